@@ -51,6 +51,10 @@ export const projectAPI = {
   // Estimation
   estimateProject: (data) => api.post('/api/v1/estimate', data),
   estimateWithSimilar: (data) => api.post('/api/v1/estimate/with-similar', data),
+  createEstimationSession: (data) => api.post('/api/v1/estimate/sessions', data),
+  updateEstimationSession: (id, changes, params = {}) =>
+    api.patch(`/api/v1/estimate/sessions/${id}`, changes, { params }),
+  deleteEstimationSession: (id) => api.delete(`/api/v1/estimate/sessions/${id}`),
 
   // Similar Projects
   searchSimilarProjects: (data) => api.post('/api/v1/similarity/search', data),
@@ -65,13 +69,18 @@ export const timesheetAPI = {
   deleteTimesheet: (id) => api.delete(`/api/v1/timesheets/${id}`),
   approveTimesheet: (id) => api.post(`/api/v1/timesheets/${id}/approve`),
   rejectTimesheet: (id, reason) => api.post(`/api/v1/timesheets/${id}/reject`, { reason }),
+  // Batch operations (one request, one transaction)
+  createTimesheets: (entries) => api.post('/api/v1/timesheets', entries),
+  approveTimesheets: (criteria) => api.post('/api/v1/timesheets/approve', criteria),
+  rejectTimesheets: (criteria, reason) => api.post('/api/v1/timesheets/reject', { ...criteria, reason }),
 };
 
 export const analyticsAPI = {
   // Analytics
-  getDashboardData: () => api.get('/api/v1/analytics/dashboard'),
+  getDashboardData: (params = {}) => api.get('/api/v1/analytics/dashboard', { params }),
   getCostAnalysis: (params = {}) => api.get('/api/v1/analytics/cost', { params }),
   getResourceAnalysis: (params = {}) => api.get('/api/v1/analytics/resources', { params }),
+  getCapacityHeatmap: (params = {}) => api.get('/api/v1/analytics/capacity', { params }),
   getProjectReport: (id) => api.get(`/api/v1/projects/${id}/report`),
 };
 
@@ -0,0 +1,412 @@
+"""
+项目成本智能评估系统 - 数据作业命令行
+Batch Job CLI
+
+用法:
+    python -m app.cli --database-url sqlite:///./project_cost.db ingest-timesheets timesheets.csv
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+from typing import List, Optional
+
+from app.core.calibration import DEFAULT_BOOTSTRAP, DEFAULT_L2
+from app.database import create_db_engine, init_db
+from app.services.baseline_calibration import activate_version, calibrate_baseline
+from app.core.ml_estimator import ALGORITHMS
+from app.core.portfolio import DEFAULT_SAMPLES
+from app.core.scheduler import ScheduleCycleError
+from app.services.baselines import capture_baseline
+from app.services.deviation_analysis import DEFAULT_TASK_THRESHOLD, run_deviation_analysis
+from app.services.evm import snapshot_evm
+from app.services.feature_snapshot import FEATURE_STORE_DIR, publish_feature_snapshot
+from app.services.forecast import HISTORY_WEEKS, forecast_projects
+from app.services.ml_training import DEFAULT_MODEL_DIR, train_ml_estimator
+from app.services.portfolio_simulation import simulate_active_portfolio
+from app.services.scheduling import schedule_project
+from app.services.similar_projects import (
+    DEFAULT_TOP_K, precompute_similar_projects, refresh_similar_projects
+)
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheet_ingest import DEFAULT_BATCH_SIZE, ingest_timesheets_csv
+from app.services.wbs import generate_project_wbs
+from app.services.wbs_rollup import rollup_projects
+
+
+def cmd_ingest_timesheets(args, engine) -> int:
+    """批量导入工时CSV"""
+    started = time.perf_counter()
+    report = ingest_timesheets_csv(args.csv_file, engine, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    print(f"读取: {report.rows_read} 行, 导入: {report.rows_inserted} 行, 拒绝: {report.rows_rejected} 行")
+    print(f"重算工时: {len(report.task_ids)} 个任务, {len(report.project_ids)} 个项目")
+    print(f"耗时: {elapsed:.2f}s")
+
+    for line_no, reason in report.errors[:args.show_errors]:
+        print(f"  第{line_no}行: {reason}")
+    if report.rows_rejected > args.show_errors:
+        print(f"  ... 其余 {report.rows_rejected - args.show_errors} 条错误未显示")
+
+    return 1 if report.rows_rejected else 0
+
+
+def cmd_rebuild_stats(args, engine) -> int:
+    """全量重建统计汇总表"""
+    started = time.perf_counter()
+    counts = rebuild_statistics(engine)
+    for table, count in counts.items():
+        print(f"{table}: {count} 行")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_check_stats(args, engine) -> int:
+    """校验统计汇总表与明细数据是否一致"""
+    mismatches = check_statistics(engine)
+    if not mismatches:
+        print("统计汇总表一致")
+        return 0
+
+    print(f"发现 {len(mismatches)} 处不一致:")
+    for item in mismatches[:args.show_errors]:
+        print(f"  {item.table} {item.key} {item.column}: 期望 {item.expected}, 实际 {item.actual}")
+    print("可执行 rebuild-stats 全量重建")
+    return 1
+
+
+def cmd_precompute_similar(args, engine) -> int:
+    """预计算相似项目 (指定 --project-id 时只增量更新受影响的行)"""
+    started = time.perf_counter()
+    if args.project_id:
+        report = refresh_similar_projects(engine, args.project_id, top_k=args.top_k, method=args.method)
+    else:
+        report = precompute_similar_projects(engine, top_k=args.top_k, method=args.method)
+
+    print(f"目标项目: {report.targets} 个, 分块: {report.blocks} 个, 写入: {report.rows_written} 行")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_analyze_deviation(args, engine) -> int:
+    """批量计算计划与实际工时偏差"""
+    started = time.perf_counter()
+    report = run_deviation_analysis(
+        engine,
+        project_ids=args.project_id,
+        analysis_date=args.date,
+        task_threshold=args.task_threshold,
+    )
+    print(f"项目: {report.projects} 个, 任务: {report.tasks} 个, 写入: {report.rows_written} 行")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_calibrate_baseline(args, engine) -> int:
+    """基于已完成项目校准工时定额"""
+    started = time.perf_counter()
+    try:
+        version, result = calibrate_baseline(
+            engine, l2=args.l2, bootstrap=args.bootstrap, seed=args.seed, activate=args.activate
+        )
+    except ValueError as e:
+        print(f"校准失败: {e}")
+        return 1
+
+    print(f"定额版本: {version}{' (已设为默认)' if args.activate else ''}, 样本: {result.samples} 个项目")
+    for group, factor in result.factors.items():
+        low, high = result.confidence_intervals[group]
+        print(f"  {group}: 系数 {factor:.4f} [{low:.4f}, {high:.4f}], 每单位 {result.base_hours_per_unit[group]} 人时")
+    print(f"R²: {result.r2_score}, MAE: {result.mae} (标准定额 MAE: {result.baseline_mae})")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_activate_baseline(args, engine) -> int:
+    """切换默认工时定额版本"""
+    try:
+        with engine.begin() as conn:
+            activate_version(conn, args.version)
+    except ValueError as e:
+        print(str(e))
+        return 1
+    print(f"默认定额版本: {args.version}")
+    return 0
+
+
+def cmd_train_ml(args, engine) -> int:
+    """训练机器学习评估模型"""
+    started = time.perf_counter()
+    try:
+        estimator = train_ml_estimator(
+            engine, model_dir=args.model_dir, algorithm=args.algorithm, random_state=args.seed
+        )
+    except ValueError as e:
+        print(f"训练失败: {e}")
+        return 1
+
+    print(f"模型版本: {estimator.version} ({estimator.algorithm}), 样本: {estimator.samples} 个项目")
+    print(f"验证集 R²: {estimator.metrics['r2_score']}, MAE: {estimator.metrics['mae']}")
+    top_features = list(estimator.feature_importance().items())[:5]
+    print("主要特征: " + ", ".join(f"{name}={value}" for name, value in top_features))
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_publish_features(args, engine) -> int:
+    """发布共享特征快照"""
+    started = time.perf_counter()
+    try:
+        version, count = publish_feature_snapshot(engine, store_dir=args.store_dir, n_clusters=args.clusters)
+    except ValueError as e:
+        print(f"发布失败: {e}")
+        return 1
+
+    print(f"特征快照版本: v{version}, 项目: {count} 个, 目录: {args.store_dir}")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_simulate_portfolio(args, engine) -> int:
+    """在建项目组合蒙特卡洛模拟"""
+    started = time.perf_counter()
+    correlations = {"client": args.client_correlation, "phase": args.phase_correlation}
+    try:
+        result = simulate_active_portfolio(
+            engine, samples=args.samples, correlations=correlations, seed=args.seed, workers=args.workers
+        )
+    except ValueError as e:
+        print(f"模拟失败: {e}")
+        return 1
+
+    print(f"项目: {result.projects} 个, 抽样: {result.samples} 次")
+    for label, hours in result.hours_quantiles.items():
+        print(f"  {label}: {hours} 人时, 成本 {result.cost_quantiles[label]}"
+              f" (各项目{label}之和 {result.sum_of_project_quantiles[label]})")
+    print(f"均值: {result.mean_hours} 人时, 成本 {result.mean_cost}")
+    print(f"尾部 (≥P{round(result.tail_quantile * 100)}) 均值: {result.tail_mean_hours} 人时, 主要贡献项目:")
+    for item in result.contributions[:args.top]:
+        print(f"  [{item['project_id']}] {item['name']} ({item['client']}): "
+              f"{item['tail_hours']} 人时, 超出均值 {item['tail_excess_hours']}, 占比 {item['tail_share']:.1%}")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_schedule_project(args, engine) -> int:
+    """关键路径计算并回写任务计划日期"""
+    started = time.perf_counter()
+    try:
+        schedule = schedule_project(
+            engine, args.project_id, start_date=args.start_date, holidays=args.holiday, write=not args.dry_run
+        )
+    except ScheduleCycleError as e:
+        print(f"排期失败: {e}")
+        return 2
+    except ValueError as e:
+        print(f"排期失败: {e}")
+        return 1
+
+    print(f"项目 {schedule.project_id}: {schedule.start_date} ~ {schedule.finish_date}, "
+          f"工期 {schedule.duration_days} 个工作日")
+    print(f"任务: {schedule.tasks} 个, 依赖: {schedule.dependencies} 条, "
+          f"关键任务: {len(schedule.critical_path)} 个, 回写: {schedule.rows_written} 行")
+    shown = schedule.critical_path[:args.show_critical]
+    if shown:
+        more = " ..." if len(schedule.critical_path) > len(shown) else ""
+        print("关键路径: " + " -> ".join(str(task_id) for task_id in shown) + more)
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_generate_wbs(args, engine) -> int:
+    """按项目规模参数生成WBS并写入 wbs_tasks"""
+    started = time.perf_counter()
+    failed = 0
+    for project_id in args.project_id:
+        result = generate_project_wbs(engine, project_id, args.baseline_version)
+        if result is None:
+            print(f"项目不存在: {project_id}")
+            failed += 1
+            continue
+        print(f"项目 {project_id}: 任务 {result.tasks} 个, 新增 {result.inserted}, "
+              f"更新 {result.updated}, 删除 {result.deleted}")
+        if result.retained:
+            print(f"  保留 (有工时记录或下级任务): {', '.join(result.retained)}")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 1 if failed else 0
+
+
+def cmd_rollup_wbs(args, engine) -> int:
+    """上卷汇总任务的预估工时、实际工时与进度"""
+    started = time.perf_counter()
+    report = rollup_projects(engine, args.project_id)
+    print(f"项目: {report.projects} 个, 任务: {report.tasks} 个, "
+          f"汇总任务: {report.summary_tasks} 个, 回写: {report.rows_written} 行")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_capture_baseline(args, engine) -> int:
+    """保存项目当前计划为新基线"""
+    try:
+        baseline = capture_baseline(engine, args.project_id, args.version, args.name)
+    except ValueError as e:
+        print(f"保存基线失败: {e}")
+        return 1
+    if baseline is None:
+        print(f"项目不存在: {args.project_id}")
+        return 1
+    print(f"项目 {args.project_id} 基线 {baseline['version']}: 任务 {baseline['tasks']} 个, "
+          f"计划工时 {baseline['total_planned_hours']}h, "
+          f"{baseline['planned_start_date']} ~ {baseline['planned_end_date']}")
+    return 0
+
+
+def cmd_snapshot_evm(args, engine) -> int:
+    """追加挣值日快照"""
+    started = time.perf_counter()
+    report = snapshot_evm(engine, args.date, args.project_id, rebuild=args.rebuild)
+    print(f"快照截至 {report.as_of}: 项目 {report.projects} 个, 写入 {report.rows_written} 行")
+    if report.skipped:
+        print(f"没有当前基线, 跳过: {', '.join(str(project_id) for project_id in report.skipped)}")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_forecast_projects(args, engine) -> int:
+    """预测在建项目的完工日期与完工总工时"""
+    started = time.perf_counter()
+    report = forecast_projects(engine, args.date, args.project_id, history_weeks=args.weeks)
+    print(f"预测日 {report.as_of}: 项目 {report.projects} 个, 写入 {report.rows_written} 行")
+    if report.without_completion_date:
+        print(f"近期没有工时消耗, 无法预测完工日期: {len(report.without_completion_date)} 个项目")
+    print(f"耗时: {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="项目成本智能评估系统 - 数据作业工具")
+    parser.add_argument("--database-url", help="数据库连接串 (默认读取 DATABASE_URL 环境变量)")
+    parser.add_argument("--init-db", action="store_true", help="执行前按ORM模型建表 (开发环境)")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest-timesheets", help="批量导入工时CSV并重算实际工时")
+    ingest.add_argument("csv_file", help="工时CSV文件路径")
+    ingest.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每批插入行数")
+    ingest.add_argument("--show-errors", type=int, default=20, help="最多显示的错误行数")
+    ingest.set_defaults(func=cmd_ingest_timesheets)
+
+    rebuild = subparsers.add_parser("rebuild-stats", help="全量重建项目统计/用户负荷汇总表")
+    rebuild.set_defaults(func=cmd_rebuild_stats)
+
+    check = subparsers.add_parser("check-stats", help="校验汇总表与明细数据的一致性")
+    check.add_argument("--show-errors", type=int, default=20, help="最多显示的不一致条数")
+    check.set_defaults(func=cmd_check_stats)
+
+    similar = subparsers.add_parser("precompute-similar", help="按项目类型分块预计算 similar_projects")
+    similar.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="每个项目保留的相似项目数")
+    similar.add_argument("--method", default="hybrid", choices=["hybrid", "cosine", "euclidean"],
+                         help="匹配方法")
+    similar.add_argument("--project-id", type=int, action="append",
+                         help="变更的项目ID (可多次指定), 只更新受影响的行")
+    similar.set_defaults(func=cmd_precompute_similar)
+
+    deviation = subparsers.add_parser("analyze-deviation", help="按阶段/任务类型批量计算工时偏差")
+    deviation.add_argument("--date", type=date.fromisoformat, help="分析日期 YYYY-MM-DD (默认今天)")
+    deviation.add_argument("--task-threshold", type=float, default=DEFAULT_TASK_THRESHOLD,
+                           help="任务级记录的偏差率阈值 (%%)")
+    deviation.add_argument("--project-id", type=int, action="append", help="只分析指定项目 (可多次指定)")
+    deviation.set_defaults(func=cmd_analyze_deviation)
+
+    calibrate = subparsers.add_parser("calibrate-baseline", help="用正则化最小二乘校准工时定额")
+    calibrate.add_argument("--l2", type=float, default=DEFAULT_L2, help="向标准定额收缩的正则强度")
+    calibrate.add_argument("--bootstrap", type=int, default=DEFAULT_BOOTSTRAP, help="自助法重采样次数")
+    calibrate.add_argument("--seed", type=int, help="随机种子")
+    calibrate.add_argument("--activate", action="store_true", help="校准后设为默认定额")
+    calibrate.set_defaults(func=cmd_calibrate_baseline)
+
+    activate = subparsers.add_parser("activate-baseline", help="切换默认工时定额版本")
+    activate.add_argument("version", help="定额版本, 如 v3")
+    activate.set_defaults(func=cmd_activate_baseline)
+
+    train = subparsers.add_parser("train-ml", help="训练机器学习评估模型并按版本保存")
+    train.add_argument("--algorithm", default="gbm", choices=list(ALGORITHMS), help="gbm 梯度提升 / rf 随机森林")
+    train.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="模型文件目录 (默认读取 ML_MODEL_DIR)")
+    train.add_argument("--seed", type=int, default=42, help="随机种子")
+    train.set_defaults(func=cmd_train_ml)
+
+    features = subparsers.add_parser("publish-features", help="发布共享历史特征快照, API工作进程自动切换")
+    features.add_argument("--store-dir", default=FEATURE_STORE_DIR,
+                          help="快照目录 (默认读取 FEATURE_STORE_DIR, 否则为 /dev/shm 下)")
+    features.add_argument("--clusters", type=int, help="聚类数 (默认约为项目数的平方根, 0 表示不聚类)")
+    features.set_defaults(func=cmd_publish_features)
+
+    portfolio = subparsers.add_parser("simulate-portfolio", help="在建项目组合蒙特卡洛模拟 (P50/P80/P90)")
+    portfolio.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="抽样次数")
+    portfolio.add_argument("--client-correlation", type=float, default=0.0, help="同一客户任务间的相关系数")
+    portfolio.add_argument("--phase-correlation", type=float, default=0.0, help="同一阶段任务间的相关系数")
+    portfolio.add_argument("--seed", type=int, help="随机种子")
+    portfolio.add_argument("--workers", type=int, default=1, help="抽样进程数")
+    portfolio.add_argument("--top", type=int, default=10, help="显示的尾部风险贡献项目数")
+    portfolio.set_defaults(func=cmd_simulate_portfolio)
+
+    schedule = subparsers.add_parser("schedule-project", help="关键路径计算, 批量回写任务计划日期与时差")
+    schedule.add_argument("project_id", type=int, help="项目ID")
+    schedule.add_argument("--start-date", type=date.fromisoformat,
+                          help="进度起点 YYYY-MM-DD (默认项目计划开始日期)")
+    schedule.add_argument("--holiday", type=date.fromisoformat, action="append", default=[],
+                          help="节假日 YYYY-MM-DD (可重复)")
+    schedule.add_argument("--dry-run", action="store_true", help="只计算不回写")
+    schedule.add_argument("--show-critical", type=int, default=20, help="最多显示的关键任务数")
+    schedule.set_defaults(func=cmd_schedule_project)
+
+    wbs = subparsers.add_parser("generate-wbs", help="按项目规模参数生成WBS, 按编码差异写入 wbs_tasks")
+    wbs.add_argument("project_id", type=int, nargs="+", help="项目ID")
+    wbs.add_argument("--baseline-version", help="工时定额版本 (默认使用当前默认定额)")
+    wbs.set_defaults(func=cmd_generate_wbs)
+
+    rollup = subparsers.add_parser("rollup-wbs", help="上卷汇总任务的工时与进度, 只回写有变化的行")
+    rollup.add_argument("--project-id", type=int, action="append", help="只处理指定项目 (可多次指定)")
+    rollup.set_defaults(func=cmd_rollup_wbs)
+
+    baseline = subparsers.add_parser("capture-baseline", help="保存项目当前计划为新基线并设为当前基线")
+    baseline.add_argument("project_id", type=int, help="项目ID")
+    baseline.add_argument("version", help="基线版本, 如 v1")
+    baseline.add_argument("--name", help="基线名称")
+    baseline.set_defaults(func=cmd_capture_baseline)
+
+    evm = subparsers.add_parser("snapshot-evm", help="增量追加挣值日快照 (PV/EV/AC、CPI/SPI、EAC)")
+    evm.add_argument("--date", type=date.fromisoformat, help="快照截至日期 YYYY-MM-DD (默认今天)")
+    evm.add_argument("--project-id", type=int, action="append", help="只处理指定项目 (默认全部在建项目)")
+    evm.add_argument("--rebuild", action="store_true", help="删除已有快照, 从基线开始日重新计算")
+    evm.set_defaults(func=cmd_snapshot_evm)
+
+    forecast = subparsers.add_parser("forecast-projects", help="按周工时消耗趋势预测完工日期与完工总工时")
+    forecast.add_argument("--date", type=date.fromisoformat, help="预测日 YYYY-MM-DD (默认今天)")
+    forecast.add_argument("--project-id", type=int, action="append", help="只处理指定项目 (默认全部在建项目)")
+    forecast.add_argument("--weeks", type=int, default=HISTORY_WEEKS, help="参与趋势拟合的周数")
+    forecast.set_defaults(func=cmd_forecast_projects)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数"""
+    args = build_parser().parse_args(argv)
+
+    engine = create_db_engine(args.database_url)
+    if args.init_db:
+        init_db(engine)
+
+    try:
+        return args.func(args, engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+资源负荷热力图
+Resource Capacity Heatmap
+
+把每个任务的预估工时平均分摊到计划开始至完成之间的工作日, 得到
+用户 × 日期的负荷矩阵。不逐天展开任务: 每个任务只在差分数组的
+起止两列各记一次 (起点 +每日工时, 终点 -每日工时), 按行做一次
+前缀和即得每天的负荷, 整体为 O(任务数 + 用户数 × 天数)。
+
+日期换算为工作日序号 (numpy 工作日历, 周一至周五, 可指定节假日),
+差分在工作日序号上进行, 周末与节假日负荷为0。跨越统计窗口的任务
+按全程工作日计算每日工时, 只统计落在窗口内的部分。
+
+每日负荷超过用户日产能 (默认8小时) 的即为超负荷。
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+# 用户日产能 (小时)
+DEFAULT_DAILY_CAPACITY = 8.0
+DEFAULT_HORIZON_DAYS = 365
+# 工作日序号的基准日期 (周一)
+EPOCH = np.datetime64("2000-01-03", "D")
+
+
+@dataclass
+class CapacityResult:
+    """用户 × 日历日的负荷矩阵"""
+    user_ids: np.ndarray
+    start_date: date
+    load: np.ndarray
+    capacity: float
+    working: np.ndarray
+    tasks: int = 0
+    unscheduled_tasks: int = 0
+
+    @property
+    def dates(self) -> List[date]:
+        """矩阵各列对应的日期"""
+        return [self.start_date + timedelta(days=i) for i in range(self.load.shape[1])]
+
+    @property
+    def over_allocated(self) -> np.ndarray:
+        """超负荷的 (用户, 日期)"""
+        return self.load > self.capacity + 1e-6
+
+    def user_summary(self) -> Dict[str, np.ndarray]:
+        """各用户的总工时、峰值、超负荷天数与工作日利用率"""
+        working_days = int(self.working.sum())
+        total = self.load.sum(axis=1)
+        return {
+            "total_hours": total,
+            "peak_hours": self.load.max(axis=1) if self.load.size else np.zeros(len(self.user_ids)),
+            "peak_day": self.load.argmax(axis=1) if self.load.size else np.zeros(len(self.user_ids), np.int64),
+            "over_allocated_days": self.over_allocated.sum(axis=1),
+            "utilization": total / (self.capacity * working_days) if working_days else np.zeros(len(total)),
+        }
+
+    def by_week(self) -> np.ndarray:
+        """按周 (从 start_date 起每7天) 汇总的负荷"""
+        users, days = self.load.shape
+        weeks = -(-days // 7)
+        padded = np.zeros((users, weeks * 7), dtype=self.load.dtype)
+        padded[:, :days] = self.load
+        return padded.reshape(users, weeks, 7).sum(axis=2)
+
+
+def _workday_index(days: np.ndarray, holidays: np.ndarray) -> np.ndarray:
+    """日期当天或之后第一个工作日的序号"""
+    return np.busday_count(EPOCH, days, holidays=holidays)
+
+
+def compute_capacity(
+    user_ids: Sequence[int],
+    task_users: Sequence[int],
+    task_starts: Sequence,
+    task_ends: Sequence,
+    task_hours: Sequence[float],
+    start_date: date,
+    days: int = DEFAULT_HORIZON_DAYS,
+    holidays: Sequence[date] = (),
+    capacity: float = DEFAULT_DAILY_CAPACITY
+) -> CapacityResult:
+    """
+    计算负荷矩阵
+
+    Args:
+        user_ids: 统计的用户 (矩阵的行), 负责人不在其中的任务被忽略
+        task_users: 各任务负责人
+        task_starts: 各任务计划开始日期 (可为空)
+        task_ends: 各任务计划完成日期 (含当天, 为空时按开始日期)
+        task_hours: 各任务工时
+        start_date: 窗口起始日期
+        days: 窗口天数
+        holidays: 节假日
+        capacity: 用户日产能
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    holidays = np.array(list(holidays), dtype="datetime64[D]")
+    window_start = np.datetime64(start_date, "D")
+    calendar = window_start + np.arange(days)
+    working = np.is_busday(calendar, holidays=holidays)
+    n_workdays = int(working.sum())
+
+    starts = np.array(task_starts, dtype="datetime64[D]")
+    ends = np.array(task_ends, dtype="datetime64[D]")
+    ends = np.where(np.isnat(ends), starts, ends)
+    hours = np.nan_to_num(np.asarray(task_hours, dtype=np.float64))
+
+    # 负责人映射为矩阵行号
+    task_users = np.asarray(task_users, dtype=np.int64)
+    order = np.argsort(user_ids)
+    position = np.zeros(len(task_users), dtype=np.int64)
+    known = np.zeros(len(task_users), dtype=bool)
+    if len(user_ids):
+        position = order[np.minimum(np.searchsorted(user_ids, task_users, sorter=order), len(user_ids) - 1)]
+        known = user_ids[position] == task_users
+    scheduled = known & ~np.isnat(starts) & (hours > 0)
+    rows = position[scheduled]
+    starts, ends, hours = starts[scheduled], np.maximum(ends[scheduled], starts[scheduled]), hours[scheduled]
+
+    # 工作日序号上的 [first, last), 全程没有工作日的任务计在开始后的第一个工作日
+    first = _workday_index(starts, holidays)
+    last = _workday_index(ends + 1, holidays)
+    last = np.maximum(last, first + 1)
+    daily = hours / (last - first)
+
+    offset = _workday_index(window_start, holidays)
+    first = np.clip(first - offset, 0, n_workdays)
+    last = np.clip(last - offset, 0, n_workdays)
+    inside = first < last
+
+    # 差分数组: 每行多一列承接终点的负值, bincount 一次完成散列累加
+    width = n_workdays + 1
+    weights = np.concatenate([daily[inside], -daily[inside]])
+    cells = np.concatenate([rows[inside] * width + first[inside], rows[inside] * width + last[inside]])
+    diff = np.bincount(cells, weights=weights, minlength=len(user_ids) * width).reshape(len(user_ids), width)
+    workday_load = np.cumsum(diff[:, :n_workdays], axis=1)
+    # 前缀和的浮点残差
+    workday_load[np.abs(workday_load) < 1e-9] = 0.0
+
+    load = np.zeros((len(user_ids), days), dtype=np.float64)
+    load[:, working] = workday_load
+    return CapacityResult(
+        user_ids=user_ids,
+        start_date=start_date,
+        load=load,
+        capacity=capacity,
+        working=working,
+        tasks=int(inside.sum()),
+        unscheduled_tasks=int((known & ~scheduled).sum()),
+    )
+
@@ -0,0 +1,428 @@
+"""
+增量评估会话
+Incremental Estimation Session
+
+创建项目向导中用户每次只修改一个参数 (报表数、个性化需求数等)。
+会话保存上一次的复杂度评分、WBS骨架与各任务工时, 参数变化时按显式
+依赖图只重算受影响的部分:
+
+    输入字段 -> 复杂度 / WBS骨架 / 规模单位 (per_source、per_table ...)
+    规模单位 -> 该单位计价的任务类型 (来自 BASELINES)
+    开发阶段任务 -> 按开发工时计算的百分比任务 (测试类)
+    非百分比任务 -> 按基础工时计算的百分比任务 (其余)
+    任务 -> 所在阶段小计 -> 基础工时 -> 复杂度调整 / 三点估算
+
+结果与 WorkloadEstimator.estimate 的全量计算逐位一致 (合计按相同顺序
+累加), 每次更新返回变化部分的差异。
+"""
+
+import math
+import uuid
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.core.estimator import (
+    ComplexityScore, EstimationResult, ProjectInfo, ProjectWBS, TaskTypeBaseline,
+    WBSLayout, WorkloadEstimator
+)
+
+
+# 输入字段 -> 直接依赖它的计算节点 (与 _assess_complexity / _generate_wbs / _unit_quantities 对应)
+INPUT_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "name": (),
+    "project_type": (),
+    "client_type": ("complexity",),
+    "data_sources_count": ("complexity", "layout", "per_source", "per_scenario"),
+    "interface_tables_count": ("complexity", "per_table"),
+    "reports_count": ("layout", "per_report"),
+    "custom_requirements_count": ("complexity", "layout", "per_requirement"),
+    "data_volume_level": ("complexity",),
+    "regulation_type": ("complexity",),
+}
+
+# 百分比任务的计算基数节点
+DEV_HOURS = "dev_hours"
+SUBTOTAL = "subtotal"
+
+COMPLEXITY_FIELDS = tuple(f.name for f in fields(ComplexityScore))
+
+# 输入字段的类型 (Optional 字段可为 None)
+INPUT_TYPES = {f.name: f.type for f in fields(ProjectInfo)}
+
+# 三点估算结果字段
+ESTIMATE_FIELDS = (
+    "total_hours", "optimistic", "most_likely", "pessimistic",
+    "expected", "std_deviation", "confidence_interval", "confidence_level"
+)
+
+
+def task_dependency_graph(baseline: TaskTypeBaseline) -> Dict[str, FrozenSet[str]]:
+    """
+    任务类型依赖图: 规模单位或计算基数 -> 依赖它的任务类型
+
+    百分比任务中测试类按开发工时 (dev_hours) 计算, 其余按非百分比任务合计 (subtotal)
+    """
+    graph: Dict[str, Set[str]] = {}
+    for task_type, rule in baseline.BASELINES.items():
+        if rule["type"] == "percentage":
+            source = DEV_HOURS if "test" in task_type else SUBTOTAL
+        else:
+            source = rule["type"]
+        graph.setdefault(source, set()).add(task_type)
+    return {source: frozenset(types) for source, types in graph.items()}
+
+
+@dataclass
+class EstimationDiff:
+    """一次参数修改引起的评估变化"""
+    inputs: Dict[str, Tuple] = field(default_factory=dict)
+    complexity: Dict[str, Tuple] = field(default_factory=dict)
+    added_tasks: List[str] = field(default_factory=list)
+    removed_tasks: List[str] = field(default_factory=list)
+    tasks: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    phases: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    estimate: Dict[str, Tuple] = field(default_factory=dict)
+    recomputed_tasks: int = 0
+
+    @property
+    def changed(self) -> bool:
+        """评估结果是否有变化"""
+        return bool(self.complexity or self.added_tasks or self.removed_tasks
+                    or self.tasks or self.phases or self.estimate)
+
+    def to_dict(self) -> Dict:
+        """转换为接口返回格式 (变化以 {"old", "new"} 表示)"""
+        def pairs(values: Dict[str, Tuple]) -> Dict[str, Dict]:
+            return {key: {"old": old, "new": new} for key, (old, new) in values.items()}
+
+        def rounded(hours: Optional[float]) -> Optional[float]:
+            return None if hours is None else round(hours, 1)
+
+        # 任务工时与完整评估结果一样保留1位小数, 取整后相同的不再列出
+        tasks = {
+            code: (rounded(old), rounded(new)) for code, (old, new) in self.tasks.items()
+            if rounded(old) != rounded(new)
+        }
+        return {
+            "inputs": pairs(self.inputs),
+            "complexity": pairs(self.complexity),
+            "added_tasks": self.added_tasks,
+            "removed_tasks": self.removed_tasks,
+            "tasks": pairs(tasks),
+            "phases": pairs(self.phases),
+            "estimate": pairs(self.estimate),
+            "recomputed_tasks": self.recomputed_tasks,
+        }
+
+
+class EstimationSession:
+    """
+    有状态的增量评估会话
+
+    Example:
+        session = EstimationSession(project_info)
+        diff = session.update(reports_count=20)
+        result = session.result
+    """
+
+    def __init__(self, project_info: ProjectInfo, estimator: Optional[WorkloadEstimator] = None):
+        self.estimator = estimator or WorkloadEstimator()
+        self.graph = task_dependency_graph(self.estimator.baseline)
+        self.project_info = replace(project_info)
+        self._result: Optional[EstimationResult] = None
+        self._layout_indexes: Dict[Tuple, Tuple] = {}
+
+        info = self.project_info
+        self.complexity = self.estimator._assess_complexity(info)
+        self._quantities = self.estimator._unit_quantities(info)
+        self._set_layout(self.estimator._generate_wbs(info, self.complexity))
+        self._compute_all()
+        self._phase_totals = [self._phase_total(p) for p in range(len(self.layout.phases))]
+        self._estimate = self._estimate_values()
+
+    # ============================================
+    # 更新
+    # ============================================
+
+    def update(self, **changes) -> EstimationDiff:
+        """
+        修改项目参数并增量重算
+
+        Args:
+            changes: ProjectInfo 字段的新值
+
+        Returns:
+            变化部分的差异
+
+        Raises:
+            ValueError: 未知字段或取值无效 (会话保持不变)
+        """
+        for name, value in changes.items():
+            _validate_input(name, value)
+
+        info = self.project_info
+        diff = EstimationDiff()
+        nodes: Set[str] = set()
+        for name, value in changes.items():
+            old = getattr(info, name)
+            if old != value:
+                diff.inputs[name] = (old, value)
+                setattr(info, name, value)
+                nodes.update(INPUT_DEPENDENCIES[name])
+        if not nodes:
+            return diff
+        self._result = None
+
+        level = self.complexity.level
+        if "complexity" in nodes:
+            old_complexity, self.complexity = self.complexity, self.estimator._assess_complexity(info)
+            for name in COMPLEXITY_FIELDS:
+                old, new = getattr(old_complexity, name), getattr(self.complexity, name)
+                if old != new:
+                    diff.complexity[name] = (old, new)
+
+        units = nodes.intersection(self._quantities)
+        if units:
+            quantities = self.estimator._unit_quantities(info)
+            units = [unit for unit in units if quantities[unit] != self._quantities[unit]]
+            self._quantities = quantities
+
+        layout = self.estimator._generate_wbs(info, self.complexity) if "layout" in nodes else self.layout
+        if layout is not self.layout:
+            dirty_phases = self._relayout(layout, diff)
+        else:
+            dirty_phases = self._recompute_units(units, diff)
+
+        for p in dirty_phases:
+            old, new = self._phase_totals[p], self._phase_total(p)
+            if old != new:
+                self._phase_totals[p] = new
+                old, new = round(old, 1), round(new, 1)
+                if old != new:
+                    diff.phases[self.layout.phases[p].phase] = (old, new)
+
+        # 基础工时 (取整后) 与复杂度等级都未变时三点估算不变
+        if round(self._total, 1) != self._estimate["base_hours"] or self.complexity.level != level:
+            old_estimate, self._estimate = self._estimate, self._estimate_values()
+            for name in ESTIMATE_FIELDS:
+                if old_estimate[name] != self._estimate[name]:
+                    diff.estimate[name] = (old_estimate[name], self._estimate[name])
+        return diff
+
+    def _recompute_units(self, units: List[str], diff: EstimationDiff) -> Set[int]:
+        """骨架不变时只重算受影响规模单位的任务及其下游百分比任务, 返回需重算小计的阶段"""
+        hours, quantities, tasks = self._hours, self._quantities, self.layout.tasks
+        dirty_phases: Set[int] = set()
+        bases = set()
+        for unit in units:
+            quantity = quantities[unit]
+            for i, rate in self._unit_tasks.get(unit, ()):
+                new = rate * quantity
+                if new != hours[i]:
+                    diff.tasks[tasks[i].wbs_code] = (hours[i], new)
+                    hours[i] = new
+                    diff.recomputed_tasks += 1
+                    dirty_phases.add(self._task_phase[i])
+                    bases.add(DEV_HOURS if self._dev_start <= i < self._dev_end else SUBTOTAL)
+
+        if bases:
+            # 测试类百分比任务依赖开发工时; 其余百分比任务依赖此前全部任务的合计
+            bases.add(SUBTOTAL)
+            for i, new in self._recompute_percentages(bases, diff).items():
+                diff.tasks[tasks[i].wbs_code] = (hours[i], new)
+                hours[i] = new
+                dirty_phases.add(self._task_phase[i])
+        return dirty_phases
+
+    def _relayout(self, layout: WBSLayout, diff: EstimationDiff) -> Set[int]:
+        """WBS骨架变化 (任务增减) 时按新骨架重算全部任务, 返回全部阶段"""
+        old = {task.wbs_code: hours for task, hours in zip(self.layout.tasks, self._hours)}
+        self._set_layout(layout)
+        self._compute_all()
+        diff.recomputed_tasks = len(layout.tasks)
+
+        codes = set()
+        for task, hours in zip(layout.tasks, self._hours):
+            codes.add(task.wbs_code)
+            if task.wbs_code not in old:
+                diff.added_tasks.append(task.wbs_code)
+            elif not _same(old[task.wbs_code], hours):
+                diff.tasks[task.wbs_code] = (_hours(old[task.wbs_code]), _hours(hours))
+        diff.removed_tasks = [code for code in old if code not in codes]
+        return set(range(len(layout.phases)))
+
+    # ============================================
+    # 计算
+    # ============================================
+
+    def _set_layout(self, layout: WBSLayout) -> None:
+        """切换骨架 (任务索引按骨架缓存在会话上, 参数来回修改时直接复用)"""
+        index = self._layout_indexes.get(layout.key)
+        if index is None:
+            index = self._layout_indexes[layout.key] = self._build_index(layout)
+        (self.layout, self._plan, self._dev_start, self._dev_end,
+         self._unit_tasks, self._percentage, self._fixed_order, self._task_phase) = index
+
+    def _build_index(self, layout: WBSLayout) -> Tuple:
+        """按骨架建立任务索引: 规模单位 -> (任务, 定额), 百分比任务 -> 计算基数, 任务 -> 阶段"""
+        plan = self.estimator.baseline.task_plan(layout)
+        dev_start, dev_end = next(
+            bounds for phase, bounds in zip(layout.phases, layout.phase_slices) if phase.phase == "开发实施"
+        )
+        unit_tasks: Dict[str, List[Tuple[int, float]]] = {}
+        percentage: List[Tuple[int, str, float]] = []
+        fixed_order: List[Tuple[int, bool]] = []
+        for i, (task, (rate, unit)) in enumerate(zip(layout.tasks, plan)):
+            if unit == "percentage":
+                base = next(source for source, types in self.graph.items() if task.type in types)
+                percentage.append((i, base, rate))
+            elif rate is not None:
+                unit_tasks.setdefault(unit, []).append((i, rate))
+                fixed_order.append((i, dev_start <= i < dev_end))
+        task_phase = [p for p, (start, end) in enumerate(layout.phase_slices) for _ in range(start, end)]
+        return layout, plan, dev_start, dev_end, unit_tasks, percentage, fixed_order, task_phase
+
+    def _compute_all(self) -> None:
+        """按当前骨架计算全部任务工时"""
+        quantities = self._quantities
+        self._hours = [
+            math.nan if rate is None
+            else 0.0 if unit == "percentage"
+            else rate * quantities[unit] if unit in quantities
+            else 0.0
+            for rate, unit in self._plan
+        ]
+        for i, hours in self._recompute_percentages({DEV_HOURS, SUBTOTAL}).items():
+            self._hours[i] = hours
+
+    def _recompute_percentages(self, bases: Set[str], diff: Optional[EstimationDiff] = None) -> Dict[int, float]:
+        """
+        重算计算基数在 bases 中的百分比任务, 返回工时有变化的任务
+
+        开发工时与合计按全量计算的顺序累加, 保证结果逐位一致
+        """
+        hours = self._hours
+        subtotal = dev_hours = 0.0
+        for i, is_dev in self._fixed_order:
+            subtotal += hours[i]
+            if is_dev:
+                dev_hours += hours[i]
+
+        changed = {}
+        total = subtotal
+        for i, base, rate in self._percentage:
+            task_hours = hours[i]
+            if base in bases:
+                new = (dev_hours if base == DEV_HOURS else total) * rate
+                if diff is not None:
+                    diff.recomputed_tasks += 1
+                if new != task_hours:
+                    changed[i] = task_hours = new
+            total += task_hours
+        self._total = total
+        return changed
+
+    def _phase_total(self, p: int) -> float:
+        start, end = self.layout.phase_slices[p]
+        total = 0
+        for hours in self._hours[start:end]:
+            if hours == hours:  # 跳过 NaN
+                total += hours
+        return total
+
+    def _estimate_values(self) -> Dict:
+        """复杂度调整与三点估算"""
+        estimator = self.estimator
+        base_hours = round(self._total, 1)
+        adjusted = estimator._apply_complexity_adjustment(base_hours, self.complexity)
+        values = estimator._three_point_estimation(adjusted, self.complexity)
+        values["base_hours"] = base_hours
+        values["total_hours"] = adjusted
+        values["confidence_level"] = estimator._determine_confidence_level(self.complexity)
+        return values
+
+    @property
+    def total_hours(self) -> float:
+        """当前评估总工时 (复杂度调整后)"""
+        return self._estimate["total_hours"]
+
+    @property
+    def result(self) -> EstimationResult:
+        """当前完整评估结果 (与 WorkloadEstimator.estimate 一致, 按需构建)"""
+        if self._result is None:
+            values = self._estimate
+            self._result = EstimationResult(
+                total_hours=values["total_hours"],
+                optimistic=values["optimistic"],
+                most_likely=values["most_likely"],
+                pessimistic=values["pessimistic"],
+                expected=values["expected"],
+                std_deviation=values["std_deviation"],
+                confidence_interval=values["confidence_interval"],
+                phase_breakdown={
+                    phase.phase: round(total, 1) for phase, total in zip(self.layout.phases, self._phase_totals)
+                },
+                wbs=ProjectWBS(self.layout, array("d", self._hours)),
+                complexity_score=self.complexity,
+                confidence_level=values["confidence_level"]
+            )
+        return self._result
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+
+def _validate_input(name: str, value) -> None:
+    """修改前校验输入字段, 避免无效取值写入会话后重算失败"""
+    if name not in INPUT_DEPENDENCIES:
+        raise ValueError(f"未知的项目参数: {name}")
+    expected = INPUT_TYPES[name]
+    if value is None:
+        if expected in (str, int):
+            raise ValueError(f"项目参数 {name} 不能为空")
+        return
+    if expected is int:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f"项目参数 {name} 须为非负整数: {value!r}")
+    elif not isinstance(value, str):
+        raise ValueError(f"项目参数 {name} 须为字符串: {value!r}")
+
+
+def _hours(value: float) -> Optional[float]:
+    """没有定额的任务 (NaN) 表示为 None"""
+    return None if value != value else value
+
+
+class EstimationSessionStore:
+    """
+    进程内的评估会话表 (按最近使用淘汰)
+
+    会话只保存在当前工作进程, 多进程部署时需按会话ID粘性路由。
+    """
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, EstimationSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, session: EstimationSession) -> str:
+        """登记会话, 返回会话ID"""
+        session_id = uuid.uuid4().hex
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[EstimationSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
@@ -6,6 +6,8 @@ Core Workload Estimation Algorithm
 from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from dataclasses import dataclass
+from array import array
+from functools import cached_property, lru_cache
 import math
 
 
@@ -35,6 +37,152 @@ class ComplexityScore:
     level: str  # simple, medium, complex, very_complex
 
 
+# ============================================
+# WBS骨架
+# ============================================
+
+# 标准WBS模板: (阶段, 编码, 任务); 任务为 (编码, 名称, 任务类型, 包含条件)
+# 包含条件: None 始终包含; "data_source" 按数据源逐个展开 (最多展示5个,
+# 编码/名称中的 {i} 为序号); "reports"/"custom_requirements" 有相应规模时包含
+MAX_SOURCE_TASKS = 5
+
+WBS_TEMPLATE = (
+    ("项目管理", "1", (
+        ("1.1", "项目启动", "pm_kickoff", None),
+        ("1.2", "项目监控", "pm_weekly_tracking", None),
+        ("1.3", "里程碑评审", "pm_milestone_review", None),
+        ("1.4", "项目收尾", "pm_closure", None),
+    )),
+    ("需求分析", "2", (
+        ("2.1", "业务调研", "req_business_research", None),
+        ("2.2", "需求访谈", "req_interview", None),
+        ("2.3", "接口表设计", "req_interface_design", None),
+        ("2.4", "需求确认", "req_confirmation", None),
+    )),
+    ("开发实施", "3", (
+        ("3.1", "环境准备", "dev_environment_setup", None),
+        ("3.2", "产品配置", "dev_product_config", None),
+        ("3.3.{i}", "数据源{i}接入开发", "dev_data_extraction", "data_source"),
+        ("3.4", "数据清洗转换", "dev_data_transformation", None),
+        ("3.5", "数据加载", "dev_data_loading", None),
+        ("3.6", "报表开发", "dev_report", "reports"),
+        ("3.7", "个性化需求开发", "dev_custom_requirement", "custom_requirements"),
+    )),
+    ("测试验证", "4", (
+        ("4.1", "单元测试", "test_unit", None),
+        ("4.2", "SIT测试", "test_sit", None),
+        ("4.3", "UAT测试支持", "test_uat_support", None),
+        ("4.4", "试运行支持", "test_trial_support", None),
+        ("4.5", "问题修复缓冲", "test_bug_fixing", None),
+    )),
+    ("培训交付", "5", (
+        ("5.1", "用户培训", "delivery_training", None),
+        ("5.2", "文档编制", "delivery_documentation", None),
+        ("5.3", "项目验收", "delivery_acceptance", None),
+    )),
+)
+
+
+@dataclass(frozen=True)
+class WBSTask:
+    """WBS任务 (不可变)"""
+    wbs_code: str
+    name: str
+    type: str
+
+
+@dataclass(frozen=True)
+class WBSPhase:
+    """WBS阶段 (不可变)"""
+    phase: str
+    wbs_code: str
+    tasks: Tuple[WBSTask, ...]
+
+
+@dataclass(frozen=True)
+class WBSLayout:
+    """
+    某一种WBS结构的不可变骨架, 由 wbs_layout 构建并在所有项目间共享
+
+    WBS结构只取决于 (展示的数据源任务数, 有无报表, 有无个性化需求)。
+    tasks 为全部任务按阶段顺序展平, phase_slices 为各阶段在其中的区间。
+    """
+    key: Tuple[int, bool, bool]
+    phases: Tuple[WBSPhase, ...]
+    tasks: Tuple[WBSTask, ...]
+    phase_slices: Tuple[Tuple[int, int], ...]
+
+
+@lru_cache(maxsize=None)
+def wbs_layout(source_tasks: int, has_reports: bool, has_custom_requirements: bool) -> WBSLayout:
+    """按模板构建 (并缓存) WBS骨架"""
+    included = {None: True, "reports": has_reports, "custom_requirements": has_custom_requirements}
+    phases, tasks, slices = [], [], []
+    for phase_name, phase_code, templates in WBS_TEMPLATE:
+        phase_tasks = []
+        for code, name, task_type, condition in templates:
+            if condition == "data_source":
+                phase_tasks.extend(
+                    WBSTask(code.format(i=i), name.format(i=i), task_type)
+                    for i in range(1, source_tasks + 1)
+                )
+            elif included[condition]:
+                phase_tasks.append(WBSTask(code, name, task_type))
+        slices.append((len(tasks), len(tasks) + len(phase_tasks)))
+        tasks.extend(phase_tasks)
+        phases.append(WBSPhase(phase_name, phase_code, tuple(phase_tasks)))
+    return WBSLayout(
+        key=(source_tasks, has_reports, has_custom_requirements),
+        phases=tuple(phases),
+        tasks=tuple(tasks),
+        phase_slices=tuple(slices),
+    )
+
+
+@dataclass
+class ProjectWBS:
+    """
+    项目WBS: 共享的不可变骨架 + 本项目各任务的基础工时
+
+    hours 与 layout.tasks 一一对应 (没有定额的任务为 NaN), 完整的字典树
+    只在调用 tree() 时拼装。
+    """
+    layout: WBSLayout
+    hours: array
+
+    def phase_hours(self) -> List[Tuple[str, float]]:
+        """各阶段工时 (按阶段顺序, 未取整)"""
+        result = []
+        for phase, (start, end) in zip(self.layout.phases, self.layout.phase_slices):
+            total = 0
+            for hours in self.hours[start:end]:
+                if hours == hours:  # 跳过 NaN
+                    total += hours
+            result.append((phase.phase, total))
+        return result
+
+    def summary(self) -> Dict:
+        """WBS摘要 (无需拼装字典树)"""
+        return {
+            "total_tasks": len(self.layout.tasks),
+            "phases_count": len(self.layout.phases),
+            "phases": [phase.phase for phase in self.layout.phases]
+        }
+
+    def tree(self) -> List[Dict]:
+        """拼装完整的WBS字典树 (每次返回新的字典, 调用方可修改)"""
+        wbs = []
+        for phase, (start, end) in zip(self.layout.phases, self.layout.phase_slices):
+            tasks = []
+            for task, hours in zip(phase.tasks, self.hours[start:end]):
+                node = {"wbs_code": task.wbs_code, "name": task.name, "type": task.type}
+                if hours == hours:
+                    node["base_hours"] = hours
+                tasks.append(node)
+            wbs.append({"phase": phase.phase, "wbs_code": phase.wbs_code, "tasks": tasks})
+        return wbs
+
+
 @dataclass
 class EstimationResult:
     """评估结果"""
@@ -46,10 +194,15 @@ class EstimationResult:
     std_deviation: float
     confidence_interval: Tuple[float, float]
     phase_breakdown: Dict[str, float]
-    wbs_structure: List[Dict]
+    wbs: ProjectWBS
     complexity_score: ComplexityScore
     confidence_level: str
 
+    @cached_property
+    def wbs_structure(self) -> List[Dict]:
+        """完整WBS字典树 (首次访问时拼装)"""
+        return self.wbs.tree()
+
 
 class TaskTypeBaseline:
     """任务类型基准工时"""
@@ -99,12 +252,82 @@ class TaskTypeBaseline:
         "very_complex": 1.8
     }
 
+    # 定额类型所属的规模单位 (校准时按单位统一缩放, 百分比类随开发工时联动)
+    UNIT_GROUPS = {
+        "fixed": "fixed",
+        "per_week": "fixed",
+        "per_milestone": "fixed",
+        "per_month": "fixed",
+        "per_source": "per_source",
+        "per_scenario": "per_source",
+        "per_table": "per_table",
+        "per_report": "per_report",
+        "per_requirement": "per_requirement",
+    }
+
+    def __init__(self, factors: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            factors: 各规模单位的校准系数 (如 {"per_table": 1.12}), 为空时使用标准定额
+        """
+        self.factors = dict(factors or {})
+        if self.factors:
+            self.BASELINES = {
+                task_type: self._scale(baseline, self.factors.get(self.UNIT_GROUPS.get(baseline["type"]), 1.0))
+                for task_type, baseline in TaskTypeBaseline.BASELINES.items()
+            }
+
+    def task_plan(self, layout: WBSLayout) -> Tuple[Tuple, ...]:
+        """
+        骨架中各任务的定额 (rate, 定额类型), 没有定额的任务为 (None, None)
+
+        按骨架缓存在本实例上, 每次评估只做乘法累加
+        """
+        plans = self.__dict__.setdefault("_task_plans", {})
+        plan = plans.get(layout.key)
+        if plan is None:
+            entries = []
+            for task in layout.tasks:
+                baseline = self.BASELINES.get(task.type)
+                if baseline:
+                    entries.append((baseline[self.rate_key(baseline)], baseline["type"]))
+                else:
+                    entries.append((None, None))
+            plan = plans[layout.key] = tuple(entries)
+        return plan
+
+    @staticmethod
+    def rate_key(baseline: Dict) -> str:
+        """定额中的工时字段名 (base_hours / base_hours_per_xxx / percentage)"""
+        return next(key for key in baseline if key != "type")
+
+    @classmethod
+    def _scale(cls, baseline: Dict, factor: float) -> Dict:
+        if baseline["type"] == "percentage":
+            return baseline
+        key = cls.rate_key(baseline)
+        return {**baseline, key: baseline[key] * factor}
+
+
+# 标准定额 (无状态, 各评估器共享以复用按骨架缓存的定额)
+DEFAULT_BASELINE = TaskTypeBaseline()
+
 
 class WorkloadEstimator:
     """工作量评估器"""
 
-    def __init__(self):
-        self.baseline = TaskTypeBaseline()
+    # 工时计算中的默认假设
+    PROJECT_WEEKS = 26  # 项目周期6个月
+    MILESTONES = 5
+    TRIAL_MONTHS = 3  # 试运行3个月
+    SCENARIOS_PER_SOURCE = 5  # SIT测试场景数 = 数据源数 * 5
+
+    def __init__(self, baseline: Optional[TaskTypeBaseline] = None):
+        """
+        Args:
+            baseline: 工时定额, 为空时使用标准定额 (可传入校准后的定额)
+        """
+        self.baseline = baseline or DEFAULT_BASELINE
 
     def estimate(self, project_info: ProjectInfo) -> EstimationResult:
         """
@@ -113,11 +336,13 @@ class WorkloadEstimator:
         # 步骤1: 评估复杂度
         complexity = self._assess_complexity(project_info)
 
-        # 步骤2: 生成WBS结构
-        wbs = self._generate_wbs(project_info, complexity)
+        # 步骤2: 生成WBS结构 (共享骨架)
+        layout = self._generate_wbs(project_info, complexity)
 
         # 步骤3: 计算基础工时
-        base_hours = self._calculate_base_hours(wbs, project_info)
+        task_hours, base_hours = self._calculate_task_hours(layout, project_info)
+        base_hours = round(base_hours, 1)
+        wbs = ProjectWBS(layout, task_hours)
 
         # 步骤4: 应用复杂度调整
         adjusted_hours = self._apply_complexity_adjustment(base_hours, complexity)
@@ -137,7 +362,7 @@ class WorkloadEstimator:
             std_deviation=three_point["std_deviation"],
             confidence_interval=three_point["confidence_interval"],
             phase_breakdown=phase_breakdown,
-            wbs_structure=wbs,
+            wbs=wbs,
             complexity_score=complexity,
             confidence_level=self._determine_confidence_level(complexity)
         )
@@ -217,178 +442,82 @@ class WorkloadEstimator:
             level=level
         )
 
-    def _generate_wbs(self, project_info: ProjectInfo, complexity: ComplexityScore) -> List[Dict]:
+    def _generate_wbs(self, project_info: ProjectInfo, complexity: ComplexityScore) -> WBSLayout:
         """
         生成WBS结构
+
+        返回共享的不可变骨架; 按数据源拆分的ETL任务最多展示5个
         """
-        wbs = []
+        return wbs_layout(
+            max(min(project_info.data_sources_count, MAX_SOURCE_TASKS), 0),
+            project_info.reports_count > 0,
+            project_info.custom_requirements_count > 0
+        )
 
-        # 1. 项目管理阶段
-        pm_phase = {
-            "phase": "项目管理",
-            "wbs_code": "1",
-            "tasks": [
-                {"wbs_code": "1.1", "name": "项目启动", "type": "pm_kickoff"},
-                {"wbs_code": "1.2", "name": "项目监控", "type": "pm_weekly_tracking"},
-                {"wbs_code": "1.3", "name": "里程碑评审", "type": "pm_milestone_review"},
-                {"wbs_code": "1.4", "name": "项目收尾", "type": "pm_closure"},
-            ]
+    def _unit_quantities(self, project_info: ProjectInfo) -> Dict[str, float]:
+        """各定额类型对应的数量"""
+        return {
+            "fixed": 1,
+            "per_source": project_info.data_sources_count,
+            "per_table": project_info.interface_tables_count,
+            "per_report": project_info.reports_count,
+            "per_requirement": project_info.custom_requirements_count,
+            # 假设项目周期为6个月 = 26周
+            "per_week": self.PROJECT_WEEKS,
+            # 假设5个里程碑
+            "per_milestone": self.MILESTONES,
+            # 假设试运行3个月
+            "per_month": self.TRIAL_MONTHS,
+            # SIT测试场景数 = 数据源数 * 5
+            "per_scenario": project_info.data_sources_count * self.SCENARIOS_PER_SOURCE,
         }
-        wbs.append(pm_phase)
-
-        # 2. 需求分析阶段
-        req_tasks = [
-            {"wbs_code": "2.1", "name": "业务调研", "type": "req_business_research"},
-            {"wbs_code": "2.2", "name": "需求访谈", "type": "req_interview"},
-            {"wbs_code": "2.3", "name": "接口表设计", "type": "req_interface_design"},
-            {"wbs_code": "2.4", "name": "需求确认", "type": "req_confirmation"},
-        ]
-        req_phase = {"phase": "需求分析", "wbs_code": "2", "tasks": req_tasks}
-        wbs.append(req_phase)
-
-        # 3. 开发实施阶段
-        dev_tasks = [
-            {"wbs_code": "3.1", "name": "环境准备", "type": "dev_environment_setup"},
-            {"wbs_code": "3.2", "name": "产品配置", "type": "dev_product_config"},
-        ]
-
-        # 按数据源拆分ETL任务
-        for i in range(1, min(project_info.data_sources_count + 1, 6)):  # 最多展示5个
-            dev_tasks.append({
-                "wbs_code": f"3.3.{i}",
-                "name": f"数据源{i}接入开发",
-                "type": "dev_data_extraction"
-            })
-
-        # 数据转换
-        dev_tasks.append({
-            "wbs_code": "3.4",
-            "name": "数据清洗转换",
-            "type": "dev_data_transformation"
-        })
-
-        # 数据加载
-        dev_tasks.append({
-            "wbs_code": "3.5",
-            "name": "数据加载",
-            "type": "dev_data_loading"
-        })
-
-        # 报表开发
-        if project_info.reports_count > 0:
-            dev_tasks.append({
-                "wbs_code": "3.6",
-                "name": "报表开发",
-                "type": "dev_report"
-            })
-
-        # 个性化开发
-        if project_info.custom_requirements_count > 0:
-            dev_tasks.append({
-                "wbs_code": "3.7",
-                "name": "个性化需求开发",
-                "type": "dev_custom_requirement"
-            })
-
-        dev_phase = {"phase": "开发实施", "wbs_code": "3", "tasks": dev_tasks}
-        wbs.append(dev_phase)
-
-        # 4. 测试验证阶段
-        test_tasks = [
-            {"wbs_code": "4.1", "name": "单元测试", "type": "test_unit"},
-            {"wbs_code": "4.2", "name": "SIT测试", "type": "test_sit"},
-            {"wbs_code": "4.3", "name": "UAT测试支持", "type": "test_uat_support"},
-            {"wbs_code": "4.4", "name": "试运行支持", "type": "test_trial_support"},
-            {"wbs_code": "4.5", "name": "问题修复缓冲", "type": "test_bug_fixing"},
-        ]
-        test_phase = {"phase": "测试验证", "wbs_code": "4", "tasks": test_tasks}
-        wbs.append(test_phase)
-
-        # 5. 培训交付阶段
-        delivery_tasks = [
-            {"wbs_code": "5.1", "name": "用户培训", "type": "delivery_training"},
-            {"wbs_code": "5.2", "name": "文档编制", "type": "delivery_documentation"},
-            {"wbs_code": "5.3", "name": "项目验收", "type": "delivery_acceptance"},
-        ]
-        delivery_phase = {"phase": "培训交付", "wbs_code": "5", "tasks": delivery_tasks}
-        wbs.append(delivery_phase)
-
-        return wbs
 
-    def _calculate_base_hours(self, wbs: List[Dict], project_info: ProjectInfo) -> float:
+    def _calculate_task_hours(self, layout: WBSLayout, project_info: ProjectInfo) -> Tuple[array, float]:
         """
-        计算基础工时
+        计算各任务基础工时
+
+        Returns:
+            (与 layout.tasks 对应的工时数组, 未取整的总工时)
         """
+        plan = self.baseline.task_plan(layout)
+        quantities = self._unit_quantities(project_info)
+        dev_start, dev_end = next(
+            bounds for phase, bounds in zip(layout.phases, layout.phase_slices) if phase.phase == "开发实施"
+        )
+
+        hours = array("d", bytes(8 * len(plan)))
         total_hours = 0.0
         dev_hours = 0.0  # 开发阶段工时,用于计算百分比任务
 
-        for phase in wbs:
-            for task in phase["tasks"]:
-                task_type = task["type"]
-                baseline = self.baseline.BASELINES.get(task_type)
-
-                if not baseline:
-                    continue
-
-                hours = 0.0
-
-                if baseline["type"] == "fixed":
-                    hours = baseline["base_hours"]
-
-                elif baseline["type"] == "per_source":
-                    hours = baseline["base_hours_per_source"] * project_info.data_sources_count
-
-                elif baseline["type"] == "per_table":
-                    hours = baseline["base_hours_per_table"] * project_info.interface_tables_count
-
-                elif baseline["type"] == "per_report":
-                    hours = baseline["base_hours_per_report"] * project_info.reports_count
-
-                elif baseline["type"] == "per_requirement":
-                    hours = baseline["base_hours_per_req"] * project_info.custom_requirements_count
-
-                elif baseline["type"] == "per_week":
-                    # 假设项目周期为6个月 = 26周
-                    hours = baseline["base_hours_per_week"] * 26
-
-                elif baseline["type"] == "per_milestone":
-                    # 假设5个里程碑
-                    hours = baseline["base_hours_per_milestone"] * 5
-
-                elif baseline["type"] == "per_month":
-                    # 假设试运行3个月
-                    hours = baseline["base_hours_per_month"] * 3
-
-                elif baseline["type"] == "per_scenario":
-                    # SIT测试场景数 = 数据源数 * 5
-                    scenarios = project_info.data_sources_count * 5
-                    hours = baseline["base_hours_per_scenario"] * scenarios
-
-                # 累加工时
-                task["base_hours"] = hours
-                total_hours += hours
-
+        for i, (rate, unit) in enumerate(plan):
+            if rate is None:
+                hours[i] = math.nan
+            elif unit != "percentage":
+                task_hours = rate * quantities[unit] if unit in quantities else 0.0
+                hours[i] = task_hours
+                total_hours += task_hours
                 # 统计开发阶段工时
-                if phase["phase"] == "开发实施":
-                    dev_hours += hours
+                if dev_start <= i < dev_end:
+                    dev_hours += task_hours
 
         # 计算百分比类型的任务
-        for phase in wbs:
-            for task in phase["tasks"]:
-                task_type = task["type"]
-                baseline = self.baseline.BASELINES.get(task_type)
-
-                if baseline and baseline["type"] == "percentage":
-                    if "test" in task_type:
-                        # 测试相关的百分比基于开发工时
-                        hours = dev_hours * baseline["percentage"]
-                    else:
-                        hours = total_hours * baseline["percentage"]
-
-                    task["base_hours"] = hours
-                    total_hours += hours
-
-        return round(total_hours, 1)
+        for i, (rate, unit) in enumerate(plan):
+            if unit == "percentage":
+                if "test" in layout.tasks[i].type:
+                    # 测试相关的百分比基于开发工时
+                    task_hours = dev_hours * rate
+                else:
+                    task_hours = total_hours * rate
+                hours[i] = task_hours
+                total_hours += task_hours
+
+        return hours, total_hours
+
+    def _calculate_base_hours(self, layout: WBSLayout, project_info: ProjectInfo) -> float:
+        """
+        计算基础工时
+        """
+        return round(self._calculate_task_hours(layout, project_info)[1], 1)
 
     def _apply_complexity_adjustment(self, base_hours: float, complexity: ComplexityScore) -> float:
         """
@@ -433,15 +562,11 @@ class WorkloadEstimator:
             "confidence_interval": confidence_interval
         }
 
-    def _calculate_phase_breakdown(self, wbs: List[Dict]) -> Dict[str, float]:
+    def _calculate_phase_breakdown(self, wbs: ProjectWBS) -> Dict[str, float]:
         """
         计算各阶段工时分解
         """
-        breakdown = {}
-        for phase in wbs:
-            phase_hours = sum(task.get("base_hours", 0) for task in phase["tasks"])
-            breakdown[phase["phase"]] = round(phase_hours, 1)
-        return breakdown
+        return {phase: round(hours, 1) for phase, hours in wbs.phase_hours()}
 
     def _determine_confidence_level(self, complexity: ComplexityScore) -> str:
         """
@@ -456,9 +581,10 @@ class WorkloadEstimator:
 
 
 # 便捷函数
-def estimate_project(project_info: ProjectInfo) -> EstimationResult:
+def estimate_project(project_info: ProjectInfo,
+                     baseline: Optional[TaskTypeBaseline] = None) -> EstimationResult:
     """
     评估项目工作量的便捷函数
     """
-    estimator = WorkloadEstimator()
+    estimator = WorkloadEstimator(baseline)
     return estimator.estimate(project_info)
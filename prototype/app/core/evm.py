@@ -0,0 +1,200 @@
+"""
+挣值管理计算
+Earned Value Management
+
+对一组汇总单元 (项目整体、项目的各阶段) 计算统计窗口内每天的:
+
+- PV (计划值): 基线任务的计划工时在计划起止日期之间按日历日平均分摊,
+  截至当天的累计值
+- EV (挣值): 基线任务计划工时 × 截至当天上报的最高进度
+- AC (实际成本): 截至当天的实际工时
+
+以上均以工时计。不逐天展开任务: PV 只在差分数组的起止两列各记一次
+分摊速率, 两次前缀和得到累计值; EV 与 AC 按 (单元, 日期) 累加增量后
+做一次前缀和, 整体为 O(任务数 + 事件数 + 单元数 × 天数)。
+
+窗口之前的累计值由调用方传入 (上一天的快照), 早于窗口的事件计入
+窗口第一天, 因此增量计算与从头计算使用同一个函数。
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# 绩效指数列为 DECIMAL(8,4)
+MAX_PERFORMANCE_INDEX = 9999.9999
+
+
+@dataclass
+class EVMSeries:
+    """单元 × 日期的累计 PV / EV / AC"""
+    start_date: date
+    budget: np.ndarray
+    planned_value: np.ndarray
+    earned_value: np.ndarray
+    actual_cost: np.ndarray
+
+    @property
+    def dates(self) -> List[date]:
+        """各列对应的日期"""
+        return [self.start_date + timedelta(days=i) for i in range(self.planned_value.shape[1])]
+
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """
+        CPI = EV / AC, SPI = EV / PV, EAC = BAC / CPI
+
+        没有实际工时时 CPI 为 NaN、EAC 取 BAC; 有实际工时但没有挣值时
+        EAC 取 AC + BAC (剩余工作按计划完成)。
+        """
+        ev, pv, ac = self.earned_value, self.planned_value, self.actual_cost
+        bac = self.budget[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cpi = np.where(ac > 0, ev / ac, np.nan)
+            spi = np.where(pv > 0, ev / pv, np.nan)
+            eac = np.where(cpi > 0, bac / cpi, np.where(ac > 0, ac + bac - ev, bac))
+        return {
+            "cost_performance_index": np.minimum(cpi, MAX_PERFORMANCE_INDEX),
+            "schedule_performance_index": np.minimum(spi, MAX_PERFORMANCE_INDEX),
+            "estimate_at_completion": eac,
+        }
+
+
+def planned_value(
+    group: np.ndarray,
+    hours: np.ndarray,
+    start: np.ndarray,
+    end: np.ndarray,
+    groups: int,
+    first_day: int,
+    days: int
+) -> np.ndarray:
+    """
+    各单元每天的累计计划值
+
+    Args:
+        group: 各计划任务所属单元
+        hours: 计划工时
+        start, end: 计划起止日期的序数 (date.toordinal, 含两端)
+        first_day: 窗口第一天的序数
+        days: 窗口天数
+    """
+    end = np.maximum(end, start)
+    span = end - start + 1
+    rate = hours / span
+
+    # 窗口第一天的累计值直接按已过天数计算, 之后只记分摊速率的起止
+    elapsed = np.clip(first_day - start + 1, 0, span)
+    first = np.bincount(group, weights=rate * elapsed, minlength=groups)
+
+    diff = np.zeros((groups, days + 1))
+    lo = np.maximum(start - first_day, 1)
+    hi = np.minimum(end - first_day, days - 1)
+    active = lo <= hi
+    np.add.at(diff, (group[active], lo[active]), rate[active])
+    np.add.at(diff, (group[active], hi[active] + 1), -rate[active])
+    daily = np.cumsum(diff, axis=1)[:, :days]
+    return first[:, None] + np.cumsum(daily, axis=1)
+
+
+def progress_gains(
+    task: np.ndarray,
+    day: np.ndarray,
+    progress: np.ndarray,
+    previous: np.ndarray
+) -> np.ndarray:
+    """
+    各进度上报使任务最高进度增加的百分点
+
+    同一任务的上报按日期排序后求前缀最大值 (以窗口前的最高进度 previous
+    为起点), 进度回退的上报增量为0。
+
+    Args:
+        task: 上报所属任务的下标
+        previous: 各任务窗口前的最高进度 (按任务下标)
+
+    Returns:
+        与输入顺序一致的增量
+    """
+    if not len(task):
+        return np.zeros(0)
+    order = np.lexsort((day, task))
+    ordered = task[order]
+    base = previous[ordered]
+    # 每个任务加上互不重叠的偏移, 一次 maximum.accumulate 即为分段前缀最大值
+    offset = ordered * 1000.0
+    running = np.maximum.accumulate(np.maximum(progress[order], base) + offset) - offset
+    first = np.r_[True, ordered[1:] != ordered[:-1]]
+    before = np.where(first, base, np.r_[0.0, running[:-1]])
+
+    gains = np.empty(len(task))
+    gains[order] = running - before
+    return gains
+
+
+def _cumulative(groups: int, days: int, group: np.ndarray, day: np.ndarray,
+                values: np.ndarray, carry: Optional[np.ndarray]) -> np.ndarray:
+    """按 (单元, 日期) 累加增量后做前缀和, 早于窗口的增量计入第一天"""
+    increments = np.zeros((groups, days))
+    np.add.at(increments, (group, np.clip(day, 0, days - 1)), values)
+    cumulative = np.cumsum(increments, axis=1)
+    if carry is not None:
+        cumulative += carry[:, None]
+    return cumulative
+
+
+def compute_evm(
+    start_date: date,
+    days: int,
+    budget: Sequence[float],
+    plan_group: Sequence[int],
+    plan_hours: Sequence[float],
+    plan_start: Sequence[int],
+    plan_end: Sequence[int],
+    cost_group: Sequence[int],
+    cost_day: Sequence[int],
+    cost_hours: Sequence[float],
+    earn_group: Sequence[int],
+    earn_day: Sequence[int],
+    earn_hours: Sequence[float],
+    carry_cost: Optional[Sequence[float]] = None,
+    carry_earned: Optional[Sequence[float]] = None
+) -> EVMSeries:
+    """
+    计算窗口内每天的累计 PV / EV / AC
+
+    Args:
+        start_date: 窗口第一天
+        days: 窗口天数
+        budget: 各单元的完工预算 (BAC)
+        plan_*: 基线计划任务 (所属单元、计划工时、计划起止日期序数)
+        cost_*: 实际工时 (所属单元、距窗口第一天的天数、工时)
+        earn_*: 挣值增量 (所属单元、距窗口第一天的天数、挣得工时)
+        carry_cost, carry_earned: 窗口前一天各单元的累计 AC / EV
+    """
+    budget = np.asarray(budget, dtype=float)
+    groups = len(budget)
+
+    def ints(values):
+        return np.asarray(values, dtype=np.int64)
+
+    def floats(values):
+        return np.asarray(values, dtype=float)
+
+    def optional(values):
+        return None if values is None else floats(values)
+
+    return EVMSeries(
+        start_date=start_date,
+        budget=budget,
+        planned_value=planned_value(
+            ints(plan_group), floats(plan_hours), ints(plan_start), ints(plan_end),
+            groups, start_date.toordinal(), days,
+        ),
+        earned_value=_cumulative(groups, days, ints(earn_group), ints(earn_day), floats(earn_hours),
+                                 optional(carry_earned)),
+        actual_cost=_cumulative(groups, days, ints(cost_group), ints(cost_day), floats(cost_hours),
+                                optional(carry_cost)),
+    )
@@ -0,0 +1,251 @@
+"""
+共享历史特征快照
+Shared Historical Feature Snapshot
+
+多个 uvicorn/gunicorn 工作进程各自加载历史项目并构建特征矩阵与聚类,
+内存占用随进程数成倍增长。这里由加载程序把特征矩阵、分类编码、
+聚类成员及构建结果所需的项目字段一次性写成 .npy 文件 (默认位于
+/dev/shm, 即 POSIX 共享内存), 各进程以只读内存映射方式挂载, 同一份
+物理页在进程间共享。
+
+快照按版本号存放在 v{N} 目录下, CURRENT 文件记录当前版本。发布新
+快照时先写临时目录再整体改名, 最后原子替换 CURRENT; 工作进程定期
+检查 CURRENT, 发现新版本后重新挂载, 无需重启。旧版本目录只保留最近
+几个, 已挂载的进程在删除后仍可继续读取原映射直到切换。
+"""
+
+import json
+import operator
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.similarity import HistoricalProject, ProjectSimilarityMatcher
+
+
+DEFAULT_STORE_DIR = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "cost-estimator-features"
+)
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+# 保留的快照版本数 (含当前版本)
+KEEP_VERSIONS = 3
+# 工作进程检查新版本的最小间隔 (秒)
+DEFAULT_CHECK_INTERVAL = 5.0
+
+# 构建 HistoricalProject 所需的数值字段 (特征矩阵之外)
+VALUE_FIELDS = ["actual_hours", "variance_percentage"]
+INTEGER_FEATURES = {
+    "data_sources_count", "interface_tables_count", "reports_count", "custom_requirements_count"
+}
+
+
+def _version_dirs(store_dir: str) -> List[int]:
+    """已发布的快照版本号 (升序)"""
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(
+        int(name[1:]) for name in os.listdir(store_dir)
+        if name.startswith("v") and name[1:].isdigit()
+    )
+
+
+def current_version(store_dir: str = DEFAULT_STORE_DIR) -> Optional[int]:
+    """当前快照版本号, 尚未发布时返回 None"""
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish_snapshot(
+    projects: Sequence,
+    store_dir: str = DEFAULT_STORE_DIR,
+    n_clusters: Optional[int] = None,
+    random_state: int = 42,
+    keep: int = KEEP_VERSIONS
+) -> int:
+    """
+    构建并发布一个新版本的特征快照
+
+    Args:
+        projects: 历史项目列表 (HistoricalProject)
+        store_dir: 快照目录
+        n_clusters: 聚类数, 为空时不聚类
+        random_state: K-means 随机种子
+        keep: 保留的版本数
+
+    Returns:
+        新快照的版本号
+    """
+    matcher = ProjectSimilarityMatcher(list(projects), n_clusters=n_clusters, random_state=random_state)
+    arrays = matcher.export_arrays()
+    vocab = matcher._feature_matrix()["vocab"]
+
+    for name in VALUE_FIELDS:
+        arrays[name] = np.array([getattr(p, name) for p in projects], dtype=np.float64)
+    encoded = [(p.name or "").encode("utf-8") for p in projects]
+    arrays["name_offsets"] = np.cumsum([0] + [len(name) for name in encoded]).astype(np.int64)
+    arrays["names"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    os.makedirs(store_dir, exist_ok=True)
+    version = max(_version_dirs(store_dir) + [current_version(store_dir) or 0]) + 1
+    staging = tempfile.mkdtemp(prefix=f".v{version}-", dir=store_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(staging, META_FILE), "w") as f:
+        json.dump({
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            "count": len(projects),
+            # 按编码排列的分类取值 (取值可能为空, 不能作为JSON键)
+            "categories": sorted(vocab, key=vocab.get),
+            "n_clusters": len(matcher._clusters["members"]) if matcher._clusters else 0,
+        }, f, ensure_ascii=False)
+    os.rename(staging, os.path.join(store_dir, f"v{version}"))
+
+    # 原子切换当前版本
+    pointer = os.path.join(store_dir, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(str(version))
+    os.replace(pointer, os.path.join(store_dir, CURRENT_FILE))
+
+    for old in _version_dirs(store_dir)[:-keep]:
+        shutil.rmtree(os.path.join(store_dir, f"v{old}"), ignore_errors=True)
+    return version
+
+
+class SnapshotProjects(Sequence):
+    """
+    快照中的历史项目序列
+
+    按下标访问时才从映射数组构建 HistoricalProject, 不在各进程中常驻对象。
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], categories: List[Optional[str]]):
+        self._arrays = arrays
+        self._categories = categories
+
+    def __len__(self) -> int:
+        return len(self._arrays["ids"])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        arrays = self._arrays
+        start, end = arrays["name_offsets"][index], arrays["name_offsets"][index + 1]
+        numeric = arrays["numeric"][index]
+        features = {
+            name: int(value) if name in INTEGER_FEATURES else float(value)
+            for name, value in zip(ProjectSimilarityMatcher.NUMERIC_FEATURES, numeric)
+        }
+        return HistoricalProject(
+            id=int(arrays["ids"][index]),
+            name=arrays["names"][start:end].tobytes().decode("utf-8"),
+            project_type=self._categories[arrays["project_type"][index]],
+            client_type=self._categories[arrays["client_type"][index]],
+            actual_hours=float(arrays["actual_hours"][index]),
+            variance_percentage=float(arrays["variance_percentage"][index]),
+            **features
+        )
+
+
+class FeatureSnapshot:
+    """已挂载的只读特征快照"""
+
+    def __init__(self, version: int, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.version = version
+        self.meta = meta
+        self.arrays = arrays
+        categories = meta["categories"]
+        self.projects = SnapshotProjects(arrays, categories)
+        self.matcher = ProjectSimilarityMatcher.from_arrays(
+            self.projects, arrays, {value: code for code, value in enumerate(categories)}
+        )
+
+    @classmethod
+    def attach(cls, store_dir: str = DEFAULT_STORE_DIR, version: Optional[int] = None) -> "FeatureSnapshot":
+        """
+        以只读内存映射挂载快照
+
+        Args:
+            version: 快照版本, 为空时挂载当前版本
+
+        Raises:
+            FileNotFoundError: 快照不存在
+        """
+        version = version or current_version(store_dir)
+        if version is None:
+            raise FileNotFoundError(f"尚未发布特征快照: {store_dir}")
+        path = os.path.join(store_dir, f"v{version}")
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {
+            name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        return cls(version, meta, arrays)
+
+    @property
+    def nbytes(self) -> int:
+        """快照数组总字节数"""
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+class SharedFeatureStore:
+    """
+    工作进程侧的快照句柄
+
+    matcher() 最多每隔 check_interval 秒读取一次 CURRENT, 版本变化时
+    重新挂载; 尚未发布快照时返回 None, 调用方回退到进程内数据。
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.store_dir = store_dir
+        self.check_interval = check_interval
+        self._snapshot: Optional[FeatureSnapshot] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        """已挂载的快照版本"""
+        return self._snapshot.version if self._snapshot else None
+
+    def snapshot(self) -> Optional[FeatureSnapshot]:
+        """当前快照 (必要时切换到新版本)"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                version = current_version(self.store_dir)
+                if version is not None and version != self.version:
+                    try:
+                        self._snapshot = FeatureSnapshot.attach(self.store_dir, version)
+                    except FileNotFoundError:
+                        # 版本目录已被更新的发布清理, 下次检查时再挂载
+                        pass
+                self._checked_at = now
+        return self._snapshot
+
+    def matcher(self) -> Optional[ProjectSimilarityMatcher]:
+        """当前快照的匹配器"""
+        snapshot = self.snapshot()
+        return snapshot.matcher if snapshot else None
@@ -0,0 +1,230 @@
+"""
+完工预测
+Forecast at Completion
+
+按项目的周工时消耗序列预测完工日期与完工总工时 (均带区间), 一次对
+全部项目的矩阵计算, 不逐项目循环:
+
+- 消耗趋势: 对每个项目最近若干周的周工时做 Theil-Sen 稳健回归 (全部
+  两两周斜率的中位数), 个别加班周或休假周不影响趋势; 残差的 MAD 估计
+  周工时波动。外推时趋势按阻尼系数逐周衰减, 避免长期线性外推。
+- 剩余工时: 叶子任务的剩余计划工时 × 效率系数。效率系数为已有进度的
+  任务的实际工时 / 挣得工时, 区间取各任务比值按挣得工时加权的分位数;
+  还没有进度或还没有实际工时的项目使用全部项目的系数。
+- 完工日期: 预测的累计消耗达到剩余工时的日期。乐观 (区间下限) 为消耗
+  偏高且剩余工时取下限, 悲观 (区间上限) 为消耗偏低且剩余工时取上限;
+  累计消耗的波动按 σ√h 随预测周数 h 放大。预测期内达不到的为 NaN。
+"""
+
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+# 80% 区间: 分位数与对应的正态分位点
+INTERVAL_QUANTILES = (0.1, 0.9)
+INTERVAL_Z = 1.2816
+# MAD 换算为正态标准差
+MAD_SCALE = 1.4826
+# 趋势每周的阻尼系数 (累计最多外推 φ/(1-φ) 周的斜率)
+DAMPING = 0.9
+# 最长预测周数
+HORIZON_WEEKS = 156
+
+
+@dataclass
+class BurnTrend:
+    """各项目的周工时趋势"""
+    level: np.ndarray      # 最后一周的拟合周工时
+    slope: np.ndarray      # 每周变化
+    scale: np.ndarray      # 周工时波动 (稳健标准差)
+    weeks: np.ndarray      # 参与拟合的周数
+
+
+@dataclass
+class EfficiencyFactors:
+    """各项目的效率系数 (实际工时 / 挣得工时) 与区间"""
+    central: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+    # 项目本身有进度且有实际工时 (否则为全部项目的系数)
+    observed: np.ndarray
+
+
+@dataclass
+class CompletionForecast:
+    """距预测日的完工周数 (可含小数), 预测期内达不到为 NaN"""
+    weeks: np.ndarray
+    weeks_low: np.ndarray
+    weeks_high: np.ndarray
+
+
+def weekly_series(
+    project: np.ndarray,
+    days_ago: np.ndarray,
+    hours: np.ndarray,
+    projects: int,
+    weeks: int
+) -> np.ndarray:
+    """
+    项目 × 周的工时矩阵, 最后一列为截至预测日的一周
+
+    Args:
+        project: 各工时记录所属项目的下标
+        days_ago: 距预测日的天数 (0 为预测日当天)
+    """
+    column = weeks - 1 - days_ago // 7
+    inside = (days_ago >= 0) & (column >= 0)
+    series = np.zeros((projects, weeks))
+    np.add.at(series, (project[inside], column[inside]), hours[inside])
+    return series
+
+
+def fit_burn_trend(series: np.ndarray, valid: np.ndarray) -> BurnTrend:
+    """
+    Theil-Sen 稳健回归
+
+    Args:
+        series: 项目 × 周的工时
+        valid: 参与拟合的周 (项目开始记工时之前的周不参与)
+    """
+    projects, weeks = series.shape
+    t = np.arange(weeks, dtype=float)
+    i, j = np.triu_indices(weeks, k=1)
+    pairs = valid[:, i] & valid[:, j]
+    slopes = np.where(pairs, (series[:, j] - series[:, i]) / (j - i), np.nan)
+
+    slope = np.zeros(projects)
+    has_pairs = pairs.any(axis=1)
+    slope[has_pairs] = np.nanmedian(slopes[has_pairs], axis=1)
+
+    intercept = np.zeros(projects)
+    scale = np.zeros(projects)
+    has_weeks = valid.any(axis=1)
+    detrended = np.where(valid, series - slope[:, None] * t, np.nan)[has_weeks]
+    intercept[has_weeks] = np.nanmedian(detrended, axis=1)
+    residuals = np.abs(detrended - intercept[has_weeks, None])
+    scale[has_weeks] = MAD_SCALE * np.nanmedian(residuals, axis=1)
+
+    return BurnTrend(
+        level=np.maximum(intercept + slope * (weeks - 1), 0.0),
+        slope=slope,
+        scale=scale,
+        weeks=valid.sum(axis=1),
+    )
+
+
+def _weighted_quantiles(group: np.ndarray, values: np.ndarray, weights: np.ndarray,
+                        groups: int, quantiles: Sequence[float]) -> Tuple[np.ndarray, ...]:
+    """按组的加权分位数, 没有数据的组为 NaN"""
+    order = np.lexsort((values, group))
+    group, values, weights = group[order], values[order], weights[order]
+    totals = np.bincount(group, weights=weights, minlength=groups)
+    cumulative = np.cumsum(weights)
+    offsets = np.r_[0.0, np.cumsum(totals)][group]
+    # 组内累计权重占比在 (0, 1], 加上组号后全局递增, 一次 searchsorted 定位各组分位点
+    key = group + 0.5 * (cumulative - offsets) / totals[group]
+
+    present = totals > 0
+    results = []
+    for q in quantiles:
+        result = np.full(groups, np.nan)
+        position = np.searchsorted(key, np.flatnonzero(present) + 0.5 * q)
+        result[present] = values[np.minimum(position, len(values) - 1)]
+        results.append(result)
+    return tuple(results)
+
+
+def efficiency_factors(
+    group: np.ndarray,
+    earned: np.ndarray,
+    actual: np.ndarray,
+    groups: int,
+    quantiles: Sequence[float] = INTERVAL_QUANTILES
+) -> EfficiencyFactors:
+    """
+    各项目的效率系数
+
+    项目既有进度又有实际工时时才使用自身的比值 (只有进度、还没有记工时
+    的项目比值为0, 会把剩余工时算成0), 否则使用全部此类项目汇总的系数。
+
+    Args:
+        group: 各任务所属项目的下标
+        earned: 任务的挣得工时 (预估工时 × 进度)
+        actual: 任务的实际工时
+    """
+    progressed = earned > 0
+    group, earned, actual = group[progressed], earned[progressed], actual[progressed]
+    earned_sum = np.bincount(group, weights=earned, minlength=groups)
+    actual_sum = np.bincount(group, weights=actual, minlength=groups)
+    observed = (earned_sum > 0) & (actual_sum > 0)
+
+    if observed.any():
+        counted = observed[group]
+        group, earned, actual = group[counted], earned[counted], actual[counted]
+        earned_sum, actual_sum = np.where(observed, earned_sum, 0.0), np.where(observed, actual_sum, 0.0)
+        ratio = actual / earned
+        low, high = _weighted_quantiles(group, ratio, earned, groups, quantiles)
+        pooled_low, pooled_high = _weighted_quantiles(
+            np.zeros(len(ratio), dtype=np.int64), ratio, earned, 1, quantiles
+        )
+        pooled = actual_sum.sum() / earned_sum.sum()
+    else:
+        low = high = np.full(groups, np.nan)
+        pooled = pooled_low = pooled_high = 1.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        central = np.where(observed, actual_sum / earned_sum, pooled)
+    low = np.where(observed, low, pooled_low)
+    high = np.where(observed, high, pooled_high)
+    return EfficiencyFactors(
+        central=central,
+        low=np.minimum(low, central),
+        high=np.maximum(high, central),
+        observed=observed,
+    )
+
+
+def _weeks_to_reach(cumulative: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """累计曲线第一次达到 target 的周数 (周内线性插值)"""
+    reached = cumulative >= target[:, None]
+    week = reached.argmax(axis=1)
+    rows = np.arange(len(target))
+    before = np.where(week > 0, cumulative[rows, np.maximum(week - 1, 0)], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (target - before) / (cumulative[rows, week] - before)
+    weeks = week + np.clip(fraction, 0.0, 1.0)
+    weeks = np.where(reached.any(axis=1), weeks, np.nan)
+    return np.where(target <= 0, 0.0, weeks)
+
+
+def forecast_completion(
+    trend: BurnTrend,
+    remaining: np.ndarray,
+    remaining_low: np.ndarray,
+    remaining_high: np.ndarray,
+    horizon: int = HORIZON_WEEKS,
+    damping: float = DAMPING,
+    z: float = INTERVAL_Z
+) -> CompletionForecast:
+    """
+    预测累计消耗达到剩余工时的周数
+
+    Args:
+        trend: 周工时趋势
+        remaining, remaining_low, remaining_high: 剩余工时及其区间
+    """
+    h = np.arange(1, horizon + 1, dtype=float)
+    damped = np.cumsum(damping ** h)
+    rate = np.maximum(trend.level[:, None] + trend.slope[:, None] * damped, 0.0)
+    cumulative = np.cumsum(rate, axis=1)
+    spread = z * trend.scale[:, None] * np.sqrt(h)
+
+    return CompletionForecast(
+        weeks=_weeks_to_reach(cumulative, remaining),
+        weeks_low=_weeks_to_reach(cumulative + spread, remaining_low),
+        # 累计值减去波动后不再单调, 取前缀最大值保证第一次达到即完工
+        weeks_high=_weeks_to_reach(np.maximum.accumulate(np.maximum(cumulative - spread, 0.0), axis=1),
+                                   remaining_high),
+    )
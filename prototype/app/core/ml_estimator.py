@@ -0,0 +1,283 @@
+"""
+机器学习工作量评估
+Machine-Learning Workload Estimator
+
+离线用历史项目训练梯度提升/随机森林回归模型 (方法论 3.3.2 节),
+模型连同特征编码一起保存为带版本号的文件。加载时把所有决策树
+展开为定长数组, 预测时对全部树逐层并行走查, 单条预测无需经过
+scikit-learn 的逐树调度, 延迟在1毫秒以内; 批量预测一次完成。
+"""
+
+import os
+import pickle
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from app.core.estimator import ProjectInfo, WorkloadEstimator
+
+
+NUMERIC_FEATURES = [
+    "data_sources_count",
+    "interface_tables_count",
+    "reports_count",
+    "custom_requirements_count",
+]
+COMPLEXITY_FEATURES = ["technical", "business", "data", "organizational", "risk", "total"]
+CATEGORICAL_FEATURES = ["project_type", "client_type", "data_volume_level"]
+FEATURES = NUMERIC_FEATURES + [f"{name}_complexity" for name in COMPLEXITY_FEATURES] + CATEGORICAL_FEATURES
+
+ALGORITHMS = ("gbm", "rf")
+ARTIFACT_PREFIX = "ml_estimator"
+
+
+def _build_model(algorithm: str, random_state: int):
+    if algorithm == "gbm":
+        return GradientBoostingRegressor(
+            n_estimators=200, max_depth=3, learning_rate=0.05, subsample=0.8, random_state=random_state
+        )
+    if algorithm == "rf":
+        return RandomForestRegressor(
+            n_estimators=100, max_depth=10, min_samples_split=5, random_state=random_state
+        )
+    raise ValueError(f"不支持的算法: {algorithm}, 可选 {list(ALGORITHMS)}")
+
+
+def _to_project_info(project: Dict) -> ProjectInfo:
+    return ProjectInfo(
+        name=project.get("name") or "",
+        project_type=project.get("project_type") or "",
+        client_type=project.get("client_type") or "",
+        data_sources_count=project.get("data_sources_count") or 0,
+        interface_tables_count=project.get("interface_tables_count") or 0,
+        reports_count=project.get("reports_count") or 0,
+        custom_requirements_count=project.get("custom_requirements_count") or 0,
+        data_volume_level=project.get("data_volume_level") or "medium",
+        regulation_type=project.get("regulation_type"),
+    )
+
+
+def build_vocab(projects: Sequence[Dict]) -> Dict[str, Dict[str, int]]:
+    """类别特征编码表 (按取值排序, 保证同一训练集编码稳定)"""
+    vocab = {}
+    for name in CATEGORICAL_FEATURES:
+        values = sorted({str(project.get(name) or "") for project in projects})
+        vocab[name] = {value: code for code, value in enumerate(values)}
+    return vocab
+
+
+def project_features(projects: Sequence[Dict], vocab: Dict[str, Dict[str, int]],
+                     estimator: Optional[WorkloadEstimator] = None) -> np.ndarray:
+    """
+    构造特征矩阵
+
+    复杂度各维度按规则引擎口径评估; 训练时未出现的类别编码为 -1。
+    """
+    estimator = estimator or WorkloadEstimator()
+    matrix = np.empty((len(projects), len(FEATURES)))
+    for i, project in enumerate(projects):
+        complexity = estimator._assess_complexity(_to_project_info(project))
+        row = [float(project.get(name) or 0) for name in NUMERIC_FEATURES]
+        row += [getattr(complexity, name) for name in COMPLEXITY_FEATURES]
+        row += [vocab[name].get(str(project.get(name) or ""), -1) for name in CATEGORICAL_FEATURES]
+        matrix[i] = row
+    return matrix
+
+
+class CompiledEnsemble:
+    """
+    展开为定长数组的树集成模型
+
+    每棵树的节点数组补齐到相同长度, 叶子节点的左右子节点指向自身,
+    预测时对 (样本, 树) 网格逐层推进 max_depth 步。
+    """
+
+    def __init__(self, trees: List, scale: float, offset: float, average: bool):
+        n_trees = len(trees)
+        max_nodes = max(tree.node_count for tree in trees)
+        self.feature = np.zeros((n_trees, max_nodes), dtype=np.intp)
+        self.threshold = np.zeros((n_trees, max_nodes))
+        self.left = np.tile(np.arange(max_nodes), (n_trees, 1))
+        self.right = self.left.copy()
+        self.value = np.zeros((n_trees, max_nodes))
+        self.depth = max(tree.max_depth for tree in trees)
+
+        for t, tree in enumerate(trees):
+            n = tree.node_count
+            internal = tree.children_left[:n] >= 0
+            self.feature[t, :n] = np.where(internal, tree.feature[:n], 0)
+            self.threshold[t, :n] = tree.threshold[:n]
+            self.left[t, :n] = np.where(internal, tree.children_left[:n], np.arange(n))
+            self.right[t, :n] = np.where(internal, tree.children_right[:n], np.arange(n))
+            self.value[t, :n] = tree.value[:n, 0, 0]
+
+        self.scale = scale / n_trees if average else scale
+        self.offset = offset
+        self._tree_index = np.arange(n_trees)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledEnsemble":
+        """从 GradientBoostingRegressor / RandomForestRegressor 构建"""
+        if hasattr(model, "init_"):
+            trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+            offset = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+            return cls(trees, scale=model.learning_rate, offset=offset, average=False)
+        return cls([estimator.tree_ for estimator in model.estimators_], scale=1.0, offset=0.0, average=True)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # 与 scikit-learn 一致: 特征按 float32 比较
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        trees = self._tree_index[None, :]
+        node = np.zeros((len(X), len(self._tree_index)), dtype=np.intp)
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[trees, node]] <= self.threshold[trees, node]
+            node = np.where(go_left, self.left[trees, node], self.right[trees, node])
+        return self.offset + self.scale * self.value[trees, node].sum(axis=1)
+
+
+@dataclass
+class MLEstimator:
+    """机器学习评估器 (训练结果 + 特征编码)"""
+    version: str
+    algorithm: str
+    model: object
+    vocab: Dict[str, Dict[str, int]]
+    metrics: Dict[str, float] = field(default_factory=dict)
+    samples: int = 0
+    trained_at: datetime = field(default_factory=datetime.now)
+    log_target: bool = True
+
+    def __post_init__(self):
+        self._compiled = CompiledEnsemble.from_sklearn(self.model)
+        self._estimator = WorkloadEstimator()
+
+    @classmethod
+    def train(cls, projects: Sequence[Dict], algorithm: str = "gbm", version: str = "v1",
+              test_size: float = 0.2, random_state: int = 42) -> "MLEstimator":
+        """
+        训练模型
+
+        先按 test_size 留出验证集评估 R² 与 MAE, 再用全部数据重新训练。
+
+        Args:
+            projects: 历史项目字典列表, 需包含 actual_hours
+        """
+        projects = [project for project in projects if (project.get("actual_hours") or 0) > 0]
+        if len(projects) < 10:
+            raise ValueError(f"训练样本不足: {len(projects)} 个项目 (至少10个)")
+
+        vocab = build_vocab(projects)
+        X = project_features(projects, vocab)
+        y = np.array([float(project["actual_hours"]) for project in projects])
+
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=random_state
+        )
+        holdout = _build_model(algorithm, random_state).fit(X_train, np.log1p(y_train))
+        predicted = np.expm1(holdout.predict(X_test))
+        metrics = {
+            "r2_score": round(float(r2_score(y_test, predicted)), 4),
+            "mae": round(float(mean_absolute_error(y_test, predicted)), 2),
+        }
+
+        model = _build_model(algorithm, random_state).fit(X, np.log1p(y))
+        return cls(version=version, algorithm=algorithm, model=model, vocab=vocab,
+                   metrics=metrics, samples=len(projects))
+
+    def predict(self, projects: Sequence[Dict]) -> np.ndarray:
+        """批量预测工时"""
+        if not projects:
+            return np.empty(0)
+        raw = self._compiled.predict(project_features(projects, self.vocab, self._estimator))
+        return np.expm1(raw) if self.log_target else raw
+
+    def predict_one(self, project: Dict) -> float:
+        """单个项目预测工时"""
+        return round(float(self.predict([project])[0]), 1)
+
+    def feature_importance(self) -> Dict[str, float]:
+        """特征重要性 (降序)"""
+        pairs = sorted(zip(FEATURES, self.model.feature_importances_), key=lambda x: x[1], reverse=True)
+        return {name: round(float(value), 4) for name, value in pairs}
+
+    def save(self, path: str) -> None:
+        """保存模型文件"""
+        payload = {
+            "version": self.version,
+            "algorithm": self.algorithm,
+            "model": self.model,
+            "vocab": self.vocab,
+            "metrics": self.metrics,
+            "samples": self.samples,
+            "trained_at": self.trained_at,
+            "log_target": self.log_target,
+            "features": FEATURES,
+        }
+        with open(path, "wb") as f:
+            pickle.dump(payload, f)
+
+    @classmethod
+    def load(cls, path: str) -> "MLEstimator":
+        """
+        加载模型文件
+
+        Raises:
+            ValueError: 特征定义与当前代码不一致
+        """
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("features") != FEATURES:
+            raise ValueError(f"模型特征与当前版本不一致, 请重新训练: {path}")
+        return cls(
+            version=payload["version"],
+            algorithm=payload["algorithm"],
+            model=payload["model"],
+            vocab=payload["vocab"],
+            metrics=payload.get("metrics", {}),
+            samples=payload.get("samples", 0),
+            trained_at=payload.get("trained_at") or datetime.now(),
+            log_target=payload.get("log_target", True),
+        )
+
+
+def artifact_name(version: str) -> str:
+    """模型文件名, 如 ml_estimator_v3.pkl"""
+    return f"{ARTIFACT_PREFIX}_{version}.pkl"
+
+
+def artifact_version(filename: str) -> Optional[int]:
+    """从文件名解析版本序号, 不符合命名规则时返回 None"""
+    stem = filename[:-len(".pkl")] if filename.endswith(".pkl") else ""
+    prefix = f"{ARTIFACT_PREFIX}_v"
+    if not stem.startswith(prefix) or not stem[len(prefix):].isdigit():
+        return None
+    return int(stem[len(prefix):])
+
+
+def find_artifact(model_dir: str, version: Optional[str] = None) -> Optional[str]:
+    """
+    查找模型文件
+
+    Args:
+        model_dir: 模型目录
+        version: 指定版本 (如 "v3"), 为空时取版本号最大的文件
+
+    Returns:
+        文件路径, 不存在时返回 None
+    """
+    if version:
+        path = os.path.join(model_dir, artifact_name(version))
+        return path if os.path.exists(path) else None
+    if not os.path.isdir(model_dir):
+        return None
+    versions = [(artifact_version(name), name) for name in os.listdir(model_dir)]
+    versions = [item for item in versions if item[0] is not None]
+    if not versions:
+        return None
+    return os.path.join(model_dir, max(versions)[1])
@@ -0,0 +1,153 @@
+"""
+WBS工时与进度上卷
+Hierarchical WBS Rollup
+
+任务树以数组表示: 任务按加载顺序编号, parent[i] 为上级任务的下标
+(根任务为 -1)。构建时所有任务同时沿 parent 数组逐级上移, 树深 d 轮
+向量化求出全部 (后代, 祖先) 对 (共 O(n·d) 对), 之后每个指标的上卷都是
+一次 np.bincount, 不按层分组、不递归。
+
+上卷口径:
+- 预估工时: 汇总任务 = 下属叶子任务预估工时之和
+- 实际工时: 汇总任务 = 本身记录的工时 + 全部下级任务的工时
+- 进度: 汇总任务 = 下属叶子任务进度按预估工时加权平均; 叶子任务都没有
+  预估工时时取叶子进度的简单平均
+
+单个任务变化时 update_task 只沿祖先链累加差值, 为 O(树深)。
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class WBSRollup:
+    """
+    一个项目任务树的上卷计算
+
+    Args:
+        ids: 任务ID
+        parent_ids: 上级任务ID (根任务为 None, 上级不在树中的也视为根任务)
+        estimated: 各任务本身的预估工时 (汇总任务的值不参与计算)
+        actual: 各任务本身记录的实际工时
+        progress: 各任务本身的进度 (0-100, 汇总任务的值不参与计算)
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[int],
+        parent_ids: Sequence[Optional[int]],
+        estimated: Sequence[float],
+        actual: Sequence[float],
+        progress: Sequence[float]
+    ):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        n = len(self.ids)
+        self.index = {int(task_id): i for i, task_id in enumerate(self.ids)}
+        self.parent = np.array(
+            [self.index.get(parent_id, -1) if parent_id is not None else -1 for parent_id in parent_ids],
+            dtype=np.int64,
+        )
+        self.is_leaf = np.bincount(self.parent[self.parent >= 0], minlength=n) == 0
+        self.descendant, self.ancestor = self._ancestor_pairs()
+
+        leaf = self.is_leaf.astype(float)
+        own_estimated = np.nan_to_num(np.asarray(estimated, dtype=float)) * leaf
+        self.own_actual = np.nan_to_num(np.asarray(actual, dtype=float))
+        own_progress = np.nan_to_num(np.asarray(progress, dtype=float)) * leaf
+
+        # 叶子任务自身的值, 汇总任务为0
+        self.own_estimated = own_estimated
+        self.own_earned = own_estimated * own_progress / 100
+        self.own_progress = own_progress
+        self.own_leaves = leaf
+
+        self.estimated = self._sum(self.own_estimated)
+        self.actual = self._sum(self.own_actual)
+        self.earned = self._sum(self.own_earned)
+        self.progress_sum = self._sum(self.own_progress)
+        self.leaves = self._sum(self.own_leaves)
+
+    def _ancestor_pairs(self):
+        """
+        全部 (后代, 祖先) 下标对
+
+        每轮把所有尚未到根的任务同时上移一级 (不是倍增式的指针跳跃),
+        轮数等于树深; 超过任务数仍未到根说明存在循环引用
+        """
+        n = len(self.ids)
+        nodes = np.arange(n, dtype=np.int64)
+        current = self.parent.copy()
+        descendants, ancestors = [], []
+        for _ in range(n + 1):
+            alive = current >= 0
+            if not alive.any():
+                break
+            nodes, current = nodes[alive], current[alive]
+            descendants.append(nodes)
+            ancestors.append(current)
+            current = self.parent[current]
+        else:
+            raise ValueError("任务树存在循环的上级引用")
+        if not descendants:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        return np.concatenate(descendants), np.concatenate(ancestors)
+
+    def _sum(self, own: np.ndarray) -> np.ndarray:
+        """自身值 + 全部后代的值"""
+        return own + np.bincount(self.ancestor, weights=own[self.descendant], minlength=len(own))
+
+    @property
+    def progress(self) -> np.ndarray:
+        """各任务上卷后的进度"""
+        weighted = np.divide(self.earned * 100, self.estimated,
+                             out=np.zeros_like(self.estimated), where=self.estimated > 0)
+        simple = np.divide(self.progress_sum, self.leaves,
+                           out=np.zeros_like(self.progress_sum), where=self.leaves > 0)
+        return np.where(self.estimated > 0, weighted, simple)
+
+    def chain(self, index: int) -> List[int]:
+        """任务本身及其全部祖先的下标 (自下而上)"""
+        chain = [index]
+        while self.parent[chain[-1]] >= 0:
+            chain.append(int(self.parent[chain[-1]]))
+        return chain
+
+    def update_task(
+        self,
+        task_id: int,
+        estimated: Optional[float] = None,
+        actual: Optional[float] = None,
+        progress: Optional[float] = None
+    ) -> List[int]:
+        """
+        修改单个任务本身的值, 只沿祖先链更新上卷结果
+
+        汇总任务只能修改实际工时 (预估工时与进度由下级上卷)。
+
+        Returns:
+            值发生变化的任务下标 (任务本身及其祖先)
+        """
+        i = self.index[task_id]
+        delta = {"estimated": 0.0, "actual": 0.0, "earned": 0.0, "progress_sum": 0.0}
+        if actual is not None:
+            delta["actual"] = actual - self.own_actual[i]
+            self.own_actual[i] = actual
+        if self.is_leaf[i] and (estimated is not None or progress is not None):
+            new_estimated = self.own_estimated[i] if estimated is None else estimated
+            new_progress = self.own_progress[i] if progress is None else progress
+            new_earned = new_estimated * new_progress / 100
+            delta["estimated"] = new_estimated - self.own_estimated[i]
+            delta["earned"] = new_earned - self.own_earned[i]
+            delta["progress_sum"] = new_progress - self.own_progress[i]
+            self.own_estimated[i], self.own_earned[i], self.own_progress[i] = (
+                new_estimated, new_earned, new_progress
+            )
+        elif estimated is not None or progress is not None:
+            raise ValueError(f"汇总任务 {task_id} 的预估工时与进度由下级任务上卷")
+
+        chain = self.chain(i)
+        for name, value in delta.items():
+            if value:
+                getattr(self, name)[chain] += value
+        return chain
@@ -0,0 +1,224 @@
+"""
+关键路径进度计算
+Critical Path Method (CPM) Scheduler
+
+输入任务工期 (工作日) 与任务依赖 (FS/SS/FF/SF + 滞后天数), 拓扑排序
+后做正推/逆推, 得到每个任务的最早/最晚开始与完成、总时差、自由时差
+以及关键路径。
+
+四种依赖都化为最早开始之间的约束 ES[后] >= ES[前] + w:
+- FS: w = 工期[前] + 滞后
+- SS: w = 滞后
+- FF: w = 工期[前] + 滞后 - 工期[后]
+- SF: w = 滞后 - 工期[后]
+正推即按拓扑序求最长路径, 逆推 LS[前] = min(LS[后] - w), 整体为
+O(任务数 + 依赖数)。存在循环依赖时抛出 ScheduleCycleError, 并给出
+其中一个环上的任务。
+
+工期与时差均以工作日为单位; to_calendar 按工作日历 (周一至周五,
+可指定节假日) 换算为日期。
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+DEPENDENCY_TYPES = ("FS", "SS", "FF", "SF")
+# 每个工作日的工时, 用于由预估工时换算工期
+HOURS_PER_DAY = 8.0
+
+
+class ScheduleCycleError(ValueError):
+    """任务依赖存在循环"""
+
+    def __init__(self, cycle: List[int]):
+        self.cycle = cycle
+        super().__init__(f"任务依赖存在循环: {' -> '.join(str(task_id) for task_id in cycle)}")
+
+
+@dataclass
+class ScheduleResult:
+    """进度计算结果 (数组与 task_ids 一一对应, 单位为工作日序号)"""
+    task_ids: List[int]
+    duration: np.ndarray
+    early_start: np.ndarray
+    early_finish: np.ndarray
+    late_start: np.ndarray
+    late_finish: np.ndarray
+    total_float: np.ndarray
+    free_float: np.ndarray
+    project_duration: int
+    critical_path: List[int] = field(default_factory=list)
+
+    @property
+    def critical(self) -> np.ndarray:
+        """是否关键任务 (总时差为0)"""
+        return self.total_float <= 0
+
+
+def durations_from_hours(hours: Sequence[Optional[float]], milestones: Optional[Sequence[bool]] = None,
+                         hours_per_day: float = HOURS_PER_DAY) -> np.ndarray:
+    """
+    由预估工时换算工期 (工作日, 向上取整)
+
+    里程碑工期为0; 其余任务至少1天 (未预估工时的任务按1天)。
+    """
+    values = np.array([np.nan if h is None else float(h) for h in hours], dtype=np.float64)
+    days = np.ceil(np.nan_to_num(values, nan=0.0) / hours_per_day).astype(np.int64)
+    np.maximum(days, 1, out=days)
+    if milestones is not None:
+        days[np.asarray(milestones, dtype=bool)] = 0
+    return days
+
+
+def _find_cycle(remaining: np.ndarray, pred: np.ndarray, succ: np.ndarray, task_ids: Sequence[int]) -> List[int]:
+    """在拓扑排序剩下的任务中找出一个环"""
+    predecessors: Dict[int, List[int]] = {}
+    for p, s in zip(pred.tolist(), succ.tolist()):
+        if remaining[p] and remaining[s]:
+            predecessors.setdefault(s, []).append(p)
+    node = int(np.flatnonzero(remaining)[0])
+    position: Dict[int, int] = {}
+    path = []
+    # 剩余任务都有剩余的前置任务, 沿前置任务一直回溯必然回到走过的任务
+    while node not in position:
+        position[node] = len(path)
+        path.append(node)
+        node = predecessors[node][0]
+    cycle = path[position[node]:] + [node]
+    return [task_ids[i] for i in reversed(cycle)]
+
+
+def critical_path_schedule(
+    task_ids: Sequence[int],
+    durations: Sequence[int],
+    predecessors: Sequence[int],
+    successors: Sequence[int],
+    dependency_types: Optional[Sequence[str]] = None,
+    lags: Optional[Sequence[int]] = None
+) -> ScheduleResult:
+    """
+    关键路径计算
+
+    Args:
+        task_ids: 任务ID
+        durations: 各任务工期 (工作日)
+        predecessors: 各依赖的前置任务ID
+        successors: 各依赖的后续任务ID
+        dependency_types: 各依赖的类型 (FS/SS/FF/SF), 默认全为 FS
+        lags: 各依赖的滞后天数, 默认全为0
+
+    Raises:
+        ValueError: 依赖引用了不存在的任务或类型未知
+        ScheduleCycleError: 依赖存在循环
+    """
+    task_ids = list(task_ids)
+    n = len(task_ids)
+    duration = np.asarray(durations, dtype=np.int64)
+    index = {task_id: i for i, task_id in enumerate(task_ids)}
+    try:
+        pred = np.array([index[task_id] for task_id in predecessors], dtype=np.int64)
+        succ = np.array([index[task_id] for task_id in successors], dtype=np.int64)
+    except KeyError as e:
+        raise ValueError(f"依赖引用了不存在的任务: {e.args[0]}")
+
+    # 各依赖化为最早开始之间的约束权重 w
+    weight = np.zeros(len(pred), dtype=np.int64) if lags is None else np.asarray(lags, dtype=np.int64)
+    if dependency_types is not None:
+        types = np.asarray([t or "FS" for t in dependency_types])
+        unknown = set(types.tolist()) - set(DEPENDENCY_TYPES)
+        if unknown:
+            raise ValueError(f"未知的依赖类型: {sorted(unknown)}, 可选 {list(DEPENDENCY_TYPES)}")
+        weight = weight + np.where(np.isin(types, ("FS", "FF")), duration[pred], 0)
+        weight = weight - np.where(np.isin(types, ("FF", "SF")), duration[succ], 0)
+    else:
+        weight = weight + duration[pred]
+
+    # 按前置任务分组的邻接表
+    out_edges: List[List[int]] = [[] for _ in range(n)]
+    out_weights: List[List[int]] = [[] for _ in range(n)]
+    for p, s, w in zip(pred.tolist(), succ.tolist(), weight.tolist()):
+        out_edges[p].append(s)
+        out_weights[p].append(w)
+
+    # 拓扑排序与正推合并: 任务出队时其全部前置任务已完成松弛
+    indegree = np.bincount(succ, minlength=n).tolist()
+    es = [0] * n
+    order = []
+    queue = deque(i for i in range(n) if indegree[i] == 0)
+    while queue:
+        u = queue.popleft()
+        order.append(u)
+        start = es[u]
+        for s, w in zip(out_edges[u], out_weights[u]):
+            if start + w > es[s]:
+                es[s] = start + w
+            indegree[s] -= 1
+            if not indegree[s]:
+                queue.append(s)
+    if len(order) < n:
+        raise ScheduleCycleError(_find_cycle(np.array(indegree) > 0, pred, succ, task_ids))
+
+    early_start = np.array(es, dtype=np.int64)
+    early_finish = early_start + duration
+    project_duration = int(early_finish.max()) if n else 0
+
+    # 逆推: 最晚开始不晚于工期终点, 且满足每个后续任务的约束
+    ls = (project_duration - duration).tolist()
+    free = (project_duration - early_finish).tolist()
+    for u in reversed(order):
+        latest, slack, start = ls[u], free[u], es[u]
+        for s, w in zip(out_edges[u], out_weights[u]):
+            if ls[s] - w < latest:
+                latest = ls[s] - w
+            if es[s] - w - start < slack:
+                slack = es[s] - w - start
+        ls[u], free[u] = latest, slack
+
+    late_start = np.array(ls, dtype=np.int64)
+    total_float = late_start - early_start
+    critical = np.flatnonzero(total_float <= 0)
+    critical = critical[np.lexsort((early_finish[critical], early_start[critical]))]
+
+    return ScheduleResult(
+        task_ids=task_ids,
+        duration=duration,
+        early_start=early_start,
+        early_finish=early_finish,
+        late_start=late_start,
+        late_finish=late_start + duration,
+        total_float=total_float,
+        free_float=np.array(free, dtype=np.int64),
+        project_duration=project_duration,
+        critical_path=[task_ids[i] for i in critical.tolist()],
+    )
+
+
+def to_calendar(offsets: np.ndarray, start_date: date, holidays: Sequence[date] = ()) -> np.ndarray:
+    """
+    工作日序号换算为日期 (序号0为 start_date 当天或之后的第一个工作日)
+
+    Returns:
+        datetime64[D] 数组
+    """
+    return np.busday_offset(
+        np.datetime64(start_date, "D"), offsets, roll="forward", holidays=list(holidays)
+    )
+
+
+def schedule_dates(result: ScheduleResult, start_date: date, holidays: Sequence[date] = ()):
+    """
+    计划开始/完成日期
+
+    完成日期为最后一个工作日 (里程碑的开始与完成为同一天)
+
+    Returns:
+        (开始日期数组, 完成日期数组), datetime64[D]
+    """
+    starts = to_calendar(result.early_start, start_date, holidays)
+    finishes = to_calendar(np.maximum(result.early_finish - 1, result.early_start), start_date, holidays)
+    return starts, finishes
@@ -1,9 +1,15 @@
 """
 相似项目匹配算法
 Similar Project Matching Algorithm
+
+历史项目较多时, 匹配器可在构建特征矩阵时按方法论 7.1 节做 K-means
+聚类, 并记录每个聚类的分类取值集合与各数值特征的取值范围。查询时
+先由取值范围算出目标与每个聚类内任一项目的相似度上界, 按上界从高
+到低访问聚类, 上界低于当前第K名的聚类整体跳过, Top-K 结果与全量
+计算完全一致。
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import math
 import numpy as np
@@ -39,8 +45,43 @@ class SimilarityResult:
 class ProjectSimilarityMatcher:
     """项目相似度匹配器"""
 
-    def __init__(self, historical_projects: List[HistoricalProject]):
+    # 规模特征及权重 (逐对计算与向量化计算共用)
+    SCALE_FEATURES = [
+        ("data_sources_count", 1.0),
+        ("interface_tables_count", 0.5),  # 权重较低
+        ("reports_count", 0.3)
+    ]
+
+    # 数值特征列顺序 (特征矩阵的列)
+    NUMERIC_FEATURES = [
+        "data_sources_count",
+        "interface_tables_count",
+        "reports_count",
+        "custom_requirements_count",
+        "complexity_score"
+    ]
+
+    # 聚类空间中分类特征 (独热编码) 的权重, 使聚类尽量按分类取值分开
+    CLUSTER_CATEGORY_WEIGHT = 2.0
+
+    def __init__(
+        self,
+        historical_projects: List[HistoricalProject],
+        n_clusters: Optional[int] = None,
+        random_state: int = 42
+    ):
+        """
+        Args:
+            historical_projects: 历史项目列表
+            n_clusters: 聚类数, 为空时不聚类 (每次查询全量计算);
+                可用 default_cluster_count 按项目数取默认值
+            random_state: K-means 随机种子
+        """
         self.historical_projects = historical_projects
+        self._features: Optional[Dict] = None
+        self._clusters: Optional[Dict] = None
+        if n_clusters and historical_projects:
+            self.build_clusters(n_clusters, random_state)
 
     def find_similar_projects(
         self,
@@ -59,20 +100,501 @@ class ProjectSimilarityMatcher:
         Returns:
             相似项目列表,按相似度降序排列
         """
-        similarities = []
+        if not self.historical_projects:
+            return []
+
+        if self._clusters is not None and method == "hybrid" and top_k > 0:
+            indices, scores, _ = self._pruned_top_k(target_project, top_k)
+            return [
+                self._build_result(scores, 0, j, method, index=int(idx))
+                for j, idx in enumerate(indices)
+            ]
+
+        scores = self.score_matrix([target_project], method)
+
+        # 按相似度排序 (稳定排序, 同分保持历史项目原有顺序)
+        rounded = np.round(scores["total"][0], 4)
+        order = np.argsort(-rounded, kind="stable")[:top_k]
+
+        return [self._build_result(scores, 0, int(idx), method) for idx in order]
+
+    # ============================================
+    # 向量化计算
+    # ============================================
+
+    def _feature_matrix(self) -> Dict:
+        """
+        构建历史项目特征矩阵 (首次调用时构建并缓存)
+
+        Returns:
+            numeric: (n, 5) 数值特征; project_type/client_type: 分类编码;
+            vocab: 分类取值到编码的映射
+        """
+        if self._features is None:
+            vocab: Dict = {}
+            self._features = {
+                "numeric": np.array(
+                    [[getattr(p, f) for f in self.NUMERIC_FEATURES] for p in self.historical_projects],
+                    dtype=np.float64
+                ).reshape(-1, len(self.NUMERIC_FEATURES)),
+                "project_type": np.array(
+                    [vocab.setdefault(p.project_type, len(vocab)) for p in self.historical_projects],
+                    dtype=np.int64
+                ),
+                "client_type": np.array(
+                    [vocab.setdefault(p.client_type, len(vocab)) for p in self.historical_projects],
+                    dtype=np.int64
+                ),
+                "ids": np.array([p.id for p in self.historical_projects], dtype=np.int64),
+                "vocab": vocab,
+            }
+        return self._features
+
+    def _target_matrix(self, targets: List[Dict]) -> Dict:
+        """将目标项目字典转换为与历史特征矩阵同构的数组"""
+        vocab = self._feature_matrix()["vocab"]
+        defaults = {"complexity_score": 5.0}
+        return {
+            "numeric": np.array(
+                [[t.get(f, defaults.get(f, 0)) for f in self.NUMERIC_FEATURES] for t in targets],
+                dtype=np.float64
+            ).reshape(-1, len(self.NUMERIC_FEATURES)),
+            # 未出现过的分类取值编码为-1, 不会与任何历史项目匹配
+            "project_type": np.array([vocab.get(t.get("project_type"), -1) for t in targets], dtype=np.int64),
+            "client_type": np.array([vocab.get(t.get("client_type"), -1) for t in targets], dtype=np.int64),
+        }
+
+    def score_matrix(self, targets: List[Dict], method: str = "hybrid") -> Dict[str, np.ndarray]:
+        """
+        向量化计算一批目标项目与全部历史项目的相似度
+
+        结果与逐对计算的 _calculate_similarity 一致 (未做四舍五入)。
+
+        Args:
+            targets: 目标项目信息列表
+            method: 匹配方法 (cosine, euclidean, hybrid)
+
+        Returns:
+            total/categorical/scale/complexity 四个 (len(targets), n_historical) 矩阵
+        """
+        return self._score(self._target_matrix(targets), self._feature_matrix(), method)
+
+    def _score(self, target: Dict, hist: Dict, method: str) -> Dict[str, np.ndarray]:
+        """按特征数组计算相似度 (hist 可以是历史特征矩阵的子集)"""
+        def column(matrix: np.ndarray, feature: str, axis: int) -> np.ndarray:
+            # 取出单列并增加广播维度: 目标为列向量, 历史项目为行向量
+            values = np.ascontiguousarray(matrix[:, self.NUMERIC_FEATURES.index(feature)])
+            return values[:, None] if axis == 0 else values[None, :]
+
+        # 1. 分类特征相似度
+        categorical = (
+            (target["project_type"][:, None] == hist["project_type"][None, :]) * 0.6 +
+            (target["client_type"][:, None] == hist["client_type"][None, :]) * 0.4
+        )
+
+        # 2. 规模相似度
+        distance_squared = np.zeros(categorical.shape)
+        for feature, weight in self.SCALE_FEATURES:
+            t_val = column(target["numeric"], feature, 0)
+            h_val = column(hist["numeric"], feature, 1)
+            diff = np.abs(t_val - h_val)
+            diff /= np.maximum(np.maximum(t_val, h_val), 1)
+            diff **= 2
+            diff *= weight
+            distance_squared += diff
+        scale = 1 / (1 + np.sqrt(distance_squared))
+
+        # 3. 复杂度相似度
+        complexity = np.abs(
+            column(target["numeric"], "complexity_score", 0) - column(hist["numeric"], "complexity_score", 1)
+        )
+        complexity = np.maximum(1.0 - complexity / 10.0, 0.0)
+
+        if method == "hybrid":
+            total = categorical * 0.4 + scale * 0.3 + complexity * 0.3
+        elif method == "cosine":
+            total = self._cosine_matrix(target["numeric"], hist["numeric"])
+        elif method == "euclidean":
+            total = self._euclidean_matrix(target["numeric"], hist["numeric"])
+        else:
+            total = (categorical + scale + complexity) / 3
+
+        return {
+            "total": total,
+            "categorical": categorical,
+            "scale": scale,
+            "complexity": complexity
+        }
+
+    @staticmethod
+    def _cosine_matrix(target: np.ndarray, hist: np.ndarray) -> np.ndarray:
+        """余弦相似度矩阵"""
+        dot = target @ hist.T
+        magnitude = np.linalg.norm(target, axis=1)[:, None] * np.linalg.norm(hist, axis=1)[None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = np.where(magnitude == 0, 0.0, dot / magnitude)
+        return np.maximum(cosine, 0.0)
+
+    @staticmethod
+    def _euclidean_matrix(target: np.ndarray, hist: np.ndarray) -> np.ndarray:
+        """欧氏相似度矩阵 (每个向量各自做0-1标准化, 同 _normalize_vector)"""
+        def normalize(matrix: np.ndarray) -> np.ndarray:
+            vectors = matrix[:, [0, 1, 2, 4]]
+            low = vectors.min(axis=1, keepdims=True)
+            span = vectors.max(axis=1, keepdims=True) - low
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(span == 0, 0.5, (vectors - low) / span)
+
+        t_norm = normalize(target)
+        h_norm = normalize(hist)
+        distance = np.sqrt(((t_norm[:, None, :] - h_norm[None, :, :]) ** 2).sum(axis=2))
+        return 1 / (1 + distance)
+
+    def top_k_matrix(
+        self,
+        targets: List[Dict],
+        top_k: int = 5,
+        method: str = "hybrid",
+        target_ids: Optional[List[int]] = None
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        批量求每个目标项目的Top-K历史项目
+
+        Args:
+            targets: 目标项目信息列表
+            top_k: 每个目标返回的相似项目数
+            method: 匹配方法
+            target_ids: 目标项目ID, 用于排除与自身的匹配
+
+        Returns:
+            (索引矩阵, 相似度矩阵字典), 形状均为 (len(targets), k);
+            历史项目不足时 k 小于 top_k, 被排除的位置索引为-1
+        """
+        scores = self.score_matrix(targets, method)
+        total = np.round(scores["total"], 4)
+
+        if target_ids is not None:
+            is_self = np.asarray(target_ids, dtype=np.int64)[:, None] == self._feature_matrix()["ids"][None, :]
+            total = np.where(is_self, -np.inf, total)
+
+        k = min(top_k, total.shape[1])
+        if k == 0:
+            return np.empty((len(targets), 0), dtype=np.int64), {name: np.empty((len(targets), 0)) for name in scores}
+
+        # 先用 argpartition 取出候选, 再对候选按 (相似度降序, 索引升序) 排序
+        candidates = np.argpartition(-total, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(total, candidates, axis=1)
+        order = np.lexsort((candidates, -candidate_scores), axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+
+        top_scores = {name: np.take_along_axis(matrix, indices, axis=1) for name, matrix in scores.items()}
+        indices = np.where(np.isinf(np.take_along_axis(total, indices, axis=1)), -1, indices)
+        return indices, top_scores
+
+    # ============================================
+    # 聚类剪枝
+    # ============================================
+
+    def _cluster_space(self) -> np.ndarray:
+        """
+        聚类空间: 规模特征取对数并乘以权重平方根 (与规模相似度的相对差异
+        口径相近), 复杂度按0-10量程缩放, 分类特征独热编码
+        """
+        hist = self._feature_matrix()
+        numeric = hist["numeric"]
+        columns = [
+            math.sqrt(weight) * np.log1p(np.maximum(numeric[:, self.NUMERIC_FEATURES.index(feature)], 0))
+            for feature, weight in self.SCALE_FEATURES
+        ]
+        columns.append(numeric[:, self.NUMERIC_FEATURES.index("complexity_score")] / 10.0)
+        one_hot = np.zeros((len(numeric), len(hist["vocab"])))
+        rows = np.arange(len(numeric))
+        one_hot[rows, hist["project_type"]] = self.CLUSTER_CATEGORY_WEIGHT
+        one_hot[rows, hist["client_type"]] = self.CLUSTER_CATEGORY_WEIGHT
+        return np.column_stack(columns + [one_hot])
+
+    def build_clusters(self, n_clusters: int, random_state: int = 42) -> None:
+        """
+        对历史项目做 K-means 聚类, 记录剪枝所需的聚类边界
+
+        每个聚类保存成员下标 (升序)、各数值特征的最小/最大值, 以及出现过的
+        项目类型与客户类型编码。
+        """
+        from sklearn.cluster import MiniBatchKMeans
 
-        for hist_proj in self.historical_projects:
-            similarity = self._calculate_similarity(
-                target_project,
-                hist_proj,
-                method
+        hist = self._feature_matrix()
+        n = len(hist["ids"])
+        n_clusters = max(1, min(int(n_clusters), n))
+        # 小批量 K-means: 十万级项目秒级完成, 聚类质量只影响剪枝效率, 不影响结果
+        labels = MiniBatchKMeans(
+            n_clusters=n_clusters, n_init=1, batch_size=4096, random_state=random_state
+        ).fit_predict(self._cluster_space())
+
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_clusters)
+        self._set_clusters(order, np.cumsum(counts))
+
+    def _set_clusters(self, order: np.ndarray, offsets: np.ndarray) -> None:
+        """
+        由聚类成员排列设置剪枝所需的聚类边界
+
+        Args:
+            order: 历史项目下标按聚类排列 (各聚类内升序)
+            offsets: 各聚类在 order 中的结束位置
+        """
+        hist = self._feature_matrix()
+        members = [m for m in np.split(order, offsets[:-1]) if len(m)]
+        n_codes = len(hist["vocab"])
+
+        numeric = hist["numeric"]
+        types = np.zeros((len(members), n_codes + 1), dtype=bool)
+        clients = np.zeros((len(members), n_codes + 1), dtype=bool)
+        for c, member in enumerate(members):
+            types[c, hist["project_type"][member]] = True
+            clients[c, hist["client_type"][member]] = True
+
+        # 各聚类在聚类空间中的成员中心 (classify 使用), 一次分组求和
+        sizes = np.array([len(m) for m in members])
+        space = self._cluster_space()[np.concatenate(members)]
+        centers = np.add.reduceat(space, np.r_[0, np.cumsum(sizes)[:-1]], axis=0) / sizes[:, None]
+
+        self._clusters = {
+            "members": members,
+            "low": np.array([numeric[m].min(axis=0) for m in members]),
+            "high": np.array([numeric[m].max(axis=0) for m in members]),
+            # 最后一列对应未出现过的分类取值 (编码-1), 恒为 False
+            "project_type": types,
+            "client_type": clients,
+            "centers": centers,
+        }
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        导出特征矩阵与聚类成员数组 (用于发布共享特征快照)
+
+        Returns:
+            numeric/project_type/client_type/ids, 已聚类时另含 cluster_order/cluster_offsets
+        """
+        hist = self._feature_matrix()
+        arrays = {name: hist[name] for name in ("numeric", "project_type", "client_type", "ids")}
+        if self._clusters is not None:
+            members = self._clusters["members"]
+            arrays["cluster_order"] = np.concatenate(members).astype(np.int64)
+            arrays["cluster_offsets"] = np.cumsum([len(m) for m in members]).astype(np.int64)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, historical_projects, arrays: Dict[str, np.ndarray], vocab: Dict[str, int]):
+        """
+        由已构建的特征数组创建匹配器 (不复制数组, 可直接使用只读内存映射)
+
+        Args:
+            historical_projects: 与数组行对应的历史项目序列 (可按需构建对象)
+            arrays: export_arrays 导出的数组
+            vocab: 分类取值到编码的映射
+        """
+        matcher = cls(historical_projects)
+        matcher._features = {
+            "numeric": arrays["numeric"],
+            "project_type": arrays["project_type"],
+            "client_type": arrays["client_type"],
+            "ids": arrays["ids"],
+            "vocab": vocab,
+        }
+        if "cluster_order" in arrays and len(historical_projects):
+            matcher._set_clusters(arrays["cluster_order"], arrays["cluster_offsets"])
+        return matcher
+
+    def _cluster_bounds(self, target: Dict) -> np.ndarray:
+        """
+        单个目标项目与每个聚类内任一项目的混合相似度上界
+
+        规模与复杂度差异在聚类取值范围内取最小值 (目标落在范围内时为0,
+        否则取最近的边界), 分类特征只要聚类内出现过同一取值即按匹配计。
+        """
+        clusters = self._clusters
+        values = target["numeric"][0]
+        low, high = clusters["low"], clusters["high"]
+
+        categorical = (
+            clusters["project_type"][:, target["project_type"][0]] * 0.6 +
+            clusters["client_type"][:, target["client_type"][0]] * 0.4
+        )
+
+        distance_squared = np.zeros(len(low))
+        for feature, weight in self.SCALE_FEATURES:
+            f = self.NUMERIC_FEATURES.index(feature)
+            t_val, lo, hi = values[f], low[:, f], high[:, f]
+            # 目标值小于下界时差异随历史值增大而增大, 大于上界时随历史值减小而增大
+            diff = np.where(
+                t_val < lo, (lo - t_val) / np.maximum(lo, 1),
+                np.where(t_val > hi, (t_val - hi) / max(t_val, 1), 0.0)
             )
-            similarities.append(similarity)
+            distance_squared += weight * diff ** 2
+        scale = 1 / (1 + np.sqrt(distance_squared))
+
+        f = self.NUMERIC_FEATURES.index("complexity_score")
+        gap = np.maximum(np.maximum(low[:, f] - values[f], values[f] - high[:, f]), 0.0)
+        complexity = np.maximum(1.0 - gap / 10.0, 0.0)
+
+        return categorical * 0.4 + scale * 0.3 + complexity * 0.3
+
+    def _pruned_top_k(self, target_project: Dict, top_k: int) -> Tuple[np.ndarray, Dict[str, np.ndarray], int]:
+        """
+        按聚类上界剪枝的混合相似度 Top-K
+
+        先按上界从高到低取聚类直到成员数不少于K, 得到当前第K名 (四舍五入后)
+        的相似度; 再一次性计算上界不低于该值的其余聚类。四舍五入是单调的,
+        上界 (加浮点容差) 舍入后仍低于第K名的聚类不可能进入 Top-K, 也不会
+        产生同分 (同分时按历史项目原有顺序, 因此上界与第K名相等时也要计算)。
+
+        Returns:
+            (历史项目下标, 对应的相似度数组字典 (1, k), 实际计算的项目数)
+        """
+        hist = self._feature_matrix()
+        members = self._clusters["members"]
+        target = self._target_matrix([target_project])
+
+        bounds = self._cluster_bounds(target)
+        order = np.argsort(-bounds, kind="stable")
+        limits = np.round(bounds[order] + 1e-9, 4)
+
+        sizes = np.cumsum([len(members[c]) for c in order])
+        first = int(np.searchsorted(sizes, top_k)) + 1
+        visit = list(order[:first])
+        candidates = np.concatenate([members[c] for c in visit])
+        totals = np.round(self._score(target, self._subset(hist, candidates), "hybrid")["total"][0], 4)
+
+        if len(candidates) >= top_k and first < len(order):
+            kth = np.sort(totals)[::-1][top_k - 1]
+            rest = order[first:][limits[first:] >= kth]
+        else:
+            rest = order[first:]
+        if len(rest):
+            extra = np.concatenate([members[c] for c in rest])
+            extra_totals = np.round(self._score(target, self._subset(hist, extra), "hybrid")["total"][0], 4)
+            candidates = np.concatenate([candidates, extra])
+            totals = np.concatenate([totals, extra_totals])
+
+        # 与全量计算的稳定排序一致: 相似度降序, 同分按下标升序
+        indices = candidates[np.lexsort((candidates, -totals))[:top_k]]
+        scores = self._score(target, self._subset(hist, indices), "hybrid")
+        return indices, scores, len(candidates)
 
-        # 按相似度排序
-        similarities.sort(key=lambda x: x.similarity_score, reverse=True)
+    @staticmethod
+    def _subset(hist: Dict, indices: np.ndarray) -> Dict:
+        """按下标取出历史特征矩阵的子集"""
+        return {
+            "numeric": hist["numeric"][indices],
+            "project_type": hist["project_type"][indices],
+            "client_type": hist["client_type"][indices],
+        }
+
+    def classify(self, target_project: Dict) -> Optional[int]:
+        """
+        将新项目归入最近的聚类 (聚类空间中距离成员中心最近)
 
-        return similarities[:top_k]
+        Returns:
+            聚类编号, 未聚类时返回 None
+        """
+        if self._clusters is None:
+            return None
+        point = self._target_space(target_project)
+        return int(np.argmin(((self._clusters["centers"] - point) ** 2).sum(axis=1)))
+
+    def _target_space(self, target_project: Dict) -> np.ndarray:
+        """目标项目在聚类空间中的坐标 (未出现过的分类取值不计入独热编码)"""
+        target = self._target_matrix([target_project])
+        values = target["numeric"][0]
+        point = [
+            math.sqrt(weight) * math.log1p(max(values[self.NUMERIC_FEATURES.index(feature)], 0))
+            for feature, weight in self.SCALE_FEATURES
+        ]
+        point.append(values[self.NUMERIC_FEATURES.index("complexity_score")] / 10.0)
+        one_hot = np.zeros(len(self._feature_matrix()["vocab"]))
+        for code in (target["project_type"][0], target["client_type"][0]):
+            if code >= 0:
+                one_hot[code] = self.CLUSTER_CATEGORY_WEIGHT
+        return np.concatenate([point, one_hot])
+
+    def cluster_profiles(self, samples: int = 3) -> List[Dict]:
+        """
+        聚类画像 (方法论 7.1 节)
+
+        每个聚类给出项目数、平均/标准差工时、平均偏差率、典型特征 (中位数)、
+        主要项目类型与客户类型及示例项目; 名称按典型规模与复杂度生成。
+
+        Returns:
+            按平均工时升序的画像列表, cluster_id 与 classify 返回值对应
+        """
+        if self._clusters is None:
+            return []
+
+        profiles = []
+        for cluster_id, member in enumerate(self._clusters["members"]):
+            projects = [self.historical_projects[i] for i in member]
+            hours = np.array([p.actual_hours for p in projects], dtype=float)
+            median = {
+                feature: float(np.median([getattr(p, feature) for p in projects]))
+                for feature in self.NUMERIC_FEATURES
+            }
+            profiles.append({
+                "cluster_id": cluster_id,
+                "name": self._cluster_name(median),
+                "count": len(projects),
+                "avg_hours": round(float(hours.mean()), 1),
+                "std_hours": round(float(hours.std(ddof=1)), 1) if len(hours) > 1 else 0.0,
+                "avg_variance": round(float(np.mean([p.variance_percentage for p in projects])), 2),
+                "typical_features": {
+                    "data_sources": median["data_sources_count"],
+                    "interface_tables": median["interface_tables_count"],
+                    "reports": median["reports_count"],
+                    "complexity_score": median["complexity_score"],
+                },
+                "project_type": self._most_common([p.project_type for p in projects]),
+                "client_type": self._most_common([p.client_type for p in projects]),
+                "sample_projects": [p.name for p in projects[:samples]],
+            })
+
+        return sorted(profiles, key=lambda x: x["avg_hours"])
+
+    @staticmethod
+    def _cluster_name(median: Dict[str, float]) -> str:
+        """由典型特征生成聚类名称, 如 "中型标准项目" (规模口径同复杂度评估的接口表阈值)"""
+        tables = median["interface_tables_count"]
+        scale = "大型" if tables > 100 else "中型" if tables > 50 else "小型"
+        score = median["complexity_score"]
+        level = "复杂" if score >= 7 else "标准" if score >= 5 else "简单"
+        return f"{scale}{level}项目"
+
+    @staticmethod
+    def _most_common(values: List[str]) -> str:
+        counts: Dict[str, int] = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        return max(counts, key=counts.get)
+
+    def _build_result(
+        self,
+        scores: Dict[str, np.ndarray],
+        row: int,
+        col: int,
+        method: str,
+        index: Optional[int] = None
+    ) -> SimilarityResult:
+        """
+        由相似度矩阵中的一个元素构建匹配结果
+
+        index 为历史项目下标, 为空时与列号相同 (矩阵覆盖全部历史项目)
+        """
+        return SimilarityResult(
+            project=self.historical_projects[col if index is None else index],
+            similarity_score=round(float(scores["total"][row, col]), 4),
+            categorical_similarity=round(float(scores["categorical"][row, col]), 4),
+            scale_similarity=round(float(scores["scale"][row, col]), 4),
+            complexity_similarity=round(float(scores["complexity"][row, col]), 4),
+            matching_method=method
+        )
 
     def _calculate_similarity(
         self,
@@ -136,15 +658,9 @@ class ProjectSimilarityMatcher:
         """
         规模相似度 (归一化欧氏距离)
         """
-        scale_features = [
-            ("data_sources_count", 1.0),
-            ("interface_tables_count", 0.5),  # 权重较低
-            ("reports_count", 0.3)
-        ]
-
         distance_squared = 0.0
 
-        for feature, weight in scale_features:
+        for feature, weight in self.SCALE_FEATURES:
             target_val = target.get(feature, 0)
             hist_val = getattr(historical, feature, 0)
 
@@ -325,11 +841,17 @@ class CaseBasedEstimator:
         }
 
 
+def default_cluster_count(n_projects: int) -> int:
+    """默认聚类数: 约为历史项目数的平方根, 查询时上界计算与成员计算的开销相当"""
+    return max(1, int(round(math.sqrt(n_projects))))
+
+
 # 便捷函数
 def find_and_estimate(
     target_project: Dict,
     historical_projects: List[HistoricalProject],
-    top_k: int = 5
+    top_k: int = 5,
+    matcher: Optional[ProjectSimilarityMatcher] = None
 ) -> Dict:
     """
     查找相似项目并基于它们进行评估
@@ -338,12 +860,13 @@ def find_and_estimate(
         target_project: 目标项目信息
         historical_projects: 历史项目列表
         top_k: 查找Top-K个相似项目
+        matcher: 已构建 (可含聚类) 的匹配器, 为空时按 historical_projects 新建
 
     Returns:
         包含评估结果和相似项目信息的字典
     """
     # 查找相似项目
-    matcher = ProjectSimilarityMatcher(historical_projects)
+    matcher = matcher or ProjectSimilarityMatcher(historical_projects)
     similar = matcher.find_similar_projects(target_project, top_k=top_k)
 
     # 基于相似项目评估
@@ -0,0 +1,132 @@
+"""
+数据库连接管理
+Database Engine & Session Management
+"""
+
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Table, create_engine, event, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base
+
+
+# 默认使用本地SQLite作为开发环境替身,生产环境通过环境变量指向PostgreSQL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./project_cost.db")
+
+# 单条 IN (...) 语句的最大参数个数 (兼顾SQLite变量上限)
+ID_CHUNK_SIZE = 500
+
+
+def create_db_engine(database_url: Optional[str] = None, echo: bool = False) -> Engine:
+    """
+    创建数据库引擎
+
+    Args:
+        database_url: 数据库连接串,为空时使用 DATABASE_URL
+        echo: 是否输出SQL日志
+
+    Returns:
+        SQLAlchemy Engine
+    """
+    url = database_url or DATABASE_URL
+    if url.startswith("sqlite"):
+        engine = create_engine(url, echo=echo, connect_args={"check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL + 外键约束, 与PostgreSQL行为保持一致
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        return engine
+
+    return create_engine(url, echo=echo, pool_pre_ping=True)
+
+
+def init_db(engine: Engine) -> None:
+    """根据ORM模型创建所有表 (仅用于开发/测试环境)"""
+    Base.metadata.create_all(engine)
+
+
+def get_session_factory(engine: Engine) -> sessionmaker:
+    """获取会话工厂"""
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def chunked(ids: Iterable, size: int = ID_CHUNK_SIZE) -> Iterator[List]:
+    """将ID集合排序后按固定大小切块, 用于 IN (...) 查询"""
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def execute_chunked(conn: Connection, stmt, column, ids: Optional[Iterable] = None) -> Iterator:
+    """
+    按 column IN (...) 分块执行查询并逐行返回结果
+
+    ids 为 None 时不加条件, 全表执行一次。
+    """
+    if ids is None:
+        yield from conn.execute(stmt)
+        return
+    for chunk in chunked(ids):
+        yield from conn.execute(stmt.where(column.in_(chunk)))
+
+
+def upsert_rows(conn: Connection, table: Table, rows: Sequence[Dict],
+                key_columns: Sequence[str], accumulate: Sequence[str] = ()) -> None:
+    """
+    批量插入或更新 (INSERT ... ON CONFLICT DO UPDATE)
+
+    支持PostgreSQL与SQLite; 冲突键需有唯一约束或主键。
+
+    Args:
+        accumulate: 冲突时累加而非覆盖的列 (用于增量汇总)
+    """
+    if not rows:
+        return
+
+    if conn.dialect.name == "postgresql":
+        stmt = postgresql.insert(table)
+    elif conn.dialect.name == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f"不支持的数据库方言: {conn.dialect.name}")
+
+    update_columns = {
+        column: (table.c[column] + stmt.excluded[column]) if column in accumulate else stmt.excluded[column]
+        for column in rows[0].keys()
+        if column not in key_columns
+    }
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=update_columns)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+    conn.execute(stmt, list(rows))
+
+
+def allocate_ids(conn: Connection, table: Table, count: int) -> List[int]:
+    """
+    预先分配 count 个主键, 供批量插入前在客户端组装父子引用
+
+    PostgreSQL 从主键序列批量取号; SQLite 取当前最大ID之后的连续区间
+    (开发环境替身: 并发写入同一张表时后提交的事务以主键冲突失败, 不会写入重复ID)。
+    """
+    if count <= 0:
+        return []
+    if conn.dialect.name == "postgresql":
+        return list(conn.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {"table": table.name, "count": count},
+        ).scalars())
+    if conn.dialect.name == "sqlite":
+        start = conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar() + 1
+        return list(range(start, start + count))
+    raise NotImplementedError(f"不支持的数据库方言: {conn.dialect.name}")
@@ -2,19 +2,58 @@
 FastAPI应用 - 项目成本智能评估系统
 """
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import date
+
+import numpy as np
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy.exc import SQLAlchemyError
+from typing import List, Optional, Dict, Union
 from decimal import Decimal
 
-from app.core.estimator import ProjectInfo, estimate_project, WorkloadEstimator
+from app.core.capacity import DEFAULT_DAILY_CAPACITY, DEFAULT_HORIZON_DAYS
+from app.core.estimation_session import EstimationSession, EstimationSessionStore
+from app.core.estimator import EstimationResult, ProjectInfo, estimate_project, WorkloadEstimator
+from app.core.feature_store import SharedFeatureStore
+from app.core.ml_estimator import MLEstimator, find_artifact
+from app.core.portfolio import (
+    DEFAULT_QUANTILES, DEFAULT_SAMPLES, DEFAULT_TAIL_QUANTILE,
+    PortfolioProject, build_model, chunk_plan, simulate_chunk, summarize
+)
 from app.core.similarity import (
     HistoricalProject,
     ProjectSimilarityMatcher,
     CaseBasedEstimator,
+    default_cluster_count,
     find_and_estimate
 )
+from app.database import create_db_engine
+from app.services.analytics import (
+    AnalyticsCache, AnalyticsFilters, cached_analytics, cost_analysis, dashboard_summary, resource_analysis
+)
+from app.services.baselines import BaselineConflictError, capture_baseline
+from app.services.capacity import capacity_heatmap
+from app.services.estimation_results import EstimationResultWriter, estimation_record, missing_result_tables
+from app.services.evm import portfolio_evm
+from app.services.forecast import latest_forecast
+from app.services.projects import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ProjectConflictError,
+    create_project, delete_project, get_project, list_projects, update_project
+)
+from app.services.wbs import generate_project_wbs
+from app.services.timesheets import (
+    MAX_BATCH_SIZE, TimesheetValidationError, create_timesheets, list_timesheets, review_timesheets
+)
 
 
 # ============================================
@@ -97,15 +136,310 @@ class SimilaritySearchRequest(BaseModel):
     method: str = Field(default="hybrid", pattern="^(hybrid|cosine|euclidean)$")
 
 
+class MLBatchRequest(BaseModel):
+    """机器学习批量评估请求"""
+    projects: List[ProjectInfoRequest] = Field(..., min_length=1, max_length=1000)
+
+
+class PortfolioProjectRequest(ProjectInfoRequest):
+    """组合中的项目"""
+    project_id: Optional[int] = Field(default=None, description="项目ID (默认按提交顺序编号)")
+    client_name: Optional[str] = Field(default=None, description="客户名称 (客户相关性分组, 默认为项目名称)")
+    hourly_rate: Optional[float] = Field(default=None, gt=0, description="时薪")
+
+
+class PortfolioSimulationRequest(BaseModel):
+    """组合蒙特卡洛模拟请求"""
+    projects: List[PortfolioProjectRequest] = Field(..., min_length=1, max_length=1000)
+    samples: int = Field(default=DEFAULT_SAMPLES, ge=100, le=200000)
+    correlations: Dict[str, float] = Field(default_factory=dict, description="分组相关系数 (client/phase)")
+    quantiles: List[float] = Field(default=list(DEFAULT_QUANTILES), min_length=1, max_length=20)
+    tail_quantile: float = Field(default=DEFAULT_TAIL_QUANTILE, gt=0, lt=1)
+    seed: Optional[int] = Field(default=None, ge=0)
+
+
+class TimesheetEntryRequest(BaseModel):
+    """工时记录 (取值范围与 chk_hours / chk_progress 约束一致)"""
+    task_id: int
+    user_id: int
+    project_id: Optional[int] = Field(default=None, description="默认为任务所属项目")
+    work_date: date
+    hours: Decimal = Field(..., ge=0, le=24)
+    description: Optional[str] = None
+    work_category: Optional[str] = None
+    task_progress_percentage: Optional[Decimal] = Field(default=None, ge=0, le=100)
+    issues_encountered: Optional[str] = None
+
+
+class TimesheetReviewRequest(BaseModel):
+    """批量审批/驳回条件 (ids 与条件同时给出时取交集)"""
+    ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=MAX_BATCH_SIZE)
+    project_id: Optional[int] = None
+    user_ids: Optional[List[int]] = Field(default=None, min_length=1)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    approver_id: Optional[int] = None
+    reason: Optional[str] = None
+
+
+class TimesheetRejectRequest(BaseModel):
+    """单条驳回"""
+    reason: Optional[str] = None
+    approver_id: Optional[int] = None
+
+
+class ProjectUpdateRequest(BaseModel):
+    """项目修改 (只需提交变化的字段)"""
+    name: Optional[str] = Field(default=None, max_length=200)
+    code: Optional[str] = Field(default=None, max_length=50)
+    description: Optional[str] = None
+    project_type: Optional[str] = None
+    regulation_type: Optional[str] = None
+    client_name: Optional[str] = Field(default=None, max_length=200)
+    client_type: Optional[str] = None
+    data_sources_count: Optional[int] = Field(default=None, ge=0)
+    interface_tables_count: Optional[int] = Field(default=None, ge=0)
+    reports_count: Optional[int] = Field(default=None, ge=0)
+    custom_requirements_count: Optional[int] = Field(default=None, ge=0)
+    data_volume_level: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    planned_start_date: Optional[date] = None
+    planned_end_date: Optional[date] = None
+    actual_start_date: Optional[date] = None
+    actual_end_date: Optional[date] = None
+    budget_amount: Optional[Decimal] = Field(default=None, ge=0)
+    contract_amount: Optional[Decimal] = Field(default=None, ge=0)
+    project_manager_id: Optional[int] = None
+    organization_id: Optional[int] = None
+
+
+class ProjectCreateRequest(ProjectUpdateRequest):
+    """项目创建"""
+    name: str = Field(..., max_length=200)
+    code: str = Field(..., max_length=50)
+    project_type: str
+    client_name: str = Field(..., max_length=200)
+
+
+class BaselineRequest(BaseModel):
+    """保存项目基线"""
+    version: str = Field(..., max_length=20)
+    baseline_name: Optional[str] = Field(default=None, max_length=200)
+    created_by: Optional[int] = None
+
+
+class EstimationSessionUpdate(BaseModel):
+    """评估会话参数修改 (只需提交变化的字段)"""
+    name: Optional[str] = None
+    project_type: Optional[str] = None
+    client_type: Optional[str] = None
+    data_sources_count: Optional[int] = Field(default=None, ge=0)
+    interface_tables_count: Optional[int] = Field(default=None, ge=0)
+    reports_count: Optional[int] = Field(default=None, ge=0)
+    custom_requirements_count: Optional[int] = Field(default=None, ge=0)
+    data_volume_level: Optional[str] = None
+    regulation_type: Optional[str] = None
+
+    @model_validator(mode="after")
+    def reject_nulls(self):
+        """只有 regulation_type 可显式置空"""
+        nulls = [
+            name for name in self.model_fields_set
+            if getattr(self, name) is None and name != "regulation_type"
+        ]
+        if nulls:
+            raise ValueError(f"参数不能为空: {', '.join(sorted(nulls))}")
+        return self
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson 直接序列化的响应
+
+    dataclass、元组与 numpy 数值直接编码为JSON字节, 跳过 Pydantic 响应模型
+    的校验与二次序列化; 接口仍声明 response_model, OpenAPI 文档不变。
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def estimation_payload(result: EstimationResult) -> Dict:
+    """评估结果转换为 EstimationResponse 结构 (复杂度评分保持 dataclass, 由 orjson 编码)"""
+    return {
+        "total_hours": result.total_hours,
+        "optimistic": result.optimistic,
+        "most_likely": result.most_likely,
+        "pessimistic": result.pessimistic,
+        "expected": result.expected,
+        "std_deviation": result.std_deviation,
+        "confidence_interval": result.confidence_interval,
+        "phase_breakdown": result.phase_breakdown,
+        "complexity_score": result.complexity_score,
+        "confidence_level": result.confidence_level,
+        "wbs_summary": result.wbs.summary()
+    }
+
+
 # ============================================
 # FastAPI App
 # ============================================
 
+logger = logging.getLogger(__name__)
+
+# 机器学习模型目录与版本 (未指定版本时加载版本号最大的模型文件)
+ML_MODEL_DIR = os.environ.get("ML_MODEL_DIR", "./models")
+ML_MODEL_VERSION = os.environ.get("ML_MODEL_VERSION")
+
+# CPU密集计算 (规则引擎评估、相似项目匹配、批量预测) 的执行器:
+# thread / process / inline (在事件循环中直接执行), 大小默认为CPU核数
+ESTIMATION_EXECUTOR = os.environ.get("ESTIMATION_EXECUTOR", "thread")
+ESTIMATION_WORKERS = int(os.environ.get("ESTIMATION_WORKERS") or 0) or (os.cpu_count() or 1)
+
+# 共享历史特征快照目录 (由 publish-features 作业发布); 未设置时使用进程内的历史项目
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR")
+
+# 每个工作进程保留的增量评估会话数 (超出时淘汰最久未使用的会话)
+ESTIMATION_SESSIONS_MAX = int(os.environ.get("ESTIMATION_SESSIONS_MAX") or 1000)
+
+# 评估结果后台批量写入 (ESTIMATION_PERSIST=1 开启, 需已建表): 每批最多条数、最长等待秒数与队列容量
+ESTIMATION_PERSIST = os.environ.get("ESTIMATION_PERSIST", "0") == "1"
+ESTIMATION_WRITE_BATCH = int(os.environ.get("ESTIMATION_WRITE_BATCH") or 200)
+ESTIMATION_WRITE_INTERVAL = float(os.environ.get("ESTIMATION_WRITE_INTERVAL") or 0.5)
+ESTIMATION_WRITE_QUEUE = int(os.environ.get("ESTIMATION_WRITE_QUEUE") or 10000)
+
+# 融合权重, 按实际参与的评估方法归一化 (无机器学习模型时为 规则60% / 相似项目40%)
+ENSEMBLE_WEIGHTS = {"rule_based": 0.45, "similarity_based": 0.30, "ml_based": 0.25}
+
+
+def load_ml_estimator(model_dir: str = ML_MODEL_DIR,
+                      version: Optional[str] = ML_MODEL_VERSION) -> Optional[MLEstimator]:
+    """加载机器学习模型, 没有可用模型时返回 None (融合评估退化为两种方法)"""
+    path = find_artifact(model_dir, version)
+    if path is None:
+        logger.info("未找到机器学习模型文件: %s", model_dir)
+        return None
+    try:
+        return MLEstimator.load(path)
+    except Exception as e:
+        logger.warning("机器学习模型加载失败 %s: %s", path, e)
+        return None
+
+
+def create_executor(kind: str = ESTIMATION_EXECUTOR, workers: int = ESTIMATION_WORKERS) -> Optional[Executor]:
+    """
+    创建有界的评估执行器
+
+    Returns:
+        线程池/进程池, inline 时返回 None (在事件循环中直接计算)
+    """
+    if kind == "inline":
+        return None
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="estimation")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError(f"不支持的执行器类型: {kind}, 可选 thread/process/inline")
+
+
+async def run_cpu_bound(http_request: Request, func, *args, shared_state: bool = False):
+    """
+    在评估执行器中运行CPU密集计算, 事件循环保持响应
+
+    Args:
+        func: 模块级函数 (进程池需要可序列化)
+        shared_state: 依赖进程内已加载的状态 (如机器学习模型), 进程池模式下改在线程中执行
+    """
+    executor = http_request.app.state.executor
+    if executor is None:
+        return func(*args)
+    if shared_state and isinstance(executor, ProcessPoolExecutor):
+        executor = http_request.app.state.thread_executor
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+def app_engine(app: FastAPI):
+    """数据库引擎 (首次使用时按 DATABASE_URL 创建, 各请求共享连接池)"""
+    if app.state.engine is None:
+        app.state.engine = create_db_engine()
+    return app.state.engine
+
+
+def database_engine(http_request: Request):
+    """当前应用的数据库引擎"""
+    return app_engine(http_request.app)
+
+
+async def persist_estimation(http_request: Request, *args, **kwargs) -> None:
+    """评估结果放入后台写入队列 (未启用写入器时忽略), 不等待数据库"""
+    writer = http_request.app.state.result_writer
+    if writer is not None:
+        await writer.submit(estimation_record(*args, **kwargs))
+
+
+def result_tables_ready(app: FastAPI) -> bool:
+    """评估结果表已存在; 缺表或数据库不可用时记一次警告, 本次运行不写入评估结果"""
+    try:
+        missing = missing_result_tables(app_engine(app))
+    except SQLAlchemyError as e:
+        logger.warning("无法检查评估结果表, 不写入评估结果: %s", e)
+        return False
+    if missing:
+        logger.warning("数据库缺少评估结果表 %s, 不写入评估结果 (先执行 schema.sql 或 --init-db)", missing)
+        return False
+    return True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时加载一次模型并创建评估执行器与评估结果写入器, 各请求共享"""
+    app.state.ml_estimator = load_ml_estimator()
+    app.state.executor = create_executor()
+    app.state.thread_executor = (
+        ThreadPoolExecutor(max_workers=ESTIMATION_WORKERS, thread_name_prefix="estimation")
+        if isinstance(app.state.executor, ProcessPoolExecutor) else app.state.executor
+    )
+    if ESTIMATION_PERSIST and result_tables_ready(app):
+        app.state.result_writer = EstimationResultWriter(
+            functools.partial(app_engine, app),
+            batch_size=ESTIMATION_WRITE_BATCH,
+            flush_interval=ESTIMATION_WRITE_INTERVAL,
+            max_pending=ESTIMATION_WRITE_QUEUE,
+        )
+        app.state.result_writer.start()
+    try:
+        yield
+    finally:
+        # 先写完队列中的评估结果, 再释放连接池
+        if app.state.result_writer is not None:
+            await app.state.result_writer.close()
+            app.state.result_writer = None
+        for executor in {app.state.executor, app.state.thread_executor} - {None}:
+            executor.shutdown(wait=True)
+        app.state.executor = app.state.thread_executor = None
+        if app.state.engine is not None:
+            app.state.engine.dispose()
+            app.state.engine = None
+
+
 app = FastAPI(
     title="项目成本智能评估系统 API",
     description="基于AI的项目工作量评估与成本管理系统",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.state.ml_estimator = None
+# 未经 lifespan 启动 (如测试客户端) 时在事件循环中直接计算
+app.state.executor = None
+app.state.thread_executor = None
+app.state.estimation_sessions = EstimationSessionStore(ESTIMATION_SESSIONS_MAX)
+app.state.engine = None
+app.state.result_writer = None
+app.state.analytics_cache = AnalyticsCache()
+# 聚类画像缓存 (匹配器, 画像), 快照版本切换后匹配器变化时重新生成
+app.state.cluster_profiles = (None, [])
 
 # CORS中间件
 app.add_middleware(
@@ -186,6 +520,50 @@ MOCK_HISTORICAL_PROJECTS = [
     ),
 ]
 
+# 历史项目匹配器 (启动时聚类一次, 各请求共用)
+HISTORICAL_MATCHER = ProjectSimilarityMatcher(
+    MOCK_HISTORICAL_PROJECTS,
+    n_clusters=default_cluster_count(len(MOCK_HISTORICAL_PROJECTS))
+)
+FEATURE_STORE = SharedFeatureStore(FEATURE_STORE_DIR) if FEATURE_STORE_DIR else None
+
+
+def historical_matcher() -> ProjectSimilarityMatcher:
+    """
+    当前历史项目匹配器
+
+    配置了共享特征快照时使用已挂载的最新版本 (各工作进程共享同一份只读数据),
+    尚未发布快照时回退到进程内的历史项目
+    """
+    matcher = FEATURE_STORE.matcher() if FEATURE_STORE else None
+    return matcher or HISTORICAL_MATCHER
+
+
+def estimate_with_similar(project_info: ProjectInfo, target: Dict, top_k: int, ml_estimator=None):
+    """
+    规则引擎评估 + 相似项目匹配 + 机器学习模型评估 (在评估执行器中运行)
+
+    ml_estimator 为空时不做模型评估, 返回的模型工时为 None
+    """
+    rule_based_result = estimate_project(project_info)
+
+    # 相似项目匹配
+    similarity_result = find_and_estimate(
+        {**target, "complexity_score": rule_based_result.complexity_score.total},
+        MOCK_HISTORICAL_PROJECTS,
+        top_k=top_k,
+        matcher=historical_matcher()
+    )
+
+    # 机器学习模型评估
+    ml_based_hours = ml_estimator.predict_one(target) if ml_estimator else None
+    return rule_based_result, similarity_result, ml_based_hours
+
+
+def search_similar(target: Dict, top_k: int, method: str):
+    """相似项目检索 (在评估执行器中运行)"""
+    return historical_matcher().find_similar_projects(target, top_k=top_k, method=method)
+
 
 # ============================================
 # API Endpoints
@@ -207,12 +585,17 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/api/v1/estimate", response_model=EstimationResponse)
-async def estimate_workload(project: ProjectInfoRequest):
+@app.post("/api/v1/estimate", response_model=EstimationResponse, response_class=FastJSONResponse)
+async def estimate_workload(
+    project: ProjectInfoRequest,
+    http_request: Request,
+    project_id: Optional[int] = Query(default=None, description="关联的项目ID, 评估结果记录到该项目")
+):
     """
     评估项目工作量
 
-    基于项目规模参数和复杂度,使用规则引擎进行工作量评估
+    基于项目规模参数和复杂度,使用规则引擎进行工作量评估;
+    评估结果由后台批量写入 estimation_results, 不等待数据库
     """
     try:
         # 转换为ProjectInfo对象
@@ -229,48 +612,147 @@ async def estimate_workload(project: ProjectInfoRequest):
         )
 
         # 执行评估
-        result = estimate_project(project_info)
+        result = await run_cpu_bound(http_request, estimate_project, project_info)
+        await persist_estimation(http_request, project_info, result, project_id)
 
-        # 构建WBS摘要
-        wbs_summary = {
-            "total_tasks": sum(len(phase["tasks"]) for phase in result.wbs_structure),
-            "phases_count": len(result.wbs_structure),
-            "phases": [phase["phase"] for phase in result.wbs_structure]
-        }
-
-        # 返回结果
-        return EstimationResponse(
-            total_hours=result.total_hours,
-            optimistic=result.optimistic,
-            most_likely=result.most_likely,
-            pessimistic=result.pessimistic,
-            expected=result.expected,
-            std_deviation=result.std_deviation,
-            confidence_interval=result.confidence_interval,
-            phase_breakdown=result.phase_breakdown,
-            complexity_score=ComplexityScoreResponse(
-                technical=result.complexity_score.technical,
-                business=result.complexity_score.business,
-                data=result.complexity_score.data,
-                organizational=result.complexity_score.organizational,
-                risk=result.complexity_score.risk,
-                total=result.complexity_score.total,
-                level=result.complexity_score.level
-            ),
-            confidence_level=result.confidence_level,
-            wbs_summary=wbs_summary
-        )
+        return FastJSONResponse(estimation_payload(result))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"评估失败: {str(e)}")
 
 
-@app.post("/api/v1/estimate/with-similar")
-async def estimate_with_similar_projects(request: SimilaritySearchRequest):
+@app.post("/api/v1/estimate/ml", response_class=FastJSONResponse)
+async def estimate_with_ml(request: MLBatchRequest, http_request: Request):
+    """
+    机器学习模型批量评估
+
+    一次请求可提交多个项目, 在同一次模型调用中完成预测
+    """
+    ml_estimator = http_request.app.state.ml_estimator
+    if ml_estimator is None:
+        raise HTTPException(status_code=503, detail="机器学习模型未加载")
+
+    predictions = await run_cpu_bound(
+        http_request, ml_estimator.predict, [project.model_dump() for project in request.projects],
+        shared_state=True
+    )
+    return FastJSONResponse({
+        "model_version": ml_estimator.version,
+        "algorithm": ml_estimator.algorithm,
+        "results": [
+            {"name": project.name, "total_hours": round(float(hours), 1)}
+            for project, hours in zip(request.projects, predictions)
+        ]
+    })
+
+
+@app.post("/api/v1/estimate/sessions", response_class=FastJSONResponse)
+async def create_estimation_session(project: ProjectInfoRequest, http_request: Request):
+    """
+    创建增量评估会话
+
+    返回会话ID与完整评估结果; 之后每次修改参数只需提交变化的字段。
+    首次完整评估在评估执行器中进行, 之后的增量更新在事件循环中计算
+    """
+    session = await run_cpu_bound(http_request, EstimationSession, ProjectInfo(**project.model_dump()))
+    session_id = http_request.app.state.estimation_sessions.create(session)
+    return FastJSONResponse({"session_id": session_id, "estimation": estimation_payload(session.result)})
+
+
+@app.patch("/api/v1/estimate/sessions/{session_id}", response_class=FastJSONResponse)
+async def update_estimation_session(session_id: str, changes: EstimationSessionUpdate,
+                                    http_request: Request, full: bool = False):
+    """
+    修改会话中的项目参数
+
+    只重算依赖变化参数的任务与汇总, 返回变化部分的差异 (单次更新为微秒级,
+    直接在事件循环中计算); full=true 时同时返回完整评估结果
+    """
+    session = http_request.app.state.estimation_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="评估会话不存在或已过期")
+
+    try:
+        diff = session.update(**changes.model_dump(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    payload = {"session_id": session_id, "total_hours": session.total_hours, "diff": diff.to_dict()}
+    if full:
+        payload["estimation"] = estimation_payload(session.result)
+    return FastJSONResponse(payload)
+
+
+@app.delete("/api/v1/estimate/sessions/{session_id}")
+async def delete_estimation_session(session_id: str, http_request: Request):
+    """关闭评估会话"""
+    if not http_request.app.state.estimation_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="评估会话不存在或已过期")
+    return {"deleted": True}
+
+
+def estimate_projects(infos: List[ProjectInfo]) -> List[EstimationResult]:
+    """批量规则引擎评估 (在执行器中一次完成)"""
+    return [estimate_project(info) for info in infos]
+
+
+@app.post("/api/v1/portfolio/simulation", response_class=FastJSONResponse)
+async def simulate_portfolio_risk(request: PortfolioSimulationRequest, http_request: Request):
+    """
+    项目组合蒙特卡洛模拟
+
+    各项目任务级联合抽样, 可按客户/阶段设置相关系数; 抽样块分发到评估
+    执行器并行计算。返回组合总工时/成本分位数与各项目的尾部风险贡献
+    """
+    if any(not 0 < q < 1 for q in request.quantiles):
+        raise HTTPException(status_code=422, detail="分位数须在 (0, 1) 之间")
+
+    infos = [
+        ProjectInfo(**project.model_dump(exclude={"project_id", "client_name", "hourly_rate"}))
+        for project in request.projects
+    ]
+    results = await run_cpu_bound(http_request, estimate_projects, infos)
+    projects = [
+        PortfolioProject.from_estimation(
+            project.project_id if project.project_id is not None else i, project.name,
+            project.client_name or project.name, result, project.hourly_rate
+        )
+        for i, (project, result) in enumerate(zip(request.projects, results), start=1)
+    ]
+    try:
+        model = build_model(projects, request.correlations)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    chunks = await asyncio.gather(*(
+        run_cpu_bound(http_request, simulate_chunk, model, size, seed)
+        for size, seed in chunk_plan(model, request.samples, request.seed)
+    ))
+    result = await run_cpu_bound(
+        http_request, summarize, projects, np.concatenate(chunks), request.quantiles, request.tail_quantile
+    )
+    return FastJSONResponse(asdict(result))
+
+
+def ensemble_estimate(estimates: Dict[str, Optional[float]]) -> Dict:
+    """按 ENSEMBLE_WEIGHTS 对可用的评估结果加权融合"""
+    available = {name: value for name, value in estimates.items() if value}
+    total_weight = sum(ENSEMBLE_WEIGHTS[name] for name in available)
+    weights = {name: round(ENSEMBLE_WEIGHTS[name] / total_weight, 4) for name in available}
+    hours = sum(value * ENSEMBLE_WEIGHTS[name] for name, value in available.items()) / total_weight
+    return {"total_hours": round(hours, 1), "weights": weights}
+
+
+@app.post("/api/v1/estimate/with-similar", response_class=FastJSONResponse)
+async def estimate_with_similar_projects(
+    request: SimilaritySearchRequest,
+    http_request: Request,
+    project_id: Optional[int] = Query(default=None, description="关联的项目ID, 评估结果记录到该项目")
+):
     """
     基于相似项目进行评估
 
-    先查找历史相似项目,然后综合规则引擎和案例推理进行评估
+    先查找历史相似项目,然后综合规则引擎和案例推理进行评估;
+    融合结果由后台批量写入 estimation_results
     """
     try:
         # 规则引擎评估
@@ -286,29 +768,29 @@ async def estimate_with_similar_projects(request: SimilaritySearchRequest):
             regulation_type=request.target_project.regulation_type
         )
 
-        rule_based_result = estimate_project(project_info)
-
-        # 相似项目匹配
-        target_dict = request.target_project.dict()
-        target_dict["complexity_score"] = rule_based_result.complexity_score.total
-
-        similarity_result = find_and_estimate(
-            target_dict,
-            MOCK_HISTORICAL_PROJECTS,
-            top_k=request.top_k
+        # 模型已加载时依赖进程内状态, 进程池模式下改在线程中执行
+        ml_estimator = http_request.app.state.ml_estimator
+        rule_based_result, similarity_result, ml_based_hours = await run_cpu_bound(
+            http_request, estimate_with_similar, project_info, request.target_project.model_dump(),
+            request.top_k, ml_estimator, shared_state=ml_estimator is not None
         )
 
         # 融合评估结果
-        rule_based_hours = rule_based_result.total_hours
-        similarity_based_hours = similarity_result["estimation"]["estimate"]
-
-        if similarity_based_hours:
-            # 加权融合: 规则60%, 相似项目40%
-            ensemble_estimate = rule_based_hours * 0.6 + similarity_based_hours * 0.4
-        else:
-            ensemble_estimate = rule_based_hours
+        ensemble = ensemble_estimate({
+            "rule_based": rule_based_result.total_hours,
+            "similarity_based": similarity_result["estimation"]["estimate"],
+            "ml_based": ml_based_hours,
+        })
+        await persist_estimation(
+            http_request, project_info, rule_based_result, project_id,
+            similarity_estimate=similarity_result["estimation"]["estimate"],
+            ml_estimate=ml_based_hours,
+            ensemble_estimate=ensemble["total_hours"],
+            model_weights=ensemble["weights"],
+            version=ml_estimator.version if ml_based_hours else None,
+        )
 
-        return {
+        return FastJSONResponse({
             "rule_based_estimation": {
                 "total_hours": rule_based_result.total_hours,
                 "confidence_level": rule_based_result.confidence_level,
@@ -324,20 +806,25 @@ async def estimate_with_similar_projects(request: SimilaritySearchRequest):
                 }
                 for sim in similarity_result["similar_projects"]
             ],
+            "ml_based_estimation": {
+                "total_hours": ml_based_hours,
+                "model_version": ml_estimator.version,
+                "algorithm": ml_estimator.algorithm
+            } if ml_estimator else None,
             "ensemble_estimation": {
-                "total_hours": round(ensemble_estimate, 1),
+                "total_hours": ensemble["total_hours"],
                 "method": "weighted_average",
-                "weights": {"rule_based": 0.6, "similarity_based": 0.4}
+                "weights": ensemble["weights"]
             },
-            "recommendation": f"建议采用融合评估结果: {round(ensemble_estimate, 1)} 人时"
-        }
+            "recommendation": f"建议采用融合评估结果: {ensemble['total_hours']} 人时"
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"评估失败: {str(e)}")
 
 
 @app.post("/api/v1/similarity/search")
-async def search_similar_projects(request: SimilaritySearchRequest):
+async def search_similar_projects(request: SimilaritySearchRequest, http_request: Request):
     """
     搜索相似的历史项目
 
@@ -346,11 +833,8 @@ async def search_similar_projects(request: SimilaritySearchRequest):
     try:
         target_dict = request.target_project.dict()
 
-        matcher = ProjectSimilarityMatcher(MOCK_HISTORICAL_PROJECTS)
-        similar_projects = matcher.find_similar_projects(
-            target_dict,
-            top_k=request.top_k,
-            method=request.method
+        similar_projects = await run_cpu_bound(
+            http_request, search_similar, target_dict, request.top_k, request.method
         )
 
         return {
@@ -408,11 +892,403 @@ async def list_historical_projects():
     }
 
 
+@app.get("/api/v1/clusters")
+async def list_project_clusters(http_request: Request):
+    """
+    获取历史项目聚类画像
+
+    与相似项目检索共用同一组聚类; 画像按匹配器缓存, 发布新版本特征快照后重新生成
+    """
+    matcher = historical_matcher()
+    cached_matcher, profiles = http_request.app.state.cluster_profiles
+    if cached_matcher is not matcher:
+        profiles = matcher.cluster_profiles()
+        http_request.app.state.cluster_profiles = (matcher, profiles)
+    return {
+        "total": len(profiles),
+        "projects": len(matcher.historical_projects),
+        "clusters": profiles
+    }
+
+
+@app.get("/api/v1/analytics/capacity", response_class=FastJSONResponse)
+async def get_capacity_heatmap(
+    http_request: Request,
+    start_date: Optional[date] = None,
+    days: int = Query(default=DEFAULT_HORIZON_DAYS, ge=1, le=731),
+    granularity: str = Query(default="day", pattern="^(day|week)$"),
+    department: Optional[str] = None,
+    over_allocated_only: bool = False,
+    capacity: float = Query(default=DEFAULT_DAILY_CAPACITY, gt=0, le=24),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0)
+):
+    """
+    资源负荷热力图
+
+    未完成任务的预估工时按计划起止日期平均分摊到工作日, 返回每个用户
+    按天/按周的负荷与超负荷日期 (start_date 默认为今天, 窗口默认一年)
+    """
+    heatmap = await run_cpu_bound(
+        http_request, capacity_heatmap, database_engine(http_request), start_date, days, granularity,
+        department, over_allocated_only, limit, offset, capacity,
+        shared_state=True
+    )
+    return FastJSONResponse(heatmap)
+
+
+@app.get("/api/v1/timesheets")
+async def get_timesheets(
+    http_request: Request,
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status: Optional[str] = Query(default=None, pattern="^(submitted|approved|rejected)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0)
+):
+    """按项目、用户、状态与日期范围查询工时记录"""
+    rows = await run_cpu_bound(
+        http_request, list_timesheets, database_engine(http_request),
+        project_id, user_id, status, start_date, end_date, limit, offset,
+        shared_state=True
+    )
+    return {"timesheets": rows, "limit": limit, "offset": offset}
+
+
+@app.post("/api/v1/timesheets", status_code=201)
+async def submit_timesheets(
+    entries: Union[List[TimesheetEntryRequest], TimesheetEntryRequest],
+    http_request: Request
+):
+    """
+    提交工时 (单条或数组)
+
+    整批先校验取值与任务/用户引用, 任何一条不合法返回422且不写入;
+    全部合法时在一个事务内批量插入并更新汇总
+    """
+    if not isinstance(entries, list):
+        entries = [entries]
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"单次最多提交 {MAX_BATCH_SIZE} 条工时记录")
+    try:
+        result = await run_cpu_bound(
+            http_request, create_timesheets, database_engine(http_request),
+            [entry.model_dump() for entry in entries],
+            shared_state=True
+        )
+    except TimesheetValidationError as e:
+        raise HTTPException(status_code=422, detail={
+            "message": str(e),
+            "errors": [{"index": index, "reason": reason} for index, reason in e.errors],
+        })
+    return asdict(result)
+
+
+async def review(http_request: Request, action: str, request: TimesheetReviewRequest) -> Dict:
+    """执行批量审批/驳回, 条件无效时返回422"""
+    try:
+        result = await run_cpu_bound(
+            http_request, functools.partial(review_timesheets, database_engine(http_request), action,
+                                            **request.model_dump()),
+            shared_state=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return asdict(result)
+
+
+@app.post("/api/v1/timesheets/approve")
+async def approve_timesheets(request: TimesheetReviewRequest, http_request: Request):
+    """
+    批量审批工时 (一条 UPDATE)
+
+    按 ids 或 项目/用户/日期范围 选择待审批 (submitted) 的记录, 记录审批人与审批时间
+    """
+    return await review(http_request, "approve", request)
+
+
+@app.post("/api/v1/timesheets/reject")
+async def reject_timesheets(request: TimesheetReviewRequest, http_request: Request):
+    """
+    批量驳回工时 (一条 UPDATE)
+
+    驳回的工时从周工时、项目月度成本与实际工时中扣除
+    """
+    return await review(http_request, "reject", request)
+
+
+@app.post("/api/v1/timesheets/{timesheet_id}/approve")
+async def approve_timesheet(timesheet_id: int, http_request: Request):
+    """审批单条工时"""
+    return await review(http_request, "approve", TimesheetReviewRequest(ids=[timesheet_id]))
+
+
+@app.post("/api/v1/timesheets/{timesheet_id}/reject")
+async def reject_timesheet(timesheet_id: int, request: TimesheetRejectRequest, http_request: Request):
+    """驳回单条工时"""
+    return await review(http_request, "reject", TimesheetReviewRequest(ids=[timesheet_id], **request.model_dump()))
+
+
+def project_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的稀疏字段参数"""
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(",") if name.strip()]
+
+
+@app.get("/api/v1/projects")
+async def get_projects(
+    http_request: Request,
+    status: Optional[str] = None,
+    project_type: Optional[str] = None,
+    client_type: Optional[str] = None,
+    fields: Optional[str] = Query(default=None, description="逗号分隔的返回字段, 默认全部"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 next_cursor")
+):
+    """
+    分页查询项目
+
+    按 (updated_at, id) 倒序做键集分页, 翻页时传入上一页的 next_cursor;
+    按 status / project_type / client_type 过滤
+    """
+    try:
+        return await run_cpu_bound(
+            http_request, list_projects, database_engine(http_request),
+            status, project_type, client_type, project_fields(fields), limit, cursor,
+            shared_state=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/api/v1/projects/{project_id}")
+async def get_project_detail(
+    project_id: int,
+    http_request: Request,
+    fields: Optional[str] = Query(default=None, description="逗号分隔的返回字段, 默认全部")
+):
+    """查询单个项目"""
+    try:
+        project = await run_cpu_bound(
+            http_request, get_project, database_engine(http_request), project_id, project_fields(fields),
+            shared_state=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if project is None:
+        raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+    return project
+
+
+@app.post("/api/v1/projects", status_code=201)
+async def create_project_endpoint(request: ProjectCreateRequest, http_request: Request):
+    """创建项目, 项目编码重复时返回409"""
+    try:
+        return await run_cpu_bound(
+            http_request, create_project, database_engine(http_request), request.model_dump(exclude_unset=True),
+            shared_state=True
+        )
+    except ProjectConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.put("/api/v1/projects/{project_id}")
+async def update_project_endpoint(project_id: int, request: ProjectUpdateRequest, http_request: Request):
+    """修改项目 (只更新提交的字段)"""
+    try:
+        project = await run_cpu_bound(
+            http_request, update_project, database_engine(http_request),
+            project_id, request.model_dump(exclude_unset=True),
+            shared_state=True
+        )
+    except ProjectConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if project is None:
+        raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+    return project
+
+
+@app.delete("/api/v1/projects/{project_id}", status_code=204)
+async def delete_project_endpoint(project_id: int, http_request: Request):
+    """删除项目 (任务、工时等一并删除)"""
+    deleted = await run_cpu_bound(
+        http_request, delete_project, database_engine(http_request), project_id,
+        shared_state=True
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+
+
+@app.post("/api/v1/projects/{project_id}/wbs")
+async def generate_wbs(
+    project_id: int,
+    http_request: Request,
+    baseline_version: Optional[str] = Query(default=None, description="工时定额版本, 默认使用当前默认定额")
+):
+    """
+    按项目规模参数生成WBS并写入 wbs_tasks
+
+    首次生成整棵树批量插入; 再次生成时按 wbs_code 差异更新, 保留实际工时与进度
+    """
+    result = await run_cpu_bound(
+        http_request, generate_project_wbs, database_engine(http_request), project_id, baseline_version,
+        shared_state=True
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+    return asdict(result)
+
+
+@app.post("/api/v1/projects/{project_id}/baselines", status_code=201)
+async def create_baseline(project_id: int, request: BaselineRequest, http_request: Request):
+    """
+    保存项目当前叶子任务的计划工时与计划日期为新基线, 并设为当前基线
+
+    版本已存在返回409, 任务缺少计划日期返回422
+    """
+    try:
+        baseline = await run_cpu_bound(
+            http_request, capture_baseline, database_engine(http_request), project_id,
+            request.version, request.baseline_name, request.created_by,
+            shared_state=True
+        )
+    except BaselineConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if baseline is None:
+        raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+    return baseline
+
+
+@app.get("/api/v1/projects/{project_id}/forecast")
+async def get_project_forecast(project_id: int, http_request: Request):
+    """
+    项目最近一次的完工预测 (由 forecast-projects 作业写入)
+
+    包括预测完工日期、完工总工时及其80%区间; 日期为空表示按当前消耗
+    趋势在预测期 (horizon_weeks 周) 内无法完工
+    """
+    forecast = await run_cpu_bound(
+        http_request, latest_forecast, database_engine(http_request), project_id,
+        shared_state=True
+    )
+    if forecast is None:
+        raise HTTPException(status_code=404, detail=f"项目没有完工预测: {project_id}")
+    return forecast
+
+
+def analytics_filters(start_date: Optional[date], end_date: Optional[date],
+                      organization_id: Optional[int], project_type: Optional[str]) -> AnalyticsFilters:
+    """分析接口的公共过滤条件"""
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=422, detail="start_date 不能晚于 end_date")
+    return AnalyticsFilters(start_date, end_date, organization_id, project_type)
+
+
+@app.get("/api/v1/analytics/dashboard", response_class=FastJSONResponse)
+async def get_dashboard_data(
+    http_request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    organization_id: Optional[int] = None,
+    project_type: Optional[str] = None
+):
+    """
+    仪表盘数据
+
+    项目状态分布、工时/预算合计、任务完成率、月度工时成本趋势与偏差最大
+    的项目; 只读取汇总表, 结果缓存至汇总数据变化
+    """
+    filters = analytics_filters(start_date, end_date, organization_id, project_type)
+    dashboard = await run_cpu_bound(
+        http_request, cached_analytics, database_engine(http_request), http_request.app.state.analytics_cache,
+        dashboard_summary, filters,
+        shared_state=True
+    )
+    return FastJSONResponse(dashboard)
+
+
+@app.get("/api/v1/analytics/cost", response_class=FastJSONResponse)
+async def get_cost_analysis(
+    http_request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    organization_id: Optional[int] = None,
+    project_type: Optional[str] = None,
+    group_by: str = Query(default="month", pattern="^(month|project|project_type|organization)$"),
+    limit: int = Query(default=100, ge=1, le=1000)
+):
+    """
+    成本分析
+
+    窗口内 (默认最近12个月) 的工时与人工成本, 按月、项目、项目类型或组织
+    分组, 项目维度附带预算合计与预算使用率
+    """
+    filters = analytics_filters(start_date, end_date, organization_id, project_type)
+    analysis = await run_cpu_bound(
+        http_request, cached_analytics, database_engine(http_request), http_request.app.state.analytics_cache,
+        cost_analysis, filters, group_by, limit,
+        shared_state=True
+    )
+    return FastJSONResponse(analysis)
+
+
+@app.get("/api/v1/analytics/resources", response_class=FastJSONResponse)
+async def get_resource_analysis(
+    http_request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    department: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=500)
+):
+    """
+    资源分析
+
+    按部门汇总人数、在办任务、剩余工时与窗口内登记工时的利用率, 并列出
+    剩余工时最多的用户
+    """
+    filters = analytics_filters(start_date, end_date, None, None)
+    analysis = await run_cpu_bound(
+        http_request, cached_analytics, database_engine(http_request), http_request.app.state.analytics_cache,
+        resource_analysis, filters, department, limit,
+        shared_state=True
+    )
+    return FastJSONResponse(analysis)
+
+
+@app.get("/api/v1/analytics/evm", response_class=FastJSONResponse)
+async def get_portfolio_evm(
+    http_request: Request,
+    as_of: Optional[date] = None,
+    include_phases: bool = False
+):
+    """
+    在建项目组合挣值分析
+
+    按当前基线与工时记录计算各项目在 as_of (默认今天) 的 PV/EV/AC、
+    CPI/SPI 与 EAC (以工时计), include_phases 时附带各阶段指标;
+    全部项目一次向量化计算, 结果缓存至汇总数据变化
+    """
+    as_of = as_of or date.today()
+    evm = await run_cpu_bound(
+        http_request, http_request.app.state.analytics_cache.get_or_compute, database_engine(http_request),
+        ("portfolio_evm", as_of, include_phases),
+        functools.partial(portfolio_evm, as_of=as_of, include_phases=include_phases),
+        shared_state=True
+    )
+    return FastJSONResponse(evm)
+
+
 @app.get("/api/v1/models/estimation")
-async def list_estimation_models():
+async def list_estimation_models(http_request: Request):
     """
     获取评估模型列表 (用于演示)
     """
+    ml_estimator = http_request.app.state.ml_estimator
     return {
         "models": [
             {
@@ -427,6 +1303,15 @@ async def list_estimation_models():
                 "status": "active",
                 "description": "基于历史相似项目的案例推理"
             },
+            {
+                "name": "机器学习评估",
+                "type": "ml_based",
+                "status": "active" if ml_estimator else "unavailable",
+                "description": "基于历史项目训练的梯度提升/随机森林回归模型",
+                "version": ml_estimator.version if ml_estimator else None,
+                "algorithm": ml_estimator.algorithm if ml_estimator else None,
+                "metrics": ml_estimator.metrics if ml_estimator else None
+            },
             {
                 "name": "融合评估",
                 "type": "ensemble",
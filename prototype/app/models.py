@@ -16,11 +16,17 @@ from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# SQLite 仅对 INTEGER PRIMARY KEY 自增,本地开发库使用 Integer 变体
+BigIntegerPK = BigInteger().with_variant(Integer, 'sqlite')
+
+# 在建项目的状态 (组合模拟、挣值、完工预测与分析看板共用)
+ACTIVE_PROJECT_STATUSES = ('planning', 'approved', 'in_progress')
+
 
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     username = Column(String(50), unique=True, nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
@@ -42,13 +48,13 @@ class User(Base):
     # Relationships
     managed_projects = relationship("Project", foreign_keys="Project.project_manager_id", back_populates="project_manager")
     assigned_tasks = relationship("WBSTask", back_populates="assignee")
-    timesheets = relationship("Timesheet", back_populates="user")
+    timesheets = relationship("Timesheet", foreign_keys="Timesheet.user_id", back_populates="user")
 
 
 class Project(Base):
     __tablename__ = 'projects'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     name = Column(String(200), nullable=False)
     code = Column(String(50), unique=True, nullable=False)
     description = Column(Text)
@@ -95,6 +101,11 @@ class Project(Base):
 
     __table_args__ = (
         CheckConstraint('planned_end_date >= planned_start_date', name='chk_dates'),
+        # 过滤列之后接 (updated_at, id), 过滤后的键集分页也是索引范围扫描
+        Index('idx_projects_status', 'status', 'updated_at', 'id'),
+        Index('idx_projects_type', 'project_type', 'updated_at', 'id'),
+        Index('idx_projects_composite', 'status', 'project_type', 'client_type', 'updated_at', 'id'),
+        Index('idx_projects_updated', 'updated_at', 'id'),
     )
 
     # Relationships
@@ -105,10 +116,28 @@ class Project(Base):
     timesheets = relationship("Timesheet", back_populates="project")
 
 
+class ProjectMember(Base):
+    __tablename__ = 'project_members'
+
+    id = Column(BigIntegerPK, primary_key=True)
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
+    user_id = Column(BigInteger, ForeignKey('users.id'))
+    role = Column(String(50), nullable=False)
+    allocation_percentage = Column(Numeric(5, 2), default=100)
+    joined_at = Column(DateTime, default=func.now())
+    left_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint('project_id', 'user_id', 'role', name='uq_project_member_role'),
+        Index('idx_project_members_project', 'project_id'),
+        Index('idx_project_members_user', 'user_id'),
+    )
+
+
 class Organization(Base):
     __tablename__ = 'organizations'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     name = Column(String(200), nullable=False)
     code = Column(String(50), unique=True, nullable=False)
     type = Column(String(50))
@@ -122,7 +151,7 @@ class Organization(Base):
 class WBSTask(Base):
     __tablename__ = 'wbs_tasks'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
     parent_task_id = Column(BigInteger, ForeignKey('wbs_tasks.id', ondelete='CASCADE'))
     wbs_code = Column(String(50), nullable=False)
@@ -157,11 +186,19 @@ class WBSTask(Base):
     is_milestone = Column(Boolean, default=False)
     sort_order = Column(Integer)
 
+    # 关键路径计算结果 (schedule-project 作业回写)
+    total_float_days = Column(Integer)
+    is_critical = Column(Boolean)
+
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now())
 
     __table_args__ = (
         UniqueConstraint('project_id', 'wbs_code', name='uq_project_wbs_code'),
+        Index('idx_wbs_project', 'project_id'),
+        Index('idx_wbs_parent', 'parent_task_id'),
+        Index('idx_wbs_assignee', 'assignee_id'),
+        Index('idx_tasks_composite', 'project_id', 'status', 'assignee_id'),
     )
 
     # Relationships
@@ -171,10 +208,27 @@ class WBSTask(Base):
     timesheets = relationship("Timesheet", back_populates="task")
 
 
+class TaskDependency(Base):
+    __tablename__ = 'task_dependencies'
+
+    id = Column(BigIntegerPK, primary_key=True)
+    predecessor_task_id = Column(BigInteger, ForeignKey('wbs_tasks.id', ondelete='CASCADE'))
+    successor_task_id = Column(BigInteger, ForeignKey('wbs_tasks.id', ondelete='CASCADE'))
+    dependency_type = Column(String(20), default='FS')
+    lag_days = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('predecessor_task_id', 'successor_task_id', name='uq_task_dependency'),
+        Index('idx_dependencies_predecessor', 'predecessor_task_id'),
+        Index('idx_dependencies_successor', 'successor_task_id'),
+    )
+
+
 class Timesheet(Base):
     __tablename__ = 'timesheets'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     task_id = Column(BigInteger, ForeignKey('wbs_tasks.id', ondelete='CASCADE'))
     user_id = Column(BigInteger, ForeignKey('users.id'))
     project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
@@ -185,22 +239,106 @@ class Timesheet(Base):
     task_progress_percentage = Column(Numeric(5, 2))
     issues_encountered = Column(Text)
     status = Column(String(20), default='submitted')
+    approved_by = Column(BigInteger, ForeignKey('users.id'))
+    approved_at = Column(DateTime)
+    rejection_reason = Column(Text)
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     __table_args__ = (
         CheckConstraint('hours >= 0 AND hours <= 24', name='chk_hours'),
+        CheckConstraint('task_progress_percentage >= 0 AND task_progress_percentage <= 100', name='chk_progress'),
+        Index('idx_timesheets_task', 'task_id'),
+        Index('idx_timesheets_user', 'user_id'),
+        Index('idx_timesheets_project', 'project_id'),
+        Index('idx_timesheets_date', 'work_date'),
+        Index('idx_timesheets_composite', 'project_id', 'user_id', 'work_date'),
     )
 
     # Relationships
     task = relationship("WBSTask", back_populates="timesheets")
-    user = relationship("User", back_populates="timesheets")
+    user = relationship("User", foreign_keys=[user_id], back_populates="timesheets")
     project = relationship("Project", back_populates="timesheets")
 
 
+class Baseline(Base):
+    __tablename__ = 'baselines'
+
+    id = Column(BigIntegerPK, primary_key=True)
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
+    version = Column(String(20), nullable=False)
+    baseline_name = Column(String(200))
+    description = Column(Text)
+    baseline_data = Column(JSON, nullable=False)
+    total_planned_hours = Column(Numeric(10, 1))
+    total_budget = Column(Numeric(15, 2))
+    planned_start_date = Column(Date)
+    planned_end_date = Column(Date)
+    is_current = Column(Boolean, default=False)
+    status = Column(String(20), default='draft')
+    approved_by = Column(BigInteger, ForeignKey('users.id'))
+    approved_at = Column(DateTime)
+    created_at = Column(DateTime, default=func.now())
+    created_by = Column(BigInteger, ForeignKey('users.id'))
+
+    __table_args__ = (
+        UniqueConstraint('project_id', 'version', name='uq_baseline_version'),
+        Index('idx_baselines_project', 'project_id'),
+        Index('idx_baselines_current', 'project_id', 'is_current'),
+    )
+
+
+class EVMSnapshot(Base):
+    """挣值日快照 (按天增量追加, 以工时计; phase_code 为空串表示项目整体)"""
+    __tablename__ = 'evm_snapshots'
+
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    snapshot_date = Column(Date, primary_key=True)
+    phase_code = Column(String(50), primary_key=True, default='')
+    baseline_version = Column(String(20))
+    budget_at_completion = Column(Numeric(12, 2), nullable=False, default=0)
+    planned_value = Column(Numeric(12, 2), nullable=False, default=0)
+    earned_value = Column(Numeric(12, 2), nullable=False, default=0)
+    actual_cost = Column(Numeric(12, 2), nullable=False, default=0)
+    cost_performance_index = Column(Numeric(8, 4))
+    schedule_performance_index = Column(Numeric(8, 4))
+    estimate_at_completion = Column(Numeric(12, 2))
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('idx_evm_snapshots_date', 'snapshot_date'),
+    )
+
+
+class ProjectForecast(Base):
+    """完工预测 (按周工时消耗趋势预测, 区间为80%; 日期为空表示预测期内无法完工)"""
+    __tablename__ = 'project_forecasts'
+
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    forecast_date = Column(Date, primary_key=True)
+    history_weeks = Column(Integer, nullable=False, default=0)
+    weekly_burn_rate = Column(Numeric(10, 2))
+    weekly_burn_trend = Column(Numeric(10, 2))
+    efficiency_factor = Column(Numeric(8, 4))
+    actual_hours = Column(Numeric(12, 2), nullable=False, default=0)
+    remaining_hours = Column(Numeric(12, 2), nullable=False, default=0)
+    forecast_total_hours = Column(Numeric(12, 2))
+    total_hours_low = Column(Numeric(12, 2))
+    total_hours_high = Column(Numeric(12, 2))
+    forecast_completion_date = Column(Date)
+    completion_date_low = Column(Date)
+    completion_date_high = Column(Date)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('idx_project_forecasts_date', 'forecast_date'),
+    )
+
+
 class EstimationModel(Base):
     __tablename__ = 'estimation_models'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     model_name = Column(String(100), nullable=False)
     model_version = Column(String(20), nullable=False)
     model_type = Column(String(50))
@@ -227,7 +365,7 @@ class EstimationModel(Base):
 class ComplexityAssessment(Base):
     __tablename__ = 'complexity_assessments'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
     assessment_method = Column(String(50))
     technical_complexity = Column(Numeric(3, 1))
@@ -250,7 +388,7 @@ class ComplexityAssessment(Base):
 class EstimationResult(Base):
     __tablename__ = 'estimation_results'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
     estimation_version = Column(String(20))
     rule_based_estimate = Column(Numeric(10, 1))
@@ -281,7 +419,7 @@ class EstimationResult(Base):
 class SimilarProject(Base):
     __tablename__ = 'similar_projects'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     target_project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
     similar_project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
     similarity_score = Column(Numeric(5, 4))
@@ -293,13 +431,45 @@ class SimilarProject(Base):
 
     __table_args__ = (
         UniqueConstraint('target_project_id', 'similar_project_id', name='uq_similar_projects'),
+        Index('idx_similar_target', 'target_project_id'),
+        Index('idx_similar_composite', 'target_project_id', 'similarity_score'),
+    )
+
+
+class DeviationAnalysis(Base):
+    __tablename__ = 'deviation_analysis'
+
+    id = Column(BigIntegerPK, primary_key=True)
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
+    task_id = Column(BigInteger, ForeignKey('wbs_tasks.id', ondelete='CASCADE'))
+    analysis_date = Column(Date)
+    analysis_level = Column(String(20))  # project, phase, task_type, task
+    analysis_key = Column(String(50))  # 阶段WBS编码 / 任务类型
+    planned_hours = Column(Numeric(10, 1))
+    actual_hours = Column(Numeric(10, 1))
+    variance_hours = Column(Numeric(10, 1))
+    variance_percentage = Column(Numeric(5, 2))
+    deviation_type = Column(String(50))
+    severity = Column(String(20))
+    root_causes = Column(JSON)
+    analysis_notes = Column(Text)
+    corrective_actions = Column(Text)
+    lessons_learned = Column(Text)
+    analyzed_by = Column(BigInteger, ForeignKey('users.id'))
+    analyzed_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('idx_deviation_project', 'project_id'),
+        Index('idx_deviation_task', 'task_id'),
+        Index('idx_deviation_date', 'analysis_date'),
+        Index('idx_deviation_level', 'project_id', 'analysis_level', 'analysis_date'),
     )
 
 
 class RiskRegister(Base):
     __tablename__ = 'risk_registers'
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntegerPK, primary_key=True)
     project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'))
     risk_title = Column(String(200), nullable=False)
     risk_description = Column(Text)
@@ -314,3 +484,62 @@ class RiskRegister(Base):
     owner_id = Column(BigInteger, ForeignKey('users.id'))
     status = Column(String(20), default='open')
     identified_at = Column(DateTime, default=func.now())
+
+
+class ProjectStatistics(Base):
+    """项目统计汇总表 (增量维护, 替代 v_project_statistics 视图的实时聚合)"""
+    __tablename__ = 'project_statistics'
+
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    total_tasks = Column(Integer, nullable=False, default=0)
+    completed_tasks = Column(Integer, nullable=False, default=0)
+    total_estimated_hours = Column(Numeric(12, 1), nullable=False, default=0)
+    total_actual_hours = Column(Numeric(12, 1), nullable=False, default=0)
+    variance_percentage = Column(Numeric(8, 2), nullable=False, default=0)
+    avg_progress = Column(Numeric(5, 2), nullable=False, default=0)
+    team_size = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=func.now())
+
+
+class UserWorkload(Base):
+    """用户工作负荷汇总表 (增量维护, 替代 v_user_workload 视图的实时聚合)"""
+    __tablename__ = 'user_workload'
+
+    user_id = Column(BigInteger, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    assigned_tasks = Column(Integer, nullable=False, default=0)
+    active_tasks = Column(Integer, nullable=False, default=0)
+    remaining_hours = Column(Numeric(12, 1), nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=func.now())
+
+
+class UserWeeklyHours(Base):
+    """用户周工时汇总表 (按周一日期累加)"""
+    __tablename__ = 'user_weekly_hours'
+
+    user_id = Column(BigInteger, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    hours = Column(Numeric(8, 2), nullable=False, default=0)
+
+
+class ProjectMonthlyCost(Base):
+    """项目月度工时成本汇总表 (按月初日期累加, 人工成本按用户时薪计)"""
+    __tablename__ = 'project_monthly_costs'
+
+    project_id = Column(BigInteger, ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    month_start = Column(Date, primary_key=True)
+    hours = Column(Numeric(12, 2), nullable=False, default=0)
+    labor_cost = Column(Numeric(15, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        # 覆盖索引: 仪表盘月度趋势只读索引
+        Index('idx_project_monthly_costs_month', 'month_start', 'hours', 'labor_cost'),
+    )
+
+
+class SummaryVersion(Base):
+    """汇总数据版本号 (汇总表每次写入加1, 查询缓存据此判断失效)"""
+    __tablename__ = 'summary_versions'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now())
@@ -0,0 +1,80 @@
+"""
+数据服务模块 (批处理作业与数据库读写)
+"""
+
+from .timesheet_ingest import IngestionReport, ingest_timesheets, ingest_timesheets_csv
+from .statistics import check_statistics, rebuild_statistics, refresh_statistics
+from .similar_projects import precompute_similar_projects, refresh_similar_projects
+from .deviation_analysis import DeviationReport, run_deviation_analysis
+from .baseline_calibration import calibrate_baseline, load_calibrated_baseline
+from .ml_training import train_ml_estimator
+from .feature_snapshot import publish_feature_snapshot
+from .portfolio_simulation import simulate_active_portfolio
+from .scheduling import ProjectSchedule, schedule_project
+from .capacity import capacity_heatmap, load_capacity
+from .analytics import AnalyticsCache, AnalyticsFilters, cost_analysis, dashboard_summary, resource_analysis
+from .timesheets import TimesheetValidationError, create_timesheets, list_timesheets, review_timesheets
+from .estimation_results import EstimationResultWriter, estimation_record, write_estimation_records
+from .wbs import WBSPersistResult, generate_project_wbs, persist_wbs
+from .wbs_rollup import RollupReport, refresh_rollups, rollup_projects
+from .baselines import BaselineConflictError, capture_baseline, load_current_baselines
+from .evm import EVMSnapshotReport, portfolio_evm, snapshot_evm
+from .forecast import ForecastReport, forecast_projects, latest_forecast
+from .projects import (
+    ProjectConflictError, create_project, delete_project, get_project, list_projects, update_project
+)
+
+__all__ = [
+    'IngestionReport',
+    'ingest_timesheets',
+    'ingest_timesheets_csv',
+    'check_statistics',
+    'rebuild_statistics',
+    'refresh_statistics',
+    'precompute_similar_projects',
+    'refresh_similar_projects',
+    'DeviationReport',
+    'run_deviation_analysis',
+    'calibrate_baseline',
+    'load_calibrated_baseline',
+    'train_ml_estimator',
+    'publish_feature_snapshot',
+    'simulate_active_portfolio',
+    'ProjectSchedule',
+    'schedule_project',
+    'capacity_heatmap',
+    'load_capacity',
+    'AnalyticsCache',
+    'AnalyticsFilters',
+    'cost_analysis',
+    'dashboard_summary',
+    'resource_analysis',
+    'TimesheetValidationError',
+    'create_timesheets',
+    'list_timesheets',
+    'review_timesheets',
+    'EstimationResultWriter',
+    'estimation_record',
+    'write_estimation_records',
+    'WBSPersistResult',
+    'generate_project_wbs',
+    'persist_wbs',
+    'RollupReport',
+    'refresh_rollups',
+    'rollup_projects',
+    'BaselineConflictError',
+    'capture_baseline',
+    'load_current_baselines',
+    'EVMSnapshotReport',
+    'portfolio_evm',
+    'snapshot_evm',
+    'ForecastReport',
+    'forecast_projects',
+    'latest_forecast',
+    'ProjectConflictError',
+    'create_project',
+    'delete_project',
+    'get_project',
+    'list_projects',
+    'update_project'
+]
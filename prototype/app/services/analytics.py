@@ -0,0 +1,414 @@
+"""
+分析仪表盘查询
+Analytics Dashboard Queries
+
+仪表盘、成本分析与资源分析只读取汇总表, 不扫描工时明细:
+
+- project_statistics: 项目任务数、预估/实际工时、进度
+- project_monthly_costs: 项目月度工时与人工成本
+- user_workload / user_weekly_hours: 用户在办任务、剩余工时与周工时
+
+支持按日期范围、组织 (含下级组织) 与项目类型过滤; 工时与成本按月
+汇总, 日期范围按整月计。未指定日期范围时趋势与成本取最近12个月。
+
+查询结果由 AnalyticsCache 缓存: 汇总表每次写入都会递增
+summary_versions 中的版本号, 缓存命中前先比对版本号 (一次主键查询),
+数据变化后的第一次请求即重新计算。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import (
+    ACTIVE_PROJECT_STATUSES, Organization, Project, ProjectMonthlyCost, ProjectStatistics, User,
+    UserWeeklyHours, UserWorkload
+)
+from app.services.statistics import month_start_of, summary_version, to_float, week_start_of
+
+
+COST_GROUPS = ("month", "project", "project_type", "organization")
+# 资源分析中每人每周的标准工时
+WEEKLY_CAPACITY_HOURS = 40.0
+DEFAULT_TREND_MONTHS = 12
+DEFAULT_CACHE_ENTRIES = 256
+# 绕过汇总表更新路径的数据变化 (如直接改项目预算) 最迟在此时间后可见
+DEFAULT_CACHE_TTL = 300.0
+
+projects_table = Project.__table__
+organizations_table = Organization.__table__
+project_stats_table = ProjectStatistics.__table__
+monthly_costs_table = ProjectMonthlyCost.__table__
+users_table = User.__table__
+user_workload_table = UserWorkload.__table__
+weekly_hours_table = UserWeeklyHours.__table__
+
+
+@dataclass(frozen=True)
+class AnalyticsFilters:
+    """分析过滤条件 (不可变, 可直接作为缓存键)"""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    organization_id: Optional[int] = None
+    project_type: Optional[str] = None
+
+    def window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        """工时与成本的统计月份范围 [起始月, 结束月]"""
+        end = month_start_of(self.end_date or today or date.today())
+        if self.start_date is not None:
+            return month_start_of(self.start_date), end
+        start = end
+        for _ in range(DEFAULT_TREND_MONTHS - 1):
+            start = month_start_of(start - timedelta(days=1))
+        return start, end
+
+
+class AnalyticsCache:
+    """分析结果缓存 (按汇总数据版本号失效, LRU 淘汰)"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, ttl: float = DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, engine: Engine, key: Hashable, compute: Callable[[Connection], Dict]) -> Dict:
+        """版本号未变且未过期时返回缓存结果, 否则在同一连接上重新计算"""
+        with engine.connect() as conn:
+            version = summary_version(conn)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self.misses += 1
+            value = compute(conn)
+
+        # 以计算前读取的版本号入缓存: 计算期间数据若有变化, 下一次请求会重新计算
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+def _organization_ids(conn: Connection, organization_id: int) -> Set[int]:
+    """组织及其全部下级组织"""
+    children: Dict[int, List[int]] = {}
+    for row in conn.execute(select(organizations_table.c.id, organizations_table.c.parent_id)):
+        children.setdefault(row.parent_id, []).append(row.id)
+    ids, stack = set(), [organization_id]
+    while stack:
+        node = stack.pop()
+        if node not in ids:
+            ids.add(node)
+            stack.extend(children.get(node, ()))
+    return ids
+
+
+def _project_conditions(conn: Connection, filters: AnalyticsFilters, dates: bool = True) -> List:
+    """
+    项目过滤条件; 日期范围按项目起止日期 (实际优先于计划) 与范围相交判断
+
+    Args:
+        dates: 是否按日期范围过滤项目 (月度汇总已按月份限定范围, 不再需要)
+    """
+    conditions = []
+    if filters.project_type is not None:
+        conditions.append(projects_table.c.project_type == filters.project_type)
+    if filters.organization_id is not None:
+        conditions.append(projects_table.c.organization_id.in_(_organization_ids(conn, filters.organization_id)))
+    if dates and filters.start_date is not None:
+        finish = func.coalesce(projects_table.c.actual_end_date, projects_table.c.planned_end_date)
+        conditions.append(or_(finish.is_(None), finish >= filters.start_date))
+    if dates and filters.end_date is not None:
+        start = func.coalesce(projects_table.c.actual_start_date, projects_table.c.planned_start_date)
+        conditions.append(or_(start.is_(None), start <= filters.end_date))
+    return conditions
+
+
+def _monthly_costs(conn: Connection, filters: AnalyticsFilters, group_column, today: Optional[date] = None):
+    """
+    窗口内按 group_column 分组的工时与人工成本
+
+    不按项目维度分组或过滤时只扫描月份覆盖索引, 不连接 projects
+    """
+    first, last = filters.window(today)
+    stmt = select(
+        group_column.label("key"),
+        func.sum(monthly_costs_table.c.hours).label("hours"),
+        func.sum(monthly_costs_table.c.labor_cost).label("labor_cost"),
+    ).where(monthly_costs_table.c.month_start.between(first, last)).group_by(group_column)
+    conditions = _project_conditions(conn, filters, dates=False)
+    if conditions or group_column.table is projects_table:
+        stmt = stmt.select_from(
+            monthly_costs_table.join(projects_table, projects_table.c.id == monthly_costs_table.c.project_id)
+        ).where(*conditions)
+    return conn.execute(stmt).all()
+
+
+def dashboard_summary(conn: Connection, filters: AnalyticsFilters, today: Optional[date] = None) -> Dict:
+    """仪表盘: 项目状态分布、工时与预算合计、任务完成率、月度趋势与偏差最大的项目"""
+    conditions = _project_conditions(conn, filters)
+    joined = projects_table.outerjoin(project_stats_table, project_stats_table.c.project_id == projects_table.c.id)
+
+    by_status = {}
+    totals = dict.fromkeys(
+        ("budget_amount", "contract_amount", "estimated_hours", "actual_hours", "total_tasks", "completed_tasks"), 0.0
+    )
+    progress_sum = 0.0
+    for row in conn.execute(
+        select(
+            projects_table.c.status,
+            func.count().label("projects"),
+            func.sum(projects_table.c.budget_amount).label("budget_amount"),
+            func.sum(projects_table.c.contract_amount).label("contract_amount"),
+            func.sum(project_stats_table.c.total_estimated_hours).label("estimated_hours"),
+            func.sum(project_stats_table.c.total_actual_hours).label("actual_hours"),
+            func.sum(project_stats_table.c.total_tasks).label("total_tasks"),
+            func.sum(project_stats_table.c.completed_tasks).label("completed_tasks"),
+            func.sum(project_stats_table.c.avg_progress).label("progress"),
+        ).select_from(joined).where(*conditions).group_by(projects_table.c.status)
+    ):
+        by_status[row.status or "unknown"] = row.projects
+        for column in totals:
+            totals[column] += to_float(getattr(row, column))
+        progress_sum += to_float(row.progress)
+
+    top_variance = conn.execute(
+        select(
+            projects_table.c.id, projects_table.c.code, projects_table.c.name, projects_table.c.status,
+            project_stats_table.c.variance_percentage,
+        ).select_from(joined)
+        .where(*conditions, project_stats_table.c.variance_percentage > 0)
+        .order_by(project_stats_table.c.variance_percentage.desc(), projects_table.c.id)
+        .limit(5)
+    ).all()
+
+    trend = sorted(_monthly_costs(conn, filters, monthly_costs_table.c.month_start, today), key=lambda row: row.key)
+
+    total_projects = sum(by_status.values())
+    estimated, actual = totals["estimated_hours"], totals["actual_hours"]
+    return {
+        "filters": asdict(filters),
+        "projects": {
+            "total": total_projects,
+            "active": sum(by_status.get(status, 0) for status in ACTIVE_PROJECT_STATUSES),
+            "by_status": by_status,
+        },
+        "hours": {
+            "estimated": round(estimated, 1),
+            "actual": round(actual, 1),
+            "variance_percentage": round((actual - estimated) / estimated * 100, 2) if estimated > 0 else 0.0,
+            "logged_in_period": round(sum(to_float(row.hours) for row in trend), 2),
+        },
+        "budget": {
+            "budget_amount": round(totals["budget_amount"], 2),
+            "contract_amount": round(totals["contract_amount"], 2),
+            "labor_cost_in_period": round(sum(to_float(row.labor_cost) for row in trend), 2),
+        },
+        "tasks": {
+            "total": int(totals["total_tasks"]),
+            "completed": int(totals["completed_tasks"]),
+            "completion_rate": round(totals["completed_tasks"] / totals["total_tasks"], 4)
+            if totals["total_tasks"] else 0.0,
+        },
+        "avg_progress": round(progress_sum / total_projects, 2) if total_projects else 0.0,
+        "monthly_trend": [
+            {"month": row.key, "hours": round(to_float(row.hours), 2), "labor_cost": round(to_float(row.labor_cost), 2)}
+            for row in trend
+        ],
+        "over_variance_projects": [
+            {"project_id": row.id, "code": row.code, "name": row.name, "status": row.status,
+             "variance_percentage": to_float(row.variance_percentage)}
+            for row in top_variance
+        ],
+    }
+
+
+def cost_analysis(conn: Connection, filters: AnalyticsFilters, group_by: str = "month",
+                  limit: int = 100, today: Optional[date] = None) -> Dict:
+    """
+    成本分析: 窗口内的工时与人工成本, 按月、项目、项目类型或组织分组
+
+    按项目维度分组时附带该组项目的预算合计与人工成本占预算比例。
+
+    Raises:
+        ValueError: 分组维度未知
+    """
+    if group_by not in COST_GROUPS:
+        raise ValueError(f"不支持的分组维度: {group_by}, 可选 {list(COST_GROUPS)}")
+    first, last = filters.window(today)
+    group_column = {
+        "month": monthly_costs_table.c.month_start,
+        "project": projects_table.c.id,
+        "project_type": projects_table.c.project_type,
+        "organization": projects_table.c.organization_id,
+    }[group_by]
+
+    rows = _monthly_costs(conn, filters, group_column, today)
+    if group_by == "month":
+        rows.sort(key=lambda row: row.key)
+    else:
+        rows.sort(key=lambda row: (-to_float(row.labor_cost), str(row.key)))
+    total_hours = sum(to_float(row.hours) for row in rows)
+    total_cost = sum(to_float(row.labor_cost) for row in rows)
+    rows = rows[:limit]
+
+    budgets, names = {}, {}
+    if group_by != "month" and rows:
+        keys = [row.key for row in rows]
+        budget_stmt = select(
+            group_column.label("key"),
+            func.sum(projects_table.c.budget_amount).label("budget_amount"),
+            func.sum(projects_table.c.contract_amount).label("contract_amount"),
+        ).where(*_project_conditions(conn, filters))
+        if None not in keys:
+            budget_stmt = budget_stmt.where(group_column.in_(keys))
+        budgets = {row.key: row for row in conn.execute(budget_stmt.group_by(group_column))}
+        if group_by == "project":
+            names = {
+                row.id: row for row in conn.execute(
+                    select(projects_table.c.id, projects_table.c.code, projects_table.c.name)
+                    .where(projects_table.c.id.in_(keys))
+                )
+            }
+
+    items = []
+    for row in rows:
+        item = {group_by: row.key, "hours": round(to_float(row.hours), 2),
+                "labor_cost": round(to_float(row.labor_cost), 2)}
+        if group_by != "month":
+            budget = budgets.get(row.key)
+            budget_amount = to_float(budget.budget_amount) if budget else 0.0
+            item.update(
+                budget_amount=round(budget_amount, 2),
+                contract_amount=round(to_float(budget.contract_amount) if budget else 0.0, 2),
+                budget_utilization=round(item["labor_cost"] / budget_amount, 4) if budget_amount else None,
+            )
+        if row.key in names:
+            item.update(code=names[row.key].code, name=names[row.key].name)
+        items.append(item)
+
+    return {
+        "filters": asdict(filters),
+        "period": {"start_month": first, "end_month": last},
+        "group_by": group_by,
+        "total_hours": round(total_hours, 2),
+        "total_labor_cost": round(total_cost, 2),
+        "items": items,
+    }
+
+
+def resource_analysis(conn: Connection, filters: AnalyticsFilters, department: Optional[str] = None,
+                      limit: int = 20, today: Optional[date] = None) -> Dict:
+    """
+    资源分析: 按部门汇总人数、在办任务、剩余工时与窗口内的登记工时利用率,
+    并列出剩余工时最多的用户
+
+    用户汇总表不区分项目, 组织与项目类型过滤不适用于资源分析。
+    """
+    window_start = week_start_of(filters.start_date or filters.window(today)[0])
+    window_end = filters.end_date or today or date.today()
+    weeks = max(1, (window_end - window_start).days // 7 + 1)
+
+    user_filter = or_(users_table.c.status.is_(None), users_table.c.status == "active")
+    if department is not None:
+        user_filter = and_(user_filter, users_table.c.department == department)
+
+    logged = (
+        select(
+            weekly_hours_table.c.user_id,
+            func.sum(weekly_hours_table.c.hours).label("hours"),
+        )
+        .where(weekly_hours_table.c.week_start.between(window_start, window_end))
+        .group_by(weekly_hours_table.c.user_id)
+        .subquery()
+    )
+    joined = (
+        users_table
+        .outerjoin(user_workload_table, user_workload_table.c.user_id == users_table.c.id)
+        .outerjoin(logged, logged.c.user_id == users_table.c.id)
+    )
+
+    departments = []
+    for row in conn.execute(
+        select(
+            users_table.c.department,
+            func.count().label("headcount"),
+            func.sum(user_workload_table.c.assigned_tasks).label("assigned_tasks"),
+            func.sum(user_workload_table.c.active_tasks).label("active_tasks"),
+            func.sum(user_workload_table.c.remaining_hours).label("remaining_hours"),
+            func.sum(logged.c.hours).label("logged_hours"),
+        ).select_from(joined).where(user_filter).group_by(users_table.c.department)
+    ):
+        capacity = row.headcount * weeks * WEEKLY_CAPACITY_HOURS
+        logged_hours = to_float(row.logged_hours)
+        departments.append({
+            "department": row.department,
+            "headcount": row.headcount,
+            "assigned_tasks": int(row.assigned_tasks or 0),
+            "active_tasks": int(row.active_tasks or 0),
+            "remaining_hours": round(to_float(row.remaining_hours), 1),
+            "logged_hours": round(logged_hours, 2),
+            "capacity_hours": capacity,
+            "utilization": round(logged_hours / capacity, 4) if capacity else 0.0,
+        })
+    departments.sort(key=lambda item: (-item["remaining_hours"], str(item["department"])))
+
+    top_users = conn.execute(
+        select(
+            users_table.c.id, users_table.c.full_name, users_table.c.department,
+            user_workload_table.c.assigned_tasks, user_workload_table.c.remaining_hours,
+            logged.c.hours.label("logged_hours"),
+        ).select_from(joined).where(user_filter)
+        # 没有 user_workload 行的用户按0排序 (PostgreSQL 降序时 NULL 排在最前)
+        .order_by(func.coalesce(user_workload_table.c.remaining_hours, 0).desc(), users_table.c.id)
+        .limit(limit)
+    ).all()
+
+    return {
+        "filters": asdict(filters),
+        "period": {"start_week": window_start, "end_date": window_end, "weeks": weeks},
+        "department": department,
+        "headcount": sum(item["headcount"] for item in departments),
+        "departments": departments,
+        "top_users": [
+            {
+                "user_id": row.id,
+                "full_name": row.full_name,
+                "department": row.department,
+                "assigned_tasks": row.assigned_tasks or 0,
+                "remaining_hours": round(to_float(row.remaining_hours), 1),
+                "logged_hours": round(to_float(row.logged_hours), 2),
+                "utilization": round(to_float(row.logged_hours) / (weeks * WEEKLY_CAPACITY_HOURS), 4),
+            }
+            for row in top_users
+        ],
+    }
+
+
+def cached_analytics(engine: Engine, cache: AnalyticsCache, query: Callable, filters: AnalyticsFilters,
+                     *args) -> Dict:
+    """经缓存执行分析查询 (缓存键含当天日期, 默认窗口随日期滚动)"""
+    today = date.today()
+    return cache.get_or_compute(
+        engine,
+        (query.__name__, filters, args, today),
+        lambda conn: query(conn, filters, *args, today=today),
+    )
@@ -0,0 +1,176 @@
+"""
+工时定额校准作业
+Baseline Calibration Job
+
+从已完成项目的规模参数与实际工时拟合各规模单位的定额缩放系数,
+结果按版本写入 estimation_models (每个版本一行, 各单位的系数、置信
+区间与每单位工时存于 adjustment_rules)。WorkloadEstimator 可加载指定
+版本或当前默认版本。
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.calibration import (
+    DEFAULT_BOOTSTRAP, DEFAULT_CONFIDENCE, DEFAULT_L2, CalibrationResult, calibrate
+)
+from app.core.estimator import TaskTypeBaseline, WorkloadEstimator
+from app.models import EstimationModel, Project
+from app.services.projects import project_info
+
+
+MODEL_NAME = "task_type_baseline"
+MODEL_TYPE = "calibrated_baseline"
+
+projects_table = Project.__table__
+models_table = EstimationModel.__table__
+
+
+def load_completed_projects(conn: Connection) -> List:
+    """加载已完成且有实际工时的项目 (定额校准与机器学习训练共用)"""
+    return conn.execute(
+        select(
+            projects_table.c.name,
+            projects_table.c.project_type,
+            projects_table.c.client_type,
+            projects_table.c.regulation_type,
+            projects_table.c.data_volume_level,
+            projects_table.c.data_sources_count,
+            projects_table.c.interface_tables_count,
+            projects_table.c.reports_count,
+            projects_table.c.custom_requirements_count,
+            projects_table.c.actual_hours,
+        ).where(and_(
+            projects_table.c.status == "completed",
+            projects_table.c.actual_hours > 0,
+        )).order_by(projects_table.c.id)
+    ).all()
+
+
+def calibration_arrays(rows: Sequence) -> Dict[str, np.ndarray]:
+    """校准输入数组, 复杂度等级按规则引擎口径重新评估"""
+    estimator = WorkloadEstimator()
+    levels = [estimator._assess_complexity(project_info(row)).level for row in rows]
+
+    return {
+        "data_sources": np.array([row.data_sources_count or 0 for row in rows], dtype=float),
+        "interface_tables": np.array([row.interface_tables_count or 0 for row in rows], dtype=float),
+        "reports": np.array([row.reports_count or 0 for row in rows], dtype=float),
+        "custom_requirements": np.array([row.custom_requirements_count or 0 for row in rows], dtype=float),
+        "complexity_levels": levels,
+        "actual_hours": np.array([float(row.actual_hours) for row in rows], dtype=float),
+    }
+
+
+def model_versions(conn: Connection, model_name: str = MODEL_NAME) -> List[str]:
+    """estimation_models 中某个模型的全部版本号"""
+    return [
+        row[0] for row in conn.execute(
+            select(models_table.c.model_version).where(models_table.c.model_name == model_name)
+        )
+    ]
+
+
+def next_model_version(conn: Connection, model_name: str = MODEL_NAME) -> str:
+    """下一个版本号 (v1, v2, ...)"""
+    numbers = [int(version[1:]) for version in model_versions(conn, model_name) if version[1:].isdigit()]
+    return f"v{max(numbers, default=0) + 1}"
+
+
+def activate_version(conn: Connection, version: str, model_name: str = MODEL_NAME) -> None:
+    """将指定版本设为该模型的默认版本"""
+    if version not in model_versions(conn, model_name):
+        raise ValueError(f"模型版本不存在: {model_name} {version}")
+    conn.execute(
+        update(models_table).where(models_table.c.model_name == model_name)
+        .values(is_default=models_table.c.model_version == version, updated_at=datetime.now())
+    )
+
+
+def save_calibration(conn: Connection, result: CalibrationResult, activate: bool = False) -> str:
+    """写入一个新版本的校准结果, 返回版本号"""
+    version = next_model_version(conn)
+    now = datetime.now()
+    conn.execute(models_table.insert().values(
+        model_name=MODEL_NAME,
+        model_version=version,
+        model_type=MODEL_TYPE,
+        base_hours=result.base_hours_per_unit["fixed"],
+        complexity_multipliers=TaskTypeBaseline.COMPLEXITY_MULTIPLIERS,
+        adjustment_rules={
+            "factors": result.factors,
+            "confidence_intervals": {group: list(ci) for group, ci in result.confidence_intervals.items()},
+            "base_hours_per_unit": result.base_hours_per_unit,
+            "samples": result.samples,
+            "l2": result.l2,
+            "bootstrap": result.bootstrap,
+            "baseline_mae": result.baseline_mae,
+        },
+        # r2_score 列为 DECIMAL(5,4)
+        r2_score=max(result.r2_score, -9.9999),
+        mae=result.mae,
+        confidence_level=DEFAULT_CONFIDENCE,
+        status="active",
+        is_default=False,
+        created_at=now,
+        updated_at=now,
+    ))
+    if activate:
+        activate_version(conn, version)
+    return version
+
+
+def calibrate_baseline(
+    engine: Engine,
+    l2: float = DEFAULT_L2,
+    bootstrap: int = DEFAULT_BOOTSTRAP,
+    seed: Optional[int] = None,
+    activate: bool = False
+) -> Tuple[str, CalibrationResult]:
+    """
+    基于全部已完成项目重新校准工时定额
+
+    Args:
+        engine: 数据库引擎
+        l2: 向标准定额收缩的正则强度
+        bootstrap: 自助法重采样次数 (0 表示不计算置信区间)
+        seed: 随机种子
+        activate: 是否设为默认定额
+
+    Returns:
+        (版本号, 校准结果)
+    """
+    with engine.begin() as conn:
+        data = calibration_arrays(load_completed_projects(conn))
+        result = calibrate(**data, l2=l2, bootstrap=bootstrap, seed=seed)
+        version = save_calibration(conn, result, activate=activate)
+    return version, result
+
+
+def load_calibrated_baseline(conn: Connection, version: Optional[str] = None) -> Optional[TaskTypeBaseline]:
+    """
+    加载校准后的工时定额
+
+    Args:
+        version: 定额版本, 为空时加载默认版本
+
+    Returns:
+        TaskTypeBaseline, 没有对应版本时返回 None (调用方回退到标准定额)
+    """
+    stmt = select(models_table.c.adjustment_rules).where(and_(
+        models_table.c.model_name == MODEL_NAME,
+        models_table.c.status == "active",
+    ))
+    if version is None:
+        stmt = stmt.where(models_table.c.is_default.is_(True))
+    else:
+        stmt = stmt.where(models_table.c.model_version == version)
+
+    rules = conn.execute(stmt).scalar()
+    if not rules:
+        return None
+    return TaskTypeBaseline({group: float(factor) for group, factor in rules["factors"].items()})
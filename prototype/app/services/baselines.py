@@ -0,0 +1,140 @@
+"""
+项目基线
+Project Baselines
+
+把项目当前的叶子任务 (计划工时、计划起止日期) 保存为 baselines 中的
+一个版本, 并设为当前基线; 挣值计算 (app.services.evm) 以当前基线的
+任务计划为 PV 与 EV 的依据。
+
+baseline_data 格式:
+    {"tasks": [{"wbs_code": "3.1", "planned_hours": 120.0,
+                "planned_start_date": "2025-03-03", "planned_end_date": "2025-03-21"}, ...]}
+
+任务没有计划日期时使用项目的计划起止日期, 两者都没有时不能建立基线。
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.database import chunked
+from app.models import Baseline, Project, WBSTask
+from app.services.statistics import bump_summary_version, is_leaf
+
+
+baselines_table = Baseline.__table__
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+
+
+class BaselineConflictError(ValueError):
+    """基线版本重复"""
+
+
+def baseline_tasks(conn: Connection, project_id: int) -> Optional[Dict]:
+    """
+    项目当前叶子任务的计划, 项目不存在时返回 None
+
+    Raises:
+        ValueError: 没有任务或任务缺少计划日期
+    """
+    project = conn.execute(
+        select(projects_table.c.planned_start_date, projects_table.c.planned_end_date)
+        .where(projects_table.c.id == project_id)
+    ).first()
+    if project is None:
+        return None
+
+    rows = conn.execute(
+        select(
+            tasks_table.c.wbs_code, tasks_table.c.estimated_hours,
+            tasks_table.c.planned_start_date, tasks_table.c.planned_end_date,
+        )
+        .where(tasks_table.c.project_id == project_id)
+        .where(is_leaf())
+        .order_by(tasks_table.c.wbs_code)
+    ).all()
+    if not rows:
+        raise ValueError(f"项目 {project_id} 没有任务")
+
+    tasks = []
+    for row in rows:
+        start = row.planned_start_date or project.planned_start_date
+        end = row.planned_end_date or project.planned_end_date
+        if start is None or end is None:
+            raise ValueError(f"任务 {row.wbs_code} 与项目都没有计划起止日期")
+        tasks.append({
+            "wbs_code": row.wbs_code,
+            "planned_hours": round(float(row.estimated_hours or 0), 1),
+            "planned_start_date": start.isoformat(),
+            "planned_end_date": max(start, end).isoformat(),
+        })
+    return {"tasks": tasks}
+
+
+def capture_baseline(
+    engine: Engine,
+    project_id: int,
+    version: str,
+    baseline_name: Optional[str] = None,
+    created_by: Optional[int] = None
+) -> Optional[Dict]:
+    """
+    保存项目当前计划为新基线并设为当前基线
+
+    Returns:
+        基线摘要, 项目不存在时返回 None
+
+    Raises:
+        ValueError: 没有任务或任务缺少计划日期
+        BaselineConflictError: 版本已存在
+    """
+    try:
+        with engine.begin() as conn:
+            data = baseline_tasks(conn, project_id)
+            if data is None:
+                return None
+            tasks = data["tasks"]
+            total = round(sum(task["planned_hours"] for task in tasks), 1)
+            start = min(task["planned_start_date"] for task in tasks)
+            end = max(task["planned_end_date"] for task in tasks)
+
+            conn.execute(
+                update(baselines_table)
+                .where(baselines_table.c.project_id == project_id)
+                .where(baselines_table.c.is_current.is_(True))
+                .values(is_current=False)
+            )
+            baseline_id = conn.execute(
+                insert(baselines_table).values(
+                    project_id=project_id, version=version, baseline_name=baseline_name,
+                    baseline_data=data, total_planned_hours=total,
+                    planned_start_date=date.fromisoformat(start), planned_end_date=date.fromisoformat(end),
+                    is_current=True, created_by=created_by, created_at=datetime.now(),
+                ).returning(baselines_table.c.id)
+            ).scalar_one()
+            # 组合挣值分析的缓存随之失效
+            bump_summary_version(conn)
+    except IntegrityError:
+        raise BaselineConflictError(f"项目 {project_id} 的基线版本 {version} 已存在")
+
+    return {
+        "id": baseline_id, "project_id": project_id, "version": version, "tasks": len(tasks),
+        "total_planned_hours": total, "planned_start_date": start, "planned_end_date": end,
+    }
+
+
+def load_current_baselines(conn: Connection, project_ids: Iterable[int]) -> Dict[int, object]:
+    """各项目的当前基线行 (没有当前基线的项目不在结果中)"""
+    baselines = {}
+    for chunk in chunked(project_ids):
+        for row in conn.execute(
+            select(baselines_table)
+            .where(baselines_table.c.project_id.in_(chunk))
+            .where(baselines_table.c.is_current.is_(True))
+        ):
+            baselines[row.project_id] = row
+    return baselines
@@ -0,0 +1,317 @@
+"""
+偏差分析批处理作业
+Vectorized Deviation Analysis
+
+方法论文档 9.1 节的反馈循环按项目逐个查询、逐阶段求和。这里改为一次性
+批量加载 wbs_tasks 估算与按任务聚合后的 timesheets 工时, 在列式数据上
+用分组聚合同时计算所有项目的:
+
+- project: 项目整体偏差, root_causes 记录超阈值的阶段/任务类型与计划外工作
+- phase: 按WBS一级编码 (阶段) 汇总的偏差
+- task_type: 按任务类型汇总的偏差
+- task: 偏差超过阈值或计划外的单个任务
+
+结果按 (项目, 分析日期) 整体替换后批量写入 deviation_analysis。
+计划工时只取叶子任务 (避免父任务与子任务重复计算), 实际工时取
+未被驳回的工时记录之和 (与 recompute_actual_hours 口径一致)。
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Float, and_, delete, func, insert, select, type_coerce
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import chunked, execute_chunked
+from app.models import DeviationAnalysis, Timesheet, WBSTask
+from app.services.statistics import non_rejected_timesheets
+
+
+# 与方法论 9.1 节保持一致的阈值 (百分比)
+PHASE_VARIANCE_THRESHOLD = 20.0
+TASK_TYPE_VARIANCE_THRESHOLD = 25.0
+UNPLANNED_WORK_RATIO = 0.1
+# 任务级记录只保留偏差绝对值不低于该值的任务
+DEFAULT_TASK_THRESHOLD = 10.0
+# variance_percentage 为 DECIMAL(5,2)
+MAX_VARIANCE_PERCENTAGE = 999.99
+INSERT_BATCH_SIZE = 5000
+
+UNKNOWN_TASK_TYPE = "unknown"
+
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+deviation_table = DeviationAnalysis.__table__
+
+
+@dataclass
+class DeviationReport:
+    """偏差分析作业结果统计"""
+    projects: int = 0
+    tasks: int = 0
+    rows_written: int = 0
+
+
+def classify_severity(variance_percentage: np.ndarray) -> np.ndarray:
+    """
+    按偏差率绝对值分级 (与准确度评级的 10/15/25 分界一致)
+
+    偏差率为空 (计划为0) 时视为 critical。
+    """
+    absolute = np.abs(variance_percentage)
+    return np.select(
+        [absolute < 10, absolute < 15, absolute < 25],
+        ["low", "medium", "high"],
+        default="critical",
+    )
+
+
+def classify_deviation(planned: np.ndarray, variance_hours: np.ndarray) -> np.ndarray:
+    """偏差类型: overrun / underrun / on_track, 无计划工时的投入为 unplanned"""
+    return np.select(
+        [(planned <= 0) & (variance_hours > 0), variance_hours > 0, variance_hours < 0],
+        ["unplanned", "overrun", "underrun"],
+        default="on_track",
+    )
+
+
+# ============================================
+# 批量加载
+# ============================================
+
+def load_task_frame(conn: Connection, project_ids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """
+    加载任务估算与聚合工时, 每个任务一行
+
+    工时在数据库端按 task_id 分组求和, 只有聚合结果进入内存,
+    千万级工时记录也只产生任务数量级的行。
+    """
+    task_rows = list(execute_chunked(conn, select(
+        tasks_table.c.id,
+        tasks_table.c.project_id,
+        tasks_table.c.parent_task_id,
+        tasks_table.c.wbs_code,
+        tasks_table.c.task_name,
+        tasks_table.c.task_type,
+        type_coerce(tasks_table.c.estimated_hours, Float).label("estimated_hours"),
+    ), tasks_table.c.project_id, project_ids))
+    tasks = pd.DataFrame(task_rows, columns=[
+        "task_id", "project_id", "parent_task_id", "wbs_code", "task_name", "task_type", "estimated_hours"
+    ])
+
+    hours_rows = list(execute_chunked(conn, select(
+        timesheets_table.c.task_id,
+        type_coerce(func.sum(timesheets_table.c.hours), Float).label("actual_hours"),
+    ).where(
+        non_rejected_timesheets()
+    ).group_by(timesheets_table.c.task_id), timesheets_table.c.project_id, project_ids))
+    hours = pd.DataFrame(hours_rows, columns=["task_id", "actual_hours"])
+
+    frame = tasks.merge(hours, on="task_id", how="left")
+    frame["actual_hours"] = frame["actual_hours"].fillna(0.0)
+
+    # 父任务的估算由子任务汇总而来, 只有叶子任务计入计划工时
+    is_leaf = ~frame["task_id"].isin(frame["parent_task_id"].dropna())
+    frame["planned_hours"] = np.where(is_leaf, frame["estimated_hours"].fillna(0.0), 0.0)
+    frame["is_leaf"] = is_leaf
+    frame["phase"] = frame["wbs_code"].str.split(".", n=1).str[0]
+    frame["task_type"] = frame["task_type"].fillna(UNKNOWN_TASK_TYPE)
+    return frame
+
+
+# ============================================
+# 向量化计算
+# ============================================
+
+def _with_variance(frame: pd.DataFrame) -> pd.DataFrame:
+    """追加偏差工时、偏差率、偏差类型与严重程度列"""
+    planned = frame["planned_hours"].to_numpy(dtype=float)
+    actual = frame["actual_hours"].to_numpy(dtype=float)
+    variance = actual - planned
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = np.where(planned > 0, variance / planned * 100, np.nan)
+
+    frame = frame.assign(
+        variance_hours=variance,
+        variance_percentage=np.clip(percentage, -MAX_VARIANCE_PERCENTAGE, MAX_VARIANCE_PERCENTAGE),
+        deviation_type=classify_deviation(planned, variance),
+    )
+    frame["severity"] = np.where(
+        np.isnan(percentage) & (variance == 0), "low", classify_severity(np.nan_to_num(percentage, nan=np.inf))
+    )
+    return frame
+
+
+def compute_deviations(frame: pd.DataFrame,
+                       task_threshold: float = DEFAULT_TASK_THRESHOLD) -> Dict[str, pd.DataFrame]:
+    """
+    计算全部项目各层级的偏差
+
+    Args:
+        frame: load_task_frame 返回的任务明细
+        task_threshold: 任务级记录的偏差率阈值 (%)
+
+    Returns:
+        {"project": ..., "phase": ..., "task_type": ..., "task": ...}
+    """
+    sums = {"planned_hours": "sum", "actual_hours": "sum"}
+    projects = _with_variance(frame.groupby("project_id", sort=True).agg(sums).reset_index())
+    phases = _with_variance(frame.groupby(["project_id", "phase"], sort=True).agg(sums).reset_index())
+    task_types = _with_variance(frame.groupby(["project_id", "task_type"], sort=True).agg(sums).reset_index())
+
+    # 阶段名称取一级任务的名称 (WBS编码无 '.' 的任务)
+    phase_names = frame.loc[frame["wbs_code"] == frame["phase"], ["project_id", "phase", "task_name"]]
+    phases = phases.merge(
+        phase_names.drop_duplicates(["project_id", "phase"]), on=["project_id", "phase"], how="left"
+    )
+
+    tasks = _with_variance(frame[frame["is_leaf"] | (frame["actual_hours"] > 0)])
+    tasks = tasks[
+        (tasks["deviation_type"] == "unplanned")
+        | (tasks["variance_percentage"].abs() >= task_threshold)
+    ]
+
+    return {"project": projects, "phase": phases, "task_type": task_types, "task": tasks}
+
+
+def _root_causes(deviations: Dict[str, pd.DataFrame]) -> Dict[int, List[Dict]]:
+    """汇总每个项目超阈值的阶段/任务类型与计划外工作, impact 为对项目偏差率的贡献"""
+    planned = deviations["project"].set_index("project_id")["planned_hours"]
+    causes: Dict[int, List[Dict]] = {}
+
+    def impact(rows: pd.DataFrame) -> np.ndarray:
+        base = planned.reindex(rows["project_id"]).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(base > 0, rows["variance_hours"].to_numpy() / base, np.nan)
+
+    phases = deviations["phase"]
+    phases = phases[phases["variance_percentage"].abs() > PHASE_VARIANCE_THRESHOLD]
+    for row, share in zip(phases.itertuples(index=False), impact(phases)):
+        causes.setdefault(row.project_id, []).append({
+            "type": "phase_overrun" if row.variance_hours > 0 else "phase_underrun",
+            "phase": row.phase,
+            "phase_name": row.task_name if isinstance(row.task_name, str) else None,
+            "variance": round(float(row.variance_percentage), 2),
+            "impact": None if np.isnan(share) else round(float(share), 4),
+        })
+
+    task_types = deviations["task_type"]
+    task_types = task_types[task_types["variance_percentage"].abs() > TASK_TYPE_VARIANCE_THRESHOLD]
+    for row, share in zip(task_types.itertuples(index=False), impact(task_types)):
+        causes.setdefault(row.project_id, []).append({
+            "type": "task_type_error",
+            "task_type": row.task_type,
+            "variance": round(float(row.variance_percentage), 2),
+            "impact": None if np.isnan(share) else round(float(share), 4),
+        })
+
+    tasks = deviations["task"]
+    unplanned = tasks[tasks["deviation_type"] == "unplanned"].groupby("project_id")["actual_hours"].sum()
+    for project_id, hours in unplanned.items():
+        if hours > planned.get(project_id, 0) * UNPLANNED_WORK_RATIO:
+            causes.setdefault(project_id, []).append({
+                "type": "scope_creep",
+                "unplanned_hours": round(float(hours), 1),
+            })
+
+    return causes
+
+
+# ============================================
+# 批量写入
+# ============================================
+
+def _optional(value) -> Optional[float]:
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def _records(rows: pd.DataFrame, level: str, key_column: Optional[str], analysis_date: date,
+             analyzed_at: datetime, analyzed_by: Optional[int],
+             root_causes: Optional[Dict[int, List[Dict]]] = None) -> List[Dict]:
+    records = []
+    for row in rows.itertuples(index=False):
+        project_id = int(row.project_id)
+        record = {
+            "project_id": project_id,
+            "task_id": int(row.task_id) if level == "task" else None,
+            "analysis_date": analysis_date,
+            "analysis_level": level,
+            "analysis_key": getattr(row, key_column) if key_column else None,
+            "planned_hours": round(float(row.planned_hours), 1),
+            "actual_hours": round(float(row.actual_hours), 1),
+            "variance_hours": round(float(row.variance_hours), 1),
+            "variance_percentage": _optional(row.variance_percentage),
+            "deviation_type": row.deviation_type,
+            "severity": row.severity,
+            "root_causes": root_causes.get(project_id, []) if root_causes is not None else None,
+            "analysis_notes": None,
+            "analyzed_by": analyzed_by,
+            "analyzed_at": analyzed_at,
+        }
+        if level == "phase" and isinstance(row.task_name, str):
+            record["analysis_notes"] = f"阶段: {row.task_name}"
+        elif level == "task":
+            record["analysis_notes"] = f"{row.wbs_code} {row.task_name}"
+        records.append(record)
+    return records
+
+
+def _write(conn: Connection, deviations: Dict[str, pd.DataFrame], analysis_date: date,
+           analyzed_by: Optional[int]) -> int:
+    """替换各项目当日的分析结果, 返回写入行数"""
+    project_ids = deviations["project"]["project_id"].tolist()
+    for chunk in chunked(project_ids):
+        conn.execute(delete(deviation_table).where(and_(
+            deviation_table.c.project_id.in_(chunk),
+            deviation_table.c.analysis_date == analysis_date,
+        )))
+
+    analyzed_at = datetime.now()
+    records = _records(deviations["project"], "project", None, analysis_date, analyzed_at, analyzed_by,
+                       root_causes=_root_causes(deviations))
+    records += _records(deviations["phase"], "phase", "phase", analysis_date, analyzed_at, analyzed_by)
+    records += _records(deviations["task_type"], "task_type", "task_type", analysis_date, analyzed_at,
+                        analyzed_by)
+    records += _records(deviations["task"], "task", None, analysis_date, analyzed_at, analyzed_by)
+
+    for start in range(0, len(records), INSERT_BATCH_SIZE):
+        conn.execute(insert(deviation_table), records[start:start + INSERT_BATCH_SIZE])
+    return len(records)
+
+
+def run_deviation_analysis(
+    engine: Engine,
+    project_ids: Optional[Iterable[int]] = None,
+    analysis_date: Optional[date] = None,
+    task_threshold: float = DEFAULT_TASK_THRESHOLD,
+    analyzed_by: Optional[int] = None
+) -> DeviationReport:
+    """
+    对全部 (或指定) 项目执行偏差分析并写入 deviation_analysis
+
+    Args:
+        engine: 数据库引擎
+        project_ids: 只分析这些项目, 为空时分析全部项目
+        analysis_date: 分析日期, 默认今天; 同一日期重复执行会覆盖旧结果
+        task_threshold: 任务级记录的偏差率阈值 (%)
+        analyzed_by: 分析人用户ID
+    """
+    analysis_date = analysis_date or date.today()
+    if project_ids is not None:
+        project_ids = set(project_ids)
+
+    with engine.begin() as conn:
+        frame = load_task_frame(conn, project_ids)
+        if frame.empty:
+            return DeviationReport()
+        deviations = compute_deviations(frame, task_threshold)
+        rows_written = _write(conn, deviations, analysis_date, analyzed_by)
+
+    return DeviationReport(
+        projects=len(deviations["project"]),
+        tasks=len(frame),
+        rows_written=rows_written,
+    )
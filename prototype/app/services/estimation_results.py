@@ -0,0 +1,277 @@
+"""
+评估结果异步批量持久化
+Asynchronous Batched Persistence of Estimation Results
+
+评估接口把结果放入进程内的有界队列后立即返回, 后台任务按条数
+(batch_size) 或等待时间 (flush_interval) 凑批, 在专用写入线程中以
+一个事务批量插入 complexity_assessments 与 estimation_results,
+请求路径不等待数据库。
+
+- 有界: 队列最多缓存 max_pending 条, 内存占用有上限
+- 背压: 队列满时提交方最多等待 put_timeout 秒, 仍无空位则丢弃该条并计数
+- 关闭: 停止接收新结果, 写完队列中已有的结果后退出
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect, insert, select
+from sqlalchemy.engine import Engine
+
+from app.core.estimator import EstimationResult, ProjectInfo
+from app.database import chunked
+from app.models import ComplexityAssessment, EstimationResult as EstimationResultRow, Project
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_PUT_TIMEOUT = 0.05
+
+assessments_table = ComplexityAssessment.__table__
+results_table = EstimationResultRow.__table__
+projects_table = Project.__table__
+
+# 队列中的结束标记
+_STOP = object()
+
+
+@dataclass
+class EstimationRecord:
+    """一次评估待写入的两行数据"""
+    project_id: Optional[int]
+    assessment: Dict
+    result: Dict
+
+
+@dataclass
+class WriterStats:
+    """写入统计"""
+    submitted: int = 0
+    written: int = 0
+    dropped: int = 0
+    failed: int = 0
+    batches: int = 0
+    pending: int = 0
+
+
+def _round(value: Optional[float], digits: int = 1) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+def estimation_record(
+    project_info: ProjectInfo,
+    result: EstimationResult,
+    project_id: Optional[int] = None,
+    similarity_estimate: Optional[float] = None,
+    ml_estimate: Optional[float] = None,
+    ensemble_estimate: Optional[float] = None,
+    model_weights: Optional[Dict[str, float]] = None,
+    version: Optional[str] = None
+) -> EstimationRecord:
+    """
+    评估结果转换为待写入的行 (在请求路径中调用, 只做字典拼装)
+
+    Args:
+        project_id: 关联的项目, 为空时只保存评估参数
+        similarity_estimate, ml_estimate, ensemble_estimate: 融合评估中其他方法的结果
+        model_weights: 融合权重
+        version: 评估版本 (如机器学习模型版本)
+    """
+    now = datetime.now()
+    score = result.complexity_score
+    final = ensemble_estimate if ensemble_estimate is not None else result.total_hours
+    assessment = {
+        "project_id": project_id,
+        "assessment_method": "rule_based",
+        "technical_complexity": _round(score.technical),
+        "business_complexity": _round(score.business),
+        "data_complexity": _round(score.data),
+        "organizational_complexity": _round(score.organizational),
+        "risk_factors": _round(score.risk),
+        "total_score": _round(score.total),
+        "complexity_level": score.level,
+        "assessment_details": asdict(project_info),
+        "assessed_at": now,
+    }
+    row = {
+        "project_id": project_id,
+        "estimation_version": version or "rules",
+        "rule_based_estimate": _round(result.total_hours),
+        "similarity_based_estimate": _round(similarity_estimate),
+        "ml_based_estimate": _round(ml_estimate),
+        "ensemble_estimate": _round(ensemble_estimate),
+        "final_estimate": _round(final),
+        "optimistic_estimate": _round(result.optimistic),
+        "most_likely_estimate": _round(result.most_likely),
+        "pessimistic_estimate": _round(result.pessimistic),
+        "expected_estimate": _round(result.expected),
+        "std_deviation": _round(result.std_deviation, 2),
+        "confidence_interval_low": _round(result.confidence_interval[0]),
+        "confidence_interval_high": _round(result.confidence_interval[1]),
+        "confidence_level": result.confidence_level,
+        "estimation_breakdown": dict(result.phase_breakdown),
+        "model_weights": model_weights or {"rule_based": 1.0},
+        "estimated_at": now,
+    }
+    return EstimationRecord(project_id=project_id, assessment=assessment, result=row)
+
+
+def write_estimation_records(engine: Engine, records: Sequence[EstimationRecord]) -> int:
+    """
+    在一个事务内批量写入评估结果
+
+    关联的项目不存在的记录跳过 (不影响同批其他记录)。
+
+    Returns:
+        写入的评估结果条数
+    """
+    with engine.begin() as conn:
+        project_ids = {record.project_id for record in records if record.project_id is not None}
+        existing = set()
+        for chunk in chunked(project_ids):
+            existing.update(conn.execute(
+                select(projects_table.c.id).where(projects_table.c.id.in_(chunk))
+            ).scalars())
+        valid = [record for record in records if record.project_id is None or record.project_id in existing]
+        if len(valid) < len(records):
+            logger.warning("%d 条评估结果关联的项目不存在, 已跳过", len(records) - len(valid))
+        if valid:
+            conn.execute(insert(assessments_table), [record.assessment for record in valid])
+            conn.execute(insert(results_table), [record.result for record in valid])
+    return len(valid)
+
+
+def missing_result_tables(engine: Engine) -> List[str]:
+    """写入器依赖的表中数据库里还不存在的表 (启动时检查, 避免每批写入都失败)"""
+    inspector = inspect(engine)
+    return [table.name for table in (assessments_table, results_table) if not inspector.has_table(table.name)]
+
+
+class EstimationResultWriter:
+    """
+    评估结果后台批量写入器
+
+    在事件循环中使用: start() 启动后台任务, 请求中 await submit(),
+    关闭时 await close() 写完剩余结果。数据库写入在单独的线程中串行执行。
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], Engine],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        put_timeout: float = DEFAULT_PUT_TIMEOUT
+    ):
+        """
+        Args:
+            engine_factory: 返回数据库引擎 (首次写入时调用)
+            batch_size: 每批最多条数
+            flush_interval: 凑批最长等待秒数 (从批内第一条算起)
+            max_pending: 队列容量
+            put_timeout: 队列满时提交方最长等待秒数
+        """
+        if batch_size < 1 or max_pending < 1:
+            raise ValueError("batch_size 与 max_pending 须为正数")
+        self.engine_factory = engine_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._stats = WriterStats()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estimation-writer")
+
+    @property
+    def stats(self) -> WriterStats:
+        return WriterStats(**{**asdict(self._stats), "pending": self._queue.qsize()})
+
+    def start(self) -> None:
+        """启动后台写入任务 (需在事件循环中调用)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, record: EstimationRecord) -> bool:
+        """
+        提交一条评估结果
+
+        Returns:
+            是否进入队列 (已关闭或队列持续已满时为 False)
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(record), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._stats.dropped += 1
+                logger.warning("评估结果写入队列已满 (%d), 丢弃一条结果", self._queue.maxsize)
+                return False
+        self._stats.submitted += 1
+        return True
+
+    async def close(self) -> None:
+        """停止接收新结果, 写完队列中的结果后退出"""
+        if self._closed:
+            return
+        self._closed = True
+        # 未启动时也写完已提交的结果
+        self.start()
+        await self._queue.put(_STOP)
+        await self._task
+        self._executor.shutdown(wait=True)
+
+    async def _next_batch(self) -> Tuple[List[EstimationRecord], bool]:
+        """取一批结果, 返回 (批, 是否收到结束标记)"""
+        loop = asyncio.get_running_loop()
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush(self, batch: List[EstimationRecord]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            written = await loop.run_in_executor(
+                self._executor, write_estimation_records, self.engine_factory(), batch
+            )
+        except Exception:
+            self._stats.failed += len(batch)
+            logger.exception("评估结果批量写入失败, 丢弃 %d 条", len(batch))
+            return
+        self._stats.batches += 1
+        self._stats.written += written
+        self._stats.failed += len(batch) - written
+
+    async def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch()
+            if batch:
+                await self._flush(batch)
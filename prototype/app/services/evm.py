@@ -0,0 +1,473 @@
+"""
+挣值管理作业
+Earned Value Management Job
+
+以项目当前基线 (baselines) 的任务计划与 timesheets 计算项目整体和各阶段
+(WBS一级编码) 的 PV / EV / AC、CPI / SPI 与 EAC (均以工时计, 见 app.core.evm)。
+
+- 基线任务按 wbs_code 对应到当前任务; 不在基线中的任务只计实际工时
+- 进度取工时记录上报的 task_progress_percentage, 截至当天的最高值
+- 被驳回的工时记录不计入
+
+日快照 (evm_snapshots) 增量追加: 已有快照的项目从上一次快照的累计
+AC / EV 出发, 只读取其后日期的工时记录, 计算新增的日期; 历史快照不
+重算。事后补录到已快照日期的工时不回溯修改历史, 计入之后的快照需
+rebuild (当前基线版本与上一次快照不同的项目, 累计值按新基线从头计算,
+同样只追加新日期)。
+
+组合查询对全部在建项目一次向量化计算指定日期的指标, 不依赖快照。
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.evm import EVMSeries, compute_evm, progress_gains
+from app.database import chunked
+from app.models import ACTIVE_PROJECT_STATUSES, EVMSnapshot, Project, Timesheet, WBSTask
+from app.services.baselines import load_current_baselines
+from app.services.statistics import non_rejected_timesheets
+
+
+# 项目整体的 phase_code
+PROJECT_LEVEL = ""
+INSERT_BATCH_SIZE = 5000
+# 1970-01-01 的 date.toordinal()
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 每批向量化计算的项目数 (限制 单元 × 天数 矩阵的大小)
+PROJECT_BATCH_SIZE = 500
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+snapshots_table = EVMSnapshot.__table__
+
+
+@dataclass
+class EVMSnapshotReport:
+    """日快照作业结果"""
+    as_of: date
+    projects: int = 0
+    rows_written: int = 0
+    # 没有当前基线的项目
+    skipped: List[int] = field(default_factory=list)
+
+
+def phase_code(wbs_code: str) -> str:
+    """WBS一级编码 (阶段)"""
+    return wbs_code.split(".")[0]
+
+
+class _PlanIndex:
+    """一批项目的基线计划、汇总单元编号与任务到单元的映射"""
+
+    def __init__(self, conn: Connection, baselines: Dict[int, object]):
+        self.groups: List[Tuple[int, str]] = []
+        self.index: Dict[Tuple[int, str], int] = {}
+        self.budget: List[float] = []
+        self.versions = {project_id: row.version for project_id, row in baselines.items()}
+        planned: Dict[Tuple[int, str], float] = {}
+        hours, starts, ends, project_groups, phase_groups = [], [], [], [], []
+        for project_id, row in sorted(baselines.items()):
+            project_group = self.group(project_id, PROJECT_LEVEL)
+            for task in (row.baseline_data or {}).get("tasks", []):
+                planned[(project_id, task["wbs_code"])] = value = float(task.get("planned_hours") or 0)
+                hours.append(value)
+                starts.append(task["planned_start_date"])
+                ends.append(task["planned_end_date"])
+                project_groups.append(project_group)
+                phase_groups.append(self.group(project_id, phase_code(task["wbs_code"])))
+
+        # ISO 日期字符串整列转换为日期序数
+        start = np.array(starts, dtype="datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        end = np.array(ends, dtype="datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        hours = np.array(hours, dtype=float)
+        group = np.concatenate([project_groups, phase_groups]).astype(np.int64)
+        self.plan = (group, np.concatenate([hours, hours]), np.concatenate([start, start]),
+                     np.concatenate([end, end]))
+        self.budget = np.bincount(group, weights=self.plan[1], minlength=len(self.groups)).tolist()
+
+        first = np.full(len(self.groups), np.iinfo(np.int64).max)
+        np.minimum.at(first, np.array(project_groups, dtype=np.int64), start)
+        self.plan_start: Dict[int, date] = {}
+        for project_id, row in baselines.items():
+            g = self.index[(project_id, PROJECT_LEVEL)]
+            if row.total_planned_hours is not None:
+                self.budget[g] = float(row.total_planned_hours)
+            self.plan_start[project_id] = (
+                date.fromordinal(int(first[g])) if first[g] != np.iinfo(np.int64).max
+                else row.planned_start_date or date.today()
+            )
+
+        # 当前任务 -> (项目单元, 阶段单元, 基线计划工时)
+        task_rows = []
+        for chunk in chunked(baselines):
+            task_rows.extend(conn.execute(
+                select(tasks_table.c.id, tasks_table.c.project_id, tasks_table.c.wbs_code)
+                .where(tasks_table.c.project_id.in_(chunk))
+            ).all())
+        task_rows.sort()
+        self.task_ids = np.array([row.id for row in task_rows], dtype=np.int64)
+        self.task_project_group = np.array(
+            [self.index[(row.project_id, PROJECT_LEVEL)] for row in task_rows], dtype=np.int64
+        )
+        self.task_phase_group = np.array(
+            [self.group(row.project_id, phase_code(row.wbs_code)) for row in task_rows], dtype=np.int64
+        )
+        self.task_hours = np.array(
+            [planned.get((row.project_id, row.wbs_code), 0.0) for row in task_rows], dtype=float
+        )
+
+    def group(self, project_id: int, phase: str) -> int:
+        """单元编号 (不存在时新建, 完工预算为0)"""
+        key = (project_id, phase)
+        if key not in self.index:
+            self.index[key] = len(self.groups)
+            self.groups.append(key)
+            self.budget.append(0.0)
+        return self.index[key]
+
+    def task_index(self, task_ids: np.ndarray) -> np.ndarray:
+        """任务ID在 task_ids 中的下标, 不在本批项目中的为 -1"""
+        if not len(self.task_ids):
+            return np.full(len(task_ids), -1, dtype=np.int64)
+        position = np.minimum(np.searchsorted(self.task_ids, task_ids), len(self.task_ids) - 1)
+        return np.where(self.task_ids[position] == task_ids, position, -1)
+
+
+def _timesheet_events(conn: Connection, project_ids: List[int], start: date, as_of: date,
+                      after: Optional[date] = None):
+    """
+    (任务ID, 日期序数, 工时, 最高进度) 数组, 在数据库中按 (任务, 日期) 聚合
+
+    早于窗口 start 的记录按任务聚合为窗口第一天的一条; after 不为空时
+    只读取其后的记录。
+    """
+    rows = []
+    hours = func.sum(timesheets_table.c.hours).label("hours")
+    progress = func.max(timesheets_table.c.task_progress_percentage).label("progress")
+    for chunk in chunked(project_ids):
+        def scoped(stmt):
+            stmt = (
+                stmt.where(timesheets_table.c.project_id.in_(chunk))
+                .where(timesheets_table.c.task_id.isnot(None))
+                .where(timesheets_table.c.work_date <= as_of)
+                .where(non_rejected_timesheets())
+            )
+            return stmt if after is None else stmt.where(timesheets_table.c.work_date > after)
+
+        if after is None or after < start - timedelta(days=1):
+            rows.extend(
+                (row.task_id, start, row.hours, row.progress) for row in conn.execute(scoped(
+                    select(timesheets_table.c.task_id, hours, progress)
+                    .where(timesheets_table.c.work_date < start)
+                    .group_by(timesheets_table.c.task_id)
+                ))
+            )
+        rows.extend(conn.execute(scoped(
+            select(timesheets_table.c.task_id, timesheets_table.c.work_date, hours, progress)
+            .where(timesheets_table.c.work_date >= start)
+            .group_by(timesheets_table.c.task_id, timesheets_table.c.work_date)
+        )).all())
+
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1].toordinal() for row in rows], dtype=np.int64),
+        np.array([float(row[2] or 0) for row in rows], dtype=float),
+        np.array([np.nan if row[3] is None else float(row[3]) for row in rows], dtype=float),
+    )
+
+
+def _previous_progress(conn: Connection, task_ids: Iterable[int], before: date) -> Dict[int, float]:
+    """各任务截至 before (含) 上报的最高进度"""
+    progress = {}
+    for chunk in chunked(set(task_ids)):
+        progress.update(conn.execute(
+            select(timesheets_table.c.task_id, func.max(timesheets_table.c.task_progress_percentage))
+            .where(timesheets_table.c.task_id.in_(chunk))
+            .where(timesheets_table.c.work_date <= before)
+            .where(timesheets_table.c.task_progress_percentage.isnot(None))
+            .where(non_rejected_timesheets())
+            .group_by(timesheets_table.c.task_id)
+        ).all())
+    return {task_id: float(value) for task_id, value in progress.items()}
+
+
+def _series(
+    conn: Connection,
+    plan: _PlanIndex,
+    project_ids: List[int],
+    start: date,
+    as_of: date,
+    after: Optional[date] = None,
+    carry: Optional[Dict[Tuple[int, str], Tuple[float, float]]] = None
+) -> EVMSeries:
+    """
+    计算 [start, as_of] 每天的累计值
+
+    Args:
+        after: 只读取该日期之后的工时记录 (增量计算, 之前的累计值由 carry 给出)
+        carry: (项目, 阶段) -> (累计 AC, 累计 EV)
+    """
+    task_ids, days, hours, progress = _timesheet_events(conn, project_ids, start, as_of, after)
+    position = plan.task_index(task_ids)
+    known = position >= 0
+    position, days, hours, progress = position[known], days[known], hours[known], progress[known]
+    offset = days - start.toordinal()
+
+    def both(values):
+        return np.concatenate([values, values])
+
+    cost_group = np.concatenate([plan.task_project_group[position], plan.task_phase_group[position]])
+
+    reported = ~np.isnan(progress)
+    previous = np.zeros(len(plan.task_ids))
+    if after is not None and reported.any():
+        last = _previous_progress(conn, task_ids[known][reported].tolist(), after)
+        if last:
+            previous[plan.task_index(np.array(list(last), dtype=np.int64))] = list(last.values())
+    earn_position = position[reported]
+    earned = progress_gains(earn_position, days[reported], progress[reported], previous) \
+        * plan.task_hours[earn_position] / 100
+    earn_group = np.concatenate([plan.task_project_group[earn_position], plan.task_phase_group[earn_position]])
+
+    carry_cost = carry_earned = None
+    if carry:
+        carry_cost = [carry.get(key, (0.0, 0.0))[0] for key in plan.groups]
+        carry_earned = [carry.get(key, (0.0, 0.0))[1] for key in plan.groups]
+
+    plan_group, plan_hours, plan_start, plan_end = plan.plan
+    return compute_evm(
+        start, (as_of - start).days + 1, plan.budget,
+        plan_group, plan_hours, plan_start, plan_end,
+        cost_group, both(offset), both(hours),
+        earn_group, both(offset[reported]), both(earned),
+        carry_cost, carry_earned,
+    )
+
+
+def _snapshot_rows(plan: _PlanIndex, series: EVMSeries, write_from: Dict[int, date]) -> List[Dict]:
+    """窗口内各项目 write_from 及之后日期的快照行"""
+    metrics = series.metrics()
+    dates = series.dates
+    now = datetime.now()
+
+    def value(array, g, i, digits):
+        number = float(array[g, i])
+        return None if np.isnan(number) else round(number, digits)
+
+    rows = []
+    for g, (project_id, phase) in enumerate(plan.groups):
+        first = max((write_from[project_id] - series.start_date).days, 0)
+        for i in range(first, len(dates)):
+            rows.append({
+                "project_id": project_id,
+                "snapshot_date": dates[i],
+                "phase_code": phase,
+                "baseline_version": plan.versions[project_id],
+                "budget_at_completion": round(float(series.budget[g]), 2),
+                "planned_value": value(series.planned_value, g, i, 2),
+                "earned_value": value(series.earned_value, g, i, 2),
+                "actual_cost": value(series.actual_cost, g, i, 2),
+                "cost_performance_index": value(metrics["cost_performance_index"], g, i, 4),
+                "schedule_performance_index": value(metrics["schedule_performance_index"], g, i, 4),
+                "estimate_at_completion": value(metrics["estimate_at_completion"], g, i, 2),
+                "created_at": now,
+            })
+    return rows
+
+
+def _active_project_ids(conn: Connection, project_ids: Optional[Iterable[int]] = None) -> List[int]:
+    stmt = select(projects_table.c.id).order_by(projects_table.c.id)
+    if project_ids is None:
+        stmt = stmt.where(projects_table.c.status.in_(ACTIVE_PROJECT_STATUSES))
+    else:
+        stmt = stmt.where(projects_table.c.id.in_(list(project_ids)))
+    return conn.execute(stmt).scalars().all()
+
+
+def _last_snapshots(conn: Connection, project_ids: List[int]) -> Dict[int, Tuple[date, str]]:
+    """各项目最后一次快照的日期与基线版本"""
+    last = {}
+    for chunk in chunked(project_ids):
+        latest = (
+            select(snapshots_table.c.project_id, func.max(snapshots_table.c.snapshot_date).label("snapshot_date"))
+            .where(snapshots_table.c.project_id.in_(chunk))
+            .group_by(snapshots_table.c.project_id)
+            .subquery()
+        )
+        for row in conn.execute(
+            select(snapshots_table.c.project_id, snapshots_table.c.snapshot_date, snapshots_table.c.baseline_version)
+            .join(latest, (latest.c.project_id == snapshots_table.c.project_id)
+                  & (latest.c.snapshot_date == snapshots_table.c.snapshot_date))
+            .where(snapshots_table.c.phase_code == PROJECT_LEVEL)
+        ):
+            last[row.project_id] = (row.snapshot_date, row.baseline_version)
+    return last
+
+
+def _carry(conn: Connection, project_ids: List[int], snapshot_date: date) -> Dict[Tuple[int, str], Tuple[float, float]]:
+    """快照日的累计 AC / EV"""
+    carry = {}
+    for chunk in chunked(project_ids):
+        for row in conn.execute(
+            select(snapshots_table.c.project_id, snapshots_table.c.phase_code,
+                   snapshots_table.c.actual_cost, snapshots_table.c.earned_value)
+            .where(snapshots_table.c.project_id.in_(chunk))
+            .where(snapshots_table.c.snapshot_date == snapshot_date)
+        ):
+            carry[(row.project_id, row.phase_code)] = (float(row.actual_cost), float(row.earned_value))
+    return carry
+
+
+def snapshot_evm(
+    engine: Engine,
+    as_of: Optional[date] = None,
+    project_ids: Optional[Iterable[int]] = None,
+    rebuild: bool = False
+) -> EVMSnapshotReport:
+    """
+    追加挣值日快照至 as_of (默认今天)
+
+    Args:
+        project_ids: 只处理指定项目, 为空时处理全部在建项目
+        rebuild: 删除已有快照, 从基线计划开始日重新计算
+    """
+    as_of = as_of or date.today()
+    report = EVMSnapshotReport(as_of=as_of)
+
+    with engine.connect() as conn:
+        ids = _active_project_ids(conn, project_ids)
+
+    for batch in chunked(ids, PROJECT_BATCH_SIZE):
+        with engine.begin() as conn:
+            baselines = load_current_baselines(conn, batch)
+            report.skipped.extend(project_id for project_id in batch if project_id not in baselines)
+            if not baselines:
+                continue
+            if rebuild:
+                for chunk in chunked(baselines):
+                    conn.execute(delete(snapshots_table).where(snapshots_table.c.project_id.in_(chunk)))
+            last = _last_snapshots(conn, list(baselines))
+
+            # 上一次快照日相同、基线未变的项目一起增量计算; 其余项目从头累计
+            incremental: Dict[date, List[int]] = defaultdict(list)
+            full: Dict[int, date] = {}
+            for project_id, baseline in baselines.items():
+                snapshot = last.get(project_id)
+                if snapshot is None:
+                    full[project_id] = None
+                elif snapshot[0] < as_of:
+                    if snapshot[1] == baseline.version:
+                        incremental[snapshot[0]].append(project_id)
+                    else:
+                        full[project_id] = snapshot[0] + timedelta(days=1)
+
+            rows = []
+            for snapshot_date, group_ids in sorted(incremental.items()):
+                plan = _PlanIndex(conn, {project_id: baselines[project_id] for project_id in group_ids})
+                start = snapshot_date + timedelta(days=1)
+                series = _series(conn, plan, group_ids, start, as_of, after=snapshot_date,
+                                 carry=_carry(conn, group_ids, snapshot_date))
+                rows.extend(_snapshot_rows(plan, series, dict.fromkeys(group_ids, start)))
+                report.projects += len(group_ids)
+
+            if full:
+                plan = _PlanIndex(conn, {project_id: baselines[project_id] for project_id in full})
+                write_from = {
+                    project_id: start or plan.plan_start[project_id] for project_id, start in full.items()
+                }
+                writable = [project_id for project_id, start in write_from.items() if start <= as_of]
+                if writable:
+                    series = _series(conn, plan, list(full), min(write_from[p] for p in writable), as_of)
+                    rows.extend(_snapshot_rows(plan, series, write_from))
+                    report.projects += len(writable)
+
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                conn.execute(insert(snapshots_table), rows[start:start + INSERT_BATCH_SIZE])
+            report.rows_written += len(rows)
+
+    return report
+
+
+def _metrics_dict(series: EVMSeries, metrics: Dict[str, np.ndarray], g: int) -> Dict:
+    def value(array, digits):
+        number = float(array[g, -1])
+        return None if np.isnan(number) else round(number, digits)
+
+    bac = float(series.budget[g])
+    pv, ev, ac = (float(array[g, -1]) for array in
+                  (series.planned_value, series.earned_value, series.actual_cost))
+    return {
+        "budget_at_completion": round(bac, 1),
+        "planned_value": round(pv, 1),
+        "earned_value": round(ev, 1),
+        "actual_cost": round(ac, 1),
+        "cost_variance": round(ev - ac, 1),
+        "schedule_variance": round(ev - pv, 1),
+        "cost_performance_index": value(metrics["cost_performance_index"], 4),
+        "schedule_performance_index": value(metrics["schedule_performance_index"], 4),
+        "estimate_at_completion": value(metrics["estimate_at_completion"], 1),
+    }
+
+
+def portfolio_evm(conn: Connection, as_of: Optional[date] = None, include_phases: bool = False) -> Dict:
+    """
+    全部在建项目在 as_of (默认今天) 的挣值指标 (一次向量化计算)
+
+    没有当前基线的项目只计数, 不参与汇总。
+    """
+    as_of = as_of or date.today()
+    projects = {
+        row.id: row for row in conn.execute(
+            select(projects_table.c.id, projects_table.c.name, projects_table.c.code)
+            .where(projects_table.c.status.in_(ACTIVE_PROJECT_STATUSES))
+            .order_by(projects_table.c.id)
+        )
+    }
+    baselines = load_current_baselines(conn, projects)
+    plan = _PlanIndex(conn, baselines)
+    project_ids = sorted(baselines)
+    series = _series(conn, plan, project_ids, as_of, as_of) if project_ids else None
+
+    items = []
+    phases = defaultdict(list)
+    if series is not None:
+        metrics = series.metrics()
+        for g, (project_id, phase) in enumerate(plan.groups):
+            if phase != PROJECT_LEVEL:
+                if include_phases:
+                    phases[project_id].append({"phase_code": phase, **_metrics_dict(series, metrics, g)})
+                continue
+            row = projects[project_id]
+            items.append({
+                "project_id": project_id, "name": row.name, "code": row.code,
+                "baseline_version": plan.versions[project_id],
+                **_metrics_dict(series, metrics, g),
+            })
+        for item in items:
+            if include_phases:
+                item["phases"] = sorted(phases[item["project_id"]], key=lambda phase: phase["phase_code"])
+
+    totals = {
+        name: round(sum(item[name] for item in items), 1)
+        for name in ("budget_at_completion", "planned_value", "earned_value", "actual_cost")
+    }
+    totals["cost_performance_index"] = (
+        round(totals["earned_value"] / totals["actual_cost"], 4) if totals["actual_cost"] > 0 else None
+    )
+    totals["schedule_performance_index"] = (
+        round(totals["earned_value"] / totals["planned_value"], 4) if totals["planned_value"] > 0 else None
+    )
+    return {
+        "as_of": as_of.isoformat(),
+        "active_projects": len(projects),
+        "projects_without_baseline": len(projects) - len(baselines),
+        "totals": totals,
+        "projects": items,
+    }
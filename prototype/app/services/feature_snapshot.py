@@ -0,0 +1,51 @@
+"""
+共享特征快照发布作业
+Feature Snapshot Publishing Job
+
+从数据库加载已完成的历史项目, 构建特征矩阵与聚类后发布为新版本
+的共享特征快照 (见 app.core.feature_store)。API 工作进程在下一次
+检查时切换到新版本, 无需重启。
+"""
+
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from app.core.feature_store import DEFAULT_STORE_DIR, publish_snapshot
+from app.core.similarity import default_cluster_count
+from app.services.similar_projects import is_candidate, load_projects, to_historical
+
+
+# 快照目录, API 与发布作业共用
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR") or DEFAULT_STORE_DIR
+
+
+def publish_feature_snapshot(
+    engine: Engine,
+    store_dir: str = FEATURE_STORE_DIR,
+    n_clusters: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    发布历史项目特征快照
+
+    Args:
+        engine: 数据库引擎
+        store_dir: 快照目录
+        n_clusters: 聚类数, 为空时按项目数取默认值, 0 表示不聚类
+
+    Returns:
+        (版本号, 项目数)
+
+    Raises:
+        ValueError: 没有可用的历史项目
+    """
+    with engine.connect() as conn:
+        projects = [to_historical(row) for row in load_projects(conn) if is_candidate(row)]
+    if not projects:
+        raise ValueError("没有已完成且有实际工时的历史项目")
+
+    if n_clusters is None:
+        n_clusters = default_cluster_count(len(projects))
+    version = publish_snapshot(projects, store_dir, n_clusters=n_clusters or None)
+    return version, len(projects)
@@ -0,0 +1,235 @@
+"""
+完工预测作业
+Forecast at Completion Job
+
+对全部在建项目按周工时消耗序列预测完工日期与完工总工时 (见
+app.core.forecast), 写入 project_forecasts (每个项目每个预测日一行,
+重复运行覆盖同一预测日的结果)。
+
+- 周工时: 截至预测日最近 history_weeks 周未驳回的 timesheets 工时,
+  项目第一条工时记录之前的周不参与拟合
+- 实际工时: 截至预测日未驳回的工时合计
+- 剩余计划工时与效率系数: 叶子任务的 estimated_hours、
+  progress_percentage 与 actual_hours
+
+数据按项目分块查询, 计算对全部项目一次完成。
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.forecast import (
+    HORIZON_WEEKS, efficiency_factors, fit_burn_trend, forecast_completion, weekly_series
+)
+from app.database import chunked
+from app.models import ACTIVE_PROJECT_STATUSES, Project, ProjectForecast, Timesheet, WBSTask
+from app.services.statistics import is_leaf, non_rejected_timesheets
+
+
+# 参与趋势拟合的周数
+HISTORY_WEEKS = 12
+INSERT_BATCH_SIZE = 5000
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+forecasts_table = ProjectForecast.__table__
+
+
+@dataclass
+class ForecastReport:
+    """完工预测作业结果"""
+    as_of: date
+    projects: int = 0
+    rows_written: int = 0
+    # 预测期内无法完工 (近期没有工时消耗) 的项目
+    without_completion_date: List[int] = field(default_factory=list)
+
+
+def _burn_history(conn: Connection, project_ids: List[int], as_of: date, weeks: int):
+    """
+    各项目的周工时矩阵、可参与拟合的周与截至预测日的实际工时
+    """
+    index = {project_id: i for i, project_id in enumerate(project_ids)}
+    window_start = as_of - timedelta(days=7 * weeks - 1)
+    actual = np.zeros(len(project_ids))
+    first_days_ago = np.full(len(project_ids), -1)
+    projects, days_ago, hours = [], [], []
+
+    for chunk in chunked(project_ids):
+        def scoped(stmt):
+            return (
+                stmt.where(timesheets_table.c.project_id.in_(chunk))
+                .where(timesheets_table.c.work_date <= as_of)
+                .where(non_rejected_timesheets())
+            )
+
+        for row in conn.execute(scoped(
+            select(timesheets_table.c.project_id, func.sum(timesheets_table.c.hours).label("hours"),
+                   func.min(timesheets_table.c.work_date).label("first_date"))
+            .group_by(timesheets_table.c.project_id)
+        )):
+            i = index[row.project_id]
+            actual[i] = float(row.hours or 0)
+            first_days_ago[i] = (as_of - row.first_date).days
+
+        for row in conn.execute(scoped(
+            select(timesheets_table.c.project_id, timesheets_table.c.work_date,
+                   func.sum(timesheets_table.c.hours).label("hours"))
+            .where(timesheets_table.c.work_date >= window_start)
+            .group_by(timesheets_table.c.project_id, timesheets_table.c.work_date)
+        )):
+            projects.append(index[row.project_id])
+            days_ago.append((as_of - row.work_date).days)
+            hours.append(float(row.hours or 0))
+
+    series = weekly_series(
+        np.array(projects, dtype=np.int64), np.array(days_ago, dtype=np.int64),
+        np.array(hours, dtype=float), len(project_ids), weeks,
+    )
+    # 第一条工时记录所在周及之后的周参与拟合
+    first_column = weeks - 1 - first_days_ago // 7
+    valid = (first_days_ago[:, None] >= 0) & (np.arange(weeks) >= first_column[:, None])
+    return series, valid, actual
+
+
+def _leaf_tasks(conn: Connection, project_ids: List[int]):
+    """叶子任务的 (项目下标, 预估工时, 进度, 实际工时) 数组"""
+    index = {project_id: i for i, project_id in enumerate(project_ids)}
+    rows = []
+    for chunk in chunked(project_ids):
+        rows.extend(conn.execute(
+            select(tasks_table.c.project_id, tasks_table.c.estimated_hours,
+                   tasks_table.c.progress_percentage, tasks_table.c.actual_hours)
+            .where(tasks_table.c.project_id.in_(chunk))
+            .where(is_leaf())
+        ).all())
+    return (
+        np.array([index[row[0]] for row in rows], dtype=np.int64),
+        np.array([float(row[1] or 0) for row in rows], dtype=float),
+        np.clip(np.array([float(row[2] or 0) for row in rows], dtype=float), 0.0, 100.0),
+        np.array([float(row[3] or 0) for row in rows], dtype=float),
+    )
+
+
+def compute_forecasts(
+    conn: Connection,
+    project_ids: List[int],
+    as_of: date,
+    history_weeks: int = HISTORY_WEEKS
+) -> List[Dict]:
+    """各项目的完工预测 (与 project_forecasts 的列一致)"""
+    if not project_ids:
+        return []
+    projects = len(project_ids)
+    series, valid, actual = _burn_history(conn, project_ids, as_of, history_weeks)
+    trend = fit_burn_trend(series, valid)
+
+    group, estimated, progress, task_actual = _leaf_tasks(conn, project_ids)
+    factors = efficiency_factors(group, estimated * progress / 100, task_actual, projects)
+    remaining_plan = np.bincount(group, weights=estimated * (1 - progress / 100), minlength=projects)
+    remaining = remaining_plan * factors.central
+    remaining_low = remaining_plan * factors.low
+    remaining_high = remaining_plan * factors.high
+    completion = forecast_completion(trend, remaining, remaining_low, remaining_high)
+
+    def hours(values, i):
+        return round(float(values[i]), 2)
+
+    def completion_date(weeks, i):
+        if np.isnan(weeks[i]):
+            return None
+        return as_of + timedelta(days=int(np.ceil(weeks[i] * 7)))
+
+    now = datetime.now()
+    return [
+        {
+            "project_id": project_id,
+            "forecast_date": as_of,
+            "history_weeks": int(trend.weeks[i]),
+            "weekly_burn_rate": hours(trend.level, i),
+            "weekly_burn_trend": hours(trend.slope, i),
+            "efficiency_factor": round(float(factors.central[i]), 4),
+            "actual_hours": hours(actual, i),
+            "remaining_hours": hours(remaining, i),
+            "forecast_total_hours": hours(actual + remaining, i),
+            "total_hours_low": hours(actual + remaining_low, i),
+            "total_hours_high": hours(actual + remaining_high, i),
+            "forecast_completion_date": completion_date(completion.weeks, i),
+            "completion_date_low": completion_date(completion.weeks_low, i),
+            "completion_date_high": completion_date(completion.weeks_high, i),
+            "created_at": now,
+        }
+        for i, project_id in enumerate(project_ids)
+    ]
+
+
+def forecast_projects(
+    engine: Engine,
+    as_of: Optional[date] = None,
+    project_ids: Optional[Iterable[int]] = None,
+    history_weeks: int = HISTORY_WEEKS
+) -> ForecastReport:
+    """
+    预测在建项目的完工日期与完工总工时并写入 project_forecasts
+
+    Args:
+        as_of: 预测日 (默认今天), 只使用截至当天的工时
+        project_ids: 只处理指定项目, 为空时处理全部在建项目
+        history_weeks: 参与趋势拟合的周数
+    """
+    as_of = as_of or date.today()
+    report = ForecastReport(as_of=as_of)
+
+    with engine.begin() as conn:
+        stmt = select(projects_table.c.id).order_by(projects_table.c.id)
+        if project_ids is None:
+            stmt = stmt.where(projects_table.c.status.in_(ACTIVE_PROJECT_STATUSES))
+        else:
+            stmt = stmt.where(projects_table.c.id.in_(list(project_ids)))
+        ids = conn.execute(stmt).scalars().all()
+
+        rows = compute_forecasts(conn, ids, as_of, history_weeks)
+        for chunk in chunked(ids):
+            conn.execute(
+                delete(forecasts_table)
+                .where(forecasts_table.c.project_id.in_(chunk))
+                .where(forecasts_table.c.forecast_date == as_of)
+            )
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            conn.execute(insert(forecasts_table), rows[start:start + INSERT_BATCH_SIZE])
+
+    report.projects = len(ids)
+    report.rows_written = len(rows)
+    report.without_completion_date = [
+        row["project_id"] for row in rows if row["forecast_completion_date"] is None
+    ]
+    return report
+
+
+def latest_forecast(engine: Engine, project_id: int) -> Optional[Dict]:
+    """项目最近一次的完工预测, 没有预测时返回 None"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(forecasts_table)
+            .where(forecasts_table.c.project_id == project_id)
+            .order_by(forecasts_table.c.forecast_date.desc())
+            .limit(1)
+        ).mappings().first()
+    if row is None:
+        return None
+
+    forecast = {}
+    for name, value in row.items():
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, int):
+            value = float(value)
+        forecast[name] = value
+    forecast["horizon_weeks"] = HORIZON_WEEKS
+    return forecast
@@ -0,0 +1,67 @@
+"""
+机器学习模型离线训练
+ML Estimator Training Job
+
+从已完成项目训练 MLEstimator, 模型文件按版本保存到模型目录
+(ml_estimator_v{N}.pkl), 同时在 estimation_models 登记版本、算法与
+验证集指标。API 启动时从模型目录加载 (见 app.main)。
+"""
+
+import os
+
+from sqlalchemy.engine import Engine
+
+from app.core.ml_estimator import MLEstimator, artifact_name
+from app.models import EstimationModel
+from app.services.baseline_calibration import load_completed_projects, next_model_version
+
+
+MODEL_NAME = "ml_estimator"
+# 模型文件目录, API 与训练作业共用
+DEFAULT_MODEL_DIR = os.environ.get("ML_MODEL_DIR", "./models")
+
+models_table = EstimationModel.__table__
+
+
+def train_ml_estimator(
+    engine: Engine,
+    model_dir: str = DEFAULT_MODEL_DIR,
+    algorithm: str = "gbm",
+    random_state: int = 42
+) -> MLEstimator:
+    """
+    训练新版本的机器学习评估模型并保存
+
+    Args:
+        engine: 数据库引擎
+        model_dir: 模型文件目录
+        algorithm: gbm (梯度提升) 或 rf (随机森林)
+        random_state: 随机种子
+    """
+    with engine.begin() as conn:
+        projects = [
+            {**row._mapping, "actual_hours": float(row.actual_hours)} for row in load_completed_projects(conn)
+        ]
+        version = next_model_version(conn, MODEL_NAME)
+        estimator = MLEstimator.train(projects, algorithm=algorithm, version=version, random_state=random_state)
+
+        os.makedirs(model_dir, exist_ok=True)
+        estimator.save(os.path.join(model_dir, artifact_name(version)))
+
+        conn.execute(models_table.insert().values(
+            model_name=MODEL_NAME,
+            model_version=version,
+            model_type=algorithm,
+            r2_score=max(estimator.metrics["r2_score"], -9.9999),
+            mae=estimator.metrics["mae"],
+            adjustment_rules={
+                "artifact": artifact_name(version),
+                "samples": estimator.samples,
+                "feature_importance": estimator.feature_importance(),
+            },
+            status="active",
+            is_default=False,
+        ))
+
+    return estimator
+
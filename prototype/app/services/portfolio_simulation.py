@@ -0,0 +1,96 @@
+"""
+在建项目组合模拟作业
+Active Portfolio Simulation Job
+
+加载所有在建项目 (规划、已批准、进行中), 用当前默认定额 (有校准版本
+时使用校准定额) 逐个评估得到任务级三点估算, 再做组合蒙特卡洛模拟
+(见 app.core.portfolio)。
+
+项目时薪取项目成员时薪按投入比例的加权平均, 没有成员或成员未设置
+时薪时使用默认时薪。
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.estimator import WorkloadEstimator
+from app.core.portfolio import (
+    DEFAULT_SAMPLES, PortfolioProject, PortfolioResult, simulate_portfolio
+)
+from app.models import ACTIVE_PROJECT_STATUSES, Project, ProjectMember, User
+from app.services.baseline_calibration import load_calibrated_baseline
+from app.services.projects import project_info
+
+
+projects_table = Project.__table__
+members_table = ProjectMember.__table__
+users_table = User.__table__
+
+
+def _hourly_rates(conn: Connection, project_ids: List[int]) -> Dict[int, float]:
+    """各项目成员时薪按投入比例的加权平均"""
+    allocation = func.coalesce(members_table.c.allocation_percentage, 100)
+    rows = conn.execute(
+        select(
+            members_table.c.project_id,
+            func.sum(users_table.c.hourly_rate * allocation).label("weighted"),
+            func.sum(allocation).label("allocation"),
+        )
+        .select_from(members_table.join(users_table, users_table.c.id == members_table.c.user_id))
+        .where(members_table.c.project_id.in_(project_ids))
+        .where(members_table.c.left_at.is_(None))
+        .where(users_table.c.hourly_rate.isnot(None))
+        .group_by(members_table.c.project_id)
+    )
+    return {row.project_id: float(row.weighted) / float(row.allocation) for row in rows if row.allocation}
+
+
+def load_active_portfolio(conn: Connection) -> List[PortfolioProject]:
+    """加载在建项目并逐个评估为任务级三点估算"""
+    rows = conn.execute(
+        select(projects_table)
+        .where(projects_table.c.status.in_(ACTIVE_PROJECT_STATUSES))
+        .order_by(projects_table.c.id)
+    ).fetchall()
+    if not rows:
+        return []
+
+    estimator = WorkloadEstimator(load_calibrated_baseline(conn))
+    rates = _hourly_rates(conn, [row.id for row in rows])
+    return [
+        PortfolioProject.from_estimation(
+            row.id, row.name, row.client_name,
+            estimator.estimate(project_info(row)),
+            hourly_rate=rates.get(row.id),
+        )
+        for row in rows
+    ]
+
+
+def simulate_active_portfolio(
+    engine: Engine,
+    samples: int = DEFAULT_SAMPLES,
+    correlations: Optional[Dict[str, float]] = None,
+    seed: Optional[int] = None,
+    workers: int = 1
+) -> PortfolioResult:
+    """
+    模拟所有在建项目的组合工时与成本
+
+    Args:
+        engine: 数据库引擎
+        samples: 抽样次数
+        correlations: 分组相关系数, 如 {"client": 0.3, "phase": 0.2}
+        seed: 随机种子
+        workers: 进程数
+
+    Raises:
+        ValueError: 没有在建项目或相关系数无效
+    """
+    with engine.connect() as conn:
+        projects = load_active_portfolio(conn)
+    if not projects:
+        raise ValueError("没有在建项目")
+    return simulate_portfolio(projects, samples, correlations, seed=seed, workers=workers)
@@ -0,0 +1,250 @@
+"""
+项目增删改查
+Project CRUD with Keyset Pagination
+
+列表按 (updated_at, id) 倒序做键集 (游标) 分页: 下一页条件为
+(updated_at, id) < 上一页最后一行, 由 idx_projects_updated 索引直接
+定位, 翻到第几页、表有多大都只读取 limit 行, 不使用 OFFSET。
+过滤条件 (status, project_type, client_type) 对应 idx_projects_composite;
+该索引及 idx_projects_status / idx_projects_type 都在过滤列之后接
+(updated_at, id), 按状态、类型或三者同时过滤时分页同样是索引范围扫描。
+
+游标中保存数据库中 updated_at 的原值 (不经日期类型转换), 避免 SQLite
+中不同精度的时间字符串在比较时错位。
+
+支持稀疏字段 (fields), 只查询并返回请求的列。项目写入后在同一事务内
+刷新项目统计, 分析接口的缓存随之失效。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import String, and_, delete, func, insert, or_, select, type_coerce, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.core.estimator import ProjectInfo
+from app.models import Project, Timesheet, WBSTask
+from app.services.statistics import (
+    apply_weekly_hours, non_rejected_timesheets, refresh_project_statistics, refresh_statistics
+)
+
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+
+PROJECT_FIELDS = tuple(column.name for column in projects_table.columns)
+# 创建/修改时可写的字段
+WRITABLE_FIELDS = tuple(
+    name for name in PROJECT_FIELDS if name not in ("id", "created_at", "updated_at")
+)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 游标使用的 updated_at 原值
+_cursor_timestamp = type_coerce(projects_table.c.updated_at, String).label("_cursor_updated_at")
+
+
+class ProjectConflictError(ValueError):
+    """项目编码重复等约束冲突"""
+
+
+def project_info(row) -> ProjectInfo:
+    """projects 行转换为评估参数 (评估、校准、组合模拟与WBS生成共用)"""
+    return ProjectInfo(
+        name=row.name,
+        project_type=row.project_type,
+        client_type=row.client_type or "",
+        data_sources_count=row.data_sources_count or 0,
+        interface_tables_count=row.interface_tables_count or 0,
+        reports_count=row.reports_count or 0,
+        custom_requirements_count=row.custom_requirements_count or 0,
+        data_volume_level=row.data_volume_level or "medium",
+        regulation_type=row.regulation_type,
+    )
+
+
+def parse_fields(fields: Optional[Sequence[str]]) -> List[str]:
+    """
+    校验稀疏字段列表, 为空时返回全部字段 (id 总是返回)
+
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if not fields:
+        return list(PROJECT_FIELDS)
+    unknown = [name for name in fields if name not in PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"未知的项目字段: {unknown}")
+    return ["id"] + [name for name in dict.fromkeys(fields) if name != "id"]
+
+
+def encode_cursor(updated_at: str, project_id: int) -> str:
+    """生成不透明的分页游标"""
+    raw = json.dumps([updated_at, project_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    解析分页游标
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(updated_at, str) or not isinstance(project_id, int):
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"无效的分页游标: {cursor!r}")
+    return updated_at, project_id
+
+
+def list_projects(
+    engine: Engine,
+    status: Optional[str] = None,
+    project_type: Optional[str] = None,
+    client_type: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Dict:
+    """
+    按 (updated_at, id) 倒序分页查询项目
+
+    Returns:
+        {"projects": [...], "next_cursor": 下一页游标, 没有下一页时为 None}
+
+    Raises:
+        ValueError: 字段或游标无效
+    """
+    columns = parse_fields(fields)
+    stmt = select(*(projects_table.c[name] for name in columns), _cursor_timestamp)
+    if status is not None:
+        stmt = stmt.where(projects_table.c.status == status)
+    if project_type is not None:
+        stmt = stmt.where(projects_table.c.project_type == project_type)
+    if client_type is not None:
+        stmt = stmt.where(projects_table.c.client_type == client_type)
+    if cursor is not None:
+        updated_at, project_id = decode_cursor(cursor)
+        after = type_coerce(updated_at, String)
+        stmt = stmt.where(or_(
+            projects_table.c.updated_at < after,
+            and_(projects_table.c.updated_at == after, projects_table.c.id < project_id),
+        ))
+    stmt = stmt.order_by(projects_table.c.updated_at.desc(), projects_table.c.id.desc()).limit(limit + 1)
+
+    with engine.connect() as conn:
+        rows = conn.execute(stmt).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(str(last._cursor_updated_at), last.id)
+    return {
+        "projects": [{name: getattr(row, name) for name in columns} for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def _fetch(conn: Connection, project_id: int, columns: Sequence[str]) -> Optional[Dict]:
+    row = conn.execute(
+        select(*(projects_table.c[name] for name in columns)).where(projects_table.c.id == project_id)
+    ).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def get_project(engine: Engine, project_id: int, fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+    """查询单个项目, 不存在时返回 None"""
+    columns = parse_fields(fields)
+    with engine.connect() as conn:
+        return _fetch(conn, project_id, columns)
+
+
+def _writable(values: Dict) -> Dict:
+    unknown = [name for name in values if name not in WRITABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"不可写的项目字段: {unknown}")
+    return dict(values)
+
+
+def create_project(engine: Engine, values: Dict) -> Dict:
+    """
+    创建项目
+
+    Raises:
+        ValueError: 包含不可写字段
+        ProjectConflictError: 项目编码重复或违反其他约束
+    """
+    values = _writable(values)
+    now = datetime.now()
+    try:
+        with engine.begin() as conn:
+            project_id = conn.execute(
+                insert(projects_table).values(**values, created_at=now, updated_at=now)
+                .returning(projects_table.c.id)
+            ).scalar_one()
+            refresh_project_statistics(conn, [project_id])
+            return _fetch(conn, project_id, PROJECT_FIELDS)
+    except IntegrityError as e:
+        raise ProjectConflictError(f"项目数据违反约束: {e.orig}")
+
+
+def update_project(engine: Engine, project_id: int, values: Dict) -> Optional[Dict]:
+    """
+    修改项目 (只更新给出的字段), 项目不存在时返回 None
+
+    Raises:
+        ValueError: 包含不可写字段
+        ProjectConflictError: 项目编码重复或违反其他约束
+    """
+    values = _writable(values)
+    try:
+        with engine.begin() as conn:
+            updated = conn.execute(
+                update(projects_table).where(projects_table.c.id == project_id)
+                .values(**values, updated_at=datetime.now())
+            ).rowcount
+            if not updated:
+                return None
+            refresh_project_statistics(conn, [project_id])
+            return _fetch(conn, project_id, PROJECT_FIELDS)
+    except IntegrityError as e:
+        raise ProjectConflictError(f"项目数据违反约束: {e.orig}")
+
+
+def delete_project(engine: Engine, project_id: int) -> bool:
+    """
+    删除项目, 返回项目是否存在
+
+    任务、工时等按外键级联删除; 级联删除前先从周工时汇总中扣除该项目的工时,
+    并刷新任务负责人的工作负荷。
+    """
+    with engine.begin() as conn:
+        timesheet_rows = [
+            dict(row._mapping) for row in conn.execute(
+                select(
+                    timesheets_table.c.user_id, timesheets_table.c.work_date,
+                    func.sum(timesheets_table.c.hours).label("hours"),
+                )
+                .where(timesheets_table.c.project_id == project_id)
+                .where(non_rejected_timesheets())
+                .group_by(timesheets_table.c.user_id, timesheets_table.c.work_date)
+            )
+        ]
+        assignees = set(conn.execute(
+            select(tasks_table.c.assignee_id).where(tasks_table.c.project_id == project_id).distinct()
+        ).scalars())
+
+        deleted = conn.execute(delete(projects_table).where(projects_table.c.id == project_id)).rowcount
+        if deleted:
+            if timesheet_rows:
+                apply_weekly_hours(conn, timesheet_rows, sign=-1)
+            refresh_statistics(conn, [project_id], assignees)
+    return bool(deleted)
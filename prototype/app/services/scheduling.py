@@ -0,0 +1,264 @@
+"""
+项目进度计算作业
+Project Scheduling Job
+
+加载项目的 WBS 任务与 task_dependencies, 用关键路径法 (见
+app.core.scheduler) 计算进度, 把计划开始/完成日期、总时差与是否关键
+任务批量回写 wbs_tasks (只写有变化的行)。
+
+只有叶子任务参与计算: 工期由预估工时按每天8小时换算, 里程碑工期为0;
+引用汇总任务的依赖经过汇总任务的0工期开始/完成节点 (见 _summary_network),
+不展开为叶子任务两两之间的依赖, 依赖数为 O(任务数 + 依赖数); 汇总任务
+的日期取下属叶子任务的最早开始与最晚完成, 总时差取其中最小值。
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.scheduler import (
+    ScheduleCycleError, critical_path_schedule, durations_from_hours, schedule_dates
+)
+from app.models import Project, TaskDependency, WBSTask
+
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+dependencies_table = TaskDependency.__table__
+
+TASK_COLUMNS = [
+    tasks_table.c.id,
+    tasks_table.c.parent_task_id,
+    tasks_table.c.estimated_hours,
+    tasks_table.c.is_milestone,
+    tasks_table.c.planned_start_date,
+    tasks_table.c.planned_end_date,
+    tasks_table.c.total_float_days,
+    tasks_table.c.is_critical,
+]
+
+# 汇总任务的0工期节点
+START, FINISH, FINISH_GATE = "start", "finish", "finish_gate"
+# 以前置任务完成为前提 / 约束后续任务开始的依赖类型
+FROM_FINISH = ("FS", "FF")
+TO_START = ("FS", "SS")
+
+
+@dataclass
+class ProjectSchedule:
+    """项目进度计算结果"""
+    project_id: int
+    start_date: date
+    finish_date: Optional[date]
+    duration_days: int
+    tasks: int
+    dependencies: int
+    critical_path: List[int] = field(default_factory=list)
+    rows_written: int = 0
+
+
+def _with_descendants(children: Dict[int, List[int]], summary_ids) -> Set[int]:
+    """汇总任务及其下的全部汇总任务"""
+    result, stack = set(), list(summary_ids)
+    while stack:
+        node = stack.pop()
+        if node not in result:
+            result.add(node)
+            stack.extend(child for child in children[node] if child in children)
+    return result
+
+
+def _summary_network(children: Dict[int, List[int]], dependencies: Sequence[Tuple[int, int, str, int]]):
+    """
+    把引用汇总任务的依赖接到汇总任务的0工期节点上
+
+    汇总任务 X 的节点:
+    - (START, X): 约束 X 开始的依赖 (FS/SS) 指向它, 以 X 开始为前提的依赖
+      (SS/SF) 从它出发; 它以 SS 指向各下级
+    - (FINISH, X): 各下级以 FS 指向它, 以 X 完成为前提的依赖 (FS/FF) 从它出发
+    - (FINISH_GATE, X): 约束 X 完成的依赖 (FF/SF) 指向它; 它以 FF 指向各下级
+    下级为汇总任务时连到下级对应的节点, 每个任务只与上级相连。
+
+    Returns:
+        (汇总节点, 前置, 后续, 类型, 滞后)
+    """
+    referenced = {task_id for pred_id, succ_id, _, _ in dependencies for task_id in (pred_id, succ_id)}
+    gated = {succ_id for _, succ_id, dependency_type, _ in dependencies
+             if succ_id in children and dependency_type not in TO_START}
+    summaries = _with_descendants(children, referenced & children.keys())
+    gated = _with_descendants(children, gated)
+
+    nodes = [(kind, task_id) for task_id in sorted(summaries) for kind in (START, FINISH)]
+    nodes.extend((FINISH_GATE, task_id) for task_id in sorted(gated))
+    pred_ids, succ_ids, types, lags = [], [], [], []
+
+    def link(pred, succ, dependency_type, lag=0):
+        pred_ids.append(pred)
+        succ_ids.append(succ)
+        types.append(dependency_type)
+        lags.append(lag)
+
+    for task_id in summaries:
+        for child in children[task_id]:
+            nested = child in children
+            link((START, task_id), (START, child) if nested else child, "SS")
+            link((FINISH, child) if nested else child, (FINISH, task_id), "FS")
+            if task_id in gated:
+                link((FINISH_GATE, task_id), (FINISH_GATE, child) if nested else child, "SS" if nested else "FF")
+
+    for pred_id, succ_id, dependency_type, lag in dependencies:
+        if pred_id in children:
+            pred_id = (FINISH if dependency_type in FROM_FINISH else START, pred_id)
+        if succ_id in children:
+            succ_id = (START if dependency_type in TO_START else FINISH_GATE, succ_id)
+        link(pred_id, succ_id, dependency_type, lag)
+    return nodes, pred_ids, succ_ids, types, lags
+
+
+def _start_date(conn: Connection, project_id: int, rows: Sequence) -> date:
+    """进度起点: 项目计划开始日期, 否则任务中最早的计划开始日期, 否则今天"""
+    planned = conn.execute(
+        select(projects_table.c.planned_start_date).where(projects_table.c.id == project_id)
+    ).scalar()
+    if planned is not None:
+        return planned
+    starts = [row.planned_start_date for row in rows if row.planned_start_date is not None]
+    return min(starts) if starts else date.today()
+
+
+def schedule_project(
+    engine: Engine,
+    project_id: int,
+    start_date: Optional[date] = None,
+    holidays: Sequence[date] = (),
+    write: bool = True
+) -> ProjectSchedule:
+    """
+    计算项目进度并回写 wbs_tasks
+
+    Args:
+        engine: 数据库引擎
+        project_id: 项目ID
+        start_date: 进度起点, 为空时取项目计划开始日期
+        holidays: 节假日 (不计为工作日)
+        write: 是否回写数据库
+
+    Raises:
+        ValueError: 项目没有任务或依赖无效
+        ScheduleCycleError: 依赖存在循环
+    """
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(*TASK_COLUMNS).where(tasks_table.c.project_id == project_id).order_by(tasks_table.c.id)
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"项目没有WBS任务: {project_id}")
+        predecessor = tasks_table.alias("predecessor")
+        dependencies = conn.execute(
+            select(
+                dependencies_table.c.predecessor_task_id,
+                dependencies_table.c.successor_task_id,
+                dependencies_table.c.dependency_type,
+                dependencies_table.c.lag_days,
+            )
+            .select_from(dependencies_table.join(
+                predecessor, predecessor.c.id == dependencies_table.c.predecessor_task_id
+            ))
+            .where(predecessor.c.project_id == project_id)
+        ).fetchall()
+        start_date = start_date or _start_date(conn, project_id, rows)
+
+        children: Dict[int, List[int]] = defaultdict(list)
+        for row in rows:
+            if row.parent_task_id is not None:
+                children[row.parent_task_id].append(row.id)
+        leaves = [row for row in rows if row.id not in children]
+
+        # 跨项目的依赖不参与计算
+        task_ids = {row.id for row in rows}
+        dependencies = [
+            (pred_id, succ_id, dependency_type or "FS", lag or 0)
+            for pred_id, succ_id, dependency_type, lag in dependencies if succ_id in task_ids
+        ]
+        nodes, pred_ids, succ_ids, types, lags = _summary_network(children, dependencies)
+
+        try:
+            result = critical_path_schedule(
+                [row.id for row in leaves] + nodes,
+                np.concatenate([
+                    durations_from_hours(
+                        [row.estimated_hours for row in leaves], [bool(row.is_milestone) for row in leaves]
+                    ),
+                    np.zeros(len(nodes), dtype=np.int64),
+                ]),
+                pred_ids, succ_ids, types, lags
+            )
+        except ScheduleCycleError as e:
+            # 环上的汇总节点报为汇总任务本身
+            cycle = [node[1] if isinstance(node, tuple) else node for node in e.cycle]
+            raise ScheduleCycleError([
+                task_id for i, task_id in enumerate(cycle) if i == 0 or task_id != cycle[i - 1]
+            ]) from None
+        starts, finishes = schedule_dates(result, start_date, holidays)
+        values = {
+            task_id: (start, finish, total_float)
+            for task_id, start, finish, total_float in zip(
+                result.task_ids, starts.tolist(), finishes.tolist(), result.total_float.tolist()
+            )
+            if not isinstance(task_id, tuple)
+        }
+
+        # 汇总任务自下而上取下属任务的日期范围与最小时差
+        order, stack = [], [row.id for row in rows if row.parent_task_id not in task_ids]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(children.get(node, ()))
+        for node in reversed(order):
+            if node in children:
+                items = [values[child] for child in children[node] if child in values]
+                if items:
+                    values[node] = (
+                        min(item[0] for item in items),
+                        max(item[1] for item in items),
+                        min(item[2] for item in items),
+                    )
+
+        changed = []
+        for row in rows:
+            if row.id not in values:
+                continue
+            start, finish, total_float = values[row.id]
+            critical = total_float <= 0
+            if (row.planned_start_date, row.planned_end_date, row.total_float_days, row.is_critical) != \
+                    (start, finish, total_float, critical):
+                changed.append({
+                    "task_id": row.id, "start": start, "finish": finish,
+                    "total_float": total_float, "critical": critical,
+                })
+        if write and changed:
+            conn.execute(
+                update(tasks_table).where(tasks_table.c.id == bindparam("task_id")).values(
+                    planned_start_date=bindparam("start"),
+                    planned_end_date=bindparam("finish"),
+                    total_float_days=bindparam("total_float"),
+                    is_critical=bindparam("critical"),
+                ),
+                changed
+            )
+
+    return ProjectSchedule(
+        project_id=project_id,
+        start_date=start_date,
+        finish_date=max(finish for _, finish, _ in values.values()) if values else None,
+        duration_days=result.project_duration,
+        tasks=len(leaves),
+        dependencies=len(dependencies),
+        critical_path=[task_id for task_id in result.critical_path if not isinstance(task_id, tuple)],
+        rows_written=len(changed) if write else 0,
+    )
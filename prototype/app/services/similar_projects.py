@@ -0,0 +1,282 @@
+"""
+相似项目离线预计算
+Batch Precomputation of similar_projects
+
+按 project_type 分块, 每块内用向量化相似度矩阵为所有项目求Top-K
+已完成的历史项目, 结果批量写入 similar_projects。API可直接读取
+预计算结果, 无需逐请求实时匹配。
+
+单个项目变更时只重算受影响的目标项目:
+- 变更项目自身的Top-K列表
+- 列表中引用了变更项目的目标 (其得分可能下降或项目类型已改变)
+- 同类型中, 变更项目的新得分足以进入其Top-K的目标
+
+项目删除时其相关记录由外键 ON DELETE CASCADE 清理。
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.similarity import HistoricalProject, ProjectSimilarityMatcher
+from app.database import chunked, upsert_rows
+from app.models import Project, SimilarProject
+
+
+DEFAULT_TOP_K = 5
+# 每次计算的相似度矩阵元素数上限 (目标数 × 候选数), 控制内存占用
+MATRIX_CELLS_PER_CHUNK = 2_000_000
+
+projects_table = Project.__table__
+similar_table = SimilarProject.__table__
+
+PROJECT_COLUMNS = [
+    projects_table.c.id,
+    projects_table.c.name,
+    projects_table.c.project_type,
+    projects_table.c.client_type,
+    projects_table.c.data_sources_count,
+    projects_table.c.interface_tables_count,
+    projects_table.c.reports_count,
+    projects_table.c.custom_requirements_count,
+    projects_table.c.complexity_score,
+    projects_table.c.actual_hours,
+    projects_table.c.variance_percentage,
+    projects_table.c.status,
+]
+
+
+@dataclass
+class SimilarityJobReport:
+    """预计算作业结果统计"""
+    targets: int = 0
+    blocks: int = 0
+    rows_written: int = 0
+
+
+def is_candidate(row) -> bool:
+    """已完成且有实际工时的项目才可作为历史参考"""
+    return row.status == "completed" and row.actual_hours is not None
+
+
+def to_historical(row) -> HistoricalProject:
+    """项目特征行转为相似度匹配使用的历史项目"""
+    return HistoricalProject(
+        id=row.id,
+        name=row.name,
+        project_type=row.project_type,
+        client_type=row.client_type,
+        data_sources_count=row.data_sources_count or 0,
+        interface_tables_count=row.interface_tables_count or 0,
+        reports_count=row.reports_count or 0,
+        custom_requirements_count=row.custom_requirements_count or 0,
+        complexity_score=float(row.complexity_score) if row.complexity_score is not None else 5.0,
+        actual_hours=float(row.actual_hours or 0),
+        variance_percentage=float(row.variance_percentage or 0)
+    )
+
+
+def _to_target(row) -> Dict:
+    target = {
+        "project_type": row.project_type,
+        "client_type": row.client_type,
+        "data_sources_count": row.data_sources_count or 0,
+        "interface_tables_count": row.interface_tables_count or 0,
+        "reports_count": row.reports_count or 0,
+        "custom_requirements_count": row.custom_requirements_count or 0,
+    }
+    if row.complexity_score is not None:
+        target["complexity_score"] = float(row.complexity_score)
+    return target
+
+
+def load_projects(conn: Connection, project_ids: Optional[Iterable[int]] = None,
+                   project_types: Optional[Iterable[str]] = None) -> List:
+    """按ID或项目类型加载项目特征行"""
+    stmt = select(*PROJECT_COLUMNS)
+    if project_ids is not None:
+        rows = []
+        for chunk in chunked(set(project_ids)):
+            rows.extend(conn.execute(stmt.where(projects_table.c.id.in_(chunk))))
+        return rows
+    if project_types is not None:
+        stmt = stmt.where(projects_table.c.project_type.in_(list(project_types)))
+    return list(conn.execute(stmt.order_by(projects_table.c.id)))
+
+
+def _write_block(
+    conn: Connection,
+    targets: Sequence,
+    candidates: Sequence,
+    top_k: int,
+    method: str,
+    run_at: datetime
+) -> int:
+    """计算一个项目类型块内目标项目的Top-K并写入, 返回写入行数"""
+    rows_written = 0
+    matcher = ProjectSimilarityMatcher([to_historical(row) for row in candidates]) if candidates else None
+    chunk_size = max(1, MATRIX_CELLS_PER_CHUNK // max(len(candidates), 1))
+
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start:start + chunk_size]
+        target_ids = [row.id for row in chunk]
+        records = []
+
+        if matcher is not None:
+            indices, scores = matcher.top_k_matrix(
+                [_to_target(row) for row in chunk], top_k=top_k, method=method, target_ids=target_ids
+            )
+            for i, target_id in enumerate(target_ids):
+                for j, idx in enumerate(indices[i]):
+                    if idx < 0:
+                        continue
+                    records.append({
+                        "target_project_id": target_id,
+                        "similar_project_id": candidates[idx].id,
+                        "similarity_score": round(float(scores["total"][i, j]), 4),
+                        "categorical_similarity": round(float(scores["categorical"][i, j]), 4),
+                        "scale_similarity": round(float(scores["scale"][i, j]), 4),
+                        "complexity_similarity": round(float(scores["complexity"][i, j]), 4),
+                        "matching_method": method,
+                        "matched_at": run_at,
+                    })
+
+        upsert_rows(conn, similar_table, records, ["target_project_id", "similar_project_id"])
+
+        # 本轮未写入 (已跌出Top-K) 的旧记录
+        conn.execute(delete(similar_table).where(and_(
+            similar_table.c.target_project_id.in_(target_ids),
+            or_(similar_table.c.matched_at.is_(None), similar_table.c.matched_at != run_at),
+        )))
+        rows_written += len(records)
+
+    return rows_written
+
+
+def _write_targets(conn: Connection, targets: Sequence, blocks: Dict[str, List],
+                   top_k: int, method: str) -> SimilarityJobReport:
+    """按项目类型分块写入目标项目的相似项目"""
+    report = SimilarityJobReport(targets=len(targets))
+    run_at = datetime.now()
+
+    targets_by_type: Dict[str, List] = defaultdict(list)
+    for row in targets:
+        targets_by_type[row.project_type].append(row)
+
+    for project_type, type_targets in targets_by_type.items():
+        candidates = [row for row in blocks.get(project_type, []) if is_candidate(row)]
+        report.rows_written += _write_block(conn, type_targets, candidates, top_k, method, run_at)
+        report.blocks += 1
+
+    return report
+
+
+def precompute_similar_projects(engine: Engine, top_k: int = DEFAULT_TOP_K,
+                                method: str = "hybrid") -> SimilarityJobReport:
+    """
+    为数据库中所有项目预计算Top-K相似历史项目
+
+    Args:
+        engine: 数据库引擎
+        top_k: 每个项目保留的相似项目数
+        method: 匹配方法 (hybrid, cosine, euclidean)
+    """
+    with engine.begin() as conn:
+        projects = load_projects(conn)
+        blocks: Dict[str, List] = defaultdict(list)
+        for row in projects:
+            blocks[row.project_type].append(row)
+        return _write_targets(conn, projects, blocks, top_k, method)
+
+
+def _affected_targets(conn: Connection, changed: Sequence, blocks: Dict[str, List],
+                      top_k: int, method: str) -> Set[int]:
+    """找出变更项目的新得分足以进入其Top-K列表的同类型目标"""
+    affected: Set[int] = set()
+    changed_by_type: Dict[str, List] = defaultdict(list)
+    for row in changed:
+        if is_candidate(row):
+            changed_by_type[row.project_type].append(row)
+
+    for project_type, new_candidates in changed_by_type.items():
+        targets = blocks.get(project_type, [])
+        if not targets:
+            continue
+        target_ids = np.array([row.id for row in targets], dtype=np.int64)
+
+        # 各目标当前列表的最低分与条数
+        floor = {}
+        for chunk in chunked(target_ids.tolist()):
+            for row in conn.execute(
+                select(
+                    similar_table.c.target_project_id,
+                    func.min(similar_table.c.similarity_score).label("min_score"),
+                    func.count().label("size"),
+                ).where(similar_table.c.target_project_id.in_(chunk))
+                .group_by(similar_table.c.target_project_id)
+            ):
+                floor[row.target_project_id] = (float(row.min_score), row.size)
+
+        matcher = ProjectSimilarityMatcher([to_historical(row) for row in new_candidates])
+        scores = np.round(matcher.score_matrix([_to_target(row) for row in targets], method)["total"], 4)
+        new_ids = np.array([row.id for row in new_candidates], dtype=np.int64)
+        scores = np.where(target_ids[:, None] == new_ids[None, :], -np.inf, scores)
+        best = scores.max(axis=1)
+
+        for target_id, score in zip(target_ids.tolist(), best.tolist()):
+            min_score, size = floor.get(target_id, (-np.inf, 0))
+            if size < top_k or score >= min_score:
+                affected.add(target_id)
+
+    return affected
+
+
+def refresh_similar_projects(engine: Engine, project_ids: Iterable[int],
+                             top_k: int = DEFAULT_TOP_K, method: str = "hybrid") -> SimilarityJobReport:
+    """
+    项目变更后增量更新 similar_projects, 只重算受影响的目标项目
+
+    Args:
+        engine: 数据库引擎
+        project_ids: 发生变更的项目ID
+        top_k: 每个项目保留的相似项目数
+        method: 匹配方法
+    """
+    project_ids = set(project_ids)
+    with engine.begin() as conn:
+        changed = load_projects(conn, project_ids=project_ids)
+
+        # 当前列表中引用了变更项目的目标
+        holders: Set[int] = set()
+        for chunk in chunked(project_ids):
+            holders.update(row[0] for row in conn.execute(
+                select(similar_table.c.target_project_id).where(similar_table.c.similar_project_id.in_(chunk))
+            ))
+        holder_rows = load_projects(conn, project_ids=holders)
+
+        block_types = {row.project_type for row in changed} | {row.project_type for row in holder_rows}
+        blocks: Dict[str, List] = defaultdict(list)
+        for row in load_projects(conn, project_types=block_types):
+            blocks[row.project_type].append(row)
+
+        affected = {row.id for row in changed} | holders
+        affected |= _affected_targets(conn, changed, blocks, top_k, method)
+
+        targets = [row for rows in blocks.values() for row in rows if row.id in affected]
+        return _write_targets(conn, targets, blocks, top_k, method)
+
+
+def load_similar_projects(conn: Connection, project_id: int, top_k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """读取预计算的相似项目 (走 idx_similar_composite 索引)"""
+    rows = conn.execute(
+        select(similar_table)
+        .where(similar_table.c.target_project_id == project_id)
+        .order_by(similar_table.c.similarity_score.desc(), similar_table.c.similar_project_id)
+        .limit(top_k)
+    )
+    return [dict(row._mapping) for row in rows]
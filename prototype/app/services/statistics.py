@@ -0,0 +1,483 @@
+"""
+项目统计汇总表维护
+Incrementally Maintained Project Statistics
+
+v_project_statistics / v_user_workload 视图每次查询都要全表聚合,
+这里改为由导入/更新路径按受影响的键增量刷新汇总表:
+
+- project_statistics: 按项目刷新 (任务数、工时、进度、团队规模)
+- user_workload: 按任务负责人刷新 (在办任务、剩余工时)
+- user_weekly_hours: 按 (用户, 周) 直接累加工时增量
+- project_monthly_costs: 按 (项目, 月) 直接累加工时与人工成本增量
+
+汇总表每次写入都在同一事务内把 summary_versions 中的版本号加1,
+查询缓存 (见 app.services.analytics) 据此判断失效。
+
+另提供全量重建与一致性校验, 供定期巡检或数据修复使用。
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import case, delete, distinct, exists, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import aliased
+
+from app.database import chunked, execute_chunked, upsert_rows
+from app.models import (
+    Project, ProjectMember, ProjectMonthlyCost, ProjectStatistics, SummaryVersion,
+    Timesheet, User, UserWeeklyHours, UserWorkload, WBSTask
+)
+
+
+# 一致性校验允许的数值误差 (汇总表按1位小数存储)
+COMPARE_TOLERANCE = 0.05
+
+tasks_table = WBSTask.__table__
+projects_table = Project.__table__
+members_table = ProjectMember.__table__
+timesheets_table = Timesheet.__table__
+users_table = User.__table__
+project_stats_table = ProjectStatistics.__table__
+user_workload_table = UserWorkload.__table__
+weekly_hours_table = UserWeeklyHours.__table__
+monthly_costs_table = ProjectMonthlyCost.__table__
+summary_versions_table = SummaryVersion.__table__
+
+# summary_versions 中统计汇总表的版本键
+SUMMARY_VERSION_KEY = "statistics"
+
+
+@dataclass
+class StatisticsMismatch:
+    """汇总表与实时聚合结果不一致的记录"""
+    table: str
+    key: Tuple
+    column: str
+    expected: Optional[float]
+    actual: Optional[float]
+
+
+def week_start_of(day: date) -> date:
+    """返回所在周的周一"""
+    return day - timedelta(days=day.weekday())
+
+
+def month_start_of(day: date) -> date:
+    """返回所在月的1日"""
+    return day.replace(day=1)
+
+
+def to_float(value) -> float:
+    """数据库数值 (Decimal/None) 转为 float, NULL 按0计"""
+    return float(value) if value is not None else 0.0
+
+
+# ============================================
+# 实时聚合 (刷新、重建与校验共用)
+# ============================================
+
+def is_leaf():
+    """任务没有下级任务 (叶子任务的条件, 各服务共用)"""
+    children = aliased(tasks_table)
+    return ~exists().where(children.c.parent_task_id == tasks_table.c.id)
+
+
+def non_rejected_timesheets():
+    """未被驳回的工时记录 (计入实际工时、统计与分析的条件, 各服务共用)"""
+    return or_(timesheets_table.c.status.is_(None), timesheets_table.c.status != "rejected")
+
+
+def compute_project_statistics(conn: Connection,
+                               project_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """
+    聚合项目统计
+
+    口径同 v_project_statistics, 但任务工时与团队规模分别聚合,
+    避免视图中 tasks × members 连接造成的工时重复累加。汇总任务的工时与
+    进度是下级任务的上卷值 (见 app.services.wbs_rollup), 任务数、预估工时
+    与进度只计叶子任务, 实际工时只计根任务。
+    """
+    if project_ids is not None:
+        project_ids = set(project_ids)
+
+    stats = {
+        row.id: {
+            "project_id": row.id,
+            "total_tasks": 0,
+            "completed_tasks": 0,
+            "total_estimated_hours": 0.0,
+            "total_actual_hours": 0.0,
+            "variance_percentage": 0.0,
+            "avg_progress": 0.0,
+            "team_size": 0,
+        }
+        for row in execute_chunked(conn, select(projects_table.c.id), projects_table.c.id, project_ids)
+    }
+
+    leaf = is_leaf()
+    task_stmt = select(
+        tasks_table.c.project_id,
+        func.count(case((leaf, tasks_table.c.id))).label("total_tasks"),
+        func.sum(case((leaf & (tasks_table.c.status == "completed"), 1), else_=0)).label("completed_tasks"),
+        func.sum(case((leaf, tasks_table.c.estimated_hours))).label("estimated"),
+        func.sum(case((tasks_table.c.parent_task_id.is_(None), tasks_table.c.actual_hours))).label("actual"),
+        func.avg(case((leaf, tasks_table.c.progress_percentage))).label("avg_progress"),
+    ).group_by(tasks_table.c.project_id)
+
+    for row in execute_chunked(conn, task_stmt, tasks_table.c.project_id, project_ids):
+        item = stats.get(row.project_id)
+        if item is None:
+            continue
+        estimated = to_float(row.estimated)
+        actual = to_float(row.actual)
+        item.update(
+            total_tasks=row.total_tasks,
+            completed_tasks=int(row.completed_tasks or 0),
+            total_estimated_hours=round(estimated, 1),
+            total_actual_hours=round(actual, 1),
+            variance_percentage=round((actual - estimated) / estimated * 100, 2) if estimated > 0 else 0.0,
+            avg_progress=round(to_float(row.avg_progress), 2),
+        )
+
+    member_stmt = select(
+        members_table.c.project_id,
+        func.count(distinct(members_table.c.user_id)).label("team_size"),
+    ).group_by(members_table.c.project_id)
+
+    for row in execute_chunked(conn, member_stmt, members_table.c.project_id, project_ids):
+        if row.project_id in stats:
+            stats[row.project_id]["team_size"] = row.team_size
+
+    return stats
+
+
+def compute_user_workload(conn: Connection,
+                          user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """聚合用户工作负荷 (未完成的叶子任务数、进行中任务数、剩余工时)"""
+    if user_ids is not None:
+        user_ids = set(user_ids)
+
+    workload = {
+        row.id: {"user_id": row.id, "assigned_tasks": 0, "active_tasks": 0, "remaining_hours": 0.0}
+        for row in execute_chunked(conn, select(users_table.c.id), users_table.c.id, user_ids)
+    }
+
+    task_stmt = select(
+        tasks_table.c.assignee_id,
+        func.count(tasks_table.c.id).label("assigned_tasks"),
+        func.sum(case((tasks_table.c.status == "in_progress", 1), else_=0)).label("active_tasks"),
+        func.sum(tasks_table.c.estimated_hours - func.coalesce(tasks_table.c.actual_hours, 0)).label("remaining"),
+    ).where(
+        or_(tasks_table.c.status.is_(None), tasks_table.c.status != "completed")
+    ).where(is_leaf()).group_by(tasks_table.c.assignee_id)
+
+    for row in execute_chunked(conn, task_stmt, tasks_table.c.assignee_id, user_ids):
+        item = workload.get(row.assignee_id)
+        if item is None:
+            continue
+        item.update(
+            assigned_tasks=row.assigned_tasks,
+            active_tasks=int(row.active_tasks or 0),
+            remaining_hours=round(to_float(row.remaining), 1),
+        )
+
+    return workload
+
+
+def compute_weekly_hours(conn: Connection,
+                         user_ids: Optional[Iterable[int]] = None) -> Dict[Tuple[int, date], float]:
+    """按 (用户, 周一) 汇总未被驳回的工时"""
+    stmt = select(
+        timesheets_table.c.user_id,
+        timesheets_table.c.work_date,
+        func.sum(timesheets_table.c.hours).label("hours"),
+    ).where(
+        non_rejected_timesheets()
+    ).group_by(timesheets_table.c.user_id, timesheets_table.c.work_date)
+
+    weekly: Dict[Tuple[int, date], float] = {}
+    for row in execute_chunked(conn, stmt, timesheets_table.c.user_id, user_ids):
+        if row.user_id is None:
+            continue
+        key = (row.user_id, week_start_of(row.work_date))
+        weekly[key] = weekly.get(key, 0.0) + to_float(row.hours)
+    return weekly
+
+
+def _user_rates(conn: Connection, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Decimal]:
+    """用户时薪 (未设置的按0计)"""
+    stmt = select(users_table.c.id, users_table.c.hourly_rate)
+    return {
+        row.id: row.hourly_rate or Decimal(0)
+        for row in execute_chunked(conn, stmt, users_table.c.id, user_ids)
+    }
+
+
+def compute_monthly_costs(conn: Connection) -> Dict[Tuple[int, date], Dict]:
+    """按 (项目, 月初) 汇总未被驳回的工时与人工成本"""
+    stmt = select(
+        timesheets_table.c.project_id,
+        timesheets_table.c.user_id,
+        timesheets_table.c.work_date,
+        func.sum(timesheets_table.c.hours).label("hours"),
+    ).where(
+        non_rejected_timesheets()
+    ).where(
+        timesheets_table.c.project_id.isnot(None)
+    ).group_by(timesheets_table.c.project_id, timesheets_table.c.user_id, timesheets_table.c.work_date)
+
+    rates = _user_rates(conn)
+    monthly: Dict[Tuple[int, date], Dict] = {}
+    for row in conn.execute(stmt):
+        key = (row.project_id, month_start_of(row.work_date))
+        item = monthly.setdefault(key, {"hours": 0.0, "labor_cost": 0.0})
+        hours = to_float(row.hours)
+        item["hours"] += hours
+        item["labor_cost"] += hours * to_float(rates.get(row.user_id))
+    return monthly
+
+
+# ============================================
+# 增量维护
+# ============================================
+
+def bump_summary_version(conn: Connection, name: str = SUMMARY_VERSION_KEY) -> None:
+    """汇总数据版本号加1 (与汇总表写入同一事务)"""
+    upsert_rows(
+        conn, summary_versions_table,
+        [{"name": name, "version": 1, "updated_at": datetime.now()}],
+        ["name"],
+        accumulate=["version"],
+    )
+
+
+def summary_version(conn: Connection, name: str = SUMMARY_VERSION_KEY) -> int:
+    """当前汇总数据版本号 (从未写入时为0)"""
+    version = conn.execute(
+        select(summary_versions_table.c.version).where(summary_versions_table.c.name == name)
+    ).scalar()
+    return version or 0
+
+
+def refresh_project_statistics(conn: Connection, project_ids: Iterable[int]) -> None:
+    """刷新指定项目的统计行; 已删除的项目同时删除其统计行"""
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    stats = compute_project_statistics(conn, project_ids)
+    now = datetime.now()
+    upsert_rows(conn, project_stats_table,
+                [dict(row, refreshed_at=now) for row in stats.values()], ["project_id"])
+    for chunk in chunked(project_ids - stats.keys()):
+        conn.execute(delete(project_stats_table).where(project_stats_table.c.project_id.in_(chunk)))
+    bump_summary_version(conn)
+
+
+def refresh_user_workload(conn: Connection, user_ids: Iterable[int]) -> None:
+    """刷新指定用户的工作负荷行"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    workload = compute_user_workload(conn, user_ids)
+    now = datetime.now()
+    upsert_rows(conn, user_workload_table,
+                [dict(row, refreshed_at=now) for row in workload.values()], ["user_id"])
+    bump_summary_version(conn)
+
+
+def apply_weekly_hours(conn: Connection, timesheet_rows: Iterable[Dict], sign: int = 1) -> None:
+    """
+    将新增 (sign=1) 或撤销 (sign=-1) 的工时记录累加到周工时汇总
+
+    Args:
+        timesheet_rows: 含 user_id, work_date, hours, status 的字典
+    """
+    deltas: Dict[Tuple[int, date], Decimal] = {}
+    for row in timesheet_rows:
+        if row.get("status") == "rejected" or row.get("user_id") is None:
+            continue
+        key = (row["user_id"], week_start_of(row["work_date"]))
+        deltas[key] = deltas.get(key, Decimal(0)) + Decimal(str(row["hours"])) * sign
+
+    upsert_rows(
+        conn, weekly_hours_table,
+        [{"user_id": user_id, "week_start": week, "hours": hours} for (user_id, week), hours in deltas.items()],
+        ["user_id", "week_start"],
+        accumulate=["hours"],
+    )
+    bump_summary_version(conn)
+
+
+def apply_monthly_costs(conn: Connection, timesheet_rows: Iterable[Dict], sign: int = 1) -> None:
+    """
+    将新增 (sign=1) 或撤销 (sign=-1) 的工时记录累加到项目月度成本汇总
+
+    Args:
+        timesheet_rows: 含 project_id, user_id, work_date, hours, status 的字典
+    """
+    rows = [
+        row for row in timesheet_rows
+        if row.get("status") != "rejected" and row.get("project_id") is not None
+    ]
+    rates = _user_rates(conn, {row["user_id"] for row in rows if row.get("user_id") is not None})
+    deltas: Dict[Tuple[int, date], List[Decimal]] = {}
+    for row in rows:
+        hours = Decimal(str(row["hours"])) * sign
+        item = deltas.setdefault((row["project_id"], month_start_of(row["work_date"])), [Decimal(0), Decimal(0)])
+        item[0] += hours
+        item[1] += hours * rates.get(row.get("user_id"), Decimal(0))
+
+    upsert_rows(
+        conn, monthly_costs_table,
+        [
+            {"project_id": project_id, "month_start": month, "hours": hours, "labor_cost": round(cost, 2)}
+            for (project_id, month), (hours, cost) in deltas.items()
+        ],
+        ["project_id", "month_start"],
+        accumulate=["hours", "labor_cost"],
+    )
+    bump_summary_version(conn)
+
+
+def task_assignees(conn: Connection, task_ids: Iterable[int]) -> Set[int]:
+    """查询任务负责人ID"""
+    stmt = select(tasks_table.c.assignee_id).where(tasks_table.c.assignee_id.isnot(None)).distinct()
+    return {row[0] for row in execute_chunked(conn, stmt, tasks_table.c.id, set(task_ids))}
+
+
+def refresh_statistics(conn: Connection, project_ids: Iterable[int] = (),
+                       user_ids: Iterable[int] = ()) -> None:
+    """更新路径统一入口: 刷新受影响项目与用户的汇总行"""
+    refresh_project_statistics(conn, project_ids)
+    refresh_user_workload(conn, user_ids)
+
+
+# ============================================
+# 查询
+# ============================================
+
+def load_user_workload(conn: Connection, user_ids: Sequence[int],
+                       today: Optional[date] = None) -> List[Dict]:
+    """读取用户工作负荷 (含本周工时), 每个用户只读取两行汇总数据"""
+    week = week_start_of(today or date.today())
+    workload = {row.user_id: dict(row._mapping) for row in execute_chunked(
+        conn, select(user_workload_table), user_workload_table.c.user_id, user_ids
+    )}
+    weekly = {row.user_id: row.hours for row in execute_chunked(
+        conn,
+        select(weekly_hours_table.c.user_id, weekly_hours_table.c.hours).where(weekly_hours_table.c.week_start == week),
+        weekly_hours_table.c.user_id,
+        user_ids,
+    )}
+    return [
+        dict(workload[user_id], this_week_hours=to_float(weekly.get(user_id)))
+        for user_id in user_ids if user_id in workload
+    ]
+
+
+# ============================================
+# 全量重建与一致性校验
+# ============================================
+
+def rebuild_statistics(engine: Engine) -> Dict[str, int]:
+    """在一个事务内全量重建所有汇总表"""
+    with engine.begin() as conn:
+        projects = compute_project_statistics(conn)
+        workload = compute_user_workload(conn)
+        weekly = compute_weekly_hours(conn)
+        monthly = compute_monthly_costs(conn)
+
+        conn.execute(delete(project_stats_table))
+        conn.execute(delete(user_workload_table))
+        conn.execute(delete(weekly_hours_table))
+        conn.execute(delete(monthly_costs_table))
+
+        now = datetime.now()
+        upsert_rows(conn, project_stats_table,
+                    [dict(row, refreshed_at=now) for row in projects.values()], ["project_id"])
+        upsert_rows(conn, user_workload_table,
+                    [dict(row, refreshed_at=now) for row in workload.values()], ["user_id"])
+        upsert_rows(conn, weekly_hours_table,
+                    [{"user_id": user_id, "week_start": week, "hours": round(hours, 2)}
+                     for (user_id, week), hours in weekly.items()],
+                    ["user_id", "week_start"])
+        upsert_rows(conn, monthly_costs_table,
+                    [{"project_id": project_id, "month_start": month,
+                      "hours": round(item["hours"], 2), "labor_cost": round(item["labor_cost"], 2)}
+                     for (project_id, month), item in monthly.items()],
+                    ["project_id", "month_start"])
+        bump_summary_version(conn)
+
+    return {
+        "project_statistics": len(projects),
+        "user_workload": len(workload),
+        "user_weekly_hours": len(weekly),
+        "project_monthly_costs": len(monthly),
+    }
+
+
+def _compare(table: str, expected: Dict, actual: Dict, columns: Sequence[str]) -> List[StatisticsMismatch]:
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        key_tuple = key if isinstance(key, tuple) else (key,)
+        if key not in actual or key not in expected:
+            mismatches.append(StatisticsMismatch(table, key_tuple, "*", None, None))
+            continue
+        for column in columns:
+            exp = to_float(expected[key][column])
+            act = to_float(actual[key][column])
+            if abs(exp - act) > COMPARE_TOLERANCE:
+                mismatches.append(StatisticsMismatch(table, key_tuple, column, exp, act))
+    return mismatches
+
+
+def check_statistics(engine: Engine) -> List[StatisticsMismatch]:
+    """
+    一致性校验: 对比汇总表与实时聚合结果
+
+    Returns:
+        不一致记录列表, 为空表示一致 (缺失或多余的行以 column="*" 表示)
+    """
+    with engine.connect() as conn:
+        project_columns = [
+            "total_tasks", "completed_tasks", "total_estimated_hours", "total_actual_hours",
+            "variance_percentage", "avg_progress", "team_size",
+        ]
+        mismatches = _compare(
+            "project_statistics",
+            compute_project_statistics(conn),
+            {row.project_id: dict(row._mapping) for row in conn.execute(select(project_stats_table))},
+            project_columns,
+        )
+
+        workload_columns = ["assigned_tasks", "active_tasks", "remaining_hours"]
+        mismatches += _compare(
+            "user_workload",
+            compute_user_workload(conn),
+            {row.user_id: dict(row._mapping) for row in conn.execute(select(user_workload_table))},
+            workload_columns,
+        )
+
+        # 周工时以增量累加, 零值行与缺失行等价
+        expected_weekly = {
+            key: {"hours": hours} for key, hours in compute_weekly_hours(conn).items() if hours != 0
+        }
+        actual_weekly = {
+            (row.user_id, row.week_start): {"hours": row.hours}
+            for row in conn.execute(select(weekly_hours_table))
+            if to_float(row.hours) != 0
+        }
+        mismatches += _compare("user_weekly_hours", expected_weekly, actual_weekly, ["hours"])
+
+        expected_monthly = {key: item for key, item in compute_monthly_costs(conn).items() if item["hours"] != 0}
+        actual_monthly = {
+            (row.project_id, row.month_start): {"hours": row.hours, "labor_cost": row.labor_cost}
+            for row in conn.execute(select(monthly_costs_table))
+            if to_float(row.hours) != 0
+        }
+        mismatches += _compare("project_monthly_costs", expected_monthly, actual_monthly, ["hours", "labor_cost"])
+
+    return mismatches
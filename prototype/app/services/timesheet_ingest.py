@@ -0,0 +1,286 @@
+"""
+工时批量导入
+Bulk Timesheet Ingestion
+
+流式读取HR导出的工时CSV, 校验后按批插入 timesheets,
+导入结束后对受影响的任务/项目各重算一次 actual_hours,
+避免逐行触发项目级汇总; 统计汇总表随导入同步增量维护。
+"""
+
+import csv
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import chunked
+from app.models import Project, Timesheet, User, WBSTask
+from app.services.statistics import (
+    apply_monthly_costs, apply_weekly_hours, non_rejected_timesheets, refresh_statistics, task_assignees
+)
+from app.services.wbs_rollup import apply_task_hours, refresh_rollups
+
+
+REQUIRED_COLUMNS = ("task_id", "user_id", "work_date", "hours")
+VALID_STATUSES = ("submitted", "approved", "rejected")
+
+DEFAULT_BATCH_SIZE = 5000
+# 报告中保留的错误明细条数上限
+MAX_REPORTED_ERRORS = 1000
+
+timesheets_table = Timesheet.__table__
+tasks_table = WBSTask.__table__
+projects_table = Project.__table__
+users_table = User.__table__
+
+
+@dataclass
+class IngestionReport:
+    """导入结果统计"""
+    rows_read: int = 0
+    rows_inserted: int = 0
+    rows_rejected: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # (行号, 原因)
+    task_ids: Set[int] = field(default_factory=set)
+    project_ids: Set[int] = field(default_factory=set)
+
+    def reject(self, line_no: int, reason: str) -> None:
+        """记录一条被拒绝的行"""
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, reason))
+
+
+def _parse_int(value: Optional[str], column: str, required: bool = True) -> Optional[int]:
+    value = (value or "").strip()
+    if not value:
+        if required:
+            raise ValueError(f"缺少字段 {column}")
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{column} 不是整数: {value!r}")
+
+
+def _parse_decimal(value: Optional[str], column: str, low: Decimal, high: Decimal,
+                   required: bool = True) -> Optional[Decimal]:
+    value = (value or "").strip()
+    if not value:
+        if required:
+            raise ValueError(f"缺少字段 {column}")
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{column} 不是数字: {value!r}")
+    if not low <= number <= high:
+        raise ValueError(f"{column} 超出范围 [{low}, {high}]: {value}")
+    return number
+
+
+def parse_timesheet_row(row: Dict[str, str]) -> Dict:
+    """
+    校验并转换一行CSV数据
+
+    规则与 schema.sql 中的 chk_hours / chk_progress 约束保持一致。
+
+    Raises:
+        ValueError: 数据不合法
+    """
+    work_date_raw = (row.get("work_date") or "").strip()
+    if not work_date_raw:
+        raise ValueError("缺少字段 work_date")
+    try:
+        work_date = date.fromisoformat(work_date_raw)
+    except ValueError:
+        raise ValueError(f"work_date 不是 YYYY-MM-DD 格式: {work_date_raw!r}")
+
+    status = (row.get("status") or "").strip() or "submitted"
+    if status not in VALID_STATUSES:
+        raise ValueError(f"status 必须是以下之一: {list(VALID_STATUSES)}")
+
+    return {
+        "task_id": _parse_int(row.get("task_id"), "task_id"),
+        "user_id": _parse_int(row.get("user_id"), "user_id"),
+        "project_id": _parse_int(row.get("project_id"), "project_id", required=False),
+        "work_date": work_date,
+        "hours": _parse_decimal(row.get("hours"), "hours", Decimal(0), Decimal(24)),
+        "description": (row.get("description") or "").strip() or None,
+        "work_category": (row.get("work_category") or "").strip() or None,
+        "task_progress_percentage": _parse_decimal(
+            row.get("task_progress_percentage"), "task_progress_percentage",
+            Decimal(0), Decimal(100), required=False
+        ),
+        "status": status,
+    }
+
+
+class ReferenceCache:
+    """任务/用户引用缓存, 每批只查询新出现的ID"""
+
+    def __init__(self):
+        self.task_projects: Dict[int, int] = {}
+        self.missing_tasks: Set[int] = set()
+        self.users: Set[int] = set()
+        self.missing_users: Set[int] = set()
+
+    def load(self, conn: Connection, task_ids: Set[int], user_ids: Set[int]) -> None:
+        new_tasks = task_ids - self.task_projects.keys() - self.missing_tasks
+        for chunk in chunked(new_tasks):
+            rows = conn.execute(
+                select(tasks_table.c.id, tasks_table.c.project_id).where(tasks_table.c.id.in_(chunk))
+            )
+            self.task_projects.update({row.id: row.project_id for row in rows})
+        self.missing_tasks |= new_tasks - self.task_projects.keys()
+
+        new_users = user_ids - self.users - self.missing_users
+        for chunk in chunked(new_users):
+            rows = conn.execute(select(users_table.c.id).where(users_table.c.id.in_(chunk)))
+            self.users.update(row.id for row in rows)
+        self.missing_users |= new_users - self.users
+
+
+def _flush_batch(engine: Engine, batch: List[Tuple[int, Dict]], cache: ReferenceCache,
+                 report: IngestionReport) -> None:
+    """校验引用关系后在一个事务内批量插入"""
+    with engine.begin() as conn:
+        cache.load(
+            conn,
+            {values["task_id"] for _, values in batch},
+            {values["user_id"] for _, values in batch},
+        )
+
+        valid_rows = []
+        for line_no, values in batch:
+            task_project = cache.task_projects.get(values["task_id"])
+            if task_project is None:
+                report.reject(line_no, f"任务不存在: {values['task_id']}")
+                continue
+            if values["user_id"] not in cache.users:
+                report.reject(line_no, f"用户不存在: {values['user_id']}")
+                continue
+            if values["project_id"] is None:
+                values["project_id"] = task_project
+            elif values["project_id"] != task_project:
+                report.reject(line_no, f"project_id 与任务所属项目不一致: {values['project_id']}")
+                continue
+            valid_rows.append(values)
+
+        if valid_rows:
+            conn.execute(insert(timesheets_table), valid_rows)
+            apply_weekly_hours(conn, valid_rows)
+            apply_monthly_costs(conn, valid_rows)
+
+    report.rows_inserted += len(valid_rows)
+    report.task_ids.update(row["task_id"] for row in valid_rows)
+    report.project_ids.update(row["project_id"] for row in valid_rows)
+
+
+def recompute_actual_hours(conn: Connection, task_ids: Iterable[int],
+                           project_ids: Iterable[int], full_rollup: bool = False) -> None:
+    """
+    重算指定任务与项目的实际工时
+
+    任务工时 = 未被驳回的工时记录之和, 汇总任务再上卷下级任务的工时;
+    项目工时 = 根任务实际工时之和 (项目表不再由触发器逐行维护)。
+
+    Args:
+        full_rollup: 对项目整棵任务树重新上卷 (WBS 结构变化后); 默认只沿
+            变化任务的祖先链增量更新 (工时写入与审批)
+    """
+    if full_rollup:
+        task_hours = (
+            select(func.coalesce(func.sum(timesheets_table.c.hours), 0))
+            .where(timesheets_table.c.task_id == tasks_table.c.id)
+            .where(non_rejected_timesheets())
+            .scalar_subquery()
+        )
+        for chunk in chunked(task_ids):
+            conn.execute(update(tasks_table).where(tasks_table.c.id.in_(chunk)).values(actual_hours=task_hours))
+        refresh_rollups(conn, project_ids)
+    else:
+        apply_task_hours(conn, task_ids)
+
+    project_hours = (
+        select(func.coalesce(func.sum(tasks_table.c.actual_hours), 0))
+        .where(tasks_table.c.project_id == projects_table.c.id)
+        .where(tasks_table.c.parent_task_id.is_(None))
+        .scalar_subquery()
+    )
+    for chunk in chunked(project_ids):
+        conn.execute(
+            update(projects_table).where(projects_table.c.id.in_(chunk)).values(actual_hours=project_hours)
+        )
+
+
+def ingest_timesheets(
+    rows: Iterable[Dict[str, str]],
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    first_line_no: int = 1
+) -> IngestionReport:
+    """
+    批量导入工时记录
+
+    Args:
+        rows: 字符串字典迭代器 (如 csv.DictReader)
+        engine: 数据库引擎
+        batch_size: 每批插入的行数
+        first_line_no: 第一条数据对应的行号, 用于错误定位
+
+    Returns:
+        导入结果统计
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size 必须大于0")
+
+    report = IngestionReport()
+    cache = ReferenceCache()
+    batch: List[Tuple[int, Dict]] = []
+
+    for line_no, row in enumerate(rows, start=first_line_no):
+        report.rows_read += 1
+        try:
+            batch.append((line_no, parse_timesheet_row(row)))
+        except ValueError as e:
+            report.reject(line_no, str(e))
+            continue
+
+        if len(batch) >= batch_size:
+            _flush_batch(engine, batch, cache, report)
+            batch = []
+
+    if batch:
+        _flush_batch(engine, batch, cache, report)
+
+    # 每个受影响的任务/项目只重算一次
+    if report.task_ids:
+        with engine.begin() as conn:
+            recompute_actual_hours(conn, report.task_ids, report.project_ids)
+            refresh_statistics(conn, report.project_ids, task_assignees(conn, report.task_ids))
+
+    return report
+
+
+def ingest_timesheets_csv(
+    csv_path: str,
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    encoding: str = "utf-8-sig"
+) -> IngestionReport:
+    """
+    从CSV文件流式导入工时记录
+
+    CSV需包含表头, 至少包括 task_id, user_id, work_date, hours 列。
+    """
+    with open(csv_path, "r", encoding=encoding, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV缺少必需列: {missing}")
+        # 表头占第1行, 数据从第2行开始
+        return ingest_timesheets(reader, engine, batch_size=batch_size, first_line_no=2)
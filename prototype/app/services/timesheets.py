@@ -0,0 +1,253 @@
+"""
+工时批量提交与审批
+Bulk Timesheet Submission & Review
+
+- 批量提交: 整批先按 chk_hours / chk_progress 规则与任务、用户引用校验,
+  任何一条不合法则整批拒绝; 全部合法时在一个事务内批量插入
+- 批量审批/驳回: 按ID列表或 (项目, 用户, 日期范围) 条件执行一条
+  UPDATE ... RETURNING, 不逐行往返
+
+写入与驳回的工时在同一事务内直接累加到汇总层 (周工时、项目月度成本),
+并对受影响的任务/项目各重算一次实际工时与统计, 不依赖逐行触发器。
+审批 (submitted -> approved) 不改变计入的工时, 汇总层无需更新。
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+
+from app.models import Timesheet
+from app.services.statistics import (
+    apply_monthly_costs, apply_weekly_hours, refresh_statistics, task_assignees
+)
+from app.services.timesheet_ingest import ReferenceCache, recompute_actual_hours
+
+
+REVIEW_ACTIONS = ("approve", "reject")
+# 各审批动作允许的原状态
+REVIEWABLE_STATUSES = {
+    "approve": ("submitted",),
+    "reject": ("submitted", "approved"),
+}
+# 单次请求的记录数上限
+MAX_BATCH_SIZE = 5000
+
+timesheets_table = Timesheet.__table__
+
+ENTRY_COLUMNS = (
+    "task_id", "user_id", "project_id", "work_date", "hours", "description",
+    "work_category", "task_progress_percentage", "issues_encountered",
+)
+
+
+class TimesheetValidationError(ValueError):
+    """批量提交的工时记录不合法 (整批未写入)"""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} 条工时记录不合法, 整批未写入")
+
+
+@dataclass
+class TimesheetBatchResult:
+    """批量写入或审批结果"""
+    count: int
+    ids: List[int] = field(default_factory=list)
+    task_ids: List[int] = field(default_factory=list)
+    project_ids: List[int] = field(default_factory=list)
+
+
+def validate_entry(entry: Dict) -> Dict:
+    """
+    校验单条工时记录的取值 (与 schema.sql 中 chk_hours / chk_progress 一致)
+
+    Raises:
+        ValueError: 数据不合法
+    """
+    values = {column: entry.get(column) for column in ENTRY_COLUMNS}
+    for column in ("task_id", "user_id", "work_date", "hours"):
+        if values[column] is None:
+            raise ValueError(f"缺少字段 {column}")
+    if not isinstance(values["work_date"], date):
+        raise ValueError(f"work_date 不是日期: {values['work_date']!r}")
+    values["hours"] = Decimal(str(values["hours"]))
+    if not Decimal(0) <= values["hours"] <= Decimal(24):
+        raise ValueError(f"hours 超出范围 [0, 24]: {values['hours']}")
+    progress = values["task_progress_percentage"]
+    if progress is not None:
+        values["task_progress_percentage"] = progress = Decimal(str(progress))
+        if not Decimal(0) <= progress <= Decimal(100):
+            raise ValueError(f"task_progress_percentage 超出范围 [0, 100]: {progress}")
+    values["status"] = "submitted"
+    return values
+
+
+def _apply_rollups(conn, rows: Sequence[Dict], sign: int) -> None:
+    """把写入 (sign=1) 或驳回 (sign=-1) 的工时推送到汇总层"""
+    apply_weekly_hours(conn, rows, sign=sign)
+    apply_monthly_costs(conn, rows, sign=sign)
+    task_ids = {row["task_id"] for row in rows if row["task_id"] is not None}
+    project_ids = {row["project_id"] for row in rows if row["project_id"] is not None}
+    recompute_actual_hours(conn, task_ids, project_ids)
+    refresh_statistics(conn, project_ids, task_assignees(conn, task_ids))
+
+
+def create_timesheets(engine: Engine, entries: Sequence[Dict]) -> TimesheetBatchResult:
+    """
+    批量提交工时记录 (全部成功或全部不写入)
+
+    Args:
+        entries: 含 task_id, user_id, work_date, hours 等字段的字典;
+            project_id 为空时取任务所属项目
+
+    Raises:
+        TimesheetValidationError: 存在不合法的记录, 附 (序号, 原因) 列表
+    """
+    if len(entries) > MAX_BATCH_SIZE:
+        raise ValueError(f"单次最多提交 {MAX_BATCH_SIZE} 条工时记录")
+
+    errors: List[Tuple[int, str]] = []
+    rows: List[Dict] = []
+    for index, entry in enumerate(entries):
+        try:
+            rows.append(validate_entry(entry))
+        except (ValueError, ArithmeticError) as e:
+            errors.append((index, str(e)))
+    if errors:
+        raise TimesheetValidationError(errors)
+    if not rows:
+        return TimesheetBatchResult(count=0)
+
+    with engine.begin() as conn:
+        cache = ReferenceCache()
+        cache.load(conn, {row["task_id"] for row in rows}, {row["user_id"] for row in rows})
+        for index, row in enumerate(rows):
+            task_project = cache.task_projects.get(row["task_id"])
+            if task_project is None:
+                errors.append((index, f"任务不存在: {row['task_id']}"))
+            elif row["user_id"] not in cache.users:
+                errors.append((index, f"用户不存在: {row['user_id']}"))
+            elif row["project_id"] is None:
+                row["project_id"] = task_project
+            elif row["project_id"] != task_project:
+                errors.append((index, f"project_id 与任务所属项目不一致: {row['project_id']}"))
+        if errors:
+            raise TimesheetValidationError(errors)
+
+        ids = conn.execute(
+            insert(timesheets_table).returning(timesheets_table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        _apply_rollups(conn, rows, sign=1)
+
+    return TimesheetBatchResult(
+        count=len(ids),
+        ids=list(ids),
+        task_ids=sorted({row["task_id"] for row in rows}),
+        project_ids=sorted({row["project_id"] for row in rows}),
+    )
+
+
+def review_timesheets(
+    engine: Engine,
+    action: str,
+    ids: Optional[Sequence[int]] = None,
+    project_id: Optional[int] = None,
+    user_ids: Optional[Sequence[int]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    approver_id: Optional[int] = None,
+    reason: Optional[str] = None
+) -> TimesheetBatchResult:
+    """
+    批量审批或驳回工时 (一条 UPDATE)
+
+    只处理处于可审批状态的记录 (审批: submitted; 驳回: submitted/approved),
+    其余记录保持不变, 不计入结果。
+
+    Args:
+        action: approve / reject
+        ids: 工时记录ID
+        project_id, user_ids, start_date, end_date: 按条件选择记录 (与 ids 同时给出时取交集)
+        approver_id: 审批人
+        reason: 驳回原因
+
+    Raises:
+        ValueError: 动作未知或未给出任何选择条件
+    """
+    if action not in REVIEW_ACTIONS:
+        raise ValueError(f"不支持的审批动作: {action}, 可选 {list(REVIEW_ACTIONS)}")
+    conditions = [timesheets_table.c.status.in_(REVIEWABLE_STATUSES[action])]
+    if ids is not None:
+        if len(ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"单次最多审批 {MAX_BATCH_SIZE} 条工时记录")
+        conditions.append(timesheets_table.c.id.in_(list(ids)))
+    if project_id is not None:
+        conditions.append(timesheets_table.c.project_id == project_id)
+    if user_ids is not None:
+        conditions.append(timesheets_table.c.user_id.in_(list(user_ids)))
+    if start_date is not None:
+        conditions.append(timesheets_table.c.work_date >= start_date)
+    if end_date is not None:
+        conditions.append(timesheets_table.c.work_date <= end_date)
+    if len(conditions) == 1:
+        raise ValueError("需要指定 ids 或 project_id/user_ids/日期范围 中的至少一个条件")
+
+    values = {
+        "status": "approved" if action == "approve" else "rejected",
+        "approved_by": approver_id,
+        "approved_at": datetime.now(),
+        "updated_at": datetime.now(),
+    }
+    if action == "reject":
+        values["rejection_reason"] = reason
+
+    with engine.begin() as conn:
+        rows = [
+            dict(row._mapping) for row in conn.execute(
+                update(timesheets_table).where(*conditions).values(**values).returning(
+                    timesheets_table.c.id, timesheets_table.c.task_id, timesheets_table.c.user_id,
+                    timesheets_table.c.project_id, timesheets_table.c.work_date, timesheets_table.c.hours,
+                )
+            )
+        ]
+        # 驳回的工时不再计入, 从汇总层扣除
+        if action == "reject" and rows:
+            _apply_rollups(conn, rows, sign=-1)
+
+    return TimesheetBatchResult(
+        count=len(rows),
+        ids=sorted(row["id"] for row in rows),
+        task_ids=sorted({row["task_id"] for row in rows if row["task_id"] is not None}),
+        project_ids=sorted({row["project_id"] for row in rows if row["project_id"] is not None}),
+    )
+
+
+def list_timesheets(
+    engine: Engine,
+    project_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> List[Dict]:
+    """按条件查询工时记录 (按工作日期、ID倒序)"""
+    stmt = select(timesheets_table)
+    if project_id is not None:
+        stmt = stmt.where(timesheets_table.c.project_id == project_id)
+    if user_id is not None:
+        stmt = stmt.where(timesheets_table.c.user_id == user_id)
+    if status is not None:
+        stmt = stmt.where(timesheets_table.c.status == status)
+    if start_date is not None:
+        stmt = stmt.where(timesheets_table.c.work_date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(timesheets_table.c.work_date <= end_date)
+    stmt = stmt.order_by(timesheets_table.c.work_date.desc(), timesheets_table.c.id.desc())
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(stmt.limit(limit).offset(offset))]
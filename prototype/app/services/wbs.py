@@ -0,0 +1,211 @@
+"""
+WBS落库
+WBS Materialization
+
+把规则引擎生成的WBS (阶段 + 任务) 写入 wbs_tasks:
+
+- 新增行的主键在客户端预先分配 (见 app.database.allocate_ids), 阶段与
+  任务的 parent_task_id 按 wbs_code 一次解析, 整棵树一条批量 INSERT
+- 重新生成时按 (project_id, wbs_code) 与已有任务做集合比对: 新编码插入,
+  已有编码只更新生成的列 (名称、层级、类型、预估工时、排序、上级),
+  不再生成的编码删除; 实际工时、进度、状态、负责人等执行数据保持不变
+- 有工时记录或有下级任务的过期任务保留不删 (删除会级联删除工时记录)
+
+任务的预估工时按任务基础工时占比分摊复杂度调整后的总工时, 乐观/悲观
+工时按三点估算的比例缩放。阶段是汇总任务, 预估工时、实际工时与进度
+由下级任务上卷 (见 app.services.wbs_rollup)。
+"""
+
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, delete, exists, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.estimator import EstimationResult, estimate_project
+from app.database import allocate_ids, chunked
+from app.models import Project, Timesheet, WBSTask
+from app.services.baseline_calibration import load_calibrated_baseline
+from app.services.projects import project_info
+from app.services.statistics import is_leaf, refresh_statistics, task_assignees
+from app.services.timesheet_ingest import recompute_actual_hours
+
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+
+PHASE_TASK_TYPE = "phase"
+
+# 由生成结果决定的列 (重新生成时比对并更新)
+GENERATED_COLUMNS = (
+    "parent_task_id", "task_name", "task_level", "task_type",
+    "estimated_hours", "optimistic_hours", "pessimistic_hours", "sort_order",
+)
+HOUR_COLUMNS = ("estimated_hours", "optimistic_hours", "pessimistic_hours")
+
+
+@dataclass
+class WBSPersistResult:
+    """WBS落库结果"""
+    project_id: int
+    tasks: int
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    # 已不在生成结果中、但因有工时记录或下级任务而保留的编码
+    retained: List[str] = field(default_factory=list)
+
+
+def wbs_rows(result: EstimationResult) -> List[Dict]:
+    """
+    生成结果展开为 wbs_tasks 行 (阶段在前, 以 parent_code 指向上级)
+
+    Returns:
+        不含 id / project_id 的行
+    """
+    wbs = result.wbs
+    base_total = sum(hours for hours in wbs.hours if hours == hours)
+    scale = result.total_hours / base_total if base_total > 0 else 0.0
+    optimistic = result.optimistic / result.total_hours if result.total_hours else 0.0
+    pessimistic = result.pessimistic / result.total_hours if result.total_hours else 0.0
+
+    phases, tasks = [], []
+    sort_order = len(wbs.layout.phases)
+    for phase_order, (phase, (start, end)) in enumerate(zip(wbs.layout.phases, wbs.layout.phase_slices), 1):
+        children = []
+        for task, hours in zip(wbs.layout.tasks[start:end], wbs.hours[start:end]):
+            sort_order += 1
+            estimated = None if math.isnan(hours) else hours * scale
+            children.append({
+                "wbs_code": task.wbs_code, "parent_code": phase.wbs_code, "task_name": task.name,
+                "task_level": 2, "task_type": task.type, "sort_order": sort_order,
+                "estimated_hours": None if estimated is None else round(estimated, 1),
+                "optimistic_hours": None if estimated is None else round(estimated * optimistic, 1),
+                "pessimistic_hours": None if estimated is None else round(estimated * pessimistic, 1),
+            })
+        # 阶段工时为下级任务之和 (与上卷口径一致, 首次写入后无需再回写)
+        phases.append({
+            "wbs_code": phase.wbs_code, "parent_code": None, "task_name": phase.phase,
+            "task_level": 1, "task_type": PHASE_TASK_TYPE, "sort_order": phase_order,
+            **{
+                column: round(sum(child[column] or 0 for child in children), 1)
+                for column in HOUR_COLUMNS
+            },
+        })
+        tasks.extend(children)
+    return phases + tasks
+
+
+def _normalized(column: str, value):
+    if column in HOUR_COLUMNS:
+        return None if value is None else round(float(value), 1)
+    return value
+
+
+def _stale_ids(conn: Connection, ids: Sequence[int]) -> List[int]:
+    """过期任务中可以删除的 (没有工时记录也没有下级任务)"""
+    deletable = []
+    for chunk in chunked(ids):
+        deletable.extend(conn.execute(
+            select(tasks_table.c.id)
+            .where(tasks_table.c.id.in_(chunk))
+            .where(~exists().where(timesheets_table.c.task_id == tasks_table.c.id))
+            .where(is_leaf())
+        ).scalars())
+    return deletable
+
+
+def persist_wbs(conn: Connection, project_id: int, result: EstimationResult) -> WBSPersistResult:
+    """
+    把生成的WBS写入项目的 wbs_tasks (在调用方事务内执行)
+
+    首次写入时整棵树一条批量 INSERT; 已有任务时按 wbs_code 做差异更新。
+    """
+    rows = wbs_rows(result)
+    existing = {
+        row.wbs_code: row for row in conn.execute(
+            select(tasks_table.c.id, tasks_table.c.wbs_code, *(tasks_table.c[c] for c in GENERATED_COLUMNS))
+            .where(tasks_table.c.project_id == project_id)
+        )
+    }
+
+    # 客户端分配主键, 按编码一次解析上级
+    new_ids = iter(allocate_ids(conn, tasks_table, sum(1 for row in rows if row["wbs_code"] not in existing)))
+    ids = {
+        row["wbs_code"]: existing[row["wbs_code"]].id if row["wbs_code"] in existing else next(new_ids)
+        for row in rows
+    }
+    now = datetime.now()
+    inserts, updates = [], []
+    for row in rows:
+        values = {column: row[column] for column in GENERATED_COLUMNS if column != "parent_task_id"}
+        values["parent_task_id"] = ids[row["parent_code"]] if row["parent_code"] else None
+        current = existing.get(row["wbs_code"])
+        if current is not None and row["task_type"] == PHASE_TASK_TYPE:
+            # 已有阶段的预估工时由上卷维护 (可能包含保留的过期任务)
+            values["estimated_hours"] = _normalized("estimated_hours", current.estimated_hours)
+        if current is None:
+            inserts.append({
+                **values, "id": ids[row["wbs_code"]], "project_id": project_id, "wbs_code": row["wbs_code"],
+                "status": "not_started", "actual_hours": 0, "progress_percentage": 0,
+                "created_at": now, "updated_at": now,
+            })
+        elif any(_normalized(column, getattr(current, column)) != values[column] for column in GENERATED_COLUMNS):
+            updates.append({**values, "_id": current.id, "updated_at": now})
+
+    generated = {row["wbs_code"] for row in rows}
+    stale = sorted(current.id for code, current in existing.items() if code not in generated)
+    deletable = _stale_ids(conn, stale)
+    changed = [update_row["_id"] for update_row in updates] + deletable
+    assignees = task_assignees(conn, changed)
+
+    if inserts:
+        conn.execute(insert(tasks_table), inserts)
+    if updates:
+        conn.execute(
+            update(tasks_table).where(tasks_table.c.id == bindparam("_id"))
+            .values({column: bindparam(column) for column in (*GENERATED_COLUMNS, "updated_at")}),
+            updates,
+        )
+    for chunk in chunked(deletable):
+        conn.execute(delete(tasks_table).where(tasks_table.c.id.in_(chunk)))
+
+    if inserts or updates or deletable:
+        # 上卷阶段的工时与进度, 并重算项目实际工时
+        recompute_actual_hours(conn, (), [project_id], full_rollup=True)
+        refresh_statistics(conn, [project_id], assignees)
+
+    kept = set(stale) - set(deletable)
+    return WBSPersistResult(
+        project_id=project_id,
+        tasks=len(rows),
+        inserted=len(inserts),
+        updated=len(updates),
+        deleted=len(deletable),
+        retained=sorted(code for code, current in existing.items() if current.id in kept),
+    )
+
+
+def generate_project_wbs(
+    engine: Engine,
+    project_id: int,
+    baseline_version: Optional[str] = None
+) -> Optional[WBSPersistResult]:
+    """
+    按项目当前的规模参数评估并写入WBS
+
+    Args:
+        baseline_version: 工时定额版本, 为空时使用默认校准定额 (没有时使用标准定额)
+
+    Returns:
+        落库结果, 项目不存在时返回 None
+    """
+    with engine.begin() as conn:
+        row = conn.execute(select(projects_table).where(projects_table.c.id == project_id)).first()
+        if row is None:
+            return None
+        result = estimate_project(project_info(row), load_calibrated_baseline(conn, baseline_version))
+        return persist_wbs(conn, project_id, result)
@@ -0,0 +1,259 @@
+"""
+WBS上卷回写
+WBS Rollup Job
+
+按项目把 wbs_tasks 加载为上级下标数组 (见 app.core.rollup), 一次向量化
+计算全部汇总任务的预估工时、实际工时与进度, 只把值有变化的汇总任务
+批量回写 (一条 executemany UPDATE)。
+
+叶子任务的实际工时取 actual_hours 列 (由 recompute_actual_hours 维护);
+汇总任务本身记录的工时从 timesheets 聚合, 再加上全部下级任务的工时。
+WBS 生成后与全量作业对项目整棵树上卷, 未变化的任务不写。
+
+工时写入与审批只改变实际工时, 由 apply_task_hours 增量处理: 只加载变化
+任务的祖先链, 差值沿链累加 (WBSRollup.update_task), 不加载整个项目。
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import Float, bindparam, func, select, type_coerce, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.rollup import WBSRollup
+from app.database import chunked
+from app.models import Project, Timesheet, WBSTask
+from app.services.statistics import non_rejected_timesheets
+
+
+projects_table = Project.__table__
+tasks_table = WBSTask.__table__
+timesheets_table = Timesheet.__table__
+
+# 上卷回写的列及比较精度 (与列的小数位一致)
+ROLLUP_COLUMNS = {"estimated_hours": 1, "actual_hours": 1, "progress_percentage": 2}
+
+
+@dataclass
+class RollupReport:
+    """上卷作业结果"""
+    projects: int = 0
+    tasks: int = 0
+    summary_tasks: int = 0
+    rows_written: int = 0
+
+
+def load_rollup(conn: Connection, project_id: int) -> Optional[WBSRollup]:
+    """加载项目任务树并完成上卷计算, 项目没有任务时返回 None"""
+    rows = conn.execute(
+        select(
+            tasks_table.c.id,
+            tasks_table.c.parent_task_id,
+            type_coerce(tasks_table.c.estimated_hours, Float),
+            type_coerce(tasks_table.c.actual_hours, Float),
+            type_coerce(tasks_table.c.progress_percentage, Float),
+        )
+        .where(tasks_table.c.project_id == project_id)
+        .order_by(tasks_table.c.id)
+    ).all()
+    if not rows:
+        return None
+
+    ids, parent_ids, estimated, actual, progress = (list(column) for column in zip(*rows))
+    parents = {parent_id for parent_id in parent_ids if parent_id is not None}
+    if parents:
+        # 汇总任务本身记录的工时 (actual_hours 列存的是上卷值)
+        own = dict.fromkeys(parents, 0.0)
+        for chunk in chunked(parents):
+            own.update(conn.execute(
+                select(timesheets_table.c.task_id, type_coerce(func.sum(timesheets_table.c.hours), Float))
+                .where(timesheets_table.c.task_id.in_(chunk))
+                .where(non_rejected_timesheets())
+                .group_by(timesheets_table.c.task_id)
+            ).all())
+        actual = [own[task_id] if task_id in own else hours for task_id, hours in zip(ids, actual)]
+
+    return WBSRollup(
+        ids, parent_ids,
+        [value or 0.0 for value in estimated],
+        [value or 0.0 for value in actual],
+        [value or 0.0 for value in progress],
+    )
+
+
+def _changed_rows(rows: Dict[int, tuple], rollup: WBSRollup) -> List[Dict]:
+    """值有变化的汇总任务 (按列的小数位比较)"""
+    computed = {
+        "estimated_hours": rollup.estimated,
+        "actual_hours": rollup.actual,
+        "progress_percentage": rollup.progress,
+    }
+    changed = []
+    for i in np.flatnonzero(~rollup.is_leaf):
+        task_id = int(rollup.ids[i])
+        values = {column: round(float(computed[column][i]), digits) for column, digits in ROLLUP_COLUMNS.items()}
+        current = rows[task_id]
+        if any(
+            current[column] is None or round(float(current[column]), digits) != values[column]
+            for column, digits in ROLLUP_COLUMNS.items()
+        ):
+            changed.append({"_id": task_id, **values})
+    return changed
+
+
+def load_chains(conn: Connection, task_ids: Iterable[int]) -> Optional[WBSRollup]:
+    """
+    只加载指定任务及其全部祖先 (逐级按上级ID查询, 查询轮数等于树深)
+
+    链外的下级任务不加载, 各任务的自身实际工时按库中的上卷值减去已加载
+    下级的上卷值折算, 使上卷结果与库中 actual_hours 一致。任务都不存在时
+    返回 None。
+    """
+    rows: Dict[int, tuple] = {}
+    frontier = set(task_ids)
+    while frontier:
+        found = []
+        for chunk in chunked(sorted(frontier)):
+            found.extend(conn.execute(
+                select(tasks_table.c.id, tasks_table.c.parent_task_id,
+                       type_coerce(tasks_table.c.actual_hours, Float))
+                .where(tasks_table.c.id.in_(chunk))
+            ).all())
+        rows.update((row[0], row) for row in found)
+        frontier = {row[1] for row in found if row[1] is not None and row[1] not in rows}
+    if not rows:
+        return None
+
+    ids = sorted(rows)
+    stored = {task_id: rows[task_id][2] or 0.0 for task_id in ids}
+    loaded_children = dict.fromkeys(ids, 0.0)
+    for task_id in ids:
+        parent_id = rows[task_id][1]
+        if parent_id is not None:
+            loaded_children[parent_id] += stored[task_id]
+    zeros = [0.0] * len(ids)
+    return WBSRollup(
+        ids, [rows[task_id][1] for task_id in ids], zeros,
+        [stored[task_id] - loaded_children[task_id] for task_id in ids], zeros,
+    )
+
+
+def apply_task_hours(conn: Connection, task_ids: Iterable[int]) -> int:
+    """
+    工时变化后增量更新任务实际工时
+
+    变化任务的新值 = 本身未驳回的工时之和 + 下级任务当前的上卷值, 与库中
+    值的差沿祖先链累加, 只回写有变化的任务。预估工时与进度不受工时影响。
+
+    Returns:
+        回写的行数
+    """
+    rollup = load_chains(conn, task_ids)
+    if rollup is None:
+        return 0
+    stored = rollup.actual.copy()
+    changed_ids = [task_id for task_id in sorted(set(task_ids)) if task_id in rollup.index]
+
+    own = dict.fromkeys(changed_ids, 0.0)
+    children = dict.fromkeys(changed_ids, 0.0)
+    for chunk in chunked(changed_ids):
+        own.update(conn.execute(
+            select(timesheets_table.c.task_id, type_coerce(func.sum(timesheets_table.c.hours), Float))
+            .where(timesheets_table.c.task_id.in_(chunk))
+            .where(non_rejected_timesheets())
+            .group_by(timesheets_table.c.task_id)
+        ).all())
+        children.update(conn.execute(
+            select(tasks_table.c.parent_task_id,
+                   type_coerce(func.sum(func.coalesce(tasks_table.c.actual_hours, 0)), Float))
+            .where(tasks_table.c.parent_task_id.in_(chunk))
+            .group_by(tasks_table.c.parent_task_id)
+        ).all())
+
+    for task_id in changed_ids:
+        i = rollup.index[task_id]
+        delta = (own[task_id] or 0.0) + (children[task_id] or 0.0) - stored[i]
+        rollup.update_task(task_id, actual=rollup.own_actual[i] + delta)
+
+    digits = ROLLUP_COLUMNS["actual_hours"]
+    changed = [
+        {"_id": int(rollup.ids[i]), "actual_hours": round(float(rollup.actual[i]), digits)}
+        for i in range(len(rollup.ids))
+        if round(float(rollup.actual[i]), digits) != round(float(stored[i]), digits)
+    ]
+    if changed:
+        now = datetime.now()
+        conn.execute(
+            update(tasks_table).where(tasks_table.c.id == bindparam("_id"))
+            .values(actual_hours=bindparam("actual_hours"), updated_at=bindparam("updated_at")),
+            [{**row, "updated_at": now} for row in changed],
+        )
+    return len(changed)
+
+
+def rollup_project(conn: Connection, project_id: int, rollup: Optional[WBSRollup] = None) -> int:
+    """
+    重算并回写一个项目的汇总任务
+
+    Args:
+        rollup: 已加载的上卷结果 (load_rollup), 为空时在此加载
+
+    Returns:
+        回写的行数
+    """
+    if rollup is None:
+        rollup = load_rollup(conn, project_id)
+    if rollup is None or rollup.is_leaf.all():
+        return 0
+
+    summary_ids = [int(task_id) for task_id in rollup.ids[~rollup.is_leaf]]
+    rows = {}
+    for chunk in chunked(summary_ids):
+        for row in conn.execute(
+            select(tasks_table.c.id, *(tasks_table.c[column] for column in ROLLUP_COLUMNS))
+            .where(tasks_table.c.id.in_(chunk))
+        ):
+            rows[row.id] = row._mapping
+
+    changed = _changed_rows(rows, rollup)
+    if changed:
+        now = datetime.now()
+        conn.execute(
+            update(tasks_table).where(tasks_table.c.id == bindparam("_id"))
+            .values({column: bindparam(column) for column in (*ROLLUP_COLUMNS, "updated_at")}),
+            [{**row, "updated_at": now} for row in changed],
+        )
+    return len(changed)
+
+
+def refresh_rollups(conn: Connection, project_ids: Iterable[int]) -> int:
+    """对受影响的项目各执行一次上卷, 返回回写的行数"""
+    return sum(rollup_project(conn, project_id) for project_id in sorted(set(project_ids)))
+
+
+def rollup_projects(engine: Engine, project_ids: Optional[Iterable[int]] = None) -> RollupReport:
+    """
+    全量上卷作业 (每个项目一个事务)
+
+    Args:
+        project_ids: 只处理指定项目, 为空时处理全部项目
+    """
+    with engine.connect() as conn:
+        stmt = select(projects_table.c.id).order_by(projects_table.c.id)
+        if project_ids is not None:
+            stmt = stmt.where(projects_table.c.id.in_(list(project_ids)))
+        ids = conn.execute(stmt).scalars().all()
+
+    report = RollupReport()
+    for project_id in ids:
+        with engine.begin() as conn:
+            rollup = load_rollup(conn, project_id)
+            if rollup is None:
+                continue
+            report.projects += 1
+            report.tasks += len(rollup.ids)
+            report.summary_tasks += int((~rollup.is_leaf).sum())
+            report.rows_written += rollup_project(conn, project_id, rollup)
+    return report
@@ -0,0 +1,42 @@
+"""
+基准脚本公共函数
+Benchmark Helpers
+"""
+
+import random
+from typing import Dict, List
+
+import numpy as np
+
+
+PROJECT_TYPES = ["regulatory_reporting", "data_platform", "risk_management"]
+CLIENT_TYPES = ["state_owned_bank", "joint_stock", "city_bank"]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """延迟分位数 (毫秒)"""
+    if not latencies:
+        return {"count": 0}
+    values = np.array(latencies) * 1000
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+def random_project(rng: random.Random, index: int = 0) -> Dict:
+    """随机生成一个项目请求体 (ProjectInfoRequest)"""
+    return {
+        "name": f"压测项目{index}",
+        "project_type": rng.choice(PROJECT_TYPES),
+        "client_type": rng.choice(CLIENT_TYPES),
+        "data_sources_count": rng.randint(1, 15),
+        "interface_tables_count": rng.randint(10, 300),
+        "reports_count": rng.randint(0, 30),
+        "custom_requirements_count": rng.randint(0, 8),
+        "data_volume_level": rng.choice(["small", "medium", "large", "very_large"]),
+        "regulation_type": rng.choice([None, "1104报送", "EAST"]),
+    }
@@ -0,0 +1,141 @@
+"""
+并发延迟基准
+Concurrency Latency Benchmark
+
+在同一事件循环中混合慢请求 (大规模历史项目上的相似度检索, 闭环并发)
+与按固定速率发送的快请求 (/health), 对比 inline (在事件循环中计算) 与线程池/进程池执行器下快
+请求的尾延迟。
+
+用法 (在 prototype 目录下):
+    python -m benchmarks.concurrency --projects 200000 --duration 5
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+import httpx
+
+from app import main
+from benchmarks.common import summarize
+from app.core.similarity import HistoricalProject, ProjectSimilarityMatcher
+
+
+SLOW_REQUEST = {
+    "target_project": {
+        "name": "基准项目",
+        "project_type": "regulatory_reporting",
+        "client_type": "city_bank",
+        "data_sources_count": 6,
+        "interface_tables_count": 85,
+        "reports_count": 12,
+    },
+    "top_k": 5,
+    # 余弦相似度不做聚类剪枝, 每次全量计算
+    "method": "cosine",
+}
+
+
+def synthetic_history(n: int, seed: int = 7) -> List[HistoricalProject]:
+    """随机生成历史项目"""
+    rng = random.Random(seed)
+    return [
+        HistoricalProject(
+            id=i,
+            name=f"历史项目{i}",
+            project_type=rng.choice(["regulatory_reporting", "data_platform", "risk_management"]),
+            client_type=rng.choice(["state_owned_bank", "joint_stock", "city_bank"]),
+            data_sources_count=rng.randint(0, 12),
+            interface_tables_count=rng.randint(0, 200),
+            reports_count=rng.randint(0, 25),
+            custom_requirements_count=rng.randint(0, 6),
+            complexity_score=round(rng.uniform(2, 9), 1),
+            actual_hours=rng.uniform(500, 3000),
+            variance_percentage=rng.uniform(-10, 20),
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+async def _request(client: httpx.AsyncClient, method: str, url: str, payload, scheduled: float,
+                   latencies: List[float]) -> None:
+    response = await client.request(method, url, json=payload)
+    response.raise_for_status()
+    latencies.append(time.perf_counter() - scheduled)
+
+
+async def _closed_loop(client: httpx.AsyncClient, method: str, url: str, payload, deadline: float,
+                       latencies: List[float]) -> None:
+    """收到响应后立即发下一个请求"""
+    while time.perf_counter() < deadline:
+        await _request(client, method, url, payload, time.perf_counter(), latencies)
+        # 进程内传输没有真实网络IO, 每个请求后主动让出事件循环
+        await asyncio.sleep(0)
+
+
+async def _open_loop(client: httpx.AsyncClient, method: str, url: str, rate: float, deadline: float,
+                     latencies: List[float]) -> None:
+    """
+    按固定速率发请求, 延迟从计划发送时刻算起
+
+    事件循环被阻塞时计划时刻照常推进, 阻塞时间计入延迟 (避免协同遗漏)
+    """
+    interval = 1.0 / rate
+    scheduled = time.perf_counter()
+    tasks = []
+    while scheduled < deadline:
+        tasks.append(asyncio.ensure_future(_request(client, method, url, None, scheduled, latencies)))
+        scheduled += interval
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+    await asyncio.gather(*tasks)
+
+
+async def run_mixed(slow_clients: int, fast_rate: float, duration: float) -> Dict[str, List[float]]:
+    """并发运行慢请求 (闭环) 与快请求 (固定速率), 返回各自的延迟 (秒)"""
+    latencies: Dict[str, List[float]] = {"slow": [], "fast": []}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *[_closed_loop(client, "POST", "/api/v1/similarity/search", SLOW_REQUEST, deadline, latencies["slow"])
+              for _ in range(slow_clients)],
+            _open_loop(client, "GET", "/health", fast_rate, deadline, latencies["fast"]),
+        )
+    return latencies
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="评估接口并发延迟基准")
+    parser.add_argument("--projects", type=int, default=200000, help="合成历史项目数")
+    parser.add_argument("--slow-clients", type=int, default=4, help="并发慢请求数")
+    parser.add_argument("--fast-rate", type=float, default=100.0, help="快请求每秒发送数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种模式的运行秒数")
+    parser.add_argument("--workers", type=int, default=main.ESTIMATION_WORKERS, help="执行器大小")
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"],
+                        help="对比的执行器类型")
+    args = parser.parse_args(argv)
+
+    # 进程池以 fork 方式继承替换后的匹配器
+    main.HISTORICAL_MATCHER = ProjectSimilarityMatcher(synthetic_history(args.projects))
+    main.HISTORICAL_MATCHER._feature_matrix()
+
+    print(f"历史项目 {args.projects}, 慢请求 {args.slow_clients} 并发, 快请求 {args.fast_rate:g}/秒, "
+          f"执行器大小 {args.workers}")
+    for mode in args.modes:
+        executor = main.create_executor(mode, args.workers)
+        main.app.state.executor = main.app.state.thread_executor = executor
+        try:
+            latencies = asyncio.run(run_mixed(args.slow_clients, args.fast_rate, args.duration))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            main.app.state.executor = main.app.state.thread_executor = None
+        print(f"[{mode}] /health: {summarize(latencies['fast'])}")
+        print(f"[{mode}] 相似度检索: {summarize(latencies['slow'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
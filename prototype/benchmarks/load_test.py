@@ -0,0 +1,341 @@
+"""
+HTTP压测工具
+HTTP Load Testing Harness
+
+在本地用 uvicorn 启动API (子进程, 与压测客户端互不争用解释器), 以目标
+并发按配置的比例回放 /api/v1/estimate、/api/v1/estimate/with-similar 与
+/api/v1/similarity/search 请求, 统计吞吐与 p50/p95/p99 延迟。结果连同
+git 提交号保存为JSON, 可用 --compare 与之前的结果对比。
+
+客户端是基于 asyncio 流的精简 HTTP/1.1 长连接实现, 每个并发一个连接,
+自身开销远小于服务端, 压测结果反映的是服务端能力。
+
+用法 (在 prototype 目录下):
+    python -m benchmarks.load_test --concurrency 16 --duration 20
+    python -m benchmarks.load_test --mix estimate=1 --compare benchmarks/results/load_xxx.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000   # 压测已启动的服务
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmarks.common import random_project, summarize
+
+
+PROTOTYPE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROTOTYPE_DIR, "benchmarks", "results")
+
+DEFAULT_MIX = "estimate=6,with-similar=3,search=1"
+
+
+def _estimate_payload(rng: random.Random, index: int) -> Dict:
+    return random_project(rng, index)
+
+
+def _with_similar_payload(rng: random.Random, index: int) -> Dict:
+    return {"target_project": random_project(rng, index), "top_k": rng.randint(3, 10)}
+
+
+def _search_payload(rng: random.Random, index: int) -> Dict:
+    return {
+        "target_project": random_project(rng, index),
+        "top_k": rng.randint(3, 10),
+        "method": rng.choice(["hybrid", "hybrid", "cosine", "euclidean"]),
+    }
+
+
+# 场景名 -> (接口路径, 请求体生成函数)
+SCENARIOS = {
+    "estimate": ("/api/v1/estimate", _estimate_payload),
+    "with-similar": ("/api/v1/estimate/with-similar", _with_similar_payload),
+    "search": ("/api/v1/similarity/search", _search_payload),
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """解析请求比例, 如 "estimate=6,with-similar=3,search=1" """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"未知的压测场景: {name}, 可选 {list(SCENARIOS)}")
+        try:
+            weights[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"场景 {name} 的比例不是数字: {weight}")
+        if weights[name] < 0:
+            raise ValueError(f"场景 {name} 的比例不能为负: {weight}")
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"请求比例无效: {mix}")
+    return weights
+
+
+def build_requests(weights: Dict[str, float], count: int, seed: int, host: str) -> List[Tuple[str, bytes]]:
+    """
+    预先生成请求序列 (场景名, 完整的HTTP请求报文)
+
+    按比例随机抽取场景, 请求体各不相同; 压测时循环使用。
+    """
+    rng = random.Random(seed)
+    names = rng.choices(list(weights), weights=list(weights.values()), k=count)
+    requests = []
+    for index, name in enumerate(names):
+        path, build = SCENARIOS[name]
+        body = json.dumps(build(rng, index), ensure_ascii=False).encode()
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n"
+        ).encode()
+        requests.append((name, head + body))
+    return requests
+
+
+class Connection:
+    """HTTP/1.1 长连接 (只支持带 Content-Length 的响应)"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, raw: bytes) -> int:
+        """发送一个请求并读完响应, 返回状态码"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.writer.write(raw)
+            head = await self.reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split(" ", 2)[1])
+            headers = dict(line.lower().split(": ", 1) for line in lines[1:] if ": " in line)
+            await self.reader.readexactly(int(headers.get("content-length", 0)))
+            if headers.get("connection") == "close":
+                self.close()
+            return status
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_load(host: str, port: int, requests: List[Tuple[str, bytes]], concurrency: int,
+                   duration: float, warmup: float) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    """
+    以固定并发闭环压测
+
+    Returns:
+        (各场景延迟列表, 各场景错误数, 统计窗口秒数); 预热期内的请求不计入
+    """
+    latencies: Dict[str, List[float]] = {name: [] for name in SCENARIOS}
+    errors: Dict[str, int] = {name: 0 for name in SCENARIOS}
+    cursor = 0
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker():
+        nonlocal cursor
+        connection = Connection(host, port)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            name, raw = requests[cursor % len(requests)]
+            cursor += 1
+            try:
+                status = await connection.request(raw)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status = 0
+            end = time.perf_counter()
+            if now < measure_from or end > deadline:
+                continue
+            if status == 200:
+                latencies[name].append(end - now)
+            else:
+                errors[name] += 1
+        connection.close()
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, duration
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: Dict[str, str], timeout: float = 60.0) -> subprocess.Popen:
+    """用 uvicorn 启动API并等待 /health 可用"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=PROTOTYPE_DIR,
+        env={**os.environ, **env},
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API服务启动失败 (退出码 {process.returncode})")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("API服务启动超时")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=PROTOTYPE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def build_report(latencies: Dict[str, List[float]], errors: Dict[str, int], window: float,
+                 config: Dict) -> Dict:
+    """汇总压测结果"""
+    all_latencies = [value for values in latencies.values() for value in values]
+    endpoints = {}
+    for name in SCENARIOS:
+        if latencies[name] or errors[name]:
+            endpoints[name] = {
+                **summarize(latencies[name]),
+                "errors": errors[name],
+                "throughput": round(len(latencies[name]) / window, 1),
+            }
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git("rev-parse", "--short", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--", ".")),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "total": {
+            **summarize(all_latencies),
+            "errors": sum(errors.values()),
+            "throughput": round(len(all_latencies) / window, 1),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def save_report(report: Dict, path: Optional[str] = None) -> str:
+    """保存结果JSON, 默认 benchmarks/results/load_<时间>_<提交号>.json"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"load_{stamp}_{report['git_commit'] or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    """结果表格; 给出基线时附加吞吐与p99的变化"""
+    def change(current, previous):
+        if not previous:
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    rows = [("total", report["total"])] + list(report["endpoints"].items())
+    lines = [f"{'scenario':<14}{'count':>8}{'errors':>7}{'req/s':>18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>18}"]
+    for name, stats in rows:
+        before = (baseline or {}).get("total" if name == "total" else "endpoints", {})
+        before = before if name == "total" else before.get(name, {})
+        if not stats.get("count"):
+            lines.append(f"{name:<14}{0:>8}{stats['errors']:>7}")
+            continue
+        throughput = f"{stats['throughput']}{change(stats['throughput'], before.get('throughput'))}"
+        p99 = f"{stats['p99']}{change(stats['p99'], before.get('p99'))}"
+        lines.append(
+            f"{name:<14}{stats['count']:>8}{stats['errors']:>7}{throughput:>18}"
+            f"{stats['p50']:>9}{stats['p95']:>9}{p99:>18}"
+        )
+    return "\n".join(lines)
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="评估API压测")
+    parser.add_argument("--url", help="压测已启动的服务 (如 http://127.0.0.1:8000), 为空时本地启动 uvicorn")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"请求比例 (默认 {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发连接数")
+    parser.add_argument("--duration", type=float, default=15.0, help="统计时长 (秒)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长 (秒, 不计入结果)")
+    parser.add_argument("--payloads", type=int, default=2000, help="预生成的请求数 (循环使用)")
+    parser.add_argument("--seed", type=int, default=42, help="请求生成随机种子")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn 工作进程数")
+    parser.add_argument("--executor", choices=["thread", "process", "inline"],
+                        help="服务端评估执行器 (ESTIMATION_EXECUTOR)")
+    parser.add_argument("--output", help="结果文件路径 (默认写入 benchmarks/results/)")
+    parser.add_argument("--compare", help="与之前保存的结果文件对比")
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        env = {"ESTIMATION_EXECUTOR": args.executor} if args.executor else {}
+        process = start_server(port, args.server_workers, env)
+
+    try:
+        requests = build_requests(weights, args.payloads, args.seed, f"{host}:{port}")
+        latencies, errors, window = asyncio.run(
+            run_load(host, port, requests, args.concurrency, args.duration, args.warmup)
+        )
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    config = {
+        "url": args.url, "mix": weights, "concurrency": args.concurrency, "duration": args.duration,
+        "warmup": args.warmup, "seed": args.seed, "server_workers": args.server_workers,
+        "executor": args.executor,
+    }
+    report = build_report(latencies, errors, window, config)
+    print(format_report(report, baseline))
+    print(f"结果已保存: {save_report(report, args.output)}")
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -0,0 +1,117 @@
+"""
+评估接口吞吐基准
+Estimation Endpoint Throughput Benchmark
+
+直接以ASGI协议调用应用 (不经过HTTP客户端, 只计服务端开销), 统计
+评估接口每秒请求数, 多轮交替运行取最好成绩。对照接口按
+原方式逐字段构建 EstimationResponse, 由 FastAPI 经 Pydantic 校验后序列化;
+同时单独测量序列化环节的耗时。
+
+用法 (在 prototype 目录下):
+    python -m benchmarks.serialization --requests 3000
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import asdict
+
+import orjson
+
+from app import main
+from app.core.estimator import ProjectInfo, estimate_project
+
+
+PROJECT = {
+    "name": "基准项目",
+    "project_type": "regulatory_reporting",
+    "client_type": "state_owned_bank",
+    "data_sources_count": 8,
+    "interface_tables_count": 120,
+    "reports_count": 15,
+    "custom_requirements_count": 3,
+    "data_volume_level": "large",
+    "regulation_type": "1104报送",
+}
+
+
+async def _call(path: str, body: bytes) -> int:
+    """以ASGI协议直接调用一次接口, 返回状态码"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await main.app(scope, receive, send)
+    return status[0]
+
+
+async def _throughput(path: str, payload, requests: int) -> float:
+    body = orjson.dumps(payload)
+    for _ in range(20):
+        assert await _call(path, body) == 200
+    started = time.perf_counter()
+    for _ in range(requests):
+        await _call(path, body)
+    return requests / (time.perf_counter() - started)
+
+
+def pydantic_response(result) -> main.EstimationResponse:
+    """原方式: 逐字段构建响应模型"""
+    payload = main.estimation_payload(result)
+    payload["complexity_score"] = main.ComplexityScoreResponse(**asdict(result.complexity_score))
+    return main.EstimationResponse(**payload)
+
+
+@main.app.post("/benchmark/estimate-pydantic", response_model=main.EstimationResponse, include_in_schema=False)
+async def estimate_pydantic(project: main.ProjectInfoRequest):
+    return pydantic_response(estimate_project(ProjectInfo(**project.model_dump())))
+
+
+def _per_call(func, repeat: int) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="评估接口吞吐基准")
+    parser.add_argument("--requests", type=int, default=3000, help="每轮每个接口的请求数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数 (取最好成绩)")
+    args = parser.parse_args(argv)
+
+    similar = {"target_project": PROJECT, "top_k": 5}
+    endpoints = [
+        ("/benchmark/estimate-pydantic", PROJECT),
+        ("/api/v1/estimate", PROJECT),
+        ("/api/v1/estimate/with-similar", similar),
+    ]
+    best = {path: 0.0 for path, _ in endpoints}
+    for _ in range(args.rounds):
+        for path, payload in endpoints:
+            best[path] = max(best[path], asyncio.run(_throughput(path, payload, args.requests)))
+    for path, rps in best.items():
+        print(f"{path}: {rps:.0f} 请求/秒")
+
+    result = estimate_project(ProjectInfo(**PROJECT))
+    pydantic_us = _per_call(lambda: pydantic_response(result).model_dump_json(), args.requests)
+    orjson_us = _per_call(lambda: main.FastJSONResponse(main.estimation_payload(result)).body, args.requests)
+    print(f"序列化 EstimationResult: Pydantic {pydantic_us:.1f}µs, orjson {orjson_us:.1f}µs")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -0,0 +1,46 @@
+"""
+测试公共夹具
+"""
+
+import pytest
+from sqlalchemy import insert
+
+from app.database import create_db_engine, init_db
+from app.models import Project, ProjectMember, User, WBSTask
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """基于临时SQLite文件的数据库引擎"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded_engine(engine):
+    """2个项目, 3个任务, 2个用户"""
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "u1", "email": "u1@example.com", "password_hash": "x", "full_name": "张三"},
+            {"id": 2, "username": "u2", "email": "u2@example.com", "password_hash": "x", "full_name": "李四"},
+        ])
+        conn.execute(insert(Project.__table__), [
+            {"id": 1, "name": "项目A", "code": "P1", "project_type": "regulatory_reporting", "client_name": "A银行"},
+            {"id": 2, "name": "项目B", "code": "P2", "project_type": "regulatory_reporting", "client_name": "B银行"},
+        ])
+        conn.execute(insert(WBSTask.__table__), [
+            {"id": 11, "project_id": 1, "wbs_code": "1.1", "task_name": "任务1", "task_level": 2,
+             "estimated_hours": 40, "assignee_id": 1, "status": "in_progress"},
+            {"id": 12, "project_id": 1, "wbs_code": "1.2", "task_name": "任务2", "task_level": 2,
+             "estimated_hours": 60, "assignee_id": 2, "status": "not_started"},
+            {"id": 21, "project_id": 2, "wbs_code": "1.1", "task_name": "任务3", "task_level": 2,
+             "estimated_hours": 20, "assignee_id": 2, "status": "in_progress"},
+        ])
+        conn.execute(insert(ProjectMember.__table__), [
+            {"project_id": 1, "user_id": 1, "role": "developer"},
+            {"project_id": 1, "user_id": 2, "role": "developer"},
+            {"project_id": 2, "user_id": 2, "role": "developer"},
+        ])
+    return engine
@@ -0,0 +1,246 @@
+"""
+测试分析仪表盘接口
+"""
+
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app import main as api
+from app.models import (
+    Organization, Project, ProjectMonthlyCost, ProjectStatistics, SummaryVersion, User, WBSTask
+)
+from app.services.analytics import (
+    AnalyticsCache, AnalyticsFilters, cached_analytics, cost_analysis, dashboard_summary, resource_analysis
+)
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheet_ingest import ingest_timesheets
+
+
+TODAY = date(2026, 10, 19)
+
+PROJECT_DEFAULTS = {
+    "organization_id": None, "status": "in_progress", "budget_amount": None,
+    "planned_start_date": None, "planned_end_date": None,
+}
+
+ROWS = [
+    {"task_id": "11", "user_id": "1", "work_date": "2026-08-03", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2026-09-01", "hours": "6"},
+    {"task_id": "12", "user_id": "2", "work_date": "2026-09-02", "hours": "4"},
+    {"task_id": "21", "user_id": "2", "work_date": "2026-09-03", "hours": "5"},
+    {"task_id": "31", "user_id": "3", "work_date": "2026-10-12", "hours": "7"},
+    {"task_id": "31", "user_id": "3", "work_date": "2026-10-13", "hours": "3", "status": "rejected"},
+]
+
+
+def _seed(engine):
+    """组织 1 下有组织 2; 项目 1/2 属于组织 1/2, 项目 3 属于组织 3"""
+    with engine.begin() as conn:
+        conn.execute(insert(Organization.__table__), [
+            {"id": 1, "name": "总部", "code": "O1", "parent_id": None},
+            {"id": 2, "name": "分部", "code": "O2", "parent_id": 1},
+            {"id": 3, "name": "子公司", "code": "O3", "parent_id": None},
+        ])
+        conn.execute(insert(User.__table__), [
+            {"id": i, "username": f"u{i}", "email": f"u{i}@example.com", "password_hash": "x",
+             "full_name": f"用户{i}", "department": department, "hourly_rate": rate, "status": status}
+            for i, department, rate, status in [
+                (1, "交付一部", 100, "active"),
+                (2, "交付一部", 200, "active"),
+                (3, "交付二部", 150, "active"),
+                (4, "交付二部", 150, "inactive"),
+            ]
+        ])
+        conn.execute(insert(Project.__table__), [
+            dict(PROJECT_DEFAULTS, **project) for project in [
+                {"id": 1, "name": "项目A", "code": "P1", "project_type": "regulatory_reporting", "client_name": "A",
+                 "organization_id": 1, "budget_amount": 10000,
+                 "planned_start_date": date(2026, 7, 1), "planned_end_date": date(2026, 12, 31)},
+                {"id": 2, "name": "项目B", "code": "P2", "project_type": "data_platform", "client_name": "B",
+                 "organization_id": 2, "budget_amount": 5000, "status": "completed",
+                 "planned_start_date": date(2026, 1, 1), "planned_end_date": date(2026, 9, 30)},
+                {"id": 3, "name": "项目C", "code": "P3", "project_type": "regulatory_reporting", "client_name": "C",
+                 "organization_id": 3, "budget_amount": 2000, "status": "planning"},
+            ]
+        ])
+        conn.execute(insert(WBSTask.__table__), [
+            {"id": task_id, "project_id": project_id, "wbs_code": code, "task_name": f"任务{task_id}",
+             "task_level": 2, "estimated_hours": hours, "assignee_id": assignee, "status": status}
+            for task_id, project_id, code, hours, assignee, status in [
+                (11, 1, "1.1", 10, 1, "completed"),
+                (12, 1, "1.2", 20, 2, "in_progress"),
+                (21, 2, "1.1", 4, 2, "completed"),
+                (31, 3, "1.1", 40, 3, "not_started"),
+            ]
+        ])
+    rebuild_statistics(engine)
+    ingest_timesheets(ROWS, engine)
+
+
+class TestAnalyticsQueries:
+    """测试基于汇总表的分析查询"""
+
+    def test_monthly_costs_maintained(self, engine):
+        """测试工时导入增量维护项目月度成本, 与全量重建一致"""
+        _seed(engine)
+        with engine.connect() as conn:
+            costs = {
+                (row.project_id, row.month_start): (float(row.hours), float(row.labor_cost))
+                for row in conn.execute(select(ProjectMonthlyCost.__table__))
+            }
+        assert costs == {
+            (1, date(2026, 8, 1)): (8.0, 800.0),
+            (1, date(2026, 9, 1)): (10.0, 1400.0),
+            (2, date(2026, 9, 1)): (5.0, 1000.0),
+            (3, date(2026, 10, 1)): (7.0, 1050.0),
+        }
+        assert check_statistics(engine) == []
+
+    def test_dashboard_filters(self, engine):
+        """测试仪表盘合计与组织 (含下级)、项目类型、日期范围过滤"""
+        _seed(engine)
+        with engine.connect() as conn:
+            body = dashboard_summary(conn, AnalyticsFilters(), today=TODAY)
+            assert body["projects"] == {
+                "total": 3, "active": 2, "by_status": {"in_progress": 1, "completed": 1, "planning": 1}
+            }
+            assert body["hours"]["estimated"] == 74.0 and body["hours"]["actual"] == 30.0
+            assert body["hours"]["logged_in_period"] == 30.0
+            assert body["budget"]["budget_amount"] == 17000.0
+            assert body["budget"]["labor_cost_in_period"] == 4250.0
+            assert body["tasks"] == {"total": 4, "completed": 2, "completion_rate": 0.5}
+            assert [item["month"] for item in body["monthly_trend"]] == [
+                date(2026, 8, 1), date(2026, 9, 1), date(2026, 10, 1)
+            ]
+            assert [item["project_id"] for item in body["over_variance_projects"]] == [2]
+
+            body = dashboard_summary(conn, AnalyticsFilters(organization_id=1), today=TODAY)
+            assert body["projects"]["total"] == 2 and body["budget"]["labor_cost_in_period"] == 3200.0
+
+            body = dashboard_summary(conn, AnalyticsFilters(project_type="regulatory_reporting"), today=TODAY)
+            assert body["projects"]["total"] == 2 and body["hours"]["logged_in_period"] == 25.0
+
+            # 项目B 9月30日结束; 无计划日期的项目C 不按日期排除
+            body = dashboard_summary(conn, AnalyticsFilters(start_date=date(2026, 10, 1)), today=TODAY)
+            assert body["projects"]["total"] == 2
+            assert [item["month"] for item in body["monthly_trend"]] == [date(2026, 10, 1)]
+
+    def test_cost_analysis(self, engine):
+        """测试成本分析分组与预算使用率"""
+        _seed(engine)
+        with engine.connect() as conn:
+            body = cost_analysis(conn, AnalyticsFilters(), "project_type", today=TODAY)
+            assert body["total_labor_cost"] == 4250.0
+            assert [(item["project_type"], item["labor_cost"], item["budget_amount"]) for item in body["items"]] == [
+                ("regulatory_reporting", 3250.0, 12000.0), ("data_platform", 1000.0, 5000.0)
+            ]
+            assert body["items"][1]["budget_utilization"] == 0.2
+
+            body = cost_analysis(conn, AnalyticsFilters(end_date=date(2026, 9, 15)), "project", limit=1, today=TODAY)
+            assert body["total_labor_cost"] == 3200.0
+            assert [(item["project"], item["code"], item["labor_cost"]) for item in body["items"]] == [(1, "P1", 2200.0)]
+
+            body = cost_analysis(conn, AnalyticsFilters(organization_id=1), "month", today=TODAY)
+            assert [item["labor_cost"] for item in body["items"]] == [800.0, 2400.0]
+
+            with pytest.raises(ValueError):
+                cost_analysis(conn, AnalyticsFilters(), "client", today=TODAY)
+
+    def test_resource_analysis(self, engine):
+        """测试资源分析按部门汇总在职用户"""
+        _seed(engine)
+        filters = AnalyticsFilters(start_date=date(2026, 8, 31), end_date=date(2026, 9, 13))
+        with engine.connect() as conn:
+            body = resource_analysis(conn, filters, today=TODAY)
+        assert body["headcount"] == 3 and body["period"]["weeks"] == 2
+        departments = {item["department"]: item for item in body["departments"]}
+        assert departments["交付一部"]["logged_hours"] == 15.0
+        assert departments["交付一部"]["capacity_hours"] == 160.0
+        assert departments["交付二部"]["headcount"] == 1 and departments["交付二部"]["remaining_hours"] == 33.0
+        assert [user["user_id"] for user in body["top_users"]] == [3, 2, 1]
+
+    def test_cache_invalidated_by_summary_writes(self, engine):
+        """测试缓存命中, 汇总表写入后失效"""
+        _seed(engine)
+        cache = AnalyticsCache()
+        first = cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters())
+        assert cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters()) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        ingest_timesheets([{"task_id": "12", "user_id": "2", "work_date": TODAY.isoformat(), "hours": "2"}], engine)
+        second = cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters())
+        assert second is not first and cache.misses == 2
+        assert second["hours"]["actual"] == first["hours"]["actual"] + 2
+
+        cache = AnalyticsCache(max_entries=1)
+        cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters(project_type="data_platform"))
+        cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters())
+        assert len(cache._entries) == 1
+
+    def test_large_dashboard(self, engine):
+        """测试1万个项目、24万行月度汇总时仪表盘的查询耗时"""
+        rng = np.random.default_rng(3)
+        projects, months = 10000, [date(2025 + (m // 12), m % 12 + 1, 1) for m in range(24)]
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), [
+                dict(PROJECT_DEFAULTS, id=i, name=f"项目{i}", code=f"P{i}",
+                     project_type=["regulatory_reporting", "data_platform", "bi"][i % 3],
+                     client_name="客户", status=["planning", "in_progress", "completed"][i % 3],
+                     budget_amount=int(rng.integers(10000, 900000)))
+                for i in range(1, projects + 1)
+            ])
+            conn.execute(insert(ProjectStatistics.__table__), [
+                {"project_id": i, "total_tasks": 20, "completed_tasks": int(rng.integers(0, 21)),
+                 "total_estimated_hours": 800, "total_actual_hours": float(rng.integers(400, 1200)),
+                 "variance_percentage": float(rng.normal(0, 20)), "avg_progress": 50, "team_size": 5}
+                for i in range(1, projects + 1)
+            ])
+            conn.execute(insert(ProjectMonthlyCost.__table__), [
+                {"project_id": i, "month_start": month, "hours": 100, "labor_cost": 15000}
+                for i in range(1, projects + 1) for month in months
+            ])
+            conn.execute(insert(SummaryVersion.__table__), [{"name": "statistics", "version": 1}])
+
+        cache = AnalyticsCache()
+        started = time.perf_counter()
+        body = cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters(end_date=TODAY))
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        cached_analytics(engine, cache, dashboard_summary, AnalyticsFilters(end_date=TODAY))
+        warm = time.perf_counter() - started
+
+        assert body["projects"]["total"] == projects and len(body["monthly_trend"]) == 12
+        assert body["hours"]["logged_in_period"] == projects * 12 * 100
+        assert cold < 0.5 and warm < 0.01
+
+
+class TestAnalyticsEndpoints:
+    """测试分析接口"""
+
+    def test_endpoints(self, engine, monkeypatch):
+        """测试仪表盘/成本/资源接口与参数校验"""
+        _seed(engine)
+        monkeypatch.setattr(api.app.state, "engine", engine)
+        monkeypatch.setattr(api.app.state, "analytics_cache", AnalyticsCache())
+        client = TestClient(api.app)
+        params = {"start_date": "2026-08-01", "end_date": "2026-10-31"}
+
+        body = client.get("/api/v1/analytics/dashboard", params={**params, "organization_id": 1}).json()
+        assert body["projects"]["total"] == 2 and body["monthly_trend"][0]["month"] == "2026-08-01"
+
+        body = client.get("/api/v1/analytics/cost", params={**params, "group_by": "organization"}).json()
+        assert [(item["organization"], item["labor_cost"]) for item in body["items"]] == [
+            (1, 2200.0), (3, 1050.0), (2, 1000.0)
+        ]
+
+        body = client.get("/api/v1/analytics/resources", params={**params, "department": "交付二部"}).json()
+        assert body["headcount"] == 1 and body["top_users"][0]["logged_hours"] == 7.0
+
+        assert client.get("/api/v1/analytics/cost", params={"group_by": "client"}).status_code == 422
+        assert client.get("/api/v1/analytics/dashboard",
+                          params={"start_date": "2026-10-01", "end_date": "2026-09-01"}).status_code == 422
@@ -0,0 +1,77 @@
+"""
+测试评估执行器 (CPU密集计算不阻塞事件循环)
+"""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+SEARCH = {
+    "target_project": {
+        "name": "新项目",
+        "project_type": "regulatory_reporting",
+        "client_type": "city_bank",
+        "data_sources_count": 6,
+        "interface_tables_count": 85,
+        "reports_count": 12,
+    },
+    "top_k": 3,
+}
+
+
+class TestEstimationExecutor:
+    """测试执行器配置与事件循环响应"""
+
+    def test_create_executor(self):
+        """测试执行器类型"""
+        assert main.create_executor("inline") is None
+        executor = main.create_executor("thread", 2)
+        assert executor._max_workers == 2
+        executor.shutdown()
+        with pytest.raises(ValueError):
+            main.create_executor("fiber")
+
+    def test_results_match_inline(self, monkeypatch):
+        """测试经 lifespan 创建的执行器与直接计算结果一致"""
+        monkeypatch.setattr(main, "ESTIMATION_PERSIST", False)
+        inline = TestClient(main.app).post("/api/v1/estimate/with-similar", json=SEARCH).json()
+        with TestClient(main.app) as client:
+            assert main.app.state.executor is not None
+            assert client.post("/api/v1/estimate/with-similar", json=SEARCH).json() == inline
+        assert main.app.state.executor is None
+
+    def test_health_responsive_while_busy(self, monkeypatch):
+        """测试执行器被占满时 /health 仍立即响应"""
+        release = threading.Event()
+
+        def blocked_search(target, top_k, method):
+            release.wait(10)
+            return []
+
+        monkeypatch.setattr(main, "search_similar", blocked_search)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                slow = asyncio.ensure_future(client.post("/api/v1/similarity/search", json=SEARCH))
+                await asyncio.sleep(0.05)
+                health = await asyncio.wait_for(client.get("/health"), timeout=2)
+                assert not slow.done()
+                release.set()
+                return health, await slow
+
+        executor = main.create_executor("thread", 1)
+        monkeypatch.setattr(main.app.state, "executor", executor)
+        try:
+            health, slow = asyncio.run(scenario())
+        finally:
+            release.set()
+            executor.shutdown()
+        assert health.json() == {"status": "healthy"}
+        assert slow.json()["total_found"] == 0
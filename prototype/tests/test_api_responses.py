@@ -0,0 +1,54 @@
+"""
+测试评估接口的 orjson 响应序列化
+"""
+
+import json
+from dataclasses import asdict
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.core.estimator import ProjectInfo, estimate_project
+from app.main import (
+    ComplexityScoreResponse, EstimationResponse, FastJSONResponse, app, estimation_payload
+)
+
+
+PROJECT = {
+    "name": "某银行1104报送项目",
+    "project_type": "regulatory_reporting",
+    "client_type": "state_owned_bank",
+    "data_sources_count": 8,
+    "interface_tables_count": 120,
+    "reports_count": 15,
+    "custom_requirements_count": 3,
+    "data_volume_level": "large",
+    "regulation_type": "1104报送",
+}
+
+
+class TestFastJSONResponse:
+    """测试直接序列化与响应模型一致"""
+
+    def test_matches_response_model(self):
+        """测试接口输出与经 Pydantic 响应模型序列化的结果一致"""
+        result = estimate_project(ProjectInfo(**PROJECT))
+        payload = estimation_payload(result)
+        payload["complexity_score"] = ComplexityScoreResponse(**asdict(result.complexity_score))
+        expected = json.loads(EstimationResponse(**payload).model_dump_json())
+
+        response = TestClient(app).post("/api/v1/estimate", json=PROJECT)
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == expected
+
+    def test_numpy_values(self):
+        """测试 numpy 数值与元组直接编码"""
+        body = FastJSONResponse({"hours": np.float64(1.5), "interval": (np.float64(1.0), 2.0)}).body
+        assert json.loads(body) == {"hours": 1.5, "interval": [1.0, 2.0]}
+
+    def test_openapi_schema_intact(self):
+        """测试 OpenAPI 文档仍声明响应模型"""
+        schema = TestClient(app).get("/openapi.json").json()
+        content = schema["paths"]["/api/v1/estimate"]["post"]["responses"]["200"]["content"]
+        assert content["application/json"]["schema"] == {"$ref": "#/components/schemas/EstimationResponse"}
+        assert "ComplexityScoreResponse" in schema["components"]["schemas"]
@@ -0,0 +1,132 @@
+"""
+测试工时定额校准
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, select
+
+from app.cli import main
+from app.core.calibration import UNIT_GROUPS, calibrate, fit_unit_factors, unit_group_hours
+from app.core.estimator import ProjectInfo, TaskTypeBaseline, WorkloadEstimator, estimate_project
+from app.models import EstimationModel, Project
+from app.services.baseline_calibration import calibrate_baseline, load_calibrated_baseline
+
+
+FACTORS = {"fixed": 0.9, "per_source": 1.3, "per_table": 1.1, "per_report": 0.7, "per_requirement": 1.5}
+
+
+def _scale_arrays(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(0, 15, n),
+        rng.integers(0, 300, n),
+        rng.integers(0, 30, n),
+        rng.integers(0, 10, n),
+    )
+
+
+def _base_hours(estimator, sources, tables, reports, requirements):
+    info = ProjectInfo("项目", "regulatory_reporting", "city_bank", sources, tables, reports, requirements)
+    wbs = estimator._generate_wbs(info, estimator._assess_complexity(info))
+    return estimator._calculate_base_hours(wbs, info)
+
+
+class TestCalibration:
+    """测试最小二乘校准算法"""
+
+    def test_unit_hours_match_rule_engine(self):
+        """测试按单位拆分的工时与规则引擎逐项目计算一致 (含缩放后的定额)"""
+        arrays = _scale_arrays(200)
+        hours = unit_group_hours(*arrays)
+        theta = np.array([FACTORS[group] for group in UNIT_GROUPS])
+        default, scaled = WorkloadEstimator(), WorkloadEstimator(TaskTypeBaseline(FACTORS))
+
+        for i, values in enumerate(zip(*arrays)):
+            values = [int(v) for v in values]
+            assert hours[i].sum() == pytest.approx(_base_hours(default, *values), abs=0.051)
+            assert hours[i] @ theta == pytest.approx(_base_hours(scaled, *values), abs=0.051)
+
+    def test_recovers_factors(self):
+        """测试从带噪声的实际工时中恢复缩放系数, 置信区间覆盖真实值"""
+        arrays = _scale_arrays(3000, seed=1)
+        rng = np.random.default_rng(2)
+        levels = list(rng.choice(["medium", "complex"], len(arrays[0])))
+        multipliers = np.array([TaskTypeBaseline.COMPLEXITY_MULTIPLIERS[level] for level in levels])
+        theta = np.array([FACTORS[group] for group in UNIT_GROUPS])
+        actual = unit_group_hours(*arrays) @ theta * multipliers * rng.normal(1, 0.01, len(levels))
+
+        result = calibrate(*arrays, levels, actual, l2=1.0, bootstrap=100, seed=3)
+        for group, expected in FACTORS.items():
+            low, high = result.confidence_intervals[group]
+            assert result.factors[group] == pytest.approx(expected, abs=0.05)
+            assert low <= result.factors[group] <= high
+        assert result.r2_score > 0.9
+        assert result.mae < result.baseline_mae
+
+    def test_missing_unit_keeps_baseline(self):
+        """测试数据中未出现的单位保持标准定额, 正则项向1收缩"""
+        sources, tables, reports, _ = _scale_arrays(100)
+        hours = unit_group_hours(sources, tables, reports, np.zeros(100))
+        factors, _, _ = fit_unit_factors(hours, np.ones(100), hours.sum(axis=1) * 2, l2=0, bootstrap=0)
+        assert factors[UNIT_GROUPS.index("per_requirement")] == pytest.approx(1.0)
+        assert factors[UNIT_GROUPS.index("per_table")] == pytest.approx(2.0)
+
+        shrunk, _, _ = fit_unit_factors(hours, np.ones(100), hours.sum(axis=1) * 2, l2=1000, bootstrap=0)
+        assert 1.0 < shrunk[UNIT_GROUPS.index("per_table")] < 1.5
+
+
+class TestBaselineCalibrationJob:
+    """测试校准作业与定额版本管理"""
+
+    def _seed(self, engine, n=60):
+        sources, tables, reports, requirements = _scale_arrays(n, seed=4)
+        estimator = WorkloadEstimator(TaskTypeBaseline({"per_table": 1.5}))
+        rows = []
+        for i, values in enumerate(zip(sources, tables, reports, requirements), start=1):
+            values = [int(v) for v in values]
+            info = ProjectInfo(f"项目{i}", "regulatory_reporting", "city_bank", *values)
+            rows.append({
+                "id": i, "name": info.name, "code": f"P{i:03d}", "project_type": info.project_type,
+                "client_name": "银行", "client_type": info.client_type,
+                "data_sources_count": values[0], "interface_tables_count": values[1],
+                "reports_count": values[2], "custom_requirements_count": values[3],
+                "status": "completed", "actual_hours": estimator.estimate(info).total_hours,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), rows)
+
+    def test_versioned_rows_and_loading(self, engine):
+        """测试按版本写入, 默认版本切换与估算器加载"""
+        self._seed(engine)
+        version, result = calibrate_baseline(engine, l2=0.1, bootstrap=20, seed=1)
+        assert version == "v1"
+        assert result.factors["per_table"] == pytest.approx(1.5, abs=0.05)
+
+        with engine.connect() as conn:
+            row = conn.execute(select(EstimationModel.__table__)).one()
+            assert set(row.adjustment_rules["factors"]) == set(UNIT_GROUPS)
+            assert float(row.r2_score) > 0.99
+            assert not row.is_default
+            assert load_calibrated_baseline(conn) is None
+            baseline = load_calibrated_baseline(conn, "v1")
+
+        info = ProjectInfo("新项目", "regulatory_reporting", "city_bank", 6, 100, 10, 2)
+        assert estimate_project(info, baseline).total_hours > estimate_project(info).total_hours
+
+        assert calibrate_baseline(engine, bootstrap=0, activate=True)[0] == "v2"
+        with engine.connect() as conn:
+            assert load_calibrated_baseline(conn).factors == load_calibrated_baseline(conn, "v2").factors
+
+    def test_cli(self, engine, capsys):
+        """测试命令行入口"""
+        url = str(engine.url)
+        assert main(["--database-url", url, "calibrate-baseline"]) == 1
+        assert "没有可用于校准的历史项目" in capsys.readouterr().out
+
+        self._seed(engine)
+        assert main(["--database-url", url, "calibrate-baseline", "--bootstrap", "10"]) == 0
+        assert main(["--database-url", url, "activate-baseline", "v1"]) == 0
+        assert main(["--database-url", url, "activate-baseline", "v9"]) == 1
+        with engine.connect() as conn:
+            assert load_calibrated_baseline(conn) is not None
@@ -0,0 +1,169 @@
+"""
+测试资源负荷热力图
+"""
+
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import main as api
+from app.core.capacity import compute_capacity
+from app.models import Project, User, WBSTask
+from app.services.capacity import capacity_heatmap, load_capacity
+
+
+START = date(2026, 10, 19)  # 周一
+
+
+def _spread_daily(user_ids, tasks, start_date, days, holidays=()):
+    """逐任务逐天展开的朴素实现"""
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+    load = np.zeros((len(user_ids), days))
+    for user_id, start, end, hours in tasks:
+        if user_id not in index or start is None or not hours:
+            continue
+        end = max(end or start, start)
+        span = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        workdays = [d for d in span if d.weekday() < 5 and d not in holidays]
+        if not workdays:
+            first = start
+            while first.weekday() >= 5 or first in holidays:
+                first += timedelta(days=1)
+            workdays = [first]
+        for day in workdays:
+            column = (day - start_date).days
+            if 0 <= column < days:
+                load[index[user_id], column] += hours / len(workdays)
+    return load
+
+
+def _random_tasks(n, users, seed=5):
+    rng = random.Random(seed)
+    tasks = []
+    for _ in range(n):
+        start = START + timedelta(days=rng.randint(-40, 120)) if rng.random() > 0.05 else None
+        end = start + timedelta(days=rng.randint(-2, 30)) if start and rng.random() > 0.1 else None
+        tasks.append((rng.choice(users), start, end, rng.choice([None, 0, rng.uniform(1, 200)])))
+    return tasks
+
+
+class TestCapacityEngine:
+    """测试差分数组分摊"""
+
+    def test_matches_daily_spread(self):
+        """测试与逐天展开的结果一致 (含跨窗口、周末、节假日与缺失日期)"""
+        users, holidays = [3, 1, 7, 9], [date(2026, 10, 21), date(2026, 11, 2)]
+        tasks = _random_tasks(400, users + [99])
+        user_col, starts, ends, hours = zip(*tasks)
+        result = compute_capacity(users, user_col, starts, ends,
+                                  [np.nan if h is None else h for h in hours], START, 90, holidays)
+        expected = _spread_daily(users, tasks, START, 90, set(holidays))
+        np.testing.assert_allclose(result.load, expected, atol=1e-9)
+        assert not result.load[:, ~result.working].any()
+        assert result.unscheduled_tasks == sum(
+            1 for u, s, _, h in tasks if u != 99 and (s is None or not h)
+        )
+
+    def test_over_allocation_and_summary(self):
+        """测试超负荷标记、周汇总与用户统计"""
+        result = compute_capacity(
+            [1, 2], [1, 1, 2], [START, START + timedelta(days=2), START], [START + timedelta(days=4)] * 3,
+            [40, 24, 10], START, 14
+        )
+        # 用户1: 周一至周五每天8小时, 周三起另加8小时
+        assert result.load[0, :5].tolist() == [8, 8, 16, 16, 16]
+        assert result.over_allocated[0].sum() == 3 and not result.over_allocated[1].any()
+        assert result.by_week()[:, 0].tolist() == [64, 10]
+        summary = result.user_summary()
+        assert summary["over_allocated_days"].tolist() == [3, 0]
+        assert summary["peak_day"][0] == 2 and summary["utilization"][0] == pytest.approx(64 / 80)
+
+    def test_large_scale(self):
+        """测试1万用户 × 365天 × 100万任务在秒级完成"""
+        rng = np.random.default_rng(1)
+        n = 1_000_000
+        starts = np.datetime64(START) + rng.integers(-60, 400, n)
+        started = time.perf_counter()
+        result = compute_capacity(
+            np.arange(10000), rng.integers(0, 10000, n), starts, starts + rng.integers(0, 40, n),
+            rng.uniform(4, 120, n), START, 365
+        )
+        assert time.perf_counter() - started < 5
+        assert result.load.shape == (10000, 365) and result.over_allocated.any()
+
+
+class TestCapacityAPI:
+    """测试负荷查询与接口"""
+
+    def _seed(self, engine):
+        with engine.begin() as conn:
+            conn.execute(insert(User.__table__), [
+                {"id": i, "username": f"u{i}", "email": f"u{i}@example.com", "password_hash": "x",
+                 "full_name": f"用户{i}", "department": "交付一部" if i % 2 else "交付二部",
+                 "status": "inactive" if i == 4 else "active"}
+                for i in range(1, 6)
+            ])
+            conn.execute(insert(Project.__table__), [{
+                "id": 1, "name": "项目A", "code": "P1", "project_type": "regulatory_reporting", "client_name": "A银行"
+            }])
+            conn.execute(insert(WBSTask.__table__), [
+                {"project_id": 1, "wbs_code": str(i), "task_name": f"任务{i}", "task_level": 1,
+                 "assignee_id": user, "planned_start_date": start, "planned_end_date": end,
+                 "estimated_hours": hours, "status": status}
+                for i, (user, start, end, hours, status) in enumerate([
+                    (1, START, START + timedelta(days=4), 80, "in_progress"),
+                    (1, START, START + timedelta(days=11), 40, "not_started"),
+                    (2, START, START + timedelta(days=9), 40, "not_started"),
+                    (2, START, START + timedelta(days=9), 400, "completed"),
+                    (3, START - timedelta(days=30), START - timedelta(days=1), 80, "in_progress"),
+                    (3, None, None, 16, "not_started"),
+                    (4, START, START, 80, "in_progress"),
+                ])
+            ])
+
+    def test_load_capacity(self, engine):
+        """测试只统计在职用户与未完成任务"""
+        self._seed(engine)
+        result = load_capacity(engine, START, 28)
+        assert result.user_ids.tolist() == [1, 2, 3, 5]
+        assert result.tasks == 3 and result.unscheduled_tasks == 1
+        assert result.load[0, 0] == pytest.approx(20) and result.load[1, 0] == pytest.approx(5)
+        assert not result.load[2].any()
+
+    def test_heatmap_endpoint(self, engine, monkeypatch):
+        """测试热力图接口的排序、筛选、按周汇总与参数校验"""
+        self._seed(engine)
+        monkeypatch.setattr(api.app.state, "engine", engine)
+        client = TestClient(api.app)
+        params = {"start_date": START.isoformat(), "days": 28}
+
+        body = client.get("/api/v1/analytics/capacity", params=params).json()
+        assert body["total_users"] == 4 and body["over_allocated_users"] == 1
+        assert [u["user_id"] for u in body["users"]] == [1, 2, 3, 5]
+        first = body["users"][0]
+        assert first["full_name"] == "用户1" and first["over_allocated_days"] == 5
+        assert first["hours"][:7] == [20, 20, 20, 20, 20, 0, 0]
+        assert first["over_allocated"] == [0, 1, 2, 3, 4] and first["peak_date"] == START.isoformat()
+        assert len(body["periods"]) == 28 and body["period_capacity"][5] == 0
+
+        body = client.get("/api/v1/analytics/capacity",
+                          params={**params, "granularity": "week", "over_allocated_only": True}).json()
+        assert [u["user_id"] for u in body["users"]] == [1] and body["matched_users"] == 1
+        assert body["users"][0]["hours"] == [100, 20, 0, 0] and body["period_capacity"] == [40, 40, 40, 40]
+
+        body = client.get("/api/v1/analytics/capacity",
+                          params={**params, "department": "交付二部", "limit": 1, "offset": 0}).json()
+        assert body["total_users"] == 1 and [u["user_id"] for u in body["users"]] == [2]
+
+        assert client.get("/api/v1/analytics/capacity", params={"granularity": "month"}).status_code == 422
+        assert client.get("/api/v1/analytics/capacity", params={"days": 0}).status_code == 422
+
+    def test_heatmap_without_tasks(self, engine):
+        """测试没有用户与任务时返回空结果"""
+        body = capacity_heatmap(engine, START, 7)
+        assert body["users"] == [] and body["total_users"] == 0 and body["tasks"] == 0
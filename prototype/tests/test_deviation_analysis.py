@@ -0,0 +1,133 @@
+"""
+测试偏差分析批处理作业
+"""
+
+from datetime import date
+
+from sqlalchemy import insert, select, update
+
+from app.cli import main
+from app.models import DeviationAnalysis, WBSTask
+from app.services.deviation_analysis import run_deviation_analysis
+from app.services.timesheet_ingest import ingest_timesheets
+
+
+ANALYSIS_DATE = date(2025, 3, 31)
+
+ROWS = [
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-07", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-08", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-09", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-10", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-13", "hours": "8"},
+    {"task_id": "12", "user_id": "2", "work_date": "2025-01-13", "hours": "6"},
+    {"task_id": "13", "user_id": "2", "work_date": "2025-01-14", "hours": "12"},
+    {"task_id": "21", "user_id": "2", "work_date": "2025-01-08", "hours": "20"},
+    {"task_id": "21", "user_id": "2", "work_date": "2025-01-09", "hours": "8", "status": "rejected"},
+]
+
+
+def _seed_wbs(engine):
+    """项目1: 阶段1 (任务11/12) 与无估算的计划外任务13"""
+    with engine.begin() as conn:
+        conn.execute(insert(WBSTask.__table__), [
+            {"id": 10, "project_id": 1, "wbs_code": "1", "task_name": "需求分析", "task_level": 1,
+             "task_type": None, "estimated_hours": 100},
+            {"id": 13, "project_id": 1, "wbs_code": "2.1", "task_name": "紧急补丁", "task_level": 2,
+             "task_type": "dev_hotfix", "estimated_hours": None},
+        ])
+        conn.execute(
+            update(WBSTask.__table__).where(WBSTask.__table__.c.id.in_([11, 12])).values(parent_task_id=10)
+        )
+        conn.execute(
+            update(WBSTask.__table__).where(WBSTask.__table__.c.id.in_([11, 21])).values(task_type="req_interview")
+        )
+    ingest_timesheets(ROWS, engine)
+
+
+def _rows(engine, **filters):
+    table = DeviationAnalysis.__table__
+    stmt = select(table)
+    for column, value in filters.items():
+        stmt = stmt.where(table.c[column] == value)
+    with engine.connect() as conn:
+        return conn.execute(stmt.order_by(table.c.id)).all()
+
+
+class TestDeviationAnalysis:
+    """测试按项目/阶段/任务类型/任务的偏差计算"""
+
+    def test_project_and_phase_variance(self, seeded_engine):
+        """测试计划工时只取叶子任务, 驳回的工时不计入"""
+        _seed_wbs(seeded_engine)
+        report = run_deviation_analysis(seeded_engine, analysis_date=ANALYSIS_DATE)
+        assert report.projects == 2
+        assert report.tasks == 5
+
+        project = _rows(seeded_engine, project_id=1, analysis_level="project")[0]
+        assert float(project.planned_hours) == 100.0
+        assert float(project.actual_hours) == 66.0
+        assert float(project.variance_percentage) == -34.0
+        assert project.deviation_type == "underrun"
+        assert project.severity == "critical"
+
+        phases = {row.analysis_key: row for row in _rows(seeded_engine, project_id=1, analysis_level="phase")}
+        assert float(phases["1"].actual_hours) == 54.0
+        assert phases["1"].analysis_notes == "阶段: 需求分析"
+        assert phases["2"].deviation_type == "unplanned"
+        assert phases["2"].variance_percentage is None
+
+        project2 = _rows(seeded_engine, project_id=2, analysis_level="project")[0]
+        assert float(project2.actual_hours) == 20.0
+        assert project2.deviation_type == "on_track"
+        assert project2.severity == "low"
+
+    def test_task_type_and_root_causes(self, seeded_engine):
+        """测试任务类型汇总与根因列表"""
+        _seed_wbs(seeded_engine)
+        run_deviation_analysis(seeded_engine, analysis_date=ANALYSIS_DATE)
+
+        task_types = {
+            row.analysis_key: row for row in _rows(seeded_engine, project_id=1, analysis_level="task_type")
+        }
+        assert set(task_types) == {"req_interview", "unknown", "dev_hotfix"}
+        assert float(task_types["req_interview"].variance_percentage) == 20.0
+        assert float(task_types["unknown"].variance_percentage) == -90.0
+
+        causes = _rows(seeded_engine, project_id=1, analysis_level="project")[0].root_causes
+        types = sorted(cause["type"] for cause in causes)
+        assert types == ["phase_underrun", "scope_creep", "task_type_error"]
+        phase_cause = next(cause for cause in causes if cause["type"] == "phase_underrun")
+        assert phase_cause["phase_name"] == "需求分析"
+        assert phase_cause["impact"] == -0.46
+
+    def test_task_rows_respect_threshold(self, seeded_engine):
+        """测试只写入超过阈值或计划外的任务"""
+        _seed_wbs(seeded_engine)
+        run_deviation_analysis(seeded_engine, analysis_date=ANALYSIS_DATE, task_threshold=15)
+
+        tasks = {row.task_id: row for row in _rows(seeded_engine, analysis_level="task")}
+        assert set(tasks) == {11, 12, 13}
+        assert tasks[11].severity == "high"
+        assert tasks[13].deviation_type == "unplanned"
+        assert tasks[13].analysis_notes == "2.1 紧急补丁"
+
+    def test_rerun_replaces_same_date(self, seeded_engine):
+        """测试同一日期重复执行覆盖旧结果, 不同日期保留历史"""
+        _seed_wbs(seeded_engine)
+        first = run_deviation_analysis(seeded_engine, analysis_date=ANALYSIS_DATE)
+        run_deviation_analysis(seeded_engine, analysis_date=ANALYSIS_DATE)
+        assert len(_rows(seeded_engine, analysis_date=ANALYSIS_DATE)) == first.rows_written
+
+        run_deviation_analysis(seeded_engine, project_ids=[2], analysis_date=date(2025, 4, 30))
+        assert len(_rows(seeded_engine)) == first.rows_written + 3
+        assert {row.project_id for row in _rows(seeded_engine, analysis_date=date(2025, 4, 30))} == {2}
+
+    def test_cli(self, seeded_engine, capsys):
+        """测试命令行入口"""
+        _seed_wbs(seeded_engine)
+        url = str(seeded_engine.url)
+        assert main(["--database-url", url, "analyze-deviation", "--date", "2025-03-31"]) == 0
+        assert "项目: 2 个" in capsys.readouterr().out
+        assert _rows(seeded_engine, analysis_date=ANALYSIS_DATE)
@@ -0,0 +1,139 @@
+"""
+测试评估结果异步批量持久化
+"""
+
+import asyncio
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+
+from app import main as api
+from app.core.estimator import ProjectInfo, estimate_project
+from app.database import create_db_engine
+from app.models import ComplexityAssessment, EstimationResult
+from app.services.estimation_results import EstimationResultWriter, estimation_record
+
+
+PROJECT = {
+    "name": "新项目",
+    "project_type": "regulatory_reporting",
+    "client_type": "city_bank",
+    "data_sources_count": 6,
+    "interface_tables_count": 85,
+    "reports_count": 12,
+}
+
+
+def _record(project_id=None):
+    info = ProjectInfo(**PROJECT)
+    return estimation_record(info, estimate_project(info), project_id)
+
+
+def _counts(engine):
+    with engine.connect() as conn:
+        return (
+            conn.execute(select(func.count()).select_from(EstimationResult.__table__)).scalar(),
+            conn.execute(select(func.count()).select_from(ComplexityAssessment.__table__)).scalar(),
+        )
+
+
+def _count_inserts(engine):
+    inserts = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: inserts.append(statement)
+                 if statement.startswith("INSERT INTO estimation_results") else None)
+    return inserts
+
+
+class TestEstimationResultWriter:
+    """测试后台批量写入"""
+
+    def test_batches_by_size_and_flushes_on_close(self, seeded_engine):
+        """测试按条数凑批, 关闭时写完剩余结果"""
+        inserts = _count_inserts(seeded_engine)
+
+        async def scenario():
+            writer = EstimationResultWriter(lambda: seeded_engine, batch_size=3, flush_interval=5)
+            writer.start()
+            for i in range(7):
+                assert await writer.submit(_record(project_id=1 if i % 2 else None))
+            await asyncio.sleep(0.2)
+            # 满3条的两批已写入, 第7条仍在等待凑批
+            assert writer.stats.written == 6
+            await writer.close()
+            assert not await writer.submit(_record())
+            return writer.stats
+
+        stats = asyncio.run(scenario())
+        assert (stats.submitted, stats.written, stats.batches, stats.pending) == (7, 7, 3, 0)
+        assert len(inserts) == 3
+        assert _counts(seeded_engine) == (7, 7)
+
+        with seeded_engine.connect() as conn:
+            row = conn.execute(
+                select(EstimationResult.__table__).where(EstimationResult.__table__.c.project_id == 1)
+            ).first()
+        assert row.final_estimate == row.rule_based_estimate
+        assert row.confidence_interval_low <= row.final_estimate <= row.confidence_interval_high
+
+    def test_flushes_after_interval(self, seeded_engine):
+        """测试不满一批时按等待时间写入"""
+        async def scenario():
+            writer = EstimationResultWriter(lambda: seeded_engine, batch_size=100, flush_interval=0.05)
+            writer.start()
+            await writer.submit(_record())
+            await asyncio.sleep(0.3)
+            written = _counts(seeded_engine)
+            await writer.close()
+            return written
+
+        assert asyncio.run(scenario()) == (1, 1)
+
+    def test_backpressure_and_unknown_project(self, seeded_engine):
+        """测试队列满时丢弃并计数, 关联项目不存在的记录跳过"""
+        async def scenario():
+            writer = EstimationResultWriter(lambda: seeded_engine, max_pending=2, put_timeout=0.01)
+            accepted = [await writer.submit(_record(project_id)) for project_id in (1, 99, 2)]
+            assert writer.stats.pending == 2
+            await writer.close()
+            return accepted, writer.stats
+
+        accepted, stats = asyncio.run(scenario())
+        assert accepted == [True, True, False]
+        assert (stats.dropped, stats.written, stats.failed) == (1, 1, 1)
+        assert _counts(seeded_engine) == (1, 1)
+
+
+class TestEstimationPersistence:
+    """测试评估接口经 lifespan 写入结果"""
+
+    def test_endpoints_persist_on_shutdown(self, seeded_engine, monkeypatch):
+        """测试评估接口不等待写入, 应用关闭时结果全部落库"""
+        monkeypatch.setattr(api, "ESTIMATION_PERSIST", True)
+        monkeypatch.setattr(api, "ESTIMATION_WRITE_INTERVAL", 60.0)
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        with TestClient(api.app) as client:
+            assert client.post("/api/v1/estimate", json=PROJECT, params={"project_id": 1}).status_code == 200
+            response = client.post("/api/v1/estimate/with-similar", json={"target_project": PROJECT, "top_k": 3})
+            assert response.status_code == 200
+            ensemble = response.json()["ensemble_estimation"]
+            assert _counts(seeded_engine) == (0, 0)
+        assert api.app.state.result_writer is None
+
+        with seeded_engine.connect() as conn:
+            rows = conn.execute(
+                select(EstimationResult.__table__).order_by(EstimationResult.__table__.c.id)
+            ).all()
+        assert [row.project_id for row in rows] == [1, None]
+        assert float(rows[1].ensemble_estimate) == ensemble["total_hours"]
+        assert rows[1].model_weights == ensemble["weights"]
+
+    def test_missing_tables_disable_writer(self, tmp_path, monkeypatch, caplog):
+        """测试缺少评估结果表时启动只警告一次, 不启用写入器, 接口正常"""
+        monkeypatch.setattr(api, "ESTIMATION_PERSIST", True)
+        monkeypatch.setattr(api.app.state, "engine", create_db_engine(f"sqlite:///{tmp_path / 'empty.db'}"))
+        with caplog.at_level(logging.WARNING), TestClient(api.app) as client:
+            assert api.app.state.result_writer is None
+            assert client.post("/api/v1/estimate", json=PROJECT).status_code == 200
+        assert len([r for r in caplog.records if "评估结果表" in r.getMessage()]) == 1
@@ -0,0 +1,203 @@
+"""
+测试增量评估会话
+"""
+
+import random
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.estimation_session import (
+    DEV_HOURS, INPUT_DEPENDENCIES, EstimationSession, EstimationSessionStore, task_dependency_graph
+)
+from app.core.estimator import DEFAULT_BASELINE, ProjectInfo, TaskTypeBaseline, WorkloadEstimator
+from app import main
+from app.main import app
+
+
+PROJECT = ProjectInfo(
+    name="测试项目",
+    project_type="regulatory_reporting",
+    client_type="city_bank",
+    data_sources_count=6,
+    interface_tables_count=85,
+    reports_count=12,
+    custom_requirements_count=2
+)
+
+CHOICES = {
+    "client_type": ["city_bank", "state_owned_bank"],
+    "data_volume_level": ["medium", "large", "very_large"],
+    "regulation_type": [None, "EAST", "其他"],
+    "name": ["项目A", "项目B"],
+}
+LIMITS = {
+    "data_sources_count": 14, "interface_tables_count": 220, "reports_count": 30, "custom_requirements_count": 8
+}
+
+
+def _result_key(result):
+    return (
+        result.total_hours, result.optimistic, result.most_likely, result.pessimistic, result.expected,
+        result.std_deviation, result.confidence_interval, result.phase_breakdown, result.complexity_score,
+        result.confidence_level, result.wbs_structure
+    )
+
+
+class TestEstimationSession:
+    """测试增量重算与差异"""
+
+    @pytest.mark.parametrize("factors", [None, {"per_table": 1.13, "per_source": 0.87, "fixed": 1.07}])
+    def test_matches_full_estimate(self, factors):
+        """测试随机逐字段修改后与全量评估逐位一致 (含校准后的定额)"""
+        rng = random.Random(3)
+        estimator = WorkloadEstimator(TaskTypeBaseline(factors) if factors else None)
+        for _ in range(30):
+            info = replace(PROJECT, data_sources_count=rng.randint(0, 8), reports_count=rng.randint(0, 3))
+            session = EstimationSession(info, estimator)
+            for _ in range(15):
+                name = rng.choice(list(CHOICES) + list(LIMITS))
+                value = rng.choice(CHOICES[name]) if name in CHOICES else rng.randint(0, LIMITS[name])
+                diff = session.update(**{name: value})
+                previous, info = estimator.estimate(info), replace(info, **{name: value})
+                expected = estimator.estimate(info)
+                assert _result_key(session.result) == _result_key(expected)
+                assert {k: v for k, (_, v) in diff.estimate.items()} == {
+                    k: getattr(expected, k) for k in diff.estimate
+                }
+                assert diff.changed == (_result_key(previous) != _result_key(expected))
+
+    def test_only_dependent_tasks_recomputed(self):
+        """测试只重算依赖变化参数的任务, 差异只包含变化部分"""
+        session = EstimationSession(PROJECT)
+        diff = session.update(reports_count=20)
+        assert diff.inputs == {"reports_count": (12, 20)}
+        assert diff.tasks["3.6"] == (144, 240)
+        # 报表任务属于开发阶段, 测试类百分比任务随开发工时联动
+        assert set(diff.tasks) == {"3.6", "4.1", "4.3", "4.5"}
+        assert set(diff.phases) == {"开发实施", "测试验证"}
+        assert diff.recomputed_tasks == 4 and not diff.complexity and not diff.added_tasks
+
+        # 不影响工时的字段
+        diff = session.update(name="改名", project_type="data_platform")
+        assert not diff.changed and diff.recomputed_tasks == 0
+
+        # 只影响复杂度: 等级不变时三点估算不变
+        diff = session.update(data_volume_level="large")
+        assert diff.complexity == {"data": (5.0, 6.0), "total": (5.6, 5.8)}
+        assert not diff.tasks and not diff.estimate
+
+        assert not session.update(reports_count=20).inputs
+
+        # 无效取值在修改前拒绝, 会话不变
+        for changes in ({"reports_count": None}, {"reports_count": 6, "client_type": None},
+                        {"reports_count": "6"}, {"unknown": 1}):
+            with pytest.raises(ValueError):
+                session.update(**changes)
+        assert session.project_info.reports_count == 20
+
+    def test_layout_changes(self):
+        """测试任务增减时返回新增/删除的任务"""
+        session = EstimationSession(PROJECT)
+        diff = session.update(reports_count=0, data_sources_count=3)
+        assert diff.removed_tasks == ["3.3.4", "3.3.5", "3.6"]
+        assert diff.added_tasks == []
+        assert diff.tasks["2.2"] == (96, 48)
+
+        diff = session.update(custom_requirements_count=0)
+        assert diff.removed_tasks == ["3.7"]
+        assert session.update(custom_requirements_count=1).added_tasks == ["3.7"]
+
+    def test_dependency_graph(self):
+        """测试依赖图覆盖全部任务类型与输入字段"""
+        graph = task_dependency_graph(DEFAULT_BASELINE)
+        assert set().union(*graph.values()) == set(DEFAULT_BASELINE.BASELINES)
+        assert graph["per_report"] == {"dev_report"}
+        assert graph[DEV_HOURS] == {"test_unit", "test_uat_support", "test_bug_fixing"}
+        assert set(INPUT_DEPENDENCIES) == set(ProjectInfo.__dataclass_fields__)
+
+        with pytest.raises(ValueError):
+            EstimationSession(PROJECT).update(duration=16)
+
+    def test_update_latency(self):
+        """测试单次参数修改的延迟低于全量评估"""
+        session, estimator = EstimationSession(PROJECT), WorkloadEstimator()
+        started = time.perf_counter()
+        for i in range(2000):
+            session.update(reports_count=10 + i % 5)
+        incremental = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(2000):
+            estimator.estimate(replace(PROJECT, reports_count=10 + i % 5)).wbs_structure
+        assert incremental < time.perf_counter() - started
+
+
+class TestEstimationSessionAPI:
+    """测试评估会话接口"""
+
+    def test_session_lifecycle(self):
+        """测试创建、修改、完整结果与关闭"""
+        client = TestClient(app)
+        project = {
+            "name": "测试项目", "project_type": "regulatory_reporting", "client_type": "city_bank",
+            "data_sources_count": 6, "interface_tables_count": 85, "reports_count": 12,
+            "custom_requirements_count": 2,
+        }
+        created = client.post("/api/v1/estimate/sessions", json=project).json()
+        assert created["estimation"] == client.post("/api/v1/estimate", json=project).json()
+
+        url = f"/api/v1/estimate/sessions/{created['session_id']}"
+        response = client.patch(url, json={"reports_count": 20}).json()
+        assert response["diff"]["tasks"]["3.6"] == {"old": 144, "new": 240}
+        assert "estimation" not in response
+
+        response = client.patch(url, params={"full": True}, json={"custom_requirements_count": 0}).json()
+        expected = client.post("/api/v1/estimate", json={**project, "reports_count": 20,
+                                                          "custom_requirements_count": 0}).json()
+        assert response["estimation"] == expected and response["total_hours"] == expected["total_hours"]
+        assert response["diff"]["removed_tasks"] == ["3.7"]
+
+        assert client.patch(url, json={"reports_count": -1}).status_code == 422
+
+        # 显式置空被拒绝, 会话保持不变; regulation_type 可置空
+        for changes in ({"reports_count": None}, {"name": None, "reports_count": 6}):
+            assert client.patch(url, json=changes).status_code == 422
+        response = client.patch(url, json={"reports_count": 6, "regulation_type": None}).json()
+        assert response["diff"]["inputs"] == {"reports_count": {"old": 20, "new": 6}}
+        assert all(round(value, 1) == value for pair in response["diff"]["tasks"].values() for value in pair.values())
+        assert client.delete(url).json() == {"deleted": True}
+        assert client.patch(url, json={"reports_count": 3}).status_code == 404
+        assert client.delete(url).status_code == 404
+
+    def test_session_built_in_executor(self, monkeypatch):
+        """测试创建会话的完整评估在评估执行器中进行"""
+        threads = []
+
+        def session_in_thread(info):
+            threads.append(threading.current_thread())
+            return EstimationSession(info)
+
+        executor = main.create_executor("thread", 1)
+        monkeypatch.setattr(main, "EstimationSession", session_in_thread)
+        monkeypatch.setattr(main.app.state, "executor", executor)
+        try:
+            created = TestClient(app).post("/api/v1/estimate/sessions", json={
+                "name": "测试项目", "project_type": "regulatory_reporting", "client_type": "city_bank",
+                "data_sources_count": 6, "interface_tables_count": 85, "reports_count": 12,
+            })
+        finally:
+            executor.shutdown()
+        assert created.status_code == 200
+        assert threads and threads[0] is not threading.main_thread()
+
+    def test_store_evicts_least_recently_used(self):
+        """测试会话数超出上限时淘汰最久未使用的会话"""
+        store = EstimationSessionStore(max_sessions=2)
+        first, second = store.create(EstimationSession(PROJECT)), store.create(EstimationSession(PROJECT))
+        assert store.get(first) is not None
+        store.create(EstimationSession(PROJECT))
+        assert len(store) == 2 and store.get(second) is None and store.get(first) is not None
@@ -2,6 +2,8 @@
 测试核心评估算法
 """
 
+from dataclasses import FrozenInstanceError
+
 import pytest
 from app.core.estimator import ProjectInfo, estimate_project, WorkloadEstimator
 
@@ -179,5 +181,47 @@ class TestWorkloadEstimator:
         assert complex_result.confidence_level in ["中", "低"]
 
 
+
+class TestWBSTemplate:
+    """测试不可变WBS骨架"""
+
+    def _project(self, sources, reports=10, requirements=2):
+        return ProjectInfo("项目", "regulatory_reporting", "city_bank", sources, 80, reports, requirements)
+
+    def test_layout_shared_and_immutable(self):
+        """测试同一结构的项目共享骨架, 骨架不可修改"""
+        first = estimate_project(self._project(7))
+        second = estimate_project(self._project(12))
+        assert first.wbs.layout is second.wbs.layout
+        assert first.wbs.layout is not estimate_project(self._project(3)).wbs.layout
+
+        with pytest.raises(FrozenInstanceError):
+            first.wbs.layout.tasks[0].name = "修改"
+        assert [task.wbs_code for task in first.wbs.layout.phases[2].tasks] == \
+            ["3.1", "3.2", "3.3.1", "3.3.2", "3.3.3", "3.3.4", "3.3.5", "3.4", "3.5", "3.6", "3.7"]
+
+    def test_lazy_tree(self):
+        """测试完整WBS按需拼装, 与各任务工时及阶段分解一致"""
+        result = estimate_project(self._project(2, reports=0, requirements=0))
+        assert "wbs_structure" not in vars(result)
+
+        tree = result.wbs_structure
+        assert result.wbs_structure is tree
+        assert [task["type"] for task in tree[2]["tasks"]].count("dev_data_extraction") == 2
+        assert "dev_report" not in [task["type"] for task in tree[2]["tasks"]]
+        for phase in tree:
+            assert result.phase_breakdown[phase["phase"]] == \
+                round(sum(task["base_hours"] for task in phase["tasks"]), 1)
+
+        # 修改拼装结果不影响共享骨架
+        tree[0]["tasks"][0]["name"] = "修改"
+        assert result.wbs.tree()[0]["tasks"][0]["name"] == "项目启动"
+        assert result.wbs.summary() == {
+            "total_tasks": sum(len(phase["tasks"]) for phase in tree),
+            "phases_count": 5,
+            "phases": [phase["phase"] for phase in tree]
+        }
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,169 @@
+"""
+测试挣值管理计算与日快照
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app import main as api
+from app.core.evm import compute_evm, planned_value, progress_gains
+from app.models import EVMSnapshot, Project, WBSTask
+from app.services.baselines import BaselineConflictError, capture_baseline
+from app.services.evm import portfolio_evm, snapshot_evm
+from app.services.timesheets import create_timesheets, review_timesheets
+
+
+snapshots_table = EVMSnapshot.__table__
+tasks_table = WBSTask.__table__
+
+
+def _plan(engine):
+    """任务11: 1/6-1/15 共40h, 任务12: 1/11-1/20 共60h, 保存基线 v1"""
+    with engine.begin() as conn:
+        conn.execute(update(Project.__table__).where(Project.__table__.c.id == 1).values(status="in_progress"))
+        conn.execute(update(tasks_table).where(tasks_table.c.id == 11).values(
+            planned_start_date=date(2025, 1, 6), planned_end_date=date(2025, 1, 15)))
+        conn.execute(update(tasks_table).where(tasks_table.c.id == 12).values(
+            planned_start_date=date(2025, 1, 11), planned_end_date=date(2025, 1, 20)))
+    return capture_baseline(engine, 1, "v1")
+
+
+def _log(engine, *entries):
+    return create_timesheets(engine, [
+        {"task_id": task_id, "user_id": 1, "work_date": day, "hours": hours, "task_progress_percentage": progress}
+        for task_id, day, hours, progress in entries
+    ])
+
+
+def _snapshots(engine, day=None):
+    with engine.connect() as conn:
+        stmt = select(snapshots_table).where(snapshots_table.c.phase_code == "")
+        if day is not None:
+            stmt = stmt.where(snapshots_table.c.snapshot_date == day)
+        return conn.execute(stmt.order_by(snapshots_table.c.snapshot_date)).all()
+
+
+class TestEVMCore:
+    """测试向量化计算"""
+
+    def test_planned_value_matches_daily_spread(self):
+        """测试差分数组的累计计划值与逐日分摊一致"""
+        rng = np.random.default_rng(3)
+        group = rng.integers(0, 4, 100)
+        hours = rng.random(100) * 40
+        start = rng.integers(1000, 1060, 100)
+        end = start + rng.integers(0, 30, 100)
+        for first_day, days in [(990, 120), (1030, 1), (1030, 10)]:
+            expected = np.stack([
+                np.bincount(group, hours * np.clip((day - start + 1) / (end - start + 1), 0, 1), minlength=4)
+                for day in range(first_day, first_day + days)
+            ], axis=1)
+            np.testing.assert_allclose(planned_value(group, hours, start, end, 4, first_day, days), expected)
+
+    def test_progress_gains_use_running_max(self):
+        """测试进度增量以窗口前最高进度为起点, 回退不计"""
+        gains = progress_gains(
+            np.array([0, 1, 0, 0, 1]), np.array([3, 1, 1, 2, 5]),
+            np.array([30.0, 50.0, 20.0, 10.0, 40.0]), np.array([15.0, 45.0]),
+        )
+        assert gains.tolist() == [10.0, 5.0, 5.0, 0.0, 0.0]
+
+    def test_metrics(self):
+        """测试 CPI/SPI/EAC 与早于窗口的事件计入第一天"""
+        series = compute_evm(
+            date(2025, 1, 1), 3, [100.0],
+            [0], [100.0], [date(2025, 1, 1).toordinal()], [date(2025, 1, 10).toordinal()],
+            [0, 0], [-5, 1], [10.0, 10.0],
+            [0], [1], [30.0],
+            carry_cost=[5.0],
+        )
+        assert series.actual_cost.tolist() == [[15.0, 25.0, 25.0]]
+        metrics = series.metrics()
+        np.testing.assert_allclose(metrics["cost_performance_index"][0], [0, 1.2, 1.2])
+        np.testing.assert_allclose(metrics["schedule_performance_index"][0], [0, 1.5, 1.0])
+        np.testing.assert_allclose(metrics["estimate_at_completion"][0], [115.0, 100 / 1.2, 100 / 1.2])
+
+
+class TestEVMSnapshots:
+    """测试基线与日快照"""
+
+    def test_capture_baseline(self, seeded_engine):
+        """测试基线保存叶子任务计划, 版本重复与缺少计划日期报错"""
+        baseline = _plan(seeded_engine)
+        assert (baseline["tasks"], baseline["total_planned_hours"]) == (2, 100.0)
+        assert (baseline["planned_start_date"], baseline["planned_end_date"]) == ("2025-01-06", "2025-01-20")
+        with pytest.raises(BaselineConflictError):
+            capture_baseline(seeded_engine, 1, "v1")
+        with pytest.raises(ValueError):
+            capture_baseline(seeded_engine, 2, "v1")
+        assert capture_baseline(seeded_engine, 99, "v1") is None
+
+    def test_incremental_snapshots_match_rebuild(self, seeded_engine):
+        """测试增量追加只写新日期, 结果与从头重算一致"""
+        _plan(seeded_engine)
+        _log(seeded_engine, (11, date(2025, 1, 6), 8, 20), (11, date(2025, 1, 8), 8, 50))
+
+        report = snapshot_evm(seeded_engine, date(2025, 1, 10))
+        assert (report.projects, report.rows_written, report.skipped) == (1, 10, [2])
+        day = _snapshots(seeded_engine, date(2025, 1, 10))[0]
+        assert (float(day.planned_value), float(day.earned_value), float(day.actual_cost)) == (20.0, 20.0, 16.0)
+        assert (float(day.cost_performance_index), float(day.schedule_performance_index)) == (1.25, 1.0)
+        assert float(day.estimate_at_completion) == 80.0
+
+        # 新工时只影响之后的日期; 已有快照不重算
+        _log(seeded_engine, (11, date(2025, 1, 12), 4, 40), (12, date(2025, 1, 12), 6, 10))
+        assert snapshot_evm(seeded_engine, date(2025, 1, 10)).rows_written == 0
+        assert snapshot_evm(seeded_engine, date(2025, 1, 13)).rows_written == 6
+        incremental = [tuple(row)[:11] for row in _snapshots(seeded_engine)]
+        assert len(incremental) == 8
+        last = _snapshots(seeded_engine, date(2025, 1, 13))[0]
+        assert (float(last.earned_value), float(last.actual_cost)) == (26.0, 26.0)
+
+        snapshot_evm(seeded_engine, date(2025, 1, 13), rebuild=True)
+        assert [tuple(row)[:11] for row in _snapshots(seeded_engine)] == incremental
+
+    def test_rejected_hours_and_rebaseline(self, seeded_engine):
+        """测试驳回的工时不计入, 基线变化后按新基线累计"""
+        _plan(seeded_engine)
+        result = _log(seeded_engine, (11, date(2025, 1, 6), 8, 20), (12, date(2025, 1, 7), 5, None))
+        review_timesheets(seeded_engine, "reject", ids=result.ids[1:], approver_id=2)
+        snapshot_evm(seeded_engine, date(2025, 1, 7))
+        assert float(_snapshots(seeded_engine, date(2025, 1, 7))[0].actual_cost) == 8.0
+
+        with seeded_engine.begin() as conn:
+            conn.execute(update(tasks_table).where(tasks_table.c.id == 12).values(estimated_hours=100))
+        capture_baseline(seeded_engine, 1, "v2")
+        snapshot_evm(seeded_engine, date(2025, 1, 8))
+        day = _snapshots(seeded_engine, date(2025, 1, 8))[0]
+        assert (day.baseline_version, float(day.budget_at_completion), float(day.actual_cost)) == ("v2", 140.0, 8.0)
+        assert day.baseline_version != _snapshots(seeded_engine, date(2025, 1, 7))[0].baseline_version
+
+
+class TestPortfolioEVM:
+    """测试组合挣值"""
+
+    def test_portfolio_and_endpoint(self, seeded_engine, monkeypatch):
+        """测试组合指标与接口"""
+        _plan(seeded_engine)
+        _log(seeded_engine, (11, date(2025, 1, 6), 8, 20), (11, date(2025, 1, 8), 8, 50))
+        with seeded_engine.connect() as conn:
+            evm = portfolio_evm(conn, date(2025, 1, 10), include_phases=True)
+        assert (evm["active_projects"], evm["projects_without_baseline"]) == (2, 1)
+        project = evm["projects"][0]
+        assert (project["planned_value"], project["earned_value"], project["actual_cost"]) == (20.0, 20.0, 16.0)
+        assert project["cost_variance"] == 4.0 and project["phases"][0]["phase_code"] == "1"
+        assert evm["totals"]["cost_performance_index"] == 1.25
+
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        client = TestClient(api.app)
+        body = client.get("/api/v1/analytics/evm", params={"as_of": "2025-01-10"}).json()
+        assert body["totals"] == evm["totals"] and "phases" not in body["projects"][0]
+
+        assert client.post("/api/v1/projects/1/baselines", json={"version": "v2"}).status_code == 201
+        assert client.post("/api/v1/projects/1/baselines", json={"version": "v2"}).status_code == 409
+        assert client.post("/api/v1/projects/2/baselines", json={"version": "v1"}).status_code == 422
+        assert client.post("/api/v1/projects/99/baselines", json={"version": "v1"}).status_code == 404
@@ -0,0 +1,139 @@
+"""
+测试共享历史特征快照
+"""
+
+import os
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import main as api
+from app.cli import main
+from app.core.feature_store import (
+    FeatureSnapshot, SharedFeatureStore, current_version, publish_snapshot
+)
+from app.core.similarity import HistoricalProject, ProjectSimilarityMatcher
+from app.models import Project
+
+
+def _projects(n, seed=21):
+    rng = random.Random(seed)
+    return [
+        HistoricalProject(
+            id=i * 10,
+            name=f"历史项目{i}" if i % 7 else "",
+            project_type=rng.choice(["regulatory_reporting", "data_platform"]),
+            # 客户类型可能为空
+            client_type=rng.choice(["state_owned_bank", "city_bank", None]),
+            data_sources_count=rng.randint(0, 12),
+            interface_tables_count=rng.randint(0, 200),
+            reports_count=rng.randint(0, 25),
+            custom_requirements_count=rng.randint(0, 6),
+            complexity_score=round(rng.uniform(2, 9), 1),
+            actual_hours=rng.uniform(500, 3000),
+            variance_percentage=rng.uniform(-10, 20)
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+TARGET = {
+    "project_type": "regulatory_reporting",
+    "client_type": "city_bank",
+    "data_sources_count": 6,
+    "interface_tables_count": 85,
+    "reports_count": 12,
+    "custom_requirements_count": 2,
+    "complexity_score": 5.5
+}
+
+
+class TestFeatureSnapshot:
+    """测试快照发布与挂载"""
+
+    def test_attached_matcher_matches_in_memory(self, tmp_path):
+        """测试挂载的只读快照与进程内匹配器结果一致"""
+        projects = _projects(800)
+        publish_snapshot(projects, str(tmp_path), n_clusters=20)
+        snapshot = FeatureSnapshot.attach(str(tmp_path))
+        expected = ProjectSimilarityMatcher(projects, n_clusters=20)
+
+        assert isinstance(snapshot.arrays["numeric"], np.memmap)
+        assert not snapshot.arrays["numeric"].flags.writeable
+        assert list(snapshot.projects) == projects
+        assert snapshot.projects[-1] == projects[-1]
+        for method in ("hybrid", "cosine"):
+            assert snapshot.matcher.find_similar_projects(TARGET, top_k=10, method=method) == \
+                expected.find_similar_projects(TARGET, top_k=10, method=method)
+        assert snapshot.matcher.cluster_profiles() == expected.cluster_profiles()
+
+    def test_versions_and_cleanup(self, tmp_path):
+        """测试新版本原子切换, 旧版本只保留最近几个"""
+        store_dir = str(tmp_path)
+        assert current_version(store_dir) is None
+        with pytest.raises(FileNotFoundError):
+            FeatureSnapshot.attach(store_dir)
+
+        store = SharedFeatureStore(store_dir, check_interval=0)
+        assert store.matcher() is None
+
+        versions = [publish_snapshot(_projects(50, seed=i), store_dir, keep=2) for i in range(4)]
+        assert versions == [1, 2, 3, 4]
+        assert sorted(name for name in os.listdir(store_dir)) == ["CURRENT", "v3", "v4"]
+        assert store.version is None and store.matcher().historical_projects[0] == _projects(50, seed=3)[0]
+
+        publish_snapshot(_projects(60), store_dir, keep=2)
+        assert store.matcher() is not None and store.version == 5
+        assert len(store.matcher().historical_projects) == 60
+
+    def test_check_interval(self, tmp_path):
+        """测试检查间隔内不重复读取版本"""
+        store_dir = str(tmp_path)
+        publish_snapshot(_projects(20), store_dir)
+        store = SharedFeatureStore(store_dir, check_interval=3600)
+        assert store.version is None and store.matcher() is not None and store.version == 1
+
+        publish_snapshot(_projects(30), store_dir)
+        assert store.version == 1 and len(store.matcher().historical_projects) == 20
+
+
+class TestFeatureSnapshotJob:
+    """测试发布作业与API集成"""
+
+    def _seed(self, engine, n=30):
+        rows = [
+            {
+                "id": p.id, "name": p.name or f"项目{p.id}", "code": f"P{p.id:04d}", "client_name": "银行",
+                "project_type": p.project_type, "client_type": p.client_type,
+                "data_sources_count": p.data_sources_count, "interface_tables_count": p.interface_tables_count,
+                "reports_count": p.reports_count, "custom_requirements_count": p.custom_requirements_count,
+                "complexity_score": p.complexity_score, "actual_hours": round(p.actual_hours, 2),
+                "status": "completed" if p.id % 30 else "in_progress",
+            }
+            for p in _projects(n)
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), rows)
+
+    def test_cli_and_api(self, engine, tmp_path, monkeypatch, capsys):
+        """测试命令行发布快照后API切换到快照中的历史项目"""
+        url, store_dir = str(engine.url), str(tmp_path / "features")
+        assert main(["--database-url", url, "publish-features", "--store-dir", store_dir]) == 1
+        assert "没有已完成且有实际工时的历史项目" in capsys.readouterr().out
+
+        self._seed(engine)
+        assert main(["--database-url", url, "publish-features", "--store-dir", store_dir, "--clusters", "4"]) == 0
+        assert "v1" in capsys.readouterr().out
+
+        client = TestClient(api.app)
+        monkeypatch.setattr(api, "FEATURE_STORE", SharedFeatureStore(store_dir, check_interval=0))
+        response = client.get("/api/v1/clusters").json()
+        assert response["projects"] == 20 and response["total"] == 4
+
+        target = {"name": "新项目", **TARGET}
+        response = client.post("/api/v1/similarity/search", json={"target_project": target, "top_k": 5}).json()
+        assert response["total_found"] == 5
+        assert {r["project"]["id"] for r in response["results"]} <= {p.id for p in _projects(30)}
@@ -0,0 +1,145 @@
+"""
+测试完工预测
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app import main as api
+from app.core.forecast import (
+    BurnTrend, efficiency_factors, fit_burn_trend, forecast_completion, weekly_series
+)
+from app.models import Project, ProjectForecast, WBSTask
+from app.services.forecast import forecast_projects
+from app.services.timesheets import create_timesheets
+
+
+AS_OF = date(2025, 3, 30)
+
+forecasts_table = ProjectForecast.__table__
+tasks_table = WBSTask.__table__
+
+
+def _trend(level, slope=0.0, scale=0.0):
+    return BurnTrend(np.array([level]), np.array([slope]), np.array([scale]), np.array([12]))
+
+
+class TestForecastCore:
+    """测试向量化趋势拟合与完工预测"""
+
+    def test_weekly_series(self):
+        """测试工时按距预测日的周数归入列, 窗口外与未来的记录不计"""
+        series = weekly_series(np.array([0, 0, 1, 1, 1]), np.array([0, 6, 7, 27, -1]),
+                               np.array([1.0, 2.0, 4.0, 8.0, 16.0]), 2, 4)
+        assert series.tolist() == [[0, 0, 0, 3], [8, 0, 4, 0]]
+
+    def test_theil_sen_ignores_outliers(self):
+        """测试个别异常周不影响趋势, 开始记工时之前的周不参与拟合"""
+        weeks = np.arange(12, dtype=float)
+        series = np.stack([20 + 2 * weeks, 40 - weeks, 30 + 0 * weeks])
+        series[0, 5] = 200
+        series[2, :8] = 0
+        valid = np.ones_like(series, dtype=bool)
+        valid[2, :8] = False
+        trend = fit_burn_trend(series, valid)
+        np.testing.assert_allclose(trend.slope, [2, -1, 0])
+        np.testing.assert_allclose(trend.level, [42, 29, 30])
+        assert trend.weeks.tolist() == [12, 12, 4]
+
+    def test_efficiency_factors(self):
+        """测试项目系数与加权分位数, 没有进度的项目使用全部项目的系数"""
+        factors = efficiency_factors(
+            np.array([0, 0, 0, 1, 2]), np.array([10.0, 10.0, 80.0, 20.0, 0.0]),
+            np.array([20.0, 5.0, 80.0, 30.0, 9.0]), 3,
+        )
+        np.testing.assert_allclose(factors.central, [1.05, 1.5, 135 / 120])
+        np.testing.assert_allclose(factors.low, [0.5, 1.5, 1.0])
+        np.testing.assert_allclose(factors.high, [1.05, 1.5, 1.5])
+        assert factors.observed.tolist() == [True, True, False]
+
+    def test_progress_without_hours_uses_pooled_factor(self):
+        """测试有进度但还没有实际工时的项目使用全部项目的系数, 不把剩余工时算成0"""
+        factors = efficiency_factors(
+            np.array([0, 0, 1]), np.array([10.0, 30.0, 50.0]), np.array([15.0, 45.0, 0.0]), 2,
+        )
+        assert factors.observed.tolist() == [True, False]
+        np.testing.assert_allclose(factors.central, [1.5, 1.5])
+        np.testing.assert_allclose([factors.low[1], factors.high[1]], [1.5, 1.5])
+
+    def test_completion_weeks(self):
+        """测试达到剩余工时的周数、区间与无法完工"""
+        completion = forecast_completion(_trend(10.0), np.array([25.0]), np.array([25.0]), np.array([25.0]))
+        assert completion.weeks.tolist() == [2.5]
+        assert completion.weeks_low[0] == 2.5
+
+        noisy = forecast_completion(_trend(10.0, scale=5.0), np.array([100.0]), np.array([80.0]), np.array([130.0]))
+        assert noisy.weeks_low[0] < noisy.weeks[0] == 10.0 < noisy.weeks_high[0]
+
+        idle = _trend(0.0)
+        assert np.isnan(forecast_completion(idle, *[np.array([10.0])] * 3).weeks[0])
+        assert forecast_completion(idle, *[np.array([0.0])] * 3).weeks[0] == 0.0
+
+        # 下降趋势按阻尼衰减, 不会很快降到0
+        damped = forecast_completion(_trend(10.0, slope=-1.0), np.array([20.0]), np.array([20.0]), np.array([20.0]))
+        assert 2 < damped.weeks[0] < 3
+
+
+class TestForecastJob:
+    """测试预测作业与接口"""
+
+    def _history(self, engine):
+        """项目1: 最近4周每周 20h, 任务11进度50% (实际 24h), 任务12未开始"""
+        with engine.begin() as conn:
+            conn.execute(update(Project.__table__).where(Project.__table__.c.id == 1).values(status="in_progress"))
+            conn.execute(update(tasks_table).where(tasks_table.c.id == 11).values(progress_percentage=50))
+        create_timesheets(engine, [
+            {"task_id": 11 if week < 2 else 12, "user_id": 1,
+             "work_date": AS_OF - timedelta(days=7 * week + 2), "hours": 20}
+            for week in range(4)
+        ] + [{"task_id": 11, "user_id": 1, "work_date": AS_OF + timedelta(days=1), "hours": 8}])
+        with engine.begin() as conn:
+            conn.execute(update(tasks_table).where(tasks_table.c.id == 11).values(actual_hours=24))
+
+    def _rows(self, engine):
+        with engine.connect() as conn:
+            return conn.execute(select(forecasts_table).order_by(forecasts_table.c.project_id)).all()
+
+    def test_forecast_projects(self, seeded_engine, monkeypatch):
+        """测试预测写入与重复运行覆盖, 没有工时的项目无完工日期"""
+        self._history(seeded_engine)
+        report = forecast_projects(seeded_engine, AS_OF)
+        assert (report.projects, report.rows_written, report.without_completion_date) == (2, 2, [2])
+        assert forecast_projects(seeded_engine, AS_OF).rows_written == 2
+
+        rows = self._rows(seeded_engine)
+        assert len(rows) == 2
+        project = rows[0]
+        assert (project.history_weeks, float(project.weekly_burn_rate), float(project.actual_hours)) == (4, 20.0, 80.0)
+        # 剩余计划 20h + 60h, 效率系数 24 / 20 = 1.2
+        assert (float(project.efficiency_factor), float(project.remaining_hours)) == (1.2, 96.0)
+        assert float(project.forecast_total_hours) == 176.0
+        assert project.forecast_completion_date == AS_OF + timedelta(days=34)
+        assert project.completion_date_low <= project.forecast_completion_date <= project.completion_date_high
+        assert rows[1].forecast_completion_date is None and float(rows[1].remaining_hours) == 24.0
+
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        client = TestClient(api.app)
+        body = client.get("/api/v1/projects/1/forecast").json()
+        assert body["forecast_completion_date"] == (AS_OF + timedelta(days=34)).isoformat()
+        assert body["forecast_total_hours"] == 176.0
+        assert client.get("/api/v1/projects/99/forecast").status_code == 404
+
+    def test_progress_without_hours(self, seeded_engine):
+        """测试有进度但没有工时的项目按全部项目的系数预测剩余工时, 不判为当天完工"""
+        self._history(seeded_engine)
+        with seeded_engine.begin() as conn:
+            conn.execute(update(Project.__table__).where(Project.__table__.c.id == 2).values(status="in_progress"))
+            conn.execute(update(tasks_table).where(tasks_table.c.id == 21).values(progress_percentage=50))
+        forecast_projects(seeded_engine, AS_OF)
+
+        project = self._rows(seeded_engine)[1]
+        assert (float(project.efficiency_factor), float(project.remaining_hours)) == (1.2, 12.0)
+        assert float(project.forecast_total_hours) == 12.0 and project.forecast_completion_date is None
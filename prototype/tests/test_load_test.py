@@ -0,0 +1,57 @@
+"""
+测试压测工具的请求比例解析与结果汇总
+"""
+
+import pytest
+
+from benchmarks.load_test import SCENARIOS, build_report, format_report, parse_mix
+
+
+class TestParseMix:
+    """测试请求比例解析"""
+
+    def test_weights(self):
+        """测试比例解析, 省略比例时为1"""
+        assert parse_mix("estimate=6, with-similar=3,search") == {"estimate": 6.0, "with-similar": 3.0, "search": 1.0}
+        assert parse_mix("estimate=0.5") == {"estimate": 0.5}
+
+    @pytest.mark.parametrize("mix", [
+        "unknown=1", "estimate=abc", "estimate=-1,search=2", "estimate=0", "estimate=1,", "",
+    ])
+    def test_malformed(self, mix):
+        """测试未知场景、非数字/负数比例与比例全为0"""
+        with pytest.raises(ValueError):
+            parse_mix(mix)
+
+
+class TestReport:
+    """测试结果汇总与对比"""
+
+    def _report(self):
+        latencies = {name: [] for name in SCENARIOS}
+        errors = dict.fromkeys(SCENARIOS, 0)
+        latencies["estimate"] = [0.010, 0.020, 0.030, 0.040]
+        latencies["search"] = [0.100]
+        errors["search"] = 2
+        return build_report(latencies, errors, 2.0, {"concurrency": 4})
+
+    def test_build_report(self):
+        """测试总体与各场景的请求数、错误数与吞吐, 没有请求的场景不列出"""
+        report = self._report()
+        assert report["config"] == {"concurrency": 4}
+        assert (report["total"]["count"], report["total"]["errors"], report["total"]["throughput"]) == (5, 2, 2.5)
+        assert report["total"]["max"] == 100.0
+        assert set(report["endpoints"]) == {"estimate", "search"}
+        estimate = report["endpoints"]["estimate"]
+        assert (estimate["count"], estimate["errors"], estimate["throughput"], estimate["p50"]) == (4, 0, 2.0, 25.0)
+        assert report["endpoints"]["search"]["errors"] == 2
+
+    def test_format_report(self):
+        """测试表格各行与相对基线的变化"""
+        report = self._report()
+        baseline = {"total": {**report["total"], "throughput": 2.0}, "endpoints": {}}
+        lines = format_report(report, baseline).splitlines()
+        assert [line.split()[0] for line in lines] == ["scenario", "total", "estimate", "search"]
+        assert "2.5 (+25.0%)" in lines[1]
+        assert "%" not in lines[2]
+        assert "%" not in format_report(report)
@@ -0,0 +1,141 @@
+"""
+测试机器学习评估模型
+"""
+
+import random
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app.cli import main
+from app.core.ml_estimator import MLEstimator, artifact_name, find_artifact, project_features
+from app.main import app, load_ml_estimator
+from app.models import EstimationModel, Project
+
+
+def _projects(n=300, seed=5):
+    rng = random.Random(seed)
+    projects = []
+    for i in range(1, n + 1):
+        project = {
+            "name": f"历史项目{i}",
+            "project_type": rng.choice(["regulatory_reporting", "data_platform"]),
+            "client_type": rng.choice(["state_owned_bank", "joint_stock", "city_bank"]),
+            "data_sources_count": rng.randint(1, 15),
+            "interface_tables_count": rng.randint(10, 300),
+            "reports_count": rng.randint(0, 30),
+            "custom_requirements_count": rng.randint(0, 8),
+            "data_volume_level": rng.choice(["medium", "large", "very_large"]),
+        }
+        project["actual_hours"] = (
+            400 + project["data_sources_count"] * 120 + project["interface_tables_count"] * 9
+            + project["reports_count"] * 15 + rng.gauss(0, 50)
+        )
+        projects.append(project)
+    return projects
+
+
+TARGET = {
+    "name": "新项目",
+    "project_type": "regulatory_reporting",
+    "client_type": "city_bank",
+    "data_sources_count": 6,
+    "interface_tables_count": 85,
+    "reports_count": 12,
+    "custom_requirements_count": 2,
+    "data_volume_level": "large",
+    "regulation_type": "1104报送",
+}
+
+
+@pytest.fixture(scope="module", params=["gbm", "rf"])
+def trained(request):
+    return MLEstimator.train(_projects(), algorithm=request.param)
+
+
+class TestMLEstimator:
+    """测试训练、预测与模型文件"""
+
+    def test_compiled_matches_sklearn(self, trained):
+        """测试展开后的树集成与 scikit-learn 预测一致"""
+        projects = _projects(50, seed=9) + [TARGET]
+        X = project_features(projects, trained.vocab)
+        expected = np.expm1(trained.model.predict(X))
+        np.testing.assert_allclose(trained.predict(projects), expected, rtol=1e-9)
+        assert trained.metrics["r2_score"] > 0.8
+
+    def test_single_prediction_latency(self, trained):
+        """测试单条预测延迟低于1毫秒"""
+        trained.predict_one(TARGET)
+        started = time.perf_counter()
+        for _ in range(200):
+            trained.predict_one(TARGET)
+        assert (time.perf_counter() - started) / 200 < 0.001
+
+    def test_save_and_load(self, trained, tmp_path):
+        """测试模型文件保存/加载与按版本查找"""
+        for version in ("v1", "v2", "v10"):
+            trained.save(str(tmp_path / artifact_name(version)))
+        (tmp_path / "notes.txt").write_text("x")
+
+        assert find_artifact(str(tmp_path)).endswith("ml_estimator_v10.pkl")
+        assert find_artifact(str(tmp_path), "v2").endswith("ml_estimator_v2.pkl")
+        assert find_artifact(str(tmp_path), "v3") is None
+        assert find_artifact(str(tmp_path / "missing")) is None
+
+        loaded = MLEstimator.load(find_artifact(str(tmp_path), "v2"))
+        assert loaded.predict_one(TARGET) == trained.predict_one(TARGET)
+
+    def test_insufficient_samples(self):
+        """测试训练样本不足时报错"""
+        with pytest.raises(ValueError):
+            MLEstimator.train(_projects(5))
+
+
+class TestMLTrainingJob:
+    """测试训练作业与API集成"""
+
+    def test_cli_trains_versioned_artifacts(self, engine, tmp_path):
+        """测试命令行训练生成递增版本并登记到 estimation_models"""
+        rows = [
+            {**project, "code": f"P{i:03d}", "client_name": "银行", "status": "completed"}
+            for i, project in enumerate(_projects(), start=1)
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), rows)
+
+        url, model_dir = str(engine.url), str(tmp_path / "models")
+        assert main(["--database-url", url, "train-ml", "--model-dir", model_dir]) == 0
+        assert main(["--database-url", url, "train-ml", "--model-dir", model_dir, "--algorithm", "rf"]) == 0
+
+        with engine.connect() as conn:
+            models = conn.execute(select(EstimationModel.__table__).order_by(EstimationModel.__table__.c.id)).all()
+        assert [(m.model_version, m.model_type) for m in models] == [("v1", "gbm"), ("v2", "rf")]
+        assert models[1].adjustment_rules["artifact"] == "ml_estimator_v2.pkl"
+        assert load_ml_estimator(model_dir, None).version == "v2"
+        assert load_ml_estimator(model_dir, "v1").algorithm == "gbm"
+
+    def test_api_uses_loaded_model(self, trained):
+        """测试批量接口与融合评估使用已加载的模型"""
+        client = TestClient(app)
+        previous = app.state.ml_estimator
+        try:
+            app.state.ml_estimator = None
+            assert client.post("/api/v1/estimate/ml", json={"projects": [TARGET]}).status_code == 503
+            response = client.post("/api/v1/estimate/with-similar", json={"target_project": TARGET}).json()
+            assert response["ml_based_estimation"] is None
+            assert response["ensemble_estimation"]["weights"] == {"rule_based": 0.6, "similarity_based": 0.4}
+
+            app.state.ml_estimator = trained
+            response = client.post("/api/v1/estimate/ml", json={"projects": [TARGET, TARGET]}).json()
+            assert response["model_version"] == trained.version
+            assert [r["total_hours"] for r in response["results"]] == [trained.predict_one(TARGET)] * 2
+
+            response = client.post("/api/v1/estimate/with-similar", json={"target_project": TARGET}).json()
+            assert response["ml_based_estimation"]["total_hours"] == trained.predict_one(TARGET)
+            assert set(response["ensemble_estimation"]["weights"]) == {"rule_based", "similarity_based", "ml_based"}
+        finally:
+            app.state.ml_estimator = previous
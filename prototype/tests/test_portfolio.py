@@ -0,0 +1,168 @@
+"""
+测试项目组合蒙特卡洛模拟
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, update
+
+from app.cli import main
+from app.core.estimator import ProjectInfo, estimate_project
+from app.core.portfolio import PortfolioProject, build_model, chunk_plan, simulate_portfolio
+from app.main import app
+from app.models import Project, ProjectMember, User
+from app.services.portfolio_simulation import load_active_portfolio, simulate_active_portfolio
+
+
+PROJECT = ProjectInfo(
+    name="测试项目",
+    project_type="regulatory_reporting",
+    client_type="city_bank",
+    data_sources_count=6,
+    interface_tables_count=85,
+    reports_count=12,
+    custom_requirements_count=2
+)
+
+
+def _portfolio(n=12):
+    return [
+        PortfolioProject.from_estimation(
+            i, f"项目{i}", f"客户{i % 3}",
+            estimate_project(replace(PROJECT, data_sources_count=2 + i % 5, reports_count=i)),
+            hourly_rate=100.0 + 10 * i
+        )
+        for i in range(n)
+    ]
+
+
+class TestPortfolioSimulation:
+    """测试组合抽样与汇总"""
+
+    def test_from_estimation(self):
+        """测试任务工时之和等于项目最可能估算, 三点比例与项目一致"""
+        result = estimate_project(PROJECT)
+        project = PortfolioProject.from_estimation(1, "项目", "客户", result)
+        assert project.most_likely.sum() == pytest.approx(result.most_likely)
+        assert len(project.task_phases) == len(project.most_likely)
+        assert project.optimistic_ratio * result.most_likely == pytest.approx(result.optimistic)
+        assert project.expected_hours == pytest.approx(result.expected, rel=1e-3)
+
+    def test_independent_matches_analytic(self):
+        """测试无相关时均值与PERT期望一致, 组合分布比各项目分位数之和窄"""
+        projects = _portfolio()
+        result = simulate_portfolio(projects, samples=20000, seed=7)
+        assert result.mean_hours == pytest.approx(result.sum_of_expected_hours, rel=2e-3)
+        assert result.mean_cost == pytest.approx(
+            sum(p.expected_hours * p.hourly_rate for p in projects), rel=2e-3
+        )
+        assert result.hours_quantiles["P50"] < result.hours_quantiles["P80"] < result.hours_quantiles["P90"]
+        assert result.hours_quantiles["P90"] < result.sum_of_project_quantiles["P90"]
+
+    def test_correlation_widens_tail(self):
+        """测试客户/阶段相关性使P90上移, 均值不变"""
+        projects = _portfolio()
+        independent = simulate_portfolio(projects, samples=20000, seed=7)
+        correlated = simulate_portfolio(projects, samples=20000, seed=7, correlations={"client": 0.4, "phase": 0.3})
+        spread = lambda r: r.hours_quantiles["P90"] - r.hours_quantiles["P50"]
+        assert spread(correlated) > 2 * spread(independent)
+        assert correlated.mean_hours == pytest.approx(independent.mean_hours, rel=5e-3)
+
+    def test_contributions(self):
+        """测试尾部贡献之和等于组合尾部均值, 按贡献降序"""
+        result = simulate_portfolio(_portfolio(), samples=5000, seed=3, correlations={"client": 0.5})
+        assert sum(item["tail_hours"] for item in result.contributions) == pytest.approx(
+            result.tail_mean_hours, abs=1
+        )
+        assert sum(item["tail_share"] for item in result.contributions) == pytest.approx(1, abs=1e-3)
+        tail = [item["tail_hours"] for item in result.contributions]
+        assert tail == sorted(tail, reverse=True)
+        assert all(item["tail_excess_hours"] > 0 for item in result.contributions)
+
+    def test_deterministic_across_workers(self, monkeypatch):
+        """测试同一种子在不同分块执行方式下结果一致"""
+        monkeypatch.setattr("app.core.portfolio.CELLS_PER_CHUNK", 20000)
+        projects = _portfolio()
+        assert len(chunk_plan(build_model(projects), 3000, 1)) > 1
+        expected = simulate_portfolio(projects, samples=3000, seed=1, correlations={"phase": 0.2})
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            assert simulate_portfolio(projects, samples=3000, seed=1, correlations={"phase": 0.2},
+                                      executor=executor) == expected
+        assert simulate_portfolio(projects, samples=3000, seed=1, correlations={"phase": 0.2},
+                                  workers=2) == expected
+        assert simulate_portfolio(projects, samples=3000, seed=2) != expected
+
+    def test_validation(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError):
+            build_model([])
+        for correlations in ({"team": 0.2}, {"client": 1.0}, {"client": 0.6, "phase": 0.5}, {"phase": -0.1}):
+            with pytest.raises(ValueError):
+                build_model(_portfolio(2), correlations)
+
+        # 没有任务的项目按零工时参与汇总
+        empty = PortfolioProject(9, "空项目", "客户", [], np.zeros(0))
+        result = simulate_portfolio(_portfolio(2) + [empty], samples=500, seed=1)
+        assert result.projects == 3
+        assert [item["tail_hours"] for item in result.contributions if item["project_id"] == 9] == [0]
+
+
+class TestPortfolioJob:
+    """测试在建项目模拟作业与接口"""
+
+    def test_load_and_simulate(self, seeded_engine, capsys):
+        """测试加载在建项目、成员加权时薪与命令行输出"""
+        with seeded_engine.begin() as conn:
+            conn.execute(update(User.__table__).where(User.__table__.c.id == 1).values(hourly_rate=200))
+            conn.execute(update(User.__table__).where(User.__table__.c.id == 2).values(hourly_rate=100))
+            conn.execute(update(ProjectMember.__table__).where(ProjectMember.__table__.c.user_id == 1)
+                         .values(allocation_percentage=50))
+            conn.execute(insert(Project.__table__), [
+                {"id": 3, "name": "项目C", "code": "P3", "project_type": "regulatory_reporting",
+                 "client_name": "A银行", "status": "completed"},
+            ])
+        with seeded_engine.connect() as conn:
+            projects = load_active_portfolio(conn)
+        assert [p.project_id for p in projects] == [1, 2]
+        assert projects[0].hourly_rate == pytest.approx((200 * 50 + 100 * 100) / 150)
+        assert projects[1].hourly_rate == 100
+
+        result = simulate_active_portfolio(seeded_engine, samples=1000, seed=1)
+        assert result.projects == 2
+
+        url = str(seeded_engine.url)
+        assert main(["--database-url", url, "simulate-portfolio", "--samples", "500",
+                     "--client-correlation", "0.3", "--seed", "1"]) == 0
+        output = capsys.readouterr().out
+        assert "P90" in output and "[1] 项目A" in output
+        assert main(["--database-url", url, "simulate-portfolio", "--phase-correlation", "1.5"]) == 1
+
+    def test_no_active_projects(self, engine):
+        """测试没有在建项目时报错"""
+        with pytest.raises(ValueError):
+            simulate_active_portfolio(engine)
+
+    def test_api(self):
+        """测试组合模拟接口"""
+        client = TestClient(app)
+        project = {
+            "name": "测试项目", "project_type": "regulatory_reporting", "client_type": "city_bank",
+            "data_sources_count": 6, "interface_tables_count": 85, "reports_count": 12,
+        }
+        payload = {
+            "projects": [{**project, "client_name": "A银行"}, {**project, "project_id": 7, "hourly_rate": 150}],
+            "samples": 2000, "correlations": {"client": 0.3}, "seed": 5,
+        }
+        response = client.post("/api/v1/portfolio/simulation", json=payload)
+        assert response.status_code == 200
+        body = response.json()
+        assert set(body["hours_quantiles"]) == {"P50", "P80", "P90"}
+        assert {item["project_id"] for item in body["contributions"]} == {1, 7}
+        assert client.post("/api/v1/portfolio/simulation", json=payload).json() == body
+
+        for invalid in ({"correlations": {"team": 0.1}}, {"quantiles": [1.5]}, {"samples": 10}):
+            assert client.post("/api/v1/portfolio/simulation", json={**payload, **invalid}).status_code == 422
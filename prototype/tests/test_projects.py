@@ -0,0 +1,170 @@
+"""
+测试项目增删改查与键集分页
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, text
+
+from app import main as api
+from app.models import Project, ProjectMonthlyCost, UserWeeklyHours, WBSTask
+from app.services.projects import (
+    ProjectConflictError, create_project, decode_cursor, delete_project, list_projects, update_project
+)
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheets import create_timesheets
+
+
+def _seed_projects(engine, count=23):
+    """每3个项目共用一个 updated_at, 用于检查同一时间戳下的翻页"""
+    base = datetime(2025, 1, 1, 9, 0, 0)
+    rows = [
+        {
+            "id": 100 + i, "name": f"项目{i}", "code": f"K{i}", "client_name": "银行",
+            "project_type": "regulatory_reporting" if i % 2 else "data_platform",
+            "status": "active" if i % 3 else "planning",
+            "client_type": "bank",
+            "updated_at": base + timedelta(minutes=i // 3),
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Project.__table__), rows)
+    return rows
+
+
+def _all_pages(engine, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = list_projects(engine, limit=limit, cursor=cursor, **filters)
+        assert len(page["projects"]) <= limit
+        ids.extend(project["id"] for project in page["projects"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+class TestProjectPagination:
+    """测试键集分页"""
+
+    def test_pages_cover_all_rows_once(self, engine):
+        """测试逐页遍历不重复、不遗漏, 顺序为 (updated_at, id) 倒序"""
+        rows = _seed_projects(engine)
+        expected = [row["id"] for row in sorted(rows, key=lambda r: (r["updated_at"], r["id"]), reverse=True)]
+
+        for limit in (1, 4, 5, 23, 100):
+            assert _all_pages(engine, limit) == expected
+
+        active = [pid for pid in expected if (pid - 100) % 3]
+        assert _all_pages(engine, 4, status="active") == active
+        assert _all_pages(engine, 4, status="active", project_type="data_platform") == [
+            pid for pid in active if (pid - 100) % 2 == 0
+        ]
+        assert _all_pages(engine, 4, client_type="insurance") == []
+
+    def test_sparse_fields_and_cursor(self, engine):
+        """测试稀疏字段与游标校验"""
+        _seed_projects(engine, 6)
+        page = list_projects(engine, fields=["name", "status"], limit=2)
+        assert [set(project) for project in page["projects"]] == [{"id", "name", "status"}] * 2
+        assert decode_cursor(page["next_cursor"])[1] == page["projects"][-1]["id"]
+
+        with pytest.raises(ValueError):
+            list_projects(engine, fields=["password"])
+        with pytest.raises(ValueError):
+            list_projects(engine, cursor="not-a-cursor")
+
+    def test_query_plan_uses_index_order(self, engine):
+        """测试分页查询按索引顺序读取, 不对全表排序"""
+        _seed_projects(engine)
+        for where in (
+            "",
+            "WHERE status = 'active' ",
+            "WHERE project_type = 'data_platform' ",
+            "WHERE status = 'active' AND project_type = 'data_platform' AND client_type = 'bank' ",
+        ):
+            with engine.connect() as conn:
+                plan = " ".join(row[-1] for row in conn.execute(text(
+                    "EXPLAIN QUERY PLAN SELECT id FROM projects " + where +
+                    "ORDER BY updated_at DESC, id DESC LIMIT 51"
+                )))
+            assert "TEMP B-TREE" not in plan
+
+
+class TestProjectWrites:
+    """测试创建、修改与删除"""
+
+    def test_create_update_conflict(self, seeded_engine):
+        """测试创建/修改刷新 updated_at, 编码重复时报冲突"""
+        project = create_project(seeded_engine, {
+            "name": "项目C", "code": "P3", "project_type": "data_platform", "client_name": "C银行",
+            "budget_amount": 500000,
+        })
+        assert project["status"] == "planning" and project["updated_at"] is not None
+        assert list_projects(seeded_engine, limit=1)["projects"][0]["id"] == project["id"]
+
+        updated = update_project(seeded_engine, 1, {"status": "active"})
+        assert updated["status"] == "active" and updated["name"] == "项目A"
+        assert list_projects(seeded_engine, limit=1)["projects"][0]["id"] == 1
+
+        with pytest.raises(ProjectConflictError):
+            update_project(seeded_engine, 1, {"code": "P3"})
+        with pytest.raises(ValueError):
+            update_project(seeded_engine, 1, {"id": 5})
+        assert update_project(seeded_engine, 99, {"status": "active"}) is None
+
+    def test_delete_keeps_rollups_consistent(self, seeded_engine):
+        """测试删除项目时级联删除并扣除周工时汇总"""
+        rebuild_statistics(seeded_engine)
+        create_timesheets(seeded_engine, [
+            {"task_id": 11, "user_id": 1, "work_date": date(2025, 1, 6), "hours": 8},
+            {"task_id": 21, "user_id": 2, "work_date": date(2025, 1, 6), "hours": 5},
+        ])
+
+        assert delete_project(seeded_engine, 2)
+        assert not delete_project(seeded_engine, 2)
+        with seeded_engine.connect() as conn:
+            weekly = {row.user_id: float(row.hours) for row in conn.execute(select(UserWeeklyHours.__table__))}
+            costs = conn.execute(select(ProjectMonthlyCost.__table__.c.project_id)).scalars().all()
+            tasks = conn.execute(select(WBSTask.__table__.c.id)).scalars().all()
+        assert weekly == {1: 8.0, 2: 0.0}
+        assert costs == [1] and sorted(tasks) == [11, 12]
+        assert check_statistics(seeded_engine) == []
+
+
+class TestProjectEndpoints:
+    """测试项目接口"""
+
+    def test_endpoints(self, seeded_engine, monkeypatch):
+        """测试列表翻页、字段选择、增删改及错误状态码"""
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        client = TestClient(api.app)
+
+        body = client.get("/api/v1/projects", params={"limit": 1, "fields": "code"}).json()
+        assert len(body["projects"]) == 1 and set(body["projects"][0]) == {"id", "code"}
+        second = client.get("/api/v1/projects", params={"limit": 1, "cursor": body["next_cursor"]}).json()
+        assert second["next_cursor"] is None
+        assert {body["projects"][0]["id"], second["projects"][0]["id"]} == {1, 2}
+        assert client.get("/api/v1/projects", params={"fields": "secret"}).status_code == 422
+        assert client.get("/api/v1/projects", params={"cursor": "xyz"}).status_code == 422
+        assert client.get("/api/v1/projects", params={"limit": 0}).status_code == 422
+
+        payload = {"name": "项目C", "code": "P3", "project_type": "data_platform", "client_name": "C银行"}
+        response = client.post("/api/v1/projects", json=payload)
+        assert response.status_code == 201
+        project_id = response.json()["id"]
+        assert client.post("/api/v1/projects", json=payload).status_code == 409
+        assert client.post("/api/v1/projects", json={"name": "缺少编码"}).status_code == 422
+
+        response = client.put(f"/api/v1/projects/{project_id}", json={"priority": "high"})
+        assert response.status_code == 200 and response.json()["priority"] == "high"
+        assert client.get(f"/api/v1/projects/{project_id}", params={"fields": "priority"}).json() == {
+            "id": project_id, "priority": "high"
+        }
+        assert client.put("/api/v1/projects/999", json={"priority": "high"}).status_code == 404
+
+        assert client.delete(f"/api/v1/projects/{project_id}").status_code == 204
+        assert client.delete(f"/api/v1/projects/{project_id}").status_code == 404
+        assert client.get(f"/api/v1/projects/{project_id}").status_code == 404
@@ -0,0 +1,152 @@
+"""
+测试WBS工时与进度上卷
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, select, update
+
+from app.core.rollup import WBSRollup
+from app.models import Project, WBSTask
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheets import create_timesheets, review_timesheets
+from app.services import wbs_rollup
+from app.services.wbs_rollup import load_rollup, rollup_project, rollup_projects
+
+
+tasks_table = WBSTask.__table__
+projects_table = Project.__table__
+
+
+def _tree():
+    """1 -> (2 -> (4, 5), 3)"""
+    return WBSRollup(
+        ids=[1, 2, 3, 4, 5],
+        parent_ids=[None, 1, 1, 2, 2],
+        estimated=[999, 999, 30, 10, 60],
+        actual=[1, 2, 5, 4, 8],
+        progress=[0, 0, 100, 50, 0],
+    )
+
+
+class TestWBSRollup:
+    """测试向量化上卷与增量更新"""
+
+    def test_rollup_values(self):
+        """测试汇总任务的预估工时只计叶子、实际工时含本身、进度按预估加权"""
+        rollup = _tree()
+        assert rollup.is_leaf.tolist() == [False, False, True, True, True]
+        assert rollup.estimated.tolist() == [100, 70, 30, 10, 60]
+        assert rollup.actual.tolist() == [20, 14, 5, 4, 8]
+        np.testing.assert_allclose(rollup.progress, [35, 5 / 70 * 100, 100, 50, 0])
+        assert rollup.chain(3) == [3, 1, 0]
+
+    def test_update_walks_ancestor_chain(self):
+        """测试单个叶子变化只更新祖先链, 结果与全量重算一致"""
+        rng = np.random.default_rng(7)
+        n = 500
+        parent_ids = [None] + [int(rng.integers(1, i + 1)) for i in range(1, n)]
+        rollup = WBSRollup(range(1, n + 1), parent_ids, rng.random(n) * 10,
+                           rng.random(n) * 10, rng.random(n) * 100)
+        leaves = rollup.ids[rollup.is_leaf]
+        for task_id in rng.choice(leaves, 50):
+            before = rollup.actual.copy()
+            chain = rollup.update_task(int(task_id), estimated=5.0, actual=3.0, progress=40.0)
+            unchanged = np.setdiff1d(np.arange(n), chain)
+            assert np.array_equal(rollup.actual[unchanged], before[unchanged])
+
+        rebuilt = WBSRollup(rollup.ids, parent_ids, rollup.own_estimated, rollup.own_actual, rollup.own_progress)
+        np.testing.assert_allclose(rollup.estimated, rebuilt.estimated)
+        np.testing.assert_allclose(rollup.actual, rebuilt.actual)
+        np.testing.assert_allclose(rollup.progress, rebuilt.progress)
+
+    def test_summary_task_and_cycle(self):
+        """测试汇总任务只能修改实际工时, 循环引用报错"""
+        rollup = _tree()
+        rollup.update_task(2, actual=6)
+        assert rollup.actual[0] == 24
+        with pytest.raises(ValueError):
+            rollup.update_task(2, progress=10)
+        with pytest.raises(ValueError):
+            WBSRollup([1, 2, 3], [3, 1, 2], [1, 1, 1], [0, 0, 0], [0, 0, 0])
+
+
+class TestRollupJob:
+    """测试上卷回写"""
+
+    def _add_phase(self, engine):
+        with engine.begin() as conn:
+            conn.execute(insert(tasks_table).values(
+                id=10, project_id=1, wbs_code="1", task_name="阶段1", task_level=1, task_type="phase"
+            ))
+            conn.execute(update(tasks_table).where(tasks_table.c.id.in_([11, 12])).values(parent_task_id=10))
+            conn.execute(update(tasks_table).where(tasks_table.c.id == 11).values(progress_percentage=50))
+        rebuild_statistics(engine)
+
+    def _task(self, engine, task_id):
+        with engine.connect() as conn:
+            return conn.execute(select(tasks_table).where(tasks_table.c.id == task_id)).first()
+
+    def test_timesheets_roll_up(self, seeded_engine):
+        """测试工时写入后汇总任务与项目工时同步, 统计不重复计算"""
+        self._add_phase(seeded_engine)
+        # 任务树结构变化后先全量上卷, 之后的工时写入只增量更新实际工时
+        with seeded_engine.begin() as conn:
+            rollup_project(conn, 1)
+        create_timesheets(seeded_engine, [
+            {"task_id": 11, "user_id": 1, "work_date": date(2025, 1, 6), "hours": 8},
+            {"task_id": 12, "user_id": 2, "work_date": date(2025, 1, 6), "hours": 4},
+            {"task_id": 10, "user_id": 1, "work_date": date(2025, 1, 7), "hours": 2},
+        ])
+
+        phase = self._task(seeded_engine, 10)
+        assert (float(phase.estimated_hours), float(phase.actual_hours)) == (100.0, 14.0)
+        assert float(phase.progress_percentage) == 20.0
+        with seeded_engine.connect() as conn:
+            project = conn.execute(select(projects_table).where(projects_table.c.id == 1)).first()
+        assert float(project.actual_hours) == 14.0
+        assert check_statistics(seeded_engine) == []
+
+    def test_writes_only_changed_rows(self, seeded_engine, monkeypatch):
+        """测试只回写值有变化的汇总任务, 无变化时不写"""
+        self._add_phase(seeded_engine)
+        with seeded_engine.begin() as conn:
+            assert rollup_project(conn, 1) == 1
+            assert rollup_project(conn, 1) == 0
+            assert rollup_project(conn, 2) == 0
+
+        loaded = []
+        monkeypatch.setattr(wbs_rollup, "load_rollup",
+                            lambda conn, project_id: loaded.append(project_id) or load_rollup(conn, project_id))
+        report = rollup_projects(seeded_engine)
+        assert (report.projects, report.tasks, report.summary_tasks, report.rows_written) == (2, 4, 1, 0)
+        # 每个项目的任务树只加载一次
+        assert loaded == [1, 2]
+        assert float(self._task(seeded_engine, 10).progress_percentage) == 20.0
+
+    def test_timesheet_writes_update_chains(self, seeded_engine, monkeypatch):
+        """测试工时写入与驳回只沿祖先链增量更新, 不加载整个项目, 结果与全量上卷一致"""
+        self._add_phase(seeded_engine)
+        with seeded_engine.begin() as conn:
+            rollup_project(conn, 1)
+
+        def full_load(conn, project_id):
+            raise AssertionError("工时写入不应加载整个项目")
+
+        monkeypatch.setattr(wbs_rollup, "load_rollup", full_load)
+        created = create_timesheets(seeded_engine, [
+            {"task_id": 11, "user_id": 1, "work_date": date(2025, 1, 6), "hours": 8},
+            {"task_id": 12, "user_id": 2, "work_date": date(2025, 1, 6), "hours": 4},
+            {"task_id": 10, "user_id": 1, "work_date": date(2025, 1, 7), "hours": 2},
+        ])
+        review_timesheets(seeded_engine, "reject", ids=created.ids[:1])
+        assert [float(self._task(seeded_engine, task_id).actual_hours) for task_id in (10, 11, 12)] == [6.0, 0.0, 4.0]
+        with seeded_engine.connect() as conn:
+            project = conn.execute(select(projects_table).where(projects_table.c.id == 1)).first()
+        assert float(project.actual_hours) == 6.0
+
+        monkeypatch.undo()
+        with seeded_engine.begin() as conn:
+            assert rollup_project(conn, 1) == 0
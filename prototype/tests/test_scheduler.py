@@ -0,0 +1,188 @@
+"""
+测试关键路径进度计算
+"""
+
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, select
+
+from app.cli import main
+from app.core.scheduler import (
+    ScheduleCycleError, critical_path_schedule, durations_from_hours, schedule_dates
+)
+from app.models import Project, TaskDependency, WBSTask
+from app.services.scheduling import schedule_project
+
+
+class TestCriticalPath:
+    """测试正推/逆推与时差"""
+
+    def test_finish_to_start(self):
+        """测试经典FS网络的最早/最晚时间、时差与关键路径"""
+        result = critical_path_schedule(
+            [1, 2, 3, 4, 5], [3, 4, 2, 5, 1],
+            [1, 1, 2, 3, 4], [2, 3, 4, 4, 5]
+        )
+        assert result.early_start.tolist() == [0, 3, 3, 7, 12]
+        assert result.late_start.tolist() == [0, 3, 5, 7, 12]
+        assert result.total_float.tolist() == [0, 0, 2, 0, 0]
+        assert result.free_float.tolist() == [0, 0, 2, 0, 0]
+        assert result.project_duration == 13
+        assert result.critical_path == [1, 2, 4, 5]
+
+    def test_dependency_types_and_lags(self):
+        """测试SS/FF/SF依赖与滞后天数"""
+        result = critical_path_schedule(
+            ["A", "B", "C", "D"], [5, 3, 4, 2],
+            ["A", "A", "A"], ["B", "C", "D"], ["SS", "FF", "SF"], [2, 1, 0]
+        )
+        assert result.early_start.tolist() == [0, 2, 2, 0]
+        assert result.early_finish.tolist() == [5, 5, 6, 2]
+        assert result.project_duration == 6
+        assert result.total_float.tolist() == [0, 1, 0, 4]
+        assert result.critical_path == ["A", "C"]
+
+    def test_cycle_detection(self):
+        """测试循环依赖报出环上的任务"""
+        with pytest.raises(ScheduleCycleError) as e:
+            critical_path_schedule([1, 2, 3, 4], [1, 1, 1, 1], [1, 2, 3, 4], [2, 3, 4, 2])
+        assert set(e.value.cycle) == {2, 3, 4} and e.value.cycle[0] == e.value.cycle[-1]
+
+        with pytest.raises(ValueError):
+            critical_path_schedule([1], [1], [1], [9])
+        with pytest.raises(ValueError):
+            critical_path_schedule([1, 2], [1, 1], [1], [2], ["XX"])
+
+    def test_calendar(self):
+        """测试工期换算与工作日历 (跳过周末与节假日)"""
+        assert durations_from_hours([16, 17, None, 0, 40], [False, False, False, False, True]).tolist() == \
+            [2, 3, 1, 1, 0]
+        result = critical_path_schedule([1, 2, 3], [3, 2, 0], [1, 2], [2, 3])
+        starts, finishes = schedule_dates(result, date(2026, 10, 16), holidays=[date(2026, 10, 21)])
+        assert starts.astype(object).tolist() == [date(2026, 10, 16), date(2026, 10, 22), date(2026, 10, 26)]
+        assert finishes.astype(object).tolist() == [date(2026, 10, 20), date(2026, 10, 23), date(2026, 10, 26)]
+
+    def test_scales_linearly(self):
+        """测试10万任务的随机网络在秒级完成"""
+        rng = np.random.default_rng(1)
+        n = 100_000
+        successors = np.repeat(np.arange(1, n), 2)
+        predecessors = (rng.random(len(successors)) * successors).astype(np.int64)
+        started = time.perf_counter()
+        result = critical_path_schedule(
+            range(n), rng.integers(0, 10, n), predecessors.tolist(), successors.tolist()
+        )
+        assert time.perf_counter() - started < 5
+        assert (result.total_float >= 0).all() and (result.free_float <= result.total_float).all()
+        critical = np.isin(np.arange(n), result.critical_path)
+        assert result.early_finish[critical].max() == result.project_duration
+
+
+class TestScheduleJob:
+    """测试排期作业与回写"""
+
+    def _seed(self, engine, cycle=False):
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), [{
+                "id": 1, "name": "项目A", "code": "P1", "project_type": "regulatory_reporting",
+                "client_name": "A银行", "planned_start_date": date(2026, 11, 2),
+            }])
+            defaults = {"parent_task_id": None, "estimated_hours": None, "is_milestone": False}
+            conn.execute(insert(WBSTask.__table__), [{**defaults, **row} for row in [
+                {"id": 1, "project_id": 1, "wbs_code": "1", "task_name": "需求", "task_level": 1},
+                {"id": 2, "project_id": 1, "parent_task_id": 1, "wbs_code": "1.1", "task_name": "调研",
+                 "task_level": 2, "estimated_hours": 24},
+                {"id": 3, "project_id": 1, "parent_task_id": 1, "wbs_code": "1.2", "task_name": "分析",
+                 "task_level": 2, "estimated_hours": 16},
+                {"id": 4, "project_id": 1, "wbs_code": "2", "task_name": "开发", "task_level": 1,
+                 "estimated_hours": 40},
+                {"id": 5, "project_id": 1, "wbs_code": "3", "task_name": "评审", "task_level": 1,
+                 "estimated_hours": 8},
+                {"id": 6, "project_id": 1, "wbs_code": "4", "task_name": "上线", "task_level": 1,
+                 "is_milestone": True},
+            ]])
+            conn.execute(insert(TaskDependency.__table__), [{"lag_days": 0, **row} for row in [
+                {"predecessor_task_id": 2, "successor_task_id": 3},
+                # 汇总任务作为前置任务: 展开为其下全部叶子任务
+                {"predecessor_task_id": 1, "successor_task_id": 4},
+                {"predecessor_task_id": 2, "successor_task_id": 5, "lag_days": 1},
+                {"predecessor_task_id": 4, "successor_task_id": 6},
+                {"predecessor_task_id": 5, "successor_task_id": 6},
+            ] + ([{"predecessor_task_id": 6, "successor_task_id": 2}] if cycle else [])])
+
+    def _tasks(self, engine):
+        with engine.connect() as conn:
+            rows = conn.execute(select(WBSTask.__table__).order_by(WBSTask.__table__.c.id))
+            return {row.id: row for row in rows}
+
+    def test_schedule_and_write_back(self, engine):
+        """测试排期结果回写, 汇总任务取下属任务范围, 重复执行不再写入"""
+        self._seed(engine)
+        schedule = schedule_project(engine, 1, write=False)
+        assert schedule.rows_written == 0 and self._tasks(engine)[2].planned_start_date is None
+
+        schedule = schedule_project(engine, 1)
+        assert schedule.start_date == date(2026, 11, 2)
+        assert schedule.duration_days == 10 and schedule.finish_date == date(2026, 11, 16)
+        assert schedule.critical_path == [2, 3, 4, 6] and schedule.rows_written == 6
+
+        tasks = self._tasks(engine)
+        assert (tasks[2].planned_start_date, tasks[2].planned_end_date) == (date(2026, 11, 2), date(2026, 11, 4))
+        assert (tasks[4].planned_start_date, tasks[4].planned_end_date) == (date(2026, 11, 9), date(2026, 11, 13))
+        assert (tasks[1].planned_start_date, tasks[1].planned_end_date) == (date(2026, 11, 2), date(2026, 11, 6))
+        assert tasks[1].is_critical and tasks[5].total_float_days == 5 and not tasks[5].is_critical
+        assert tasks[6].planned_start_date == tasks[6].planned_end_date == date(2026, 11, 16)
+
+        assert schedule_project(engine, 1).rows_written == 0
+        assert schedule_project(engine, 1, start_date=date(2026, 11, 9)).rows_written == 6
+
+    def test_cli(self, engine, capsys):
+        """测试命令行排期与循环依赖"""
+        url = str(engine.url)
+        assert main(["--database-url", url, "schedule-project", "1"]) == 1
+        self._seed(engine, cycle=True)
+        assert main(["--database-url", url, "schedule-project", "1"]) == 2
+        assert "循环" in capsys.readouterr().out
+        assert self._tasks(engine)[2].planned_start_date is None
+
+    def test_summary_dependencies_scale(self, engine):
+        """测试汇总任务之间的依赖经过开始/完成节点, 不按叶子两两展开; 约束汇总任务完成的FF依赖作用于各下级"""
+        n = 5000
+        with engine.begin() as conn:
+            conn.execute(insert(Project.__table__), [{
+                "id": 1, "name": "项目A", "code": "P1", "project_type": "regulatory_reporting",
+                "client_name": "A银行", "planned_start_date": date(2026, 11, 2),
+            }])
+            phases = [
+                {"id": 1, "wbs_code": "1", "task_name": "阶段A", "task_level": 1, "estimated_hours": None},
+                {"id": 2, "wbs_code": "2", "task_name": "阶段B", "task_level": 1, "estimated_hours": None},
+                {"id": 3, "wbs_code": "3", "task_name": "验收", "task_level": 1, "estimated_hours": 40},
+            ]
+            leaves = [
+                {"id": 10 + i, "parent_task_id": 1 + i // n, "wbs_code": f"{1 + i // n}.{i % n + 1}",
+                 "task_name": f"任务{i}", "task_level": 2, "estimated_hours": 8}
+                for i in range(2 * n)
+            ]
+            conn.execute(insert(WBSTask.__table__), [
+                {"project_id": 1, "parent_task_id": None, "is_milestone": False, **row} for row in phases + leaves
+            ])
+            conn.execute(insert(TaskDependency.__table__), [
+                {"predecessor_task_id": 1, "successor_task_id": 2, "dependency_type": "FS", "lag_days": 0},
+                {"predecessor_task_id": 3, "successor_task_id": 2, "dependency_type": "FF", "lag_days": 0},
+            ])
+
+        started = time.perf_counter()
+        schedule = schedule_project(engine, 1)
+        assert time.perf_counter() - started < 10
+        assert (schedule.tasks, schedule.dependencies, schedule.duration_days) == (2 * n + 1, 2, 5)
+        assert schedule.critical_path[0] == 3 and len(schedule.critical_path) == n + 1
+
+        tasks = self._tasks(engine)
+        assert (tasks[1].planned_start_date, tasks[1].planned_end_date) == (date(2026, 11, 2), date(2026, 11, 2))
+        assert tasks[10].total_float_days == 3 and not tasks[1].is_critical
+        # 阶段B的叶子在阶段A完成后开始, 且不早于验收完成
+        assert (tasks[2].planned_start_date, tasks[2].planned_end_date) == (date(2026, 11, 6), date(2026, 11, 6))
+        assert tasks[10 + n].planned_start_date == date(2026, 11, 6) and tasks[2].is_critical
@@ -0,0 +1,93 @@
+"""
+测试相似项目离线预计算
+"""
+
+import random
+
+from sqlalchemy import insert, select, update
+
+from app.models import Project, SimilarProject
+from app.services.similar_projects import (
+    load_similar_projects, precompute_similar_projects, refresh_similar_projects
+)
+
+
+def _seed_projects(engine, n=40, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        completed = i % 4 != 0
+        rows.append({
+            "id": i,
+            "name": f"项目{i}",
+            "code": f"P{i:03d}",
+            "project_type": "regulatory_reporting" if i % 3 else "data_platform",
+            "client_name": "银行",
+            "client_type": rng.choice(["state_owned_bank", "joint_stock", "city_bank"]),
+            "data_sources_count": rng.randint(1, 12),
+            "interface_tables_count": rng.randint(10, 200),
+            "reports_count": rng.randint(1, 25),
+            "custom_requirements_count": rng.randint(0, 5),
+            "complexity_score": round(rng.uniform(3, 8), 1),
+            "status": "completed" if completed else "in_progress",
+            "actual_hours": rng.uniform(500, 3000) if completed else None,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Project.__table__), rows)
+
+
+def _snapshot(engine):
+    with engine.connect() as conn:
+        return {
+            (row.target_project_id, row.similar_project_id): float(row.similarity_score)
+            for row in conn.execute(select(SimilarProject.__table__))
+        }
+
+
+class TestSimilarProjectsJob:
+    """测试 similar_projects 预计算作业"""
+
+    def test_precompute_blocks_by_type(self, engine):
+        """测试全量预计算按类型分块并排除自身"""
+        _seed_projects(engine)
+
+        report = precompute_similar_projects(engine, top_k=3)
+
+        assert report.targets == 40
+        assert report.blocks == 2
+        assert report.rows_written == 40 * 3
+
+        with engine.connect() as conn:
+            types = dict(conn.execute(select(Project.__table__.c.id, Project.__table__.c.project_type)).all())
+            statuses = dict(conn.execute(select(Project.__table__.c.id, Project.__table__.c.status)).all())
+            top = load_similar_projects(conn, 1, top_k=3)
+
+        for target, similar in _snapshot(engine):
+            assert target != similar
+            assert types[target] == types[similar]
+            assert statuses[similar] == "completed"
+        assert [row["similarity_score"] for row in top] == sorted((row["similarity_score"] for row in top), reverse=True)
+
+        # 重复执行结果不变
+        before = _snapshot(engine)
+        precompute_similar_projects(engine, top_k=3)
+        assert _snapshot(engine) == before
+
+    def test_incremental_refresh_matches_full_recompute(self, engine):
+        """测试单个项目变更后的增量更新与全量重算一致"""
+        _seed_projects(engine)
+        precompute_similar_projects(engine, top_k=3)
+
+        projects = Project.__table__
+        with engine.begin() as conn:
+            # 项目2规模调整; 项目4完工成为新的历史参考; 项目5改变项目类型
+            conn.execute(update(projects).where(projects.c.id == 2).values(interface_tables_count=15, reports_count=2))
+            conn.execute(update(projects).where(projects.c.id == 4).values(status="completed", actual_hours=1200))
+            conn.execute(update(projects).where(projects.c.id == 5).values(project_type="data_platform"))
+
+        report = refresh_similar_projects(engine, [2, 4, 5], top_k=3)
+        assert 0 < report.targets < 40
+        incremental = _snapshot(engine)
+
+        precompute_similar_projects(engine, top_k=3)
+        assert incremental == _snapshot(engine)
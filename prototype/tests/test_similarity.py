@@ -0,0 +1,179 @@
+"""
+测试相似项目匹配算法
+"""
+
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.similarity import HistoricalProject, ProjectSimilarityMatcher, default_cluster_count
+from app.main import app
+
+
+def _random_projects(n, seed=7):
+    rng = random.Random(seed)
+    types = ["regulatory_reporting", "data_platform", "risk_management"]
+    clients = ["state_owned_bank", "joint_stock", "city_bank"]
+    return [
+        HistoricalProject(
+            id=i,
+            name=f"历史项目{i}",
+            project_type=rng.choice(types),
+            client_type=rng.choice(clients),
+            data_sources_count=rng.randint(0, 12),
+            interface_tables_count=rng.randint(0, 200),
+            reports_count=rng.randint(0, 25),
+            custom_requirements_count=rng.randint(0, 6),
+            complexity_score=round(rng.uniform(2, 9), 1),
+            actual_hours=rng.uniform(500, 3000),
+            variance_percentage=rng.uniform(-10, 20)
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+TARGET = {
+    "project_type": "regulatory_reporting",
+    "client_type": "city_bank",
+    "data_sources_count": 6,
+    "interface_tables_count": 85,
+    "reports_count": 12,
+    "custom_requirements_count": 2,
+    "complexity_score": 5.5
+}
+
+
+class TestProjectSimilarityMatcher:
+    """测试相似度匹配器"""
+
+    @pytest.mark.parametrize("method", ["hybrid", "cosine", "euclidean"])
+    def test_vectorized_matches_pairwise(self, method):
+        """测试向量化计算与逐对计算结果一致"""
+        projects = _random_projects(200)
+        matcher = ProjectSimilarityMatcher(projects)
+
+        expected = sorted(
+            (matcher._calculate_similarity(TARGET, p, method) for p in projects),
+            key=lambda x: x.similarity_score,
+            reverse=True
+        )[:10]
+        actual = matcher.find_similar_projects(TARGET, top_k=10, method=method)
+
+        assert [(r.project.id, r.similarity_score, r.scale_similarity) for r in actual] == \
+            [(r.project.id, r.similarity_score, r.scale_similarity) for r in expected]
+
+    def test_top_k_matrix_excludes_self(self):
+        """测试批量Top-K排除自身"""
+        projects = _random_projects(50)
+        matcher = ProjectSimilarityMatcher(projects)
+        targets = [
+            {
+                "project_type": p.project_type,
+                "client_type": p.client_type,
+                "data_sources_count": p.data_sources_count,
+                "interface_tables_count": p.interface_tables_count,
+                "reports_count": p.reports_count,
+                "custom_requirements_count": p.custom_requirements_count,
+                "complexity_score": p.complexity_score
+            }
+            for p in projects[:5]
+        ]
+
+        indices, scores = matcher.top_k_matrix(targets, top_k=3, target_ids=[p.id for p in projects[:5]])
+
+        assert indices.shape == (5, 3)
+        for row, project in enumerate(projects[:5]):
+            assert project.id not in [projects[i].id for i in indices[row]]
+            assert list(scores["total"][row]) == sorted(scores["total"][row], reverse=True)
+
+    def test_empty_history(self):
+        """测试无历史项目"""
+        assert ProjectSimilarityMatcher([]).find_similar_projects(TARGET) == []
+
+
+def _random_targets(n, seed=11):
+    rng = random.Random(seed)
+    return [
+        {
+            # 含一个历史中不存在的项目类型
+            "project_type": rng.choice(["regulatory_reporting", "data_platform", "risk_management", "new_type"]),
+            "client_type": rng.choice(["state_owned_bank", "joint_stock", "city_bank"]),
+            "data_sources_count": rng.randint(0, 15),
+            "interface_tables_count": rng.randint(0, 250),
+            "reports_count": rng.randint(0, 30),
+            "custom_requirements_count": rng.randint(0, 6),
+            "complexity_score": round(rng.uniform(1, 10), 1)
+        }
+        for _ in range(n)
+    ]
+
+
+class TestClusterPruning:
+    """测试聚类剪枝检索"""
+
+    def _key(self, results):
+        return [
+            (r.project.id, r.similarity_score, r.categorical_similarity, r.scale_similarity, r.complexity_similarity)
+            for r in results
+        ]
+
+    @pytest.mark.parametrize("top_k", [1, 5, 30])
+    def test_matches_full_scan(self, top_k):
+        """测试剪枝结果与全量计算完全一致 (含同分排序)"""
+        projects = _random_projects(3000)
+        full = ProjectSimilarityMatcher(projects)
+        clustered = ProjectSimilarityMatcher(projects, n_clusters=default_cluster_count(len(projects)))
+
+        for target in _random_targets(40) + [TARGET]:
+            assert self._key(clustered.find_similar_projects(target, top_k=top_k)) == \
+                self._key(full.find_similar_projects(target, top_k=top_k))
+
+    def test_prunes_large_history(self):
+        """测试大规模历史项目时只计算一小部分项目"""
+        projects = _random_projects(20000)
+        matcher = ProjectSimilarityMatcher(projects, n_clusters=default_cluster_count(len(projects)))
+        visited = [matcher._pruned_top_k(target, 10)[2] for target in _random_targets(20)]
+        assert sum(visited) / len(visited) < len(projects) * 0.1
+
+    def test_small_history_and_other_methods(self):
+        """测试项目数少于K及非混合方法 (不剪枝) 的结果"""
+        projects = _random_projects(8)
+        full = ProjectSimilarityMatcher(projects)
+        clustered = ProjectSimilarityMatcher(projects, n_clusters=20)
+        assert len(clustered.find_similar_projects(TARGET, top_k=10)) == 8
+        for method in ("hybrid", "cosine"):
+            assert self._key(clustered.find_similar_projects(TARGET, top_k=10, method=method)) == \
+                self._key(full.find_similar_projects(TARGET, top_k=10, method=method))
+
+    def test_cluster_profiles(self):
+        """测试聚类画像与新项目归类"""
+        projects = _random_projects(500)
+        matcher = ProjectSimilarityMatcher(projects, n_clusters=5)
+        profiles = matcher.cluster_profiles()
+
+        assert len(profiles) == 5
+        assert sum(p["count"] for p in profiles) == 500
+        assert [p["avg_hours"] for p in profiles] == sorted(p["avg_hours"] for p in profiles)
+        assert all(p["name"].endswith("项目") and len(p["sample_projects"]) == 3 for p in profiles)
+        assert matcher.classify(TARGET) in {p["cluster_id"] for p in profiles}
+        # 聚类中心在建立聚类时算好, 与逐聚类求均值一致
+        space = matcher._cluster_space()
+        np.testing.assert_allclose(
+            matcher._clusters["centers"], [space[m].mean(axis=0) for m in matcher._clusters["members"]]
+        )
+        assert ProjectSimilarityMatcher(projects).cluster_profiles() == []
+
+    def test_clusters_endpoint(self, monkeypatch):
+        """测试聚类画像接口, 匹配器不变时使用缓存的画像"""
+        client = TestClient(app)
+        response = client.get("/api/v1/clusters").json()
+        assert response["total"] == len(response["clusters"])
+        assert sum(c["count"] for c in response["clusters"]) == response["projects"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("聚类画像应使用缓存")
+
+        monkeypatch.setattr(ProjectSimilarityMatcher, "cluster_profiles", fail)
+        assert client.get("/api/v1/clusters").json() == response
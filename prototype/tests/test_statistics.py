@@ -0,0 +1,102 @@
+"""
+测试统计汇总表的增量维护
+"""
+
+from datetime import date
+
+from sqlalchemy import select, update
+
+from app.cli import main
+from app.models import ProjectStatistics, UserWeeklyHours, WBSTask
+from app.services.statistics import (
+    check_statistics, load_user_workload, rebuild_statistics, refresh_statistics
+)
+from app.services.timesheet_ingest import ingest_timesheets
+
+
+ROWS = [
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "8"},
+    {"task_id": "11", "user_id": "1", "work_date": "2025-01-07", "hours": "8"},
+    {"task_id": "12", "user_id": "2", "work_date": "2025-01-13", "hours": "6"},
+    {"task_id": "21", "user_id": "2", "work_date": "2025-01-08", "hours": "4", "status": "rejected"},
+]
+
+
+def _project_stats(engine, project_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(ProjectStatistics.__table__).where(ProjectStatistics.__table__.c.project_id == project_id)
+        ).one()
+
+
+class TestStatistics:
+    """测试项目统计/用户负荷汇总"""
+
+    def test_ingestion_maintains_statistics(self, seeded_engine):
+        """测试工时导入同步维护汇总表"""
+        ingest_timesheets(ROWS, seeded_engine)
+
+        stats = _project_stats(seeded_engine, 1)
+        assert stats.total_tasks == 2
+        assert float(stats.total_estimated_hours) == 100.0
+        assert float(stats.total_actual_hours) == 22.0
+        assert float(stats.variance_percentage) == -78.0
+        assert stats.team_size == 2
+
+        with seeded_engine.connect() as conn:
+            weeks = {
+                (row.user_id, row.week_start): float(row.hours)
+                for row in conn.execute(select(UserWeeklyHours.__table__))
+            }
+            workload = load_user_workload(conn, [1, 2], today=date(2025, 1, 8))
+
+        # 驳回的工时不计入周工时
+        assert weeks == {(1, date(2025, 1, 6)): 16.0, (2, date(2025, 1, 13)): 6.0}
+        assert workload[0]["remaining_hours"] == 24.0
+        assert workload[0]["this_week_hours"] == 16.0
+        assert workload[1]["this_week_hours"] == 0.0
+
+        assert check_statistics(seeded_engine) == []
+
+    def test_incremental_ingestion_accumulates(self, seeded_engine):
+        """测试多次导入时周工时按增量累加"""
+        # 初始化汇总表后, 后续只由导入路径增量维护
+        rebuild_statistics(seeded_engine)
+        ingest_timesheets(ROWS[:1], seeded_engine)
+        ingest_timesheets(ROWS[1:2], seeded_engine)
+
+        assert float(_project_stats(seeded_engine, 1).total_actual_hours) == 16.0
+        assert check_statistics(seeded_engine) == []
+
+    def test_check_detects_drift_and_rebuild_repairs(self, seeded_engine):
+        """测试一致性校验与全量重建"""
+        ingest_timesheets(ROWS, seeded_engine)
+
+        # 绕过更新路径直接修改任务, 汇总表随之失效
+        with seeded_engine.begin() as conn:
+            conn.execute(update(WBSTask.__table__).where(WBSTask.__table__.c.id == 12).values(status="completed"))
+
+        mismatches = check_statistics(seeded_engine)
+        assert {(m.table, m.column) for m in mismatches} >= {
+            ("project_statistics", "completed_tasks"),
+            ("user_workload", "assigned_tasks"),
+        }
+
+        database_url = str(seeded_engine.url)
+        assert main(["--database-url", database_url, "check-stats"]) == 1
+
+        counts = rebuild_statistics(seeded_engine)
+        assert counts["project_statistics"] == 2
+        assert check_statistics(seeded_engine) == []
+        assert main(["--database-url", database_url, "check-stats"]) == 0
+
+    def test_refresh_statistics(self, seeded_engine):
+        """测试更新路径按键刷新"""
+        with seeded_engine.begin() as conn:
+            conn.execute(update(WBSTask.__table__).where(WBSTask.__table__.c.id == 21).values(status="completed"))
+            refresh_statistics(conn, project_ids=[2], user_ids=[2])
+
+        assert _project_stats(seeded_engine, 2).completed_tasks == 1
+        with seeded_engine.connect() as conn:
+            workload = load_user_workload(conn, [2])
+        assert workload[0]["assigned_tasks"] == 1
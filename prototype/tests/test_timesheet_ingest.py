@@ -0,0 +1,91 @@
+"""
+测试工时批量导入
+"""
+
+import csv
+
+import pytest
+from sqlalchemy import select
+
+from app.cli import main
+from app.models import Project, Timesheet, WBSTask
+from app.services.timesheet_ingest import ingest_timesheets, ingest_timesheets_csv
+
+
+def _actual_hours(engine, table, row_id):
+    with engine.connect() as conn:
+        return float(conn.execute(select(table.c.actual_hours).where(table.c.id == row_id)).scalar())
+
+
+class TestTimesheetIngest:
+    """测试工时导入"""
+
+    def test_batched_insert_and_rollup(self, seeded_engine):
+        """测试分批插入并汇总任务/项目工时"""
+        rows = [
+            {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "8"},
+            {"task_id": "11", "user_id": "2", "work_date": "2025-01-06", "hours": "4.5"},
+            {"task_id": "12", "user_id": "1", "work_date": "2025-01-07", "hours": "6"},
+            {"task_id": "21", "user_id": "2", "work_date": "2025-01-07", "hours": "7", "project_id": "2"},
+            {"task_id": "21", "user_id": "2", "work_date": "2025-01-08", "hours": "3", "status": "rejected"},
+        ]
+
+        report = ingest_timesheets(rows, seeded_engine, batch_size=2)
+
+        assert report.rows_inserted == 5
+        assert report.rows_rejected == 0
+        assert report.task_ids == {11, 12, 21}
+        assert report.project_ids == {1, 2}
+
+        assert _actual_hours(seeded_engine, WBSTask.__table__, 11) == 12.5
+        assert _actual_hours(seeded_engine, WBSTask.__table__, 21) == 7.0  # 驳回记录不计入
+        assert _actual_hours(seeded_engine, Project.__table__, 1) == 18.5
+        assert _actual_hours(seeded_engine, Project.__table__, 2) == 7.0
+
+    def test_invalid_rows_rejected(self, seeded_engine):
+        """测试非法行被拒绝且不影响其他行"""
+        rows = [
+            {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "25"},
+            {"task_id": "11", "user_id": "1", "work_date": "06/01/2025", "hours": "8"},
+            {"task_id": "99", "user_id": "1", "work_date": "2025-01-06", "hours": "8"},
+            {"task_id": "11", "user_id": "9", "work_date": "2025-01-06", "hours": "8"},
+            {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "8", "project_id": "2"},
+            {"task_id": "11", "user_id": "1", "work_date": "2025-01-06", "hours": "8"},
+        ]
+
+        report = ingest_timesheets(rows, seeded_engine, first_line_no=2)
+
+        assert report.rows_read == 6
+        assert report.rows_inserted == 1
+        assert report.rows_rejected == 5
+        assert [line for line, _ in report.errors] == [2, 3, 4, 5, 6]
+
+        with seeded_engine.connect() as conn:
+            assert conn.execute(select(Timesheet.__table__.c.id)).all() != []
+        assert _actual_hours(seeded_engine, Project.__table__, 1) == 8.0
+
+    def test_csv_and_cli(self, seeded_engine, tmp_path):
+        """测试CSV导入及命令行入口"""
+        csv_path = tmp_path / "timesheets.csv"
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["task_id", "user_id", "work_date", "hours", "description"])
+            writer.writeheader()
+            for day in range(1, 11):
+                writer.writerow({"task_id": 12, "user_id": 1, "work_date": f"2025-02-{day:02d}",
+                                 "hours": 8, "description": "开发"})
+
+        report = ingest_timesheets_csv(str(csv_path), seeded_engine, batch_size=3)
+        assert report.rows_inserted == 10
+        assert _actual_hours(seeded_engine, WBSTask.__table__, 12) == 80.0
+
+        database_url = str(seeded_engine.url)
+        assert main(["--database-url", database_url, "ingest-timesheets", str(csv_path)]) == 0
+        assert _actual_hours(seeded_engine, Project.__table__, 1) == 160.0
+
+    def test_csv_missing_columns(self, seeded_engine, tmp_path):
+        """测试CSV缺少必需列"""
+        csv_path = tmp_path / "bad.csv"
+        csv_path.write_text("task_id,hours\n11,8\n", encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            ingest_timesheets_csv(str(csv_path), seeded_engine)
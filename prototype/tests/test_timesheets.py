@@ -0,0 +1,159 @@
+"""
+测试工时批量提交与审批
+"""
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from app import main as api
+from app.models import ProjectMonthlyCost, Timesheet, UserWeeklyHours, WBSTask
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheets import (
+    TimesheetValidationError, create_timesheets, list_timesheets, review_timesheets
+)
+
+
+def _entries():
+    return [
+        {"task_id": 11, "user_id": 1, "work_date": date(2025, 1, 6), "hours": 8},
+        {"task_id": 11, "user_id": 1, "work_date": date(2025, 1, 7), "hours": 6.5},
+        {"task_id": 12, "user_id": 2, "work_date": date(2025, 1, 6), "hours": 4, "task_progress_percentage": 30},
+        {"task_id": 21, "user_id": 2, "work_date": date(2025, 1, 8), "hours": 5},
+    ]
+
+
+def _task_hours(engine):
+    with engine.connect() as conn:
+        return {
+            row.id: float(row.actual_hours or 0)
+            for row in conn.execute(select(WBSTask.__table__.c.id, WBSTask.__table__.c.actual_hours))
+        }
+
+
+def _weekly_hours(engine):
+    with engine.connect() as conn:
+        return {
+            (row.user_id, row.week_start): float(row.hours)
+            for row in conn.execute(select(UserWeeklyHours.__table__))
+        }
+
+
+class TestTimesheetBatch:
+    """测试批量提交"""
+
+    def test_create_updates_rollups(self, seeded_engine):
+        """测试一个事务内批量插入并更新汇总"""
+        rebuild_statistics(seeded_engine)
+        result = create_timesheets(seeded_engine, _entries())
+
+        assert result.count == 4 and len(result.ids) == 4
+        assert result.project_ids == [1, 2]
+        assert _task_hours(seeded_engine) == {11: 14.5, 12: 4.0, 21: 5.0}
+        assert _weekly_hours(seeded_engine) == {(1, date(2025, 1, 6)): 14.5, (2, date(2025, 1, 6)): 9.0}
+        rows = list_timesheets(seeded_engine, user_id=2)
+        assert [row["task_id"] for row in rows] == [21, 12]
+        assert all(row["status"] == "submitted" for row in rows)
+        assert check_statistics(seeded_engine) == []
+
+    def test_invalid_batch_writes_nothing(self, seeded_engine):
+        """测试任一条不合法时整批拒绝并给出全部错误"""
+        entries = _entries()
+        entries[1]["hours"] = 25
+        entries[2]["task_progress_percentage"] = 120
+        with pytest.raises(TimesheetValidationError) as excinfo:
+            create_timesheets(seeded_engine, entries)
+        assert [index for index, _ in excinfo.value.errors] == [1, 2]
+
+        entries = _entries()
+        entries[0]["task_id"] = 99
+        entries[3]["project_id"] = 1
+        with pytest.raises(TimesheetValidationError) as excinfo:
+            create_timesheets(seeded_engine, entries)
+        assert [index for index, _ in excinfo.value.errors] == [0, 3]
+        assert list_timesheets(seeded_engine) == []
+
+
+class TestTimesheetReview:
+    """测试批量审批/驳回"""
+
+    def test_single_update_statement(self, seeded_engine):
+        """测试按条件审批只执行一条 UPDATE, 记录审批人"""
+        rebuild_statistics(seeded_engine)
+        ids = create_timesheets(seeded_engine, _entries()).ids
+
+        statements = []
+        event.listen(seeded_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        result = review_timesheets(seeded_engine, "approve", project_id=1,
+                                   start_date=date(2025, 1, 6), end_date=date(2025, 1, 12), approver_id=2)
+        assert [s.split()[0] for s in statements if s.split()[0] in ("UPDATE", "INSERT", "DELETE")] == ["UPDATE"]
+        assert result.ids == ids[:3]
+
+        rows = {row["id"]: row for row in list_timesheets(seeded_engine)}
+        assert rows[ids[0]]["status"] == "approved" and rows[ids[0]]["approved_by"] == 2
+        assert rows[ids[0]]["approved_at"] is not None
+        assert rows[ids[3]]["status"] == "submitted"
+
+        # 已审批的记录不会再次审批
+        assert review_timesheets(seeded_engine, "approve", ids=ids).ids == [ids[3]]
+
+    def test_reject_removes_hours(self, seeded_engine):
+        """测试驳回的工时从汇总层扣除"""
+        rebuild_statistics(seeded_engine)
+        ids = create_timesheets(seeded_engine, _entries()).ids
+        review_timesheets(seeded_engine, "approve", ids=ids[:1])
+
+        result = review_timesheets(seeded_engine, "reject", user_ids=[1], reason="工时填错")
+        assert result.ids == ids[:2] and result.task_ids == [11]
+        assert _task_hours(seeded_engine)[11] == 0.0
+        assert _weekly_hours(seeded_engine)[(1, date(2025, 1, 6))] == 0.0
+        with seeded_engine.connect() as conn:
+            costs = {row.project_id: float(row.hours) for row in conn.execute(select(ProjectMonthlyCost.__table__))}
+            reasons = conn.execute(
+                select(Timesheet.__table__.c.rejection_reason).where(Timesheet.__table__.c.id == ids[0])
+            ).scalar()
+        assert costs == {1: 4.0, 2: 5.0} and reasons == "工时填错"
+        assert check_statistics(seeded_engine) == []
+
+        # 已驳回的记录不能再驳回或审批
+        assert review_timesheets(seeded_engine, "reject", ids=ids[:2]).count == 0
+        assert review_timesheets(seeded_engine, "approve", ids=ids[:2]).count == 0
+
+        with pytest.raises(ValueError):
+            review_timesheets(seeded_engine, "reject")
+        with pytest.raises(ValueError):
+            review_timesheets(seeded_engine, "archive", ids=ids)
+
+
+class TestTimesheetEndpoints:
+    """测试工时接口"""
+
+    def test_endpoints(self, seeded_engine, monkeypatch):
+        """测试单条/数组提交、批量与单条审批及参数校验"""
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        client = TestClient(api.app)
+        entries = [dict(entry, work_date=entry["work_date"].isoformat()) for entry in _entries()]
+
+        response = client.post("/api/v1/timesheets", json=entries[0])
+        assert response.status_code == 201 and response.json()["count"] == 1
+        response = client.post("/api/v1/timesheets", json=entries[1:])
+        assert response.status_code == 201
+        ids = response.json()["ids"]
+
+        response = client.post("/api/v1/timesheets", json=[entries[0], dict(entries[1], hours=30)])
+        assert response.status_code == 422
+        response = client.post("/api/v1/timesheets", json=[dict(entries[0], task_id=99)])
+        assert response.status_code == 422
+        assert response.json()["detail"]["errors"] == [{"index": 0, "reason": "任务不存在: 99"}]
+
+        body = client.post("/api/v1/timesheets/approve", json={"user_ids": [2], "approver_id": 1}).json()
+        assert body["ids"] == ids[1:]
+        body = client.post(f"/api/v1/timesheets/{ids[0]}/reject", json={"reason": "重复填报"}).json()
+        assert body["count"] == 1
+
+        body = client.get("/api/v1/timesheets", params={"status": "approved"}).json()
+        assert [row["id"] for row in body["timesheets"]] == [ids[2], ids[1]]
+        assert client.post("/api/v1/timesheets/approve", json={}).status_code == 422
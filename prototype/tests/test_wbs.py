@@ -0,0 +1,139 @@
+"""
+测试WBS落库与按编码差异更新
+"""
+
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select, update
+
+from app import main as api
+from app.core.estimator import estimate_project
+from app.models import Project, WBSTask
+from app.services.statistics import check_statistics, rebuild_statistics
+from app.services.timesheets import create_timesheets
+from app.services.wbs import generate_project_wbs, project_info
+
+
+tasks_table = WBSTask.__table__
+projects_table = Project.__table__
+
+
+def _add_project(engine, **params):
+    values = {
+        "id": 3, "name": "项目C", "code": "P3", "project_type": "regulatory_reporting",
+        "client_name": "C银行", "client_type": "city_bank", "data_sources_count": 3,
+        "interface_tables_count": 40, "reports_count": 10, "custom_requirements_count": 0,
+    }
+    with engine.begin() as conn:
+        conn.execute(insert(projects_table).values(**{**values, **params}))
+
+
+def _tasks(engine, project_id=3):
+    with engine.connect() as conn:
+        return {
+            row.wbs_code: row for row in conn.execute(
+                select(tasks_table).where(tasks_table.c.project_id == project_id)
+            )
+        }
+
+
+def _writes(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+                 if statement.startswith(("INSERT INTO wbs_tasks", "UPDATE wbs_tasks", "DELETE FROM wbs_tasks"))
+                 else None)
+    return statements
+
+
+class TestWBSPersist:
+    """测试WBS落库"""
+
+    def test_first_generation_single_insert(self, seeded_engine):
+        """测试首次生成整棵树一条 INSERT, 阶段与任务的上级正确"""
+        _add_project(seeded_engine)
+        statements = _writes(seeded_engine)
+        result = generate_project_wbs(seeded_engine, 3)
+
+        assert [s for s in statements if s in ("INSERT", "UPDATE", "DELETE")] == ["INSERT"]
+        tasks = _tasks(seeded_engine)
+        assert result.inserted == result.tasks == len(tasks)
+        phases = {code: row for code, row in tasks.items() if row.task_level == 1}
+        assert sorted(phases) == ["1", "2", "3", "4", "5"]
+        assert tasks["3.3.2"].parent_task_id == phases["3"].id
+        assert tasks["4.1"].parent_task_id == phases["4"].id
+        assert "3.7" not in tasks
+
+        with seeded_engine.connect() as conn:
+            row = conn.execute(select(projects_table).where(projects_table.c.id == 3)).first()
+        expected = estimate_project(project_info(row)).total_hours
+        leaf_hours = sum(float(row.estimated_hours or 0) for row in tasks.values() if row.task_level == 2)
+        assert abs(leaf_hours - expected) < 0.1 * len(tasks)
+
+        # 参数不变时再次生成不写入
+        statements.clear()
+        again = generate_project_wbs(seeded_engine, 3)
+        assert (again.inserted, again.updated, again.deleted) == (0, 0, 0)
+        assert not [s for s in statements if s in ("INSERT", "UPDATE", "DELETE")]
+
+    def test_regeneration_diffs_by_code(self, seeded_engine):
+        """测试参数变化后按编码插入/更新/删除, 保留执行数据与有工时的任务"""
+        _add_project(seeded_engine)
+        generate_project_wbs(seeded_engine, 3)
+        before = _tasks(seeded_engine)
+        with seeded_engine.begin() as conn:
+            conn.execute(update(tasks_table).where(tasks_table.c.id == before["3.1"].id)
+                         .values(progress_percentage=50, status="in_progress", assignee_id=1))
+        rebuild_statistics(seeded_engine)
+        create_timesheets(seeded_engine, [
+            {"task_id": before["3.3.3"].id, "user_id": 1, "work_date": date(2025, 1, 6), "hours": 6},
+        ])
+
+        with seeded_engine.begin() as conn:
+            conn.execute(update(projects_table).where(projects_table.c.id == 3).values(
+                data_sources_count=1, interface_tables_count=80, custom_requirements_count=2
+            ))
+        statements = _writes(seeded_engine)
+        result = generate_project_wbs(seeded_engine, 3)
+
+        after = _tasks(seeded_engine)
+        assert result.inserted == 1 and "3.7" in after
+        assert result.deleted == 1 and "3.3.2" not in after
+        assert result.retained == ["3.3.3"] and float(after["3.3.3"].actual_hours) == 6.0
+        assert [s for s in statements if s in ("INSERT", "UPDATE")].count("INSERT") == 1
+
+        # 已有编码保留主键与执行数据, 只更新生成的列
+        assert after["3.1"].id == before["3.1"].id
+        assert after["3.1"].status == "in_progress" and float(after["3.1"].progress_percentage) == 50
+        assert after["3.3.1"].parent_task_id == after["3"].id
+        assert float(after["2.3"].estimated_hours) > float(before["2.3"].estimated_hours)
+        assert check_statistics(seeded_engine) == []
+
+    def test_existing_flat_tasks_attach_to_phases(self, seeded_engine):
+        """测试已有的同编码任务挂到生成的阶段下, 负责人不变"""
+        with seeded_engine.begin() as conn:
+            conn.execute(update(projects_table).where(projects_table.c.id == 1).values(
+                client_type="city_bank", data_sources_count=2, interface_tables_count=30, reports_count=5
+            ))
+        result = generate_project_wbs(seeded_engine, 1)
+        tasks = _tasks(seeded_engine, 1)
+        assert result.updated == 2 and result.inserted == result.tasks - 2
+        assert tasks["1.1"].id == 11 and tasks["1.1"].parent_task_id == tasks["1"].id
+        assert tasks["1.2"].assignee_id == 2 and tasks["1.2"].task_name == "项目监控"
+        assert generate_project_wbs(seeded_engine, 99) is None
+
+
+class TestWBSEndpoint:
+    """测试WBS生成接口"""
+
+    def test_endpoint(self, seeded_engine, monkeypatch):
+        """测试生成与项目不存在"""
+        monkeypatch.setattr(api.app.state, "engine", seeded_engine)
+        _add_project(seeded_engine)
+        client = TestClient(api.app)
+
+        body = client.post("/api/v1/projects/3/wbs").json()
+        assert body["inserted"] == body["tasks"] and body["retained"] == []
+        assert client.post("/api/v1/projects/3/wbs").json()["inserted"] == 0
+        assert client.post("/api/v1/projects/99/wbs").status_code == 404
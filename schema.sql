@@ -124,11 +124,12 @@ CREATE TABLE projects (
 );
 
 CREATE INDEX idx_projects_code ON projects(code);
-CREATE INDEX idx_projects_status ON projects(status);
+CREATE INDEX idx_projects_status ON projects(status, updated_at, id);
 CREATE INDEX idx_projects_pm ON projects(project_manager_id);
 CREATE INDEX idx_projects_client ON projects(client_name);
-CREATE INDEX idx_projects_type ON projects(project_type);
-CREATE INDEX idx_projects_composite ON projects(status, project_type, client_type);
+CREATE INDEX idx_projects_type ON projects(project_type, updated_at, id);
+CREATE INDEX idx_projects_composite ON projects(status, project_type, client_type, updated_at, id);
+CREATE INDEX idx_projects_updated ON projects(updated_at, id);
 
 -- 2.2 项目成员表
 CREATE TABLE project_members (
@@ -196,6 +197,8 @@ CREATE TABLE wbs_tasks (
     risk_level VARCHAR(20),
     is_milestone BOOLEAN DEFAULT false,
     sort_order INTEGER,
+    total_float_days INTEGER,
+    is_critical BOOLEAN,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_by BIGINT REFERENCES users(id),
@@ -242,6 +245,7 @@ CREATE TABLE timesheets (
     status VARCHAR(20) DEFAULT 'submitted',
     approved_by BIGINT REFERENCES users(id),
     approved_at TIMESTAMP,
+    rejection_reason TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT chk_hours CHECK (hours >= 0 AND hours <= 24),
@@ -279,6 +283,47 @@ CREATE TABLE baselines (
 CREATE INDEX idx_baselines_project ON baselines(project_id);
 CREATE INDEX idx_baselines_current ON baselines(project_id, is_current);
 
+-- 4.3 挣值快照表 (按天增量追加, 以工时计; phase_code 为空串表示项目整体)
+CREATE TABLE evm_snapshots (
+    project_id BIGINT REFERENCES projects(id) ON DELETE CASCADE,
+    snapshot_date DATE NOT NULL,
+    phase_code VARCHAR(50) NOT NULL DEFAULT '',
+    baseline_version VARCHAR(20),
+    budget_at_completion DECIMAL(12,2) NOT NULL DEFAULT 0,
+    planned_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+    earned_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+    actual_cost DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cost_performance_index DECIMAL(8,4),
+    schedule_performance_index DECIMAL(8,4),
+    estimate_at_completion DECIMAL(12,2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (project_id, snapshot_date, phase_code)
+);
+
+CREATE INDEX idx_evm_snapshots_date ON evm_snapshots(snapshot_date);
+
+-- 4.4 完工预测表 (按周工时消耗趋势预测, 区间为80%; 日期为空表示预测期内无法完工)
+CREATE TABLE project_forecasts (
+    project_id BIGINT REFERENCES projects(id) ON DELETE CASCADE,
+    forecast_date DATE NOT NULL,
+    history_weeks INTEGER NOT NULL DEFAULT 0,
+    weekly_burn_rate DECIMAL(10,2),
+    weekly_burn_trend DECIMAL(10,2),
+    efficiency_factor DECIMAL(8,4),
+    actual_hours DECIMAL(12,2) NOT NULL DEFAULT 0,
+    remaining_hours DECIMAL(12,2) NOT NULL DEFAULT 0,
+    forecast_total_hours DECIMAL(12,2),
+    total_hours_low DECIMAL(12,2),
+    total_hours_high DECIMAL(12,2),
+    forecast_completion_date DATE,
+    completion_date_low DATE,
+    completion_date_high DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (project_id, forecast_date)
+);
+
+CREATE INDEX idx_project_forecasts_date ON project_forecasts(forecast_date);
+
 -- ============================================
 -- 5. 智能评估模块
 -- ============================================
@@ -449,8 +494,10 @@ CREATE INDEX idx_reports_type ON project_reports(report_type);
 CREATE TABLE deviation_analysis (
     id BIGSERIAL PRIMARY KEY,
     project_id BIGINT REFERENCES projects(id) ON DELETE CASCADE,
-    task_id BIGINT REFERENCES wbs_tasks(id),
+    task_id BIGINT REFERENCES wbs_tasks(id) ON DELETE CASCADE,
     analysis_date DATE,
+    analysis_level VARCHAR(20), -- project, phase, task_type, task
+    analysis_key VARCHAR(50), -- 阶段WBS编码 / 任务类型 (项目级与任务级为空)
     planned_hours DECIMAL(10,1),
     actual_hours DECIMAL(10,1),
     variance_hours DECIMAL(10,1),
@@ -468,6 +515,7 @@ CREATE TABLE deviation_analysis (
 CREATE INDEX idx_deviation_project ON deviation_analysis(project_id);
 CREATE INDEX idx_deviation_task ON deviation_analysis(task_id);
 CREATE INDEX idx_deviation_date ON deviation_analysis(analysis_date);
+CREATE INDEX idx_deviation_level ON deviation_analysis(project_id, analysis_level, analysis_date);
 
 -- 6.3 风险登记表
 CREATE TABLE risk_registers (
@@ -559,6 +607,52 @@ LEFT JOIN wbs_tasks t ON u.id = t.assignee_id AND t.status != 'completed'
 LEFT JOIN timesheets ts ON u.id = ts.user_id
 GROUP BY u.id, u.full_name, u.department;
 
+-- 7.3 汇总表 (由导入/更新路径增量维护, 仪表盘直接读取)
+-- 全量重建: python -m app.cli rebuild-stats; 一致性校验: python -m app.cli check-stats
+CREATE TABLE project_statistics (
+    project_id BIGINT PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+    total_tasks INTEGER NOT NULL DEFAULT 0,
+    completed_tasks INTEGER NOT NULL DEFAULT 0,
+    total_estimated_hours DECIMAL(12,1) NOT NULL DEFAULT 0,
+    total_actual_hours DECIMAL(12,1) NOT NULL DEFAULT 0,
+    variance_percentage DECIMAL(8,2) NOT NULL DEFAULT 0,
+    avg_progress DECIMAL(5,2) NOT NULL DEFAULT 0,
+    team_size INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE user_workload (
+    user_id BIGINT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    assigned_tasks INTEGER NOT NULL DEFAULT 0,
+    active_tasks INTEGER NOT NULL DEFAULT 0,
+    remaining_hours DECIMAL(12,1) NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE user_weekly_hours (
+    user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
+    week_start DATE NOT NULL,
+    hours DECIMAL(8,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, week_start)
+);
+
+CREATE TABLE project_monthly_costs (
+    project_id BIGINT REFERENCES projects(id) ON DELETE CASCADE,
+    month_start DATE NOT NULL,
+    hours DECIMAL(12,2) NOT NULL DEFAULT 0,
+    labor_cost DECIMAL(15,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (project_id, month_start)
+);
+
+CREATE INDEX idx_project_monthly_costs_month ON project_monthly_costs(month_start, hours, labor_cost);
+
+-- 汇总表每次写入时版本号加1, 分析接口的查询缓存据此失效
+CREATE TABLE summary_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================
 -- 8. 触发器函数
 -- ============================================
@@ -582,24 +676,8 @@ CREATE TRIGGER update_projects_updated_at BEFORE UPDATE ON projects
 CREATE TRIGGER update_wbs_tasks_updated_at BEFORE UPDATE ON wbs_tasks
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- 8.2 自动更新项目实际工时
-CREATE OR REPLACE FUNCTION update_project_actual_hours()
-RETURNS TRIGGER AS $$
-BEGIN
-    UPDATE projects
-    SET actual_hours = (
-        SELECT COALESCE(SUM(actual_hours), 0)
-        FROM wbs_tasks
-        WHERE project_id = NEW.project_id
-    )
-    WHERE id = NEW.project_id;
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
-
-CREATE TRIGGER update_project_hours_on_task_change
-AFTER INSERT OR UPDATE OR DELETE ON wbs_tasks
-FOR EACH ROW EXECUTE FUNCTION update_project_actual_hours();
+-- 8.2 项目实际工时 (根任务实际工时之和) 不用逐行触发器维护: 工时写入、
+-- 审批与 WBS 生成后由应用按受影响的项目各重算一次 (recompute_actual_hours)
 
 -- ============================================
 -- 9. 初始化数据
@@ -7,10 +7,13 @@ import json
 import pickle
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
 from dataclasses import dataclass, asdict
 import numpy as np
 
+if TYPE_CHECKING:
+    from history_store import SQLiteHistoryStore
+
 
 @dataclass
 class ProjectRisk:
@@ -39,12 +42,14 @@ class HistoricalProject:
 class AdvancedCostEstimator:
     """高级项目成本估算器类"""
     
-    def __init__(self, config_file: Optional[str] = None):
+    def __init__(self, config_file: Optional[str] = None,
+                 history_store: Optional["SQLiteHistoryStore"] = None):
         """
         初始化高级估算器
         
         Args:
             config_file: 配置文件路径
+            history_store: 历史项目库，指定时历史数据从库中查询，不加载到内存
         """
         self.default_config = {
             'base_cost_per_hour': 100,
@@ -76,6 +81,7 @@ class AdvancedCostEstimator:
             self.load_config(config_file)
         
         self.historical_projects: List[HistoricalProject] = []
+        self.history_store = history_store
         self.risk_database: List[ProjectRisk] = self._init_risk_database()
         
     def _init_risk_database(self) -> List[ProjectRisk]:
@@ -124,7 +130,17 @@ class AdvancedCostEstimator:
     
     def add_historical_project(self, project: HistoricalProject) -> None:
         """添加历史项目数据"""
-        self.historical_projects.append(project)
+        if self.history_store is not None:
+            self.history_store.add(project)
+        else:
+            self.historical_projects.append(project)
+    
+    def add_historical_projects(self, projects: List[HistoricalProject]) -> None:
+        """批量添加历史项目数据（使用历史项目库时在单个事务中写入）"""
+        if self.history_store is not None:
+            self.history_store.add_many(projects)
+        else:
+            self.historical_projects.extend(projects)
     
     def estimate_cost_advanced(self, project_params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -201,6 +217,15 @@ class AdvancedCostEstimator:
     
     def _calculate_accuracy_adjustment(self, project_params: Dict[str, Any]) -> float:
         """基于历史数据计算准确性调整因子"""
+        if self.history_store is not None:
+            avg_accuracy = self.history_store.accuracy_ratio(
+                project_params.get('complexity', 'medium'),
+                project_params.get('team_size', 1)
+            )
+            if avg_accuracy is None:
+                return 1.0
+            return min(1.3, max(0.8, avg_accuracy))
+        
         if not self.historical_projects:
             return 1.0
         
@@ -301,7 +326,12 @@ class AdvancedCostEstimator:
         confidence = 0.8  # 基础置信度
         
         # 如果有历史数据，提高置信度
-        if self.historical_projects:
+        if self.history_store is not None:
+            similar_count = self.history_store.count_by_complexity(
+                project_params.get('complexity', 'medium')
+            )
+            confidence += min(0.15, similar_count * 0.03)
+        elif self.historical_projects:
             similar_count = len([
                 p for p in self.historical_projects
                 if p.complexity == project_params.get('complexity', 'medium')
@@ -9,21 +9,23 @@ import json
 import sys
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 # 添加当前目录到 Python 路径
 sys.path.insert(0, os.path.dirname(__file__))
 
 from cost_estimator import ProjectCostEstimator
 from advanced_estimator import AdvancedCostEstimator, HistoricalProject
+from history_store import SQLiteHistoryStore
 
 
 class ProjectCostCLI:
     """项目成本估算命令行界面"""
     
-    def __init__(self):
+    def __init__(self, history_db: Optional[str] = None):
         self.basic_estimator = ProjectCostEstimator()
-        self.advanced_estimator = AdvancedCostEstimator()
+        self.history_store = SQLiteHistoryStore(history_db) if history_db else None
+        self.advanced_estimator = AdvancedCostEstimator(history_store=self.history_store)
     
     def run_interactive_mode(self):
         """运行交互式模式"""
@@ -250,17 +252,19 @@ class ProjectCostCLI:
         """查看历史数据"""
         print("\n--- 历史数据 ---")
         
-        if not self.advanced_estimator.historical_projects:
+        projects = self.history_store if self.history_store is not None \
+            else self.advanced_estimator.historical_projects
+        if not len(projects):
             print("暂无历史数据")
             print()
             return
         
-        print(f"共有 {len(self.advanced_estimator.historical_projects)} 个历史项目:")
+        print(f"共有 {len(projects)} 个历史项目:")
         print("-" * 80)
         print(f"{'项目名':<20} {'实际工时':<10} {'预估工时':<10} {'准确率':<8} {'复杂度':<12}")
         print("-" * 80)
         
-        for project in self.advanced_estimator.historical_projects:
+        for project in projects:
             accuracy = project.estimated_hours / project.actual_hours if project.actual_hours > 0 else 0
             print(f"{project.name:<20} "
                  f"{project.actual_hours:<10.1f} "
@@ -306,6 +310,11 @@ class ProjectCostCLI:
             self.advanced_estimator.add_historical_project(project)
             print(f"历史项目 '{name}' 已添加成功！")
             
+            # 使用历史项目库时已直接写入数据库
+            if self.history_store is not None:
+                print()
+                return
+            
             # 询问是否保存历史数据
             save_data = input("是否保存历史数据到文件? (y/n): ").strip().lower()
             if save_data == 'y':
@@ -474,11 +483,21 @@ def main():
     parser.add_argument('--batch', '-b', help='批处理模式：输入JSON文件')
     parser.add_argument('--output', '-o', help='批处理模式：输出JSON文件')
     parser.add_argument('--config', '-c', help='配置文件路径')
+    parser.add_argument('--history-db', help='历史项目库 (SQLite文件)，估算时按索引查询，不加载全部历史数据')
+    parser.add_argument('--import-history', help='把历史数据文件 (pickle) 导入 --history-db 指定的历史项目库')
     parser.add_argument('--version', '-v', action='version', version='ProjectCost AI 1.0.0')
     
     args = parser.parse_args()
     
-    cli = ProjectCostCLI()
+    if args.import_history and not args.history_db:
+        print("导入历史数据需要指定历史项目库 (--history-db)")
+        sys.exit(1)
+    
+    cli = ProjectCostCLI(history_db=args.history_db)
+    
+    if args.import_history:
+        count = cli.history_store.import_pickle(args.import_history)
+        print(f"已导入 {count} 个历史项目到: {args.history_db}")
     
     # 加载配置文件
     if args.config and os.path.exists(args.config):
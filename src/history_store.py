@@ -0,0 +1,162 @@
+"""
+历史项目存储模块
+基于本地SQLite文件存放历史项目，准确性调整与置信度所需的统计直接在
+带索引的表上聚合查询，估算时无需把全部历史数据加载到内存
+"""
+
+import json
+import pickle
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from advanced_estimator import HistoricalProject
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS historical_projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    actual_hours REAL NOT NULL,
+    estimated_hours REAL NOT NULL,
+    actual_cost REAL,
+    estimated_cost REAL,
+    complexity TEXT NOT NULL,
+    team_size INTEGER NOT NULL,
+    duration INTEGER,
+    completion_date TEXT,
+    success_factors TEXT
+);
+-- 准确性查询 (复杂度相同且团队规模相近) 只需扫描这个覆盖索引
+CREATE INDEX IF NOT EXISTS idx_history_complexity_team
+    ON historical_projects (complexity, team_size, estimated_hours, actual_hours);
+CREATE INDEX IF NOT EXISTS idx_history_team_size ON historical_projects (team_size);
+CREATE INDEX IF NOT EXISTS idx_history_completion_date ON historical_projects (completion_date);
+"""
+
+COLUMNS = (
+    "name", "actual_hours", "estimated_hours", "actual_cost", "estimated_cost",
+    "complexity", "team_size", "duration", "completion_date", "success_factors"
+)
+
+# 批量写入时每次 executemany 的行数
+BATCH_SIZE = 5000
+
+
+def _to_row(project: HistoricalProject) -> tuple:
+    completion_date = project.completion_date
+    if isinstance(completion_date, datetime):
+        completion_date = completion_date.isoformat()
+    return (
+        project.name, project.actual_hours, project.estimated_hours, project.actual_cost,
+        project.estimated_cost, project.complexity, project.team_size, project.duration,
+        completion_date, json.dumps(project.success_factors or [], ensure_ascii=False)
+    )
+
+
+def _from_row(row: tuple) -> HistoricalProject:
+    values = dict(zip(COLUMNS, row))
+    if values["completion_date"]:
+        values["completion_date"] = datetime.fromisoformat(values["completion_date"])
+    values["success_factors"] = json.loads(values["success_factors"] or "[]")
+    return HistoricalProject(**values)
+
+
+class SQLiteHistoryStore:
+    """基于本地SQLite文件的历史项目库"""
+
+    def __init__(self, db_path: str):
+        """
+        打开 (必要时创建) 历史项目库
+
+        Args:
+            db_path: SQLite文件路径, ":memory:" 为内存库
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self) -> "SQLiteHistoryStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM historical_projects").fetchone()[0]
+
+    def __iter__(self) -> Iterator[HistoricalProject]:
+        """按写入顺序逐条读取 (游标流式返回, 不一次性加载)"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM historical_projects ORDER BY id"
+        )
+        for row in cursor:
+            yield _from_row(row)
+
+    def add(self, project: HistoricalProject) -> None:
+        """添加一个历史项目"""
+        self.add_many([project])
+
+    def add_many(self, projects: Iterable[HistoricalProject], batch_size: int = BATCH_SIZE) -> int:
+        """
+        批量添加历史项目 (单个事务, 任一条失败时全部回滚)
+
+        Returns:
+            写入的项目数
+        """
+        sql = (
+            f"INSERT INTO historical_projects ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})"
+        )
+        count = 0
+        batch = []
+        with self.conn:
+            for project in projects:
+                batch.append(_to_row(project))
+                if len(batch) >= batch_size:
+                    self.conn.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany(sql, batch)
+                count += len(batch)
+        return count
+
+    def import_pickle(self, data_file: str) -> int:
+        """导入 save_historical_data 保存的pickle文件, 返回导入的项目数"""
+        with open(data_file, 'rb') as f:
+            return self.add_many(pickle.load(f))
+
+    def accuracy_ratio(self, complexity: str, team_size: int, tolerance: int = 2) -> Optional[float]:
+        """
+        相似历史项目 (复杂度相同且团队规模相差不超过 tolerance) 的平均
+        估算准确率 (预估工时 / 实际工时), 没有相似项目时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT AVG(estimated_hours / actual_hours), COUNT(*) FROM historical_projects "
+            "WHERE complexity = ? AND team_size BETWEEN ? AND ?",
+            (complexity, team_size - tolerance, team_size + tolerance)
+        ).fetchone()
+        return row[0] if row[1] else None
+
+    def count_by_complexity(self, complexity: str) -> int:
+        """指定复杂度的历史项目数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM historical_projects WHERE complexity = ?", (complexity,)
+        ).fetchone()[0]
+
+    def completed_between(self, start: datetime, end: datetime) -> Iterator[HistoricalProject]:
+        """完成日期在 [start, end) 内的历史项目"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM historical_projects "
+            "WHERE completion_date >= ? AND completion_date < ? ORDER BY completion_date",
+            (start.isoformat(), end.isoformat())
+        )
+        for row in cursor:
+            yield _from_row(row)
@@ -0,0 +1,110 @@
+"""
+历史项目存储的测试用例
+"""
+
+import pytest
+import sys
+import os
+import pickle
+import tempfile
+from datetime import datetime
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from advanced_estimator import AdvancedCostEstimator, HistoricalProject
+from history_store import SQLiteHistoryStore
+
+
+def make_projects():
+    """不同复杂度、团队规模与估算准确率的历史项目"""
+    projects = []
+    for i in range(40):
+        projects.append(HistoricalProject(
+            name=f"历史项目{i}",
+            actual_hours=100 + i * 5,
+            estimated_hours=90 + (i % 7) * 10,
+            actual_cost=(100 + i * 5) * 100,
+            estimated_cost=(90 + (i % 7) * 10) * 100,
+            complexity=['low', 'medium', 'high', 'enterprise'][i % 4],
+            team_size=1 + i % 9,
+            duration=20 + i,
+            completion_date=datetime(2025, 1 + i % 12, 1 + i % 28),
+            success_factors=["需求稳定"] if i % 2 else []
+        ))
+    return projects
+
+
+class TestSQLiteHistoryStore:
+    """历史项目库测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的设置"""
+        self.store = SQLiteHistoryStore(":memory:")
+
+    def teardown_method(self):
+        """每个测试方法后的清理"""
+        self.store.close()
+
+    def test_add_and_iterate(self):
+        """测试写入与读取保持字段一致"""
+        projects = make_projects()
+        assert self.store.add_many(projects, batch_size=7) == len(projects)
+        assert len(self.store) == len(projects)
+        assert list(self.store) == projects
+
+    def test_add_many_is_atomic(self):
+        """测试批量写入失败时整批回滚"""
+        projects = make_projects()
+        projects[10] = HistoricalProject(
+            name=None, actual_hours=1, estimated_hours=1, actual_cost=1, estimated_cost=1,
+            complexity='low', team_size=1, duration=1,
+            completion_date=datetime(2025, 1, 1), success_factors=[]
+        )
+        with pytest.raises(Exception):
+            self.store.add_many(projects, batch_size=4)
+        assert len(self.store) == 0
+
+    def test_aggregates(self):
+        """测试聚合查询与逐条筛选结果一致"""
+        projects = make_projects()
+        self.store.add_many(projects)
+        similar = [p for p in projects if p.complexity == 'medium' and abs(p.team_size - 4) <= 2]
+        expected = sum(p.estimated_hours / p.actual_hours for p in similar) / len(similar)
+        assert self.store.accuracy_ratio('medium', 4) == pytest.approx(expected)
+        assert self.store.accuracy_ratio('unknown', 4) is None
+        assert self.store.count_by_complexity('high') == 10
+
+    def test_completed_between(self):
+        """测试按完成日期范围查询"""
+        self.store.add_many(make_projects())
+        projects = list(self.store.completed_between(datetime(2025, 3, 1), datetime(2025, 4, 1)))
+        assert projects
+        assert all(p.completion_date.month == 3 for p in projects)
+
+    def test_import_pickle(self):
+        """测试导入pickle历史数据文件"""
+        projects = make_projects()
+        with tempfile.NamedTemporaryFile(suffix='.pkl', delete=False) as f:
+            pickle.dump(projects, f)
+            data_file = f.name
+        try:
+            assert self.store.import_pickle(data_file) == len(projects)
+            assert len(self.store) == len(projects)
+        finally:
+            os.unlink(data_file)
+
+    def test_estimator_matches_in_memory(self):
+        """测试使用历史项目库的估算结果与内存历史数据一致"""
+        memory_estimator = AdvancedCostEstimator()
+        memory_estimator.add_historical_projects(make_projects())
+        store_estimator = AdvancedCostEstimator(history_store=self.store)
+        store_estimator.add_historical_projects(make_projects())
+        assert store_estimator.historical_projects == []
+
+        for complexity in ['low', 'medium', 'high', 'enterprise']:
+            params = {'hours': 200, 'complexity': complexity, 'team_size': 5, 'duration': 30}
+            expected = memory_estimator.estimate_cost_advanced(params)
+            result = store_estimator.estimate_cost_advanced(params)
+            assert result['total_cost'] == pytest.approx(expected['total_cost'])
+            assert result['confidence_level'] == pytest.approx(expected['confidence_level'])